@@ -0,0 +1,235 @@
+"""
+Times the scheduler methods called by the pipelines and training scripts (`set_timesteps`, `scale_model_input`, `step`
+and `add_noise`) for every scheduler class of `diffusers.schedulers`, over a grid of latent shapes, batch sizes and
+numbers of inference steps. Runs on CPU: the model is replaced by random model outputs so that only the scheduler
+overhead is measured.
+
+    python benchmarks/schedulers/benchmark_schedulers.py --output scheduler_benchmarks.csv
+
+The results of a previous run can be passed as a baseline, in which case every timing that is slower than the
+baseline by more than `--tolerance` is reported and the script exits with a non-zero status:
+
+    python benchmarks/schedulers/benchmark_schedulers.py --baseline scheduler_benchmarks.csv
+"""
+
+import argparse
+import csv
+import inspect
+import itertools
+import os
+import statistics
+import sys
+import time
+
+import torch
+
+import diffusers.schedulers
+
+
+GITHUB_SHA = os.getenv("GITHUB_SHA", None)
+BENCHMARK_FIELDS = [
+    "scheduler",
+    "operation",
+    "batch_size",
+    "latent_shape",
+    "num_inference_steps",
+    "time (us)",
+    "github_sha",
+]
+# The fields that identify a timing when comparing against a baseline.
+KEY_FIELDS = ["scheduler", "operation", "batch_size", "latent_shape", "num_inference_steps"]
+OPERATIONS = ["set_timesteps", "scale_model_input", "step", "add_noise"]
+
+
+def get_scheduler_classes(names=None):
+    # The Flax schedulers and the dummy objects of the schedulers whose dependencies aren't installed are left out.
+    classes = {}
+    for name in dir(diffusers.schedulers):
+        cls = getattr(diffusers.schedulers, name)
+        if not (inspect.isclass(cls) and name.endswith("Scheduler")) or name.startswith("Flax"):
+            continue
+        if names is not None and name not in names:
+            continue
+        if issubclass(cls, diffusers.schedulers.SchedulerMixin):
+            classes[name] = cls
+    return classes
+
+
+def time_us(fn, repeats):
+    # Median over `repeats` runs of the time of `fn`, after a warmup run. `fn` returns the number of calls it timed
+    # and their total time, so that it can leave the preparation of the calls out of the timing.
+    fn()
+    timings = []
+    for _ in range(repeats):
+        num_calls, elapsed = fn()
+        timings.append(1e6 * elapsed / num_calls)
+    return statistics.median(timings)
+
+
+def benchmark_set_timesteps(scheduler, num_inference_steps):
+    start = time.perf_counter()
+    scheduler.set_timesteps(num_inference_steps)
+    return 1, time.perf_counter() - start
+
+
+def benchmark_denoising_loop(scheduler, num_inference_steps, sample, operation):
+    # `step` and `scale_model_input` depend on the state of the scheduler, so they are timed over a full denoising
+    # loop, which is reset by `set_timesteps`.
+    scheduler.set_timesteps(num_inference_steps)
+    step_kwargs = {"return_dict": False}
+    if "generator" in inspect.signature(scheduler.step).parameters:
+        step_kwargs["generator"] = torch.manual_seed(0)
+    model_output = torch.randn_like(sample)
+
+    elapsed = 0.0
+    for t in scheduler.timesteps:
+        if hasattr(scheduler, "scale_model_input"):
+            start = time.perf_counter()
+            scheduler.scale_model_input(sample, t)
+            if operation == "scale_model_input":
+                elapsed += time.perf_counter() - start
+
+        start = time.perf_counter()
+        # The sample isn't updated, to keep the model outputs in the range of the schedule.
+        scheduler.step(model_output, t, sample, **step_kwargs)
+        if operation == "step":
+            elapsed += time.perf_counter() - start
+    return len(scheduler.timesteps), elapsed
+
+
+def benchmark_add_noise(scheduler, num_inference_steps, sample):
+    # Like in the training scripts, the timesteps of a batch are random.
+    scheduler.set_timesteps(num_inference_steps)
+    generator = torch.manual_seed(0)
+    timesteps = scheduler.timesteps[torch.randint(len(scheduler.timesteps), (sample.shape[0],), generator=generator)]
+    noise = torch.randn_like(sample)
+
+    start = time.perf_counter()
+    if hasattr(scheduler, "add_noise"):
+        scheduler.add_noise(sample, noise, timesteps)
+    else:
+        scheduler.scale_noise(sample, timesteps, noise)
+    return 1, time.perf_counter() - start
+
+
+def benchmark_scheduler(cls, operation, batch_size, latent_shape, num_inference_steps, repeats):
+    """Returns the time of `operation` in microseconds, or `None` if the scheduler doesn't have this operation."""
+    scheduler = cls()
+    if operation == "scale_model_input" and not hasattr(scheduler, "scale_model_input"):
+        return None
+    sample = torch.randn(batch_size, *latent_shape, generator=torch.manual_seed(0))
+
+    if operation == "set_timesteps":
+        return time_us(lambda: benchmark_set_timesteps(scheduler, num_inference_steps), repeats)
+    elif operation == "add_noise":
+        return time_us(lambda: benchmark_add_noise(scheduler, num_inference_steps, sample), repeats)
+    else:
+        return time_us(lambda: benchmark_denoising_loop(scheduler, num_inference_steps, sample, operation), repeats)
+
+
+def run_benchmarks(args):
+    results = []
+    for name, cls in get_scheduler_classes(args.schedulers).items():
+        for operation in args.operations:
+            # `set_timesteps` doesn't depend on the latents.
+            if operation == "set_timesteps":
+                configs = [(None, None, steps) for steps in args.num_inference_steps]
+            else:
+                configs = itertools.product(args.batch_sizes, args.latent_shapes, args.num_inference_steps)
+
+            for batch_size, latent_shape, num_inference_steps in configs:
+                try:
+                    timing = benchmark_scheduler(
+                        cls, operation, batch_size or 1, latent_shape or (4, 64, 64), num_inference_steps, args.repeats
+                    )
+                except Exception as e:
+                    # Some schedulers have a different API, e.g. `RePaintScheduler.step` also needs a mask, or only
+                    # support some numbers of inference steps.
+                    print(
+                        f"Skipping `{name}.{operation}` for {num_inference_steps} steps: {e.__class__.__name__}: {e}",
+                        file=sys.stderr,
+                    )
+                    continue
+                if timing is None:
+                    continue
+
+                results.append(
+                    {
+                        "scheduler": name,
+                        "operation": operation,
+                        "batch_size": batch_size or "",
+                        "latent_shape": "x".join(map(str, latent_shape)) if latent_shape else "",
+                        "num_inference_steps": num_inference_steps,
+                        "time (us)": timing,
+                        "github_sha": GITHUB_SHA,
+                    }
+                )
+    return results
+
+
+def compare_to_baseline(results, baseline_file, tolerance):
+    """Returns the results that are slower than in the baseline by more than `tolerance`, with their slowdown."""
+    with open(baseline_file, newline="") as f:
+        baseline = {tuple(row[field] for field in KEY_FIELDS): float(row["time (us)"]) for row in csv.DictReader(f)}
+
+    regressions = []
+    for result in results:
+        key = tuple(str(result[field]) for field in KEY_FIELDS)
+        if key in baseline and result["time (us)"] > (1 + tolerance) * baseline[key]:
+            regressions.append((result, result["time (us)"] / baseline[key]))
+    return regressions
+
+
+def parse_latent_shape(value):
+    return tuple(int(dim) for dim in value.split("x"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schedulers", nargs="+", default=None, help="Scheduler class names, defaults to all.")
+    parser.add_argument("--operations", nargs="+", default=OPERATIONS, choices=OPERATIONS)
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument(
+        "--latent_shapes",
+        type=parse_latent_shape,
+        nargs="+",
+        default=[(4, 64, 64), (16, 128, 128)],
+        help="Latent shapes without the batch dimension, formatted like `4x64x64`.",
+    )
+    parser.add_argument("--num_inference_steps", type=int, nargs="+", default=[4, 25, 50])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a CSV file to write results to.")
+    parser.add_argument(
+        "--baseline", type=str, default=None, help="Optional CSV file of a previous run to compare to."
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Relative slowdown over the baseline reported as a regression."
+    )
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+
+    results = run_benchmarks(args)
+
+    print(" | ".join(BENCHMARK_FIELDS[:-1]))
+    for result in results:
+        print(
+            " | ".join(
+                f"{result[field]:.1f}" if field == "time (us)" else str(result[field])
+                for field in BENCHMARK_FIELDS[:-1]
+            )
+        )
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=BENCHMARK_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+
+    if args.baseline is not None:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        for result, slowdown in regressions:
+            key = ", ".join(f"{field}={result[field]}" for field in KEY_FIELDS)
+            print(f"Regression: {key} is {slowdown:.2f}x slower than the baseline.")
+        if regressions:
+            sys.exit(1)
@@ -0,0 +1,125 @@
+"""
+Counts the host-device synchronizations and `torch.compile` graph breaks per denoising step of a scheduler, with and
+without the sync-free step path. Runs on CPU: the operations that synchronize on an accelerator are counted when they
+are called rather than timed.
+
+    python benchmarks/schedulers/benchmark_sync_free_step.py --num_inference_steps 25
+"""
+
+import argparse
+import csv
+import time
+
+import torch
+import torch._dynamo
+from torch.overrides import TorchFunctionMode
+
+from diffusers import (
+    DPMSolverMultistepScheduler,
+    EulerDiscreteScheduler,
+    FlowMatchEulerDiscreteScheduler,
+    HeunDiscreteScheduler,
+    KDPM2DiscreteScheduler,
+)
+
+
+SCHEDULERS = {
+    "euler": EulerDiscreteScheduler,
+    "flow_match_euler": FlowMatchEulerDiscreteScheduler,
+    "heun": HeunDiscreteScheduler,
+    "kdpm2": KDPM2DiscreteScheduler,
+    "dpmsolver_multistep": DPMSolverMultistepScheduler,
+}
+BENCHMARK_FIELDS = ["scheduler", "sync_free", "num_steps", "syncs / step", "graph breaks / step", "time / step (ms)"]
+
+# Tensor methods that copy a value to the host, which blocks until the device has caught up.
+SYNC_FUNCTIONS = {
+    torch.Tensor.item,
+    torch.Tensor.tolist,
+    torch.Tensor.nonzero,
+    torch.nonzero,
+    torch.Tensor.__bool__,
+    torch.Tensor.__int__,
+    torch.Tensor.__float__,
+    torch.Tensor.__index__,
+}
+
+
+class SyncCounter(TorchFunctionMode):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def __torch_function__(self, func, types, args=(), kwargs=None):
+        if func in SYNC_FUNCTIONS:
+            self.count += 1
+        return func(*args, **(kwargs or {}))
+
+
+def denoise(scheduler, sample):
+    # The model is replaced by a cheap elementwise op so that only the scheduler is measured.
+    for t in scheduler.timesteps:
+        model_input = scheduler.scale_model_input(sample, t) if hasattr(scheduler, "scale_model_input") else sample
+        sample = scheduler.step(torch.sin(model_input), t, sample).prev_sample
+    return sample
+
+
+def benchmark_scheduler(name, sync_free, num_inference_steps, shape):
+    scheduler = SCHEDULERS[name]()
+    if sync_free:
+        scheduler.enable_sync_free_step()
+    sample = torch.randn(shape)
+
+    scheduler.set_timesteps(num_inference_steps)
+    num_steps = len(scheduler.timesteps)
+    counter = SyncCounter()
+    with counter:
+        denoise(scheduler, sample)
+
+    scheduler.set_timesteps(num_inference_steps)
+    torch._dynamo.reset()
+    explanation = torch._dynamo.explain(denoise)(scheduler, sample)
+
+    scheduler.set_timesteps(num_inference_steps)
+    start = time.perf_counter()
+    denoise(scheduler, sample)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "scheduler": name,
+        "sync_free": sync_free,
+        "num_steps": num_steps,
+        "syncs / step": counter.count / num_steps,
+        "graph breaks / step": explanation.graph_break_count / num_steps,
+        "time / step (ms)": 1000 * elapsed / num_steps,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--schedulers", nargs="+", default=list(SCHEDULERS), choices=list(SCHEDULERS))
+    parser.add_argument("--num_inference_steps", type=int, default=25)
+    parser.add_argument("--shape", type=int, nargs="+", default=[1, 4, 64, 64])
+    parser.add_argument("--output", type=str, default=None, help="Optional path of a CSV file to write results to.")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.schedulers:
+        modes = [False, True] if hasattr(SCHEDULERS[name], "enable_sync_free_step") else [False]
+        for sync_free in modes:
+            results.append(benchmark_scheduler(name, sync_free, args.num_inference_steps, tuple(args.shape)))
+
+    print(" | ".join(BENCHMARK_FIELDS))
+    for result in results:
+        print(
+            " | ".join(
+                f"{result[field]:.2f}" if isinstance(result[field], float) else str(result[field])
+                for field in BENCHMARK_FIELDS
+            )
+        )
+
+    if args.output is not None:
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=BENCHMARK_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
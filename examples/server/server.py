@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import os
 import random
@@ -13,6 +12,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
+from diffusers import RequestBatchingEngine
 from diffusers.pipelines.stable_diffusion_3 import StableDiffusion3Pipeline
 
 
@@ -43,6 +43,7 @@ class HttpClient:
 
 class TextToImagePipeline:
     pipeline: StableDiffusion3Pipeline = None
+    engine: RequestBatchingEngine = None
     device: str = None
 
     def start(self):
@@ -65,6 +66,16 @@ class TextToImagePipeline:
         else:
             raise Exception("No CUDA or MPS device available")
 
+        # concurrent requests with the same settings are run as a single batched pipeline call
+        self.engine = RequestBatchingEngine(
+            self.pipeline,
+            max_batch_size=int(os.getenv("MAX_BATCH_SIZE", "4")),
+            max_wait_time=float(os.getenv("MAX_WAIT_TIME", "0.05")),
+        )
+
+    def stop(self):
+        self.engine.stop()
+
 
 app = FastAPI()
 service_url = os.getenv("SERVICE_URL", "http://localhost:8000")
@@ -91,6 +102,12 @@ def startup():
     shared_pipeline.start()
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await http_client.stop()
+    shared_pipeline.stop()
+
+
 def save_image(image):
     filename = "draw" + str(uuid.uuid4()).split("-")[0] + ".png"
     image_path = os.path.join(image_dir, filename)
@@ -110,12 +127,9 @@ async def base():
 @app.post("/v1/images/generations")
 async def generate_image(image_input: TextToImageInput):
     try:
-        loop = asyncio.get_event_loop()
-        scheduler = shared_pipeline.pipeline.scheduler.from_config(shared_pipeline.pipeline.scheduler.config)
-        pipeline = StableDiffusion3Pipeline.from_pipe(shared_pipeline.pipeline, scheduler=scheduler)
         generator = torch.Generator(device=shared_pipeline.device)
         generator.manual_seed(random.randint(0, 10000000))
-        output = await loop.run_in_executor(None, lambda: pipeline(image_input.prompt, generator=generator))
+        output = await shared_pipeline.engine.generate(prompt=image_input.prompt, generator=generator)
         logger.info(f"output: {output}")
         image_url = save_image(output.images[0])
         return {"data": [{"url": image_url}]}
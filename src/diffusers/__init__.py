@@ -28,11 +28,13 @@ from .utils import (
 
 _import_structure = {
     "configuration_utils": ["ConfigMixin"],
+    "hooks": [],
     "loaders": ["FromOriginalModelMixin"],
     "models": [],
     "pipelines": [],
     "quantizers.quantization_config": ["BitsAndBytesConfig", "GGUFQuantizationConfig", "TorchAoConfig"],
     "schedulers": [],
+    "serving": [],
     "utils": [
         "OptionalDependencyNotAvailable",
         "is_flax_available",
@@ -75,6 +77,19 @@ except OptionalDependencyNotAvailable:
     _import_structure["utils.dummy_pt_objects"] = [name for name in dir(dummy_pt_objects) if not name.startswith("_")]
 
 else:
+    _import_structure["hooks"].extend(
+        [
+            "DeepCacheConfig",
+            "FirstBlockCacheConfig",
+            "HookRegistry",
+            "ModelHook",
+            "PromptEmbedsCacheConfig",
+            "PyramidAttentionBroadcastConfig",
+            "apply_first_block_cache",
+            "apply_prompt_embeds_cache",
+            "apply_pyramid_attention_broadcast",
+        ]
+    )
     _import_structure["models"].extend(
         [
             "AllegroTransformer3DModel",
@@ -185,6 +200,7 @@ else:
             "DPMSolverMultistepInverseScheduler",
             "DPMSolverMultistepScheduler",
             "DPMSolverSinglestepScheduler",
+            "EDMBogackiShampineScheduler",
             "EDMDPMSolverMultistepScheduler",
             "EDMEulerScheduler",
             "EulerAncestralDiscreteScheduler",
@@ -197,6 +213,7 @@ else:
             "KDPM2AncestralDiscreteScheduler",
             "KDPM2DiscreteScheduler",
             "LCMScheduler",
+            "PicardSamplingOutput",
             "PNDMScheduler",
             "RePaintScheduler",
             "SASolverScheduler",
@@ -206,8 +223,10 @@ else:
             "UnCLIPScheduler",
             "UniPCMultistepScheduler",
             "VQDiffusionScheduler",
+            "picard_sample",
         ]
     )
+    _import_structure["serving"].extend(["ContinuousBatchingEngine", "RequestBatchingEngine"])
     _import_structure["training_utils"] = ["EMAModel"]
 
 try:
@@ -586,6 +605,17 @@ if TYPE_CHECKING or DIFFUSERS_SLOW_IMPORT:
     except OptionalDependencyNotAvailable:
         from .utils.dummy_pt_objects import *  # noqa F403
     else:
+        from .hooks import (
+            DeepCacheConfig,
+            FirstBlockCacheConfig,
+            HookRegistry,
+            ModelHook,
+            PromptEmbedsCacheConfig,
+            PyramidAttentionBroadcastConfig,
+            apply_first_block_cache,
+            apply_prompt_embeds_cache,
+            apply_pyramid_attention_broadcast,
+        )
         from .models import (
             AllegroTransformer3DModel,
             AsymmetricAutoencoderKL,
@@ -693,6 +723,7 @@ if TYPE_CHECKING or DIFFUSERS_SLOW_IMPORT:
             DPMSolverMultistepInverseScheduler,
             DPMSolverMultistepScheduler,
             DPMSolverSinglestepScheduler,
+            EDMBogackiShampineScheduler,
             EDMDPMSolverMultistepScheduler,
             EDMEulerScheduler,
             EulerAncestralDiscreteScheduler,
@@ -705,6 +736,7 @@ if TYPE_CHECKING or DIFFUSERS_SLOW_IMPORT:
             KDPM2AncestralDiscreteScheduler,
             KDPM2DiscreteScheduler,
             LCMScheduler,
+            PicardSamplingOutput,
             PNDMScheduler,
             RePaintScheduler,
             SASolverScheduler,
@@ -714,7 +746,9 @@ if TYPE_CHECKING or DIFFUSERS_SLOW_IMPORT:
             UnCLIPScheduler,
             UniPCMultistepScheduler,
             VQDiffusionScheduler,
+            picard_sample,
         )
+        from .serving import ContinuousBatchingEngine, RequestBatchingEngine
         from .training_utils import EMAModel
 
     try:
@@ -0,0 +1,10 @@
+from ..utils import is_torch_available
+
+
+if is_torch_available():
+    from .deep_cache import DeepCacheConfig
+    from .first_block_cache import FirstBlockCacheConfig, apply_first_block_cache
+    from .group_offloading import apply_group_offloading
+    from .hooks import HookRegistry, ModelHook
+    from .prompt_embeds_cache import PromptEmbedsCacheConfig, apply_prompt_embeds_cache
+    from .pyramid_attention_broadcast import PyramidAttentionBroadcastConfig, apply_pyramid_attention_broadcast
@@ -0,0 +1,118 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import torch
+
+from ..utils import logging
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+_DEFAULT_CACHE_CONTEXT = "default"
+
+
+@dataclass
+class DeepCacheConfig:
+    r"""
+    Configuration for [DeepCache](https://huggingface.co/papers/2312.00858).
+
+    The high-level features that the deep part of the UNet passes to the up block at `cache_branch_id` are computed
+    once every `cache_interval` steps. On the steps in between, only the first `cache_branch_id + 1` down blocks and
+    the last `cache_branch_id + 1` up blocks are run, and the cached high-level features are reused.
+
+    Args:
+        cache_interval (`int`, defaults to `3`):
+            The number of denoising steps between two full computations of the UNet.
+        cache_branch_id (`int`, defaults to `0`):
+            The index of the skip branch, ordered from the shallowest to the deepest down/up block pair, through which
+            the shallow blocks are connected to the cached features. Lower values skip more blocks and are faster, at
+            the cost of quality.
+    """
+
+    cache_interval: int = 3
+    cache_branch_id: int = 0
+
+
+class DeepCacheState:
+    r"""
+    State for DeepCache.
+
+    Attributes:
+        iteration (`int`):
+            The number of model calls made since the state was last reset.
+        cached_hidden_states (`torch.Tensor`, *optional*):
+            The input to the up block at the cache branch from the last fully computed step.
+    """
+
+    def __init__(self) -> None:
+        self.iteration: int = 0
+        self.cached_hidden_states: Optional[torch.Tensor] = None
+
+    def reset(self) -> None:
+        self.iteration = 0
+        self.cached_hidden_states = None
+
+
+class DeepCache:
+    r"""
+    Holds the configuration and state of DeepCache for a UNet. The UNet reads it in its `forward` to decide which
+    blocks to run. Use [`~models.cache_utils.CacheMixin.enable_cache`] with a [`DeepCacheConfig`] instead of
+    instantiating this class directly.
+    """
+
+    def __init__(self, module: torch.nn.Module, config: DeepCacheConfig) -> None:
+        down_blocks = getattr(module, "down_blocks", None)
+        up_blocks = getattr(module, "up_blocks", None)
+        if down_blocks is None or up_blocks is None or len(down_blocks) != len(up_blocks):
+            raise ValueError(
+                "DeepCache requires a UNet with the same number of down and up blocks, but got"
+                f" `{module.__class__.__name__}`."
+            )
+        if config.cache_interval < 1:
+            raise ValueError(f"`cache_interval` must be a positive integer, but got {config.cache_interval}.")
+        if not 0 <= config.cache_branch_id < len(down_blocks):
+            raise ValueError(
+                f"`cache_branch_id` must be between 0 and {len(down_blocks) - 1}, but got {config.cache_branch_id}."
+            )
+
+        self.cache_interval = config.cache_interval
+        self.cache_branch_id = config.cache_branch_id
+        self.cache_up_block_index = len(up_blocks) - 1 - config.cache_branch_id
+        self.current_context = _DEFAULT_CACHE_CONTEXT
+        self._states: Dict[str, DeepCacheState] = {}
+
+    @property
+    def state(self) -> DeepCacheState:
+        if self.current_context not in self._states:
+            self._states[self.current_context] = DeepCacheState()
+        return self._states[self.current_context]
+
+    def step(self) -> bool:
+        r"""
+        Advances the state by one model call and returns whether the cached high-level features can be reused for it.
+        """
+        state = self.state
+        use_cache = state.cached_hidden_states is not None and state.iteration % self.cache_interval != 0
+        state.iteration += 1
+        return use_cache
+
+    def reset_state(self) -> None:
+        self._states = {}
+
+    def remove(self) -> None:
+        self.reset_state()
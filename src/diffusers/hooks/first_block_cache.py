@@ -0,0 +1,301 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import torch
+
+from ..utils import logging
+from .hooks import HookRegistry, ModelHook
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+_DEFAULT_CACHE_CONTEXT = "default"
+_FIRST_BLOCK_CACHE_HOOK = "first_block_cache"
+
+# Names of the `nn.ModuleList` attributes that hold the transformer blocks, in the order they are run.
+_TRANSFORMER_BLOCK_STACK_NAMES = ("transformer_blocks", "single_transformer_blocks")
+
+# Maps a transformer block class name to `(accepts_encoder_hidden_states, hidden_states_output_index)`. An output index
+# of `None` means that the block returns `hidden_states` as a single tensor. Otherwise, the block returns a tuple of
+# `hidden_states` and `encoder_hidden_states` with `hidden_states` at the given index.
+_TRANSFORMER_BLOCK_SIGNATURES = {
+    "CogVideoXBlock": (True, 0),
+    "FluxSingleTransformerBlock": (False, None),
+    "FluxTransformerBlock": (True, 1),
+    "HunyuanVideoSingleTransformerBlock": (True, 0),
+    "HunyuanVideoTransformerBlock": (True, 0),
+    "JointTransformerBlock": (True, 1),
+}
+
+
+@dataclass
+class FirstBlockCacheConfig:
+    r"""
+    Configuration for [First Block Cache](https://github.com/chengzeyi/ParaAttention/blob/main/doc/fastest_flux.md).
+
+    At every denoising step, only the first transformer block is computed. If its output residual did not change
+    significantly since the last fully computed step, the remaining blocks are skipped and their cached residual is
+    reused instead.
+
+    Args:
+        threshold (`float`, defaults to `0.05`):
+            The relative L1 distance between the residual of the first transformer block at the current step and at
+            the last fully computed step, below which the remaining blocks are skipped. Higher values skip more blocks
+            at the cost of quality. A value of `0` disables skipping.
+    """
+
+    threshold: float = 0.05
+
+
+class FirstBlockCacheState:
+    r"""
+    State for First Block Cache.
+
+    Attributes:
+        head_block_residual (`torch.Tensor`, *optional*):
+            The residual of the first transformer block at the last fully computed step.
+        should_compute (`bool`):
+            Whether the remaining transformer blocks have to be computed at the current step.
+        tail_block_inputs (`Dict[int, Tuple[torch.Tensor, Optional[torch.Tensor]]]`):
+            The `hidden_states` and `encoder_hidden_states` that are passed to the first cached block of each stack.
+        tail_block_residuals (`Dict[int, Tuple[torch.Tensor, Optional[torch.Tensor]]]`):
+            The residuals of the `hidden_states` and `encoder_hidden_states` across the cached blocks of each stack.
+    """
+
+    def __init__(self) -> None:
+        self.head_block_residual: Optional[torch.Tensor] = None
+        self.should_compute: bool = True
+        self.tail_block_inputs: Dict[int, Tuple[torch.Tensor, Optional[torch.Tensor]]] = {}
+        self.tail_block_residuals: Dict[int, Tuple[torch.Tensor, Optional[torch.Tensor]]] = {}
+
+    def reset(self) -> None:
+        self.head_block_residual = None
+        self.should_compute = True
+        self.tail_block_inputs = {}
+        self.tail_block_residuals = {}
+
+
+class FirstBlockCache:
+    r"""
+    Registers the First Block Cache hooks on the transformer blocks of a model and holds their shared state. Use
+    [`~hooks.apply_first_block_cache`] instead of instantiating this class directly.
+
+    A separate [`FirstBlockCacheState`] is kept per cache context, so that pipelines which run the model more than once
+    per denoising step (for example, separate conditional and unconditional passes) do not compare residuals across
+    unrelated inputs.
+    """
+
+    def __init__(self, module: torch.nn.Module, config: FirstBlockCacheConfig) -> None:
+        self.threshold = config.threshold
+        self.current_context = _DEFAULT_CACHE_CONTEXT
+        self._states: Dict[str, FirstBlockCacheState] = {}
+        self._blocks: List[torch.nn.Module] = []
+
+        stacks = []
+        for name in _TRANSFORMER_BLOCK_STACK_NAMES:
+            stack = getattr(module, name, None)
+            if isinstance(stack, torch.nn.ModuleList) and len(stack) > 0:
+                stacks.append(list(stack))
+        if len(stacks) == 0:
+            raise ValueError(
+                f"First Block Cache could not find any transformer blocks in `{module.__class__.__name__}`."
+            )
+
+        for stack in stacks:
+            for block in stack:
+                if block.__class__.__name__ not in _TRANSFORMER_BLOCK_SIGNATURES:
+                    raise ValueError(
+                        f"First Block Cache does not support transformer blocks of type `{block.__class__.__name__}`."
+                    )
+
+        head_block = stacks[0][0]
+        self._register_hook(head_block, FirstBlockCacheHeadHook(self))
+
+        for stack_index, stack in enumerate(stacks):
+            tail_blocks = stack[1:] if stack_index == 0 else stack
+            for position, block in enumerate(tail_blocks):
+                hook = FirstBlockCacheTailHook(
+                    self, stack_index, is_first=position == 0, is_last=position == len(tail_blocks) - 1
+                )
+                self._register_hook(block, hook)
+
+    @property
+    def state(self) -> FirstBlockCacheState:
+        if self.current_context not in self._states:
+            self._states[self.current_context] = FirstBlockCacheState()
+        return self._states[self.current_context]
+
+    def reset_state(self) -> None:
+        self._states = {}
+
+    def remove(self) -> None:
+        for block in self._blocks:
+            HookRegistry.check_if_exists_or_initialize(block).remove_hook(_FIRST_BLOCK_CACHE_HOOK, recurse=False)
+        self._blocks = []
+        self.reset_state()
+
+    def _register_hook(self, block: torch.nn.Module, hook: ModelHook) -> None:
+        registry = HookRegistry.check_if_exists_or_initialize(block)
+        registry.register_hook(hook, _FIRST_BLOCK_CACHE_HOOK)
+        self._blocks.append(block)
+
+
+class FirstBlockCacheHeadHook(ModelHook):
+    r"""Computes the first transformer block and decides whether the remaining blocks have to be computed."""
+
+    def __init__(self, cache: FirstBlockCache) -> None:
+        super().__init__()
+        self.cache = cache
+        self.signature = None
+
+    def initialize_hook(self, module: torch.nn.Module) -> torch.nn.Module:
+        self.signature = _TRANSFORMER_BLOCK_SIGNATURES[module.__class__.__name__]
+        return module
+
+    def new_forward(self, module: torch.nn.Module, *args, **kwargs) -> Any:
+        state = self.cache.state
+        hidden_states, _ = _get_block_inputs(self.signature, args, kwargs)
+        output = self.fn_ref.original_forward(*args, **kwargs)
+        output_hidden_states, _ = _get_block_outputs(self.signature, output)
+        residual = output_hidden_states - hidden_states
+
+        state.should_compute = (
+            state.head_block_residual is None
+            or state.head_block_residual.shape != residual.shape
+            or _relative_l1_distance(residual, state.head_block_residual) >= self.cache.threshold
+        )
+        if state.should_compute:
+            # The reference residual is only updated on fully computed steps, so that slow drifts over several
+            # skipped steps still trigger a recomputation.
+            state.head_block_residual = residual
+        return output
+
+
+class FirstBlockCacheTailHook(ModelHook):
+    r"""Computes a remaining transformer block, or skips it and applies the cached residual of its stack."""
+
+    def __init__(self, cache: FirstBlockCache, stack_index: int, is_first: bool, is_last: bool) -> None:
+        super().__init__()
+        self.cache = cache
+        self.stack_index = stack_index
+        self.is_first = is_first
+        self.is_last = is_last
+        self.signature = None
+
+    def initialize_hook(self, module: torch.nn.Module) -> torch.nn.Module:
+        self.signature = _TRANSFORMER_BLOCK_SIGNATURES[module.__class__.__name__]
+        return module
+
+    def new_forward(self, module: torch.nn.Module, *args, **kwargs) -> Any:
+        state = self.cache.state
+        signature = self.signature
+        if state.should_compute:
+            if self.is_first:
+                state.tail_block_inputs[self.stack_index] = _get_block_inputs(signature, args, kwargs)
+            output = self.fn_ref.original_forward(*args, **kwargs)
+            if self.is_last:
+                input_hidden_states, input_encoder_hidden_states = state.tail_block_inputs.pop(self.stack_index)
+                output_hidden_states, output_encoder_hidden_states = _get_block_outputs(signature, output)
+                encoder_hidden_states_residual = None
+                if input_encoder_hidden_states is not None and output_encoder_hidden_states is not None:
+                    encoder_hidden_states_residual = output_encoder_hidden_states - input_encoder_hidden_states
+                state.tail_block_residuals[self.stack_index] = (
+                    output_hidden_states - input_hidden_states,
+                    encoder_hidden_states_residual,
+                )
+            return output
+
+        hidden_states, encoder_hidden_states = _get_block_inputs(signature, args, kwargs)
+        if self.is_last:
+            hidden_states_residual, encoder_hidden_states_residual = state.tail_block_residuals[self.stack_index]
+            hidden_states = hidden_states + hidden_states_residual
+            if encoder_hidden_states_residual is not None:
+                encoder_hidden_states = encoder_hidden_states + encoder_hidden_states_residual
+            elif signature[1] is not None:
+                # Blocks that do not return an updated context (e.g. `context_pre_only` blocks) return `None`.
+                encoder_hidden_states = None
+        return _make_block_outputs(signature, hidden_states, encoder_hidden_states)
+
+
+def apply_first_block_cache(module: torch.nn.Module, config: FirstBlockCacheConfig) -> FirstBlockCache:
+    r"""
+    Apply [First Block Cache](https://github.com/chengzeyi/ParaAttention/blob/main/doc/fastest_flux.md) to a given
+    transformer model.
+
+    Args:
+        module (`torch.nn.Module`):
+            The transformer model to apply First Block Cache to. Its blocks must be stored in `transformer_blocks`
+            and, optionally, `single_transformer_blocks`.
+        config (`FirstBlockCacheConfig`):
+            The configuration to use for First Block Cache.
+
+    Returns:
+        [`~hooks.first_block_cache.FirstBlockCache`]: The object holding the cache state. Call its `remove` method
+        to restore the original transformer blocks.
+
+    Example:
+
+    ```python
+    >>> import torch
+    >>> from diffusers import FluxPipeline, FirstBlockCacheConfig, apply_first_block_cache
+
+    >>> pipe = FluxPipeline.from_pretrained("black-forest-labs/FLUX.1-dev", torch_dtype=torch.bfloat16)
+    >>> pipe.to("cuda")
+
+    >>> config = FirstBlockCacheConfig(threshold=0.08)
+    >>> apply_first_block_cache(pipe.transformer, config)
+
+    >>> image = pipe("A cat holding a sign that says hello world", num_inference_steps=28).images[0]
+    ```
+    """
+    return FirstBlockCache(module, config)
+
+
+def _get_block_inputs(
+    signature: Tuple[bool, Optional[int]], args: Tuple[Any], kwargs: Dict[str, Any]
+) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+    accepts_encoder_hidden_states, _ = signature
+    hidden_states = kwargs["hidden_states"] if "hidden_states" in kwargs else args[0]
+    encoder_hidden_states = None
+    if accepts_encoder_hidden_states:
+        encoder_hidden_states = kwargs["encoder_hidden_states"] if "encoder_hidden_states" in kwargs else args[1]
+    return hidden_states, encoder_hidden_states
+
+
+def _get_block_outputs(
+    signature: Tuple[bool, Optional[int]], output: Any
+) -> Tuple[torch.Tensor, Optional[torch.Tensor]]:
+    _, hidden_states_index = signature
+    if hidden_states_index is None:
+        return output, None
+    return output[hidden_states_index], output[1 - hidden_states_index]
+
+
+def _make_block_outputs(
+    signature: Tuple[bool, Optional[int]], hidden_states: torch.Tensor, encoder_hidden_states: Optional[torch.Tensor]
+) -> Any:
+    _, hidden_states_index = signature
+    if hidden_states_index is None:
+        return hidden_states
+    if hidden_states_index == 0:
+        return hidden_states, encoder_hidden_states
+    return encoder_hidden_states, hidden_states
+
+
+def _relative_l1_distance(x: torch.Tensor, reference: torch.Tensor) -> float:
+    return ((x - reference).abs().mean() / reference.abs().mean()).item()
@@ -0,0 +1,332 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Union
+
+import torch
+
+from ..utils import logging
+from .hooks import HookRegistry, ModelHook
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+_GROUP_OFFLOADING = "group_offloading"
+
+
+class ModuleGroup:
+    r"""
+    A group of modules whose parameters and buffers are moved between the offload and onload devices together.
+
+    The offloaded copy of every tensor is kept for the lifetime of the group, so offloading only swaps the tensor data
+    back to it instead of copying the weights back to the offload device. This assumes that the weights are not
+    modified while offloading is enabled, which holds for inference.
+
+    Args:
+        modules (`List[torch.nn.Module]`):
+            The modules in the group, in execution order.
+        tensors (`List[torch.Tensor]`):
+            The parameters and buffers moved with the group.
+        offload_device (`torch.device`):
+            The device that the tensors are stored on while the group is not in use.
+        onload_device (`torch.device`):
+            The device that the tensors are moved to before the group is run.
+        onload_leader (`torch.nn.Module`):
+            The module whose forward pass onloads the group.
+        offload_leader (`torch.nn.Module`):
+            The module whose forward pass offloads the group once it returns.
+        non_blocking (`bool`, defaults to `False`):
+            Whether the transfers to the onload device are non-blocking.
+        stream (`torch.cuda.Stream`, *optional*):
+            The CUDA stream on which the group is prefetched.
+        executor (`concurrent.futures.ThreadPoolExecutor`, *optional*):
+            The background thread on which the group is prefetched when no CUDA stream is available.
+    """
+
+    def __init__(
+        self,
+        modules: List[torch.nn.Module],
+        tensors: List[torch.Tensor],
+        offload_device: torch.device,
+        onload_device: torch.device,
+        onload_leader: torch.nn.Module,
+        offload_leader: torch.nn.Module,
+        non_blocking: bool = False,
+        stream: Optional["torch.cuda.Stream"] = None,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> None:
+        self.modules = modules
+        self.tensors = tensors
+        self.offload_device = offload_device
+        self.onload_device = onload_device
+        self.onload_leader = onload_leader
+        self.offload_leader = offload_leader
+        self.non_blocking = non_blocking
+        self.stream = stream
+        self.executor = executor
+        self.next_group: Optional["ModuleGroup"] = None
+
+        self._is_onloaded = False
+        self._pending: Optional[Union[Future, bool]] = None
+
+        self._offloaded_tensors: Dict[torch.Tensor, torch.Tensor] = {}
+        for tensor in self.tensors:
+            offloaded_tensor = tensor.data.to(self.offload_device)
+            if self.stream is not None and offloaded_tensor.device.type == "cpu":
+                # Transfers from pinned memory can overlap with computation on the onload device.
+                offloaded_tensor = offloaded_tensor.pin_memory()
+            tensor.data = offloaded_tensor
+            self._offloaded_tensors[tensor] = offloaded_tensor
+
+    @property
+    def is_onloaded(self) -> bool:
+        return self._is_onloaded or self._pending is not None
+
+    def _copy_to_onload_device(self) -> Dict[torch.Tensor, torch.Tensor]:
+        return {
+            tensor: offloaded_tensor.to(self.onload_device, non_blocking=self.non_blocking or self.stream is not None)
+            for tensor, offloaded_tensor in self._offloaded_tensors.items()
+        }
+
+    def _assign(self, onloaded_tensors: Dict[torch.Tensor, torch.Tensor]) -> None:
+        for tensor, onloaded_tensor in onloaded_tensors.items():
+            tensor.data = onloaded_tensor
+
+    def prefetch_(self) -> None:
+        r"""
+        Starts moving the group to the onload device in the background, if it is not already there. Does nothing if
+        prefetching is disabled, in which case the group is onloaded right before it runs.
+        """
+        if self.is_onloaded:
+            return
+
+        if self.stream is not None:
+            with torch.cuda.stream(self.stream):
+                self._assign(self._copy_to_onload_device())
+            self._pending = True
+        elif self.executor is not None:
+            self._pending = self.executor.submit(self._copy_to_onload_device)
+
+    def onload_(self) -> None:
+        r"""Moves the group to the onload device, waiting for a pending prefetch to complete if there is one."""
+        if self._is_onloaded:
+            return
+
+        if self._pending is None:
+            self._assign(self._copy_to_onload_device())
+        elif isinstance(self._pending, Future):
+            self._assign(self._pending.result())
+        else:
+            current_stream = torch.cuda.current_stream()
+            current_stream.wait_stream(self.stream)
+            # The tensors were allocated on the prefetch stream but are used and freed on the current one.
+            for tensor in self.tensors:
+                tensor.data.record_stream(current_stream)
+
+        self._pending = None
+        self._is_onloaded = True
+
+    def offload_(self) -> None:
+        r"""Moves the group back to the offload device."""
+        if not self.is_onloaded:
+            return
+
+        if isinstance(self._pending, Future):
+            self._pending.result()
+        self._assign(self._offloaded_tensors)
+        self._pending = None
+        self._is_onloaded = False
+
+
+class GroupOffloadingHook(ModelHook):
+    r"""
+    Onloads a [`ModuleGroup`] before its first module runs and prefetches the next group, then offloads the group
+    once its last module returns.
+    """
+
+    def __init__(self, group: ModuleGroup) -> None:
+        super().__init__()
+        self.group = group
+
+    def pre_forward(self, module: torch.nn.Module, *args, **kwargs):
+        if module is self.group.onload_leader:
+            self.group.onload_()
+            if self.group.next_group is not None:
+                self.group.next_group.prefetch_()
+        return args, kwargs
+
+    def post_forward(self, module: torch.nn.Module, output):
+        if module is self.group.offload_leader:
+            self.group.offload_()
+        return output
+
+
+class RootGroupOffloadingHook(GroupOffloadingHook):
+    r"""
+    Onloads the parameters of a model that are not part of any block group for the duration of its forward pass. Once
+    the forward pass returns, any block group that is still onloaded, for example because its blocks were skipped, is
+    offloaded as well.
+    """
+
+    def __init__(self, group: ModuleGroup, block_groups: List[ModuleGroup]) -> None:
+        super().__init__(group)
+        self.block_groups = block_groups
+
+    def post_forward(self, module: torch.nn.Module, output):
+        self.group.offload_()
+        for group in self.block_groups:
+            group.offload_()
+        return output
+
+    @property
+    def onload_device(self) -> torch.device:
+        return self.group.onload_device
+
+
+def apply_group_offloading(
+    module: torch.nn.Module,
+    onload_device: Union[str, torch.device],
+    offload_device: Union[str, torch.device] = torch.device("cpu"),
+    num_blocks_per_group: int = 1,
+    non_blocking: bool = False,
+    use_stream: bool = False,
+) -> None:
+    r"""
+    Apply group offloading to a model. The blocks stored in the `torch.nn.ModuleList` children of the model are split
+    into groups of `num_blocks_per_group` consecutive blocks. A group is moved to the onload device right before its
+    first block runs and back to the offload device once its last block returns, so that only one group (or two, with
+    prefetching) is on the onload device at a time. The remaining parameters of the model are onloaded for the
+    duration of its forward pass.
+
+    This sits between [`~DiffusionPipeline.enable_model_cpu_offload`], which keeps the whole model on the onload device
+    while it runs, and [`~DiffusionPipeline.enable_sequential_cpu_offload`], which moves the weights of one leaf module
+    at a time and spends most of its time waiting for transfers.
+
+    Args:
+        module (`torch.nn.Module`):
+            The model to apply group offloading to.
+        onload_device (`torch.device` or `str`):
+            The device that the model runs on.
+        offload_device (`torch.device` or `str`, defaults to `"cpu"`):
+            The device that the weights are stored on while they are not in use.
+        num_blocks_per_group (`int`, defaults to `1`):
+            The number of consecutive blocks that are moved together. Larger groups make fewer, larger transfers at
+            the cost of memory.
+        non_blocking (`bool`, defaults to `False`):
+            Whether the transfers to the onload device are non-blocking.
+        use_stream (`bool`, defaults to `False`):
+            Whether to prefetch the next group while the current one runs. The transfers are made on a separate CUDA
+            stream when the onload device is a CUDA device, and on a background thread otherwise.
+
+    Example:
+
+    ```python
+    >>> import torch
+    >>> from diffusers import HunyuanVideoTransformer3DModel
+    >>> from diffusers.hooks import apply_group_offloading
+
+    >>> transformer = HunyuanVideoTransformer3DModel.from_pretrained(
+    ...     "hunyuanvideo-community/HunyuanVideo", subfolder="transformer", torch_dtype=torch.bfloat16
+    ... )
+    >>> apply_group_offloading(transformer, onload_device="cuda", num_blocks_per_group=2, use_stream=True)
+    ```
+    """
+    onload_device = torch.device(onload_device)
+    offload_device = torch.device(offload_device)
+    if num_blocks_per_group < 1:
+        raise ValueError(f"`num_blocks_per_group` must be a positive integer, but got {num_blocks_per_group}.")
+
+    registry = HookRegistry.check_if_exists_or_initialize(module)
+    if registry.get_hook(_GROUP_OFFLOADING) is not None:
+        raise ValueError(f"Group offloading has already been applied to `{module.__class__.__name__}`.")
+
+    stream = None
+    executor = None
+    if use_stream:
+        if onload_device.type == "cuda" and torch.cuda.is_available():
+            stream = torch.cuda.Stream(device=onload_device)
+        else:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diffusers_group_offloading")
+
+    block_groups = []
+    grouped_tensors = set()
+    for child in module.children():
+        if not isinstance(child, torch.nn.ModuleList):
+            continue
+        for i in range(0, len(child), num_blocks_per_group):
+            blocks = list(child[i : i + num_blocks_per_group])
+            tensors = _get_unique_tensors(blocks)
+            if len(tensors) == 0:
+                continue
+            grouped_tensors.update(tensors)
+            group = ModuleGroup(
+                modules=blocks,
+                tensors=tensors,
+                offload_device=offload_device,
+                onload_device=onload_device,
+                onload_leader=blocks[0],
+                offload_leader=blocks[-1],
+                non_blocking=non_blocking,
+                stream=stream,
+                executor=executor,
+            )
+            block_groups.append(group)
+
+    # Blocks are assumed to run in the order in which they are defined. When they don't, the prefetched group is
+    # simply kept on the onload device until it runs or the forward pass of the model returns.
+    for group, next_group in zip(block_groups, block_groups[1:]):
+        group.next_group = next_group
+
+    for group in block_groups:
+        hook = GroupOffloadingHook(group)
+        HookRegistry.check_if_exists_or_initialize(group.onload_leader).register_hook(hook, _GROUP_OFFLOADING)
+        if group.offload_leader is not group.onload_leader:
+            hook = GroupOffloadingHook(group)
+            HookRegistry.check_if_exists_or_initialize(group.offload_leader).register_hook(hook, _GROUP_OFFLOADING)
+
+    root_tensors = [tensor for tensor in _get_unique_tensors([module]) if tensor not in grouped_tensors]
+    root_group = ModuleGroup(
+        modules=[module],
+        tensors=root_tensors,
+        offload_device=offload_device,
+        onload_device=onload_device,
+        onload_leader=module,
+        offload_leader=module,
+        non_blocking=non_blocking,
+        stream=None,
+        executor=None,
+    )
+    root_group.next_group = block_groups[0] if len(block_groups) > 0 else None
+    registry.register_hook(RootGroupOffloadingHook(root_group, block_groups), _GROUP_OFFLOADING)
+
+
+def _get_unique_tensors(modules: List[torch.nn.Module]) -> List[torch.Tensor]:
+    tensors = []
+    seen = set()
+    for module in modules:
+        for tensor in [*module.parameters(), *module.buffers()]:
+            if tensor not in seen:
+                seen.add(tensor)
+                tensors.append(tensor)
+    return tensors
+
+
+def _get_group_onload_device(module: torch.nn.Module) -> Optional[torch.device]:
+    registry = getattr(module, "_diffusers_hook", None)
+    hook = registry.get_hook(_GROUP_OFFLOADING) if registry is not None else None
+    if isinstance(hook, RootGroupOffloadingHook):
+        return hook.onload_device
+    return None
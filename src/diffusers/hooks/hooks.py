@@ -0,0 +1,271 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import torch
+
+from ..utils import logging
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+class ModelHook:
+    r"""
+    A hook that intercepts the forward pass of a module. Hooks are attached to a module through its [`HookRegistry`].
+
+    Subclasses can override `pre_forward` to modify the inputs, `post_forward` to modify the output, or define a
+    `new_forward(module, *args, **kwargs)` method to replace the forward pass altogether. From within `new_forward`,
+    the forward pass that the hook replaced is available as `self.fn_ref.original_forward`.
+    """
+
+    _is_stateful = False
+
+    def __init__(self) -> None:
+        self.fn_ref: Optional["HookFunctionReference"] = None
+
+    def initialize_hook(self, module: torch.nn.Module) -> torch.nn.Module:
+        r"""
+        Called when the hook is registered to a module.
+
+        Args:
+            module (`torch.nn.Module`):
+                The module that the hook is attached to.
+        """
+        return module
+
+    def deinitialize_hook(self, module: torch.nn.Module) -> torch.nn.Module:
+        r"""
+        Called when the hook is removed from a module.
+
+        Args:
+            module (`torch.nn.Module`):
+                The module that the hook is detached from.
+        """
+        return module
+
+    def pre_forward(self, module: torch.nn.Module, *args, **kwargs) -> Tuple[Tuple[Any], Dict[str, Any]]:
+        r"""
+        Called before the forward pass of the module.
+
+        Args:
+            module (`torch.nn.Module`):
+                The module whose forward pass is about to be executed.
+            args (`Tuple[Any]`):
+                The positional arguments passed to the module.
+            kwargs (`Dict[str, Any]`):
+                The keyword arguments passed to the module.
+
+        Returns:
+            `Tuple[Tuple[Any], Dict[str, Any]]`: The positional and keyword arguments to pass to the forward pass.
+        """
+        return args, kwargs
+
+    def post_forward(self, module: torch.nn.Module, output: Any) -> Any:
+        r"""
+        Called after the forward pass of the module.
+
+        Args:
+            module (`torch.nn.Module`):
+                The module whose forward pass was executed.
+            output (`Any`):
+                The output of the forward pass.
+
+        Returns:
+            `Any`: The output to return to the caller.
+        """
+        return output
+
+    def reset_state(self, module: torch.nn.Module) -> torch.nn.Module:
+        r"""
+        Resets the state of a stateful hook, for example at the end of a pipeline call.
+
+        Args:
+            module (`torch.nn.Module`):
+                The module that the hook is attached to.
+        """
+        if self._is_stateful:
+            raise NotImplementedError(f"`{self.__class__.__name__}` is stateful but does not implement `reset_state`.")
+        return module
+
+
+class HookFunctionReference:
+    r"""
+    Holds the functions that make up one link in the chain of hooks of a module. Keeping them in a mutable object
+    allows hooks to be removed from the middle of the chain without rebuilding the remaining hooks.
+
+    Attributes:
+        pre_forward (`Callable`):
+            The `pre_forward` method of the hook.
+        post_forward (`Callable`):
+            The `post_forward` method of the hook.
+        forward (`Callable`):
+            The function that is called between `pre_forward` and `post_forward`. This is either the forward pass that
+            the hook wraps or the `new_forward` method of the hook.
+        original_forward (`Callable`, *optional*):
+            The forward pass that the hook wraps, if the hook defines `new_forward`.
+    """
+
+    def __init__(self) -> None:
+        self.pre_forward: Optional[Callable] = None
+        self.post_forward: Optional[Callable] = None
+        self.forward: Optional[Callable] = None
+        self.original_forward: Optional[Callable] = None
+
+
+class HookRegistry:
+    r"""
+    Holds the hooks attached to a module and chains them around its forward pass. Hooks registered later wrap the ones
+    registered earlier, so their `pre_forward` runs first and their `post_forward` runs last. Use
+    [`~HookRegistry.check_if_exists_or_initialize`] to get the registry of a module.
+    """
+
+    def __init__(self, module_ref: torch.nn.Module) -> None:
+        self.hooks: Dict[str, ModelHook] = {}
+        self._module_ref = module_ref
+        self._hook_order: List[str] = []
+        self._fn_refs: List[HookFunctionReference] = []
+        # The `forward` that was set on the module instance before the first hook was registered, if any, so that it
+        # can be restored exactly once all hooks are removed.
+        self._original_instance_forward: Optional[Callable] = None
+
+    def register_hook(self, hook: ModelHook, name: str) -> None:
+        r"""
+        Registers a hook on the module under a unique name.
+
+        Args:
+            hook (`ModelHook`):
+                The hook to register.
+            name (`str`):
+                The name of the hook, used to retrieve or remove it later.
+        """
+        if name in self.hooks:
+            raise ValueError(
+                f"Hook with name {name} already exists in the registry. Please use a different name or first remove the existing hook."
+            )
+
+        if len(self._hook_order) == 0:
+            self._original_instance_forward = self._module_ref.__dict__.get("forward")
+
+        self._module_ref = hook.initialize_hook(self._module_ref)
+
+        fn_ref = HookFunctionReference()
+        fn_ref.pre_forward = hook.pre_forward
+        fn_ref.post_forward = hook.post_forward
+        fn_ref.forward = self._module_ref.forward
+        if hasattr(hook, "new_forward"):
+            fn_ref.original_forward = fn_ref.forward
+            fn_ref.forward = functools.update_wrapper(
+                functools.partial(hook.new_forward, self._module_ref), hook.new_forward
+            )
+
+        def new_forward(module, *args, **kwargs):
+            args, kwargs = fn_ref.pre_forward(module, *args, **kwargs)
+            output = fn_ref.forward(*args, **kwargs)
+            return fn_ref.post_forward(module, output)
+
+        self._module_ref.forward = functools.update_wrapper(
+            functools.partial(new_forward, self._module_ref), type(self._module_ref).forward
+        )
+
+        hook.fn_ref = fn_ref
+        self.hooks[name] = hook
+        self._hook_order.append(name)
+        self._fn_refs.append(fn_ref)
+
+    def get_hook(self, name: str) -> Optional[ModelHook]:
+        r"""Returns the hook registered under `name`, or `None` if there is no such hook."""
+        return self.hooks.get(name, None)
+
+    def remove_hook(self, name: str, recurse: bool = True) -> None:
+        r"""
+        Removes the hook registered under `name` and restores the forward pass that it wrapped.
+
+        Args:
+            name (`str`):
+                The name of the hook to remove.
+            recurse (`bool`, defaults to `True`):
+                Whether to also remove hooks with the same name from the submodules of the module.
+        """
+        if name in self.hooks:
+            index = self._hook_order.index(name)
+            hook = self.hooks[name]
+            fn_ref = self._fn_refs[index]
+
+            old_forward = fn_ref.forward
+            if fn_ref.original_forward is not None:
+                old_forward = fn_ref.original_forward
+
+            if index == len(self._hook_order) - 1:
+                self._module_ref.forward = old_forward
+            else:
+                next_fn_ref = self._fn_refs[index + 1]
+                if next_fn_ref.original_forward is not None:
+                    next_fn_ref.original_forward = old_forward
+                else:
+                    next_fn_ref.forward = old_forward
+
+            self._module_ref = hook.deinitialize_hook(self._module_ref)
+            del self.hooks[name]
+            self._hook_order.pop(index)
+            self._fn_refs.pop(index)
+
+            if len(self._hook_order) == 0:
+                if self._original_instance_forward is None:
+                    del self._module_ref.forward
+                else:
+                    self._module_ref.forward = self._original_instance_forward
+                self._original_instance_forward = None
+
+        if recurse:
+            for module_name, module in self._module_ref.named_modules():
+                if module_name == "" or not hasattr(module, "_diffusers_hook"):
+                    continue
+                module._diffusers_hook.remove_hook(name, recurse=False)
+
+    def reset_stateful_hooks(self, recurse: bool = True) -> None:
+        r"""
+        Resets the state of all stateful hooks of the module.
+
+        Args:
+            recurse (`bool`, defaults to `True`):
+                Whether to also reset the stateful hooks of the submodules of the module.
+        """
+        for hook_name in reversed(self._hook_order):
+            hook = self.hooks[hook_name]
+            if hook._is_stateful:
+                hook.reset_state(self._module_ref)
+
+        if recurse:
+            for module_name, module in self._module_ref.named_modules():
+                if module_name == "" or not hasattr(module, "_diffusers_hook"):
+                    continue
+                module._diffusers_hook.reset_stateful_hooks(recurse=False)
+
+    @classmethod
+    def check_if_exists_or_initialize(cls, module: torch.nn.Module) -> "HookRegistry":
+        r"""Returns the registry of `module`, creating and attaching a new one if the module does not have one yet."""
+        if not hasattr(module, "_diffusers_hook"):
+            module._diffusers_hook = cls(module)
+        return module._diffusers_hook
+
+    def __repr__(self) -> str:
+        registry_repr = ""
+        for i, hook_name in enumerate(self._hook_order):
+            registry_repr += f"  ({i}) {hook_name} - {self.hooks[hook_name].__class__.__name__}"
+            if i < len(self._hook_order) - 1:
+                registry_repr += "\n"
+        return f"HookRegistry(\n{registry_repr}\n)"
@@ -0,0 +1,449 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import importlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import safetensors.torch
+import torch
+
+from ..utils import is_peft_available, logging
+from .hooks import HookRegistry, ModelHook
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+_PROMPT_EMBEDS_CACHE_HOOK = "prompt_embeds_cache"
+_FINGERPRINT_SAMPLES_PER_PARAMETER = 64
+
+
+@dataclass
+class PromptEmbedsCacheConfig:
+    r"""
+    Configuration for the prompt embeddings cache.
+
+    Args:
+        max_memory (`int`, defaults to `1073741824`):
+            The maximum size in bytes of the cached text encoder outputs kept in memory. The least recently used
+            outputs are evicted first.
+        cache_dir (`str`, *optional*):
+            A directory where the text encoder outputs are also saved as safetensors files, so that they can be reused
+            by other processes or after a restart. Outputs evicted from memory are reloaded from this directory.
+    """
+
+    max_memory: int = 1024**3
+    cache_dir: Optional[str] = None
+
+
+class PromptEmbedsCache:
+    r"""
+    Registers the prompt embeddings cache hooks on the text encoders of a pipeline and holds the cached outputs. Use
+    [`~hooks.apply_prompt_embeds_cache`] instead of instantiating this class directly.
+
+    Every text encoder call is keyed on its inputs (the token ids and attention mask produced by the tokenizer, and
+    flags like `output_hidden_states`), on the identity of the text encoder (its config and weights, checked again
+    whenever its parameters are modified or replaced), on its dtype and on its LoRA state. Outputs kept in memory are
+    also keyed on the device they were computed on. The cache keeps its own copy of every output and returns a copy on
+    every hit, so that callers can modify the prompt embeddings in place. The cache can be used by text encoders
+    called from several threads, like the ones of a pipeline served by a [`RequestBatchingEngine`].
+
+    Attributes:
+        hits (`int`):
+            The number of text encoder calls served from memory.
+        disk_hits (`int`):
+            The number of text encoder calls served from `cache_dir`.
+        misses (`int`):
+            The number of text encoder calls that had to be computed.
+        evictions (`int`):
+            The number of outputs evicted from memory to stay within `max_memory`.
+        memory_usage (`int`):
+            The size in bytes of the outputs currently kept in memory.
+    """
+
+    def __init__(self, modules: List[torch.nn.Module], config: PromptEmbedsCacheConfig) -> None:
+        self.max_memory = config.max_memory
+        self.cache_dir = config.cache_dir
+        self._entries: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+        # guards the entries and the counters, the text encoders and the files are used outside of it
+        self._lock = threading.Lock()
+        self._modules: List[torch.nn.Module] = []
+        self.memory_usage = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+        for module in modules:
+            registry = HookRegistry.check_if_exists_or_initialize(module)
+            registry.register_hook(PromptEmbedsCacheHook(self), _PROMPT_EMBEDS_CACHE_HOOK)
+            self._modules.append(module)
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        r"""The hit, miss and eviction counters and the memory usage of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_usage": self.memory_usage,
+                "num_entries": len(self._entries),
+            }
+
+    def get(self, key: Tuple, device: Optional[torch.device]) -> Any:
+        # the same output computed on another device is loaded from `cache_dir` rather than moved between devices
+        memory_key = (key, str(device))
+        with self._lock:
+            entry = self._entries.get(memory_key)
+            if entry is not None:
+                self._entries.move_to_end(memory_key)
+                self.hits += 1
+        if entry is not None:
+            return _copy_output(entry[0])
+
+        output = self._load(key, device) if self.cache_dir is not None else None
+        with self._lock:
+            if output is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_in_memory(memory_key, output)
+        return _copy_output(output)
+
+    def put(self, key: Tuple, output: Any, device: Optional[torch.device]) -> None:
+        # the caller keeps the output it computed, and may modify it in place
+        output = _copy_output(output)
+        with self._lock:
+            self._put_in_memory((key, str(device)), output)
+        if self.cache_dir is not None:
+            self._save(key, output)
+
+    def clear(self) -> None:
+        r"""Removes all the outputs kept in memory and resets the counters. The files in `cache_dir` are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.memory_usage = 0
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def remove(self) -> None:
+        r"""Removes the hooks from the text encoders and clears the cache."""
+        for module in self._modules:
+            HookRegistry.check_if_exists_or_initialize(module).remove_hook(_PROMPT_EMBEDS_CACHE_HOOK, recurse=False)
+        self._modules = []
+        self.clear()
+
+    def _put_in_memory(self, key: Tuple, output: Any) -> None:
+        # called with `_lock` held
+        nbytes = sum(tensor.numel() * tensor.element_size() for tensor in _get_output_tensors(output).values())
+        if nbytes > self.max_memory:
+            return
+
+        # a key computed by two concurrent calls is only accounted for once
+        if key in self._entries:
+            self.memory_usage -= self._entries.pop(key)[1]
+        self._entries[key] = (output, nbytes)
+        self.memory_usage += nbytes
+        while self.memory_usage > self.max_memory:
+            _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+            self.memory_usage -= evicted_nbytes
+            self.evictions += 1
+
+    def _get_path(self, key: Tuple) -> str:
+        filename = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{filename}.safetensors")
+
+    def _save(self, key: Tuple, output: Any) -> None:
+        path = self._get_path(key)
+        if os.path.exists(path):
+            return
+
+        # safetensors doesn't accept tensors sharing memory, so every tensor is saved from its own copy
+        tensors = {
+            name: tensor.to("cpu", copy=True).contiguous() for name, tensor in _get_output_tensors(output).items()
+        }
+        output_class = type(output)
+        metadata = {
+            "output_class": f"{output_class.__module__}.{output_class.__qualname__}",
+            "fields": json.dumps(_get_output_fields(output)),
+        }
+        # written to a temporary file and renamed, so that concurrent processes never read a partial file
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+        try:
+            safetensors.torch.save_file(tensors, tmp_path, metadata=metadata)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _load(self, key: Tuple, device: Optional[torch.device]) -> Any:
+        path = self._get_path(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with safetensors.safe_open(path, framework="pt") as f:
+                metadata = f.metadata()
+                tensors = {name: f.get_tensor(name) for name in f.keys()}
+            module_name, class_name = metadata["output_class"].rsplit(".", 1)
+            output_class = getattr(importlib.import_module(module_name), class_name)
+            fields = json.loads(metadata["fields"])
+            if device is not None:
+                tensors = {name: tensor.to(device) for name, tensor in tensors.items()}
+            return _build_output(output_class, fields, tensors)
+        except Exception as e:
+            logger.warning(f"Could not load the cached text encoder output from {path}: {e}")
+            return None
+
+
+class PromptEmbedsCacheHook(ModelHook):
+    r"""
+    A hook that returns the cached output of a text encoder when it is called again with the same inputs.
+    """
+
+    def __init__(self, cache: PromptEmbedsCache) -> None:
+        super().__init__()
+        self.cache = cache
+        # the state of the parameters and the fingerprint computed from it, replaced together for concurrent calls
+        self._fingerprint: Optional[Tuple[Tuple, str]] = None
+
+    def get_encoder_fingerprint(self, module: torch.nn.Module) -> str:
+        # The fingerprint is computed again only when the parameters were modified in place, replaced or cast since
+        # the last call, e.g. after loading other weights or fine-tuning the text encoder.
+        parameters_state = _get_parameters_state(module)
+        fingerprint = self._fingerprint
+        if fingerprint is None or fingerprint[0] != parameters_state:
+            fingerprint = (parameters_state, _get_encoder_fingerprint(module))
+            self._fingerprint = fingerprint
+        return fingerprint[1]
+
+    def new_forward(self, module: torch.nn.Module, *args, **kwargs):
+        # a text encoder in training mode is being fine-tuned, so its outputs change from one call to the next
+        if module.training:
+            return self.fn_ref.original_forward(*args, **kwargs)
+
+        try:
+            inputs_key = _to_cache_key((args, kwargs))
+        except _Unhashable:
+            return self.fn_ref.original_forward(*args, **kwargs)
+
+        key = (self.get_encoder_fingerprint(module), str(_get_dtype(module)), _get_lora_state(module), inputs_key)
+        device = next((arg.device for arg in (*args, *kwargs.values()) if isinstance(arg, torch.Tensor)), None)
+        output = self.cache.get(key, device)
+        if output is None:
+            output = self.fn_ref.original_forward(*args, **kwargs)
+            tensors = _get_output_tensors(output)
+            # outputs that are part of an autograd graph would keep the graph alive
+            if tensors and not any(tensor.requires_grad for tensor in tensors.values()):
+                self.cache.put(key, output, device)
+        return output
+
+
+def apply_prompt_embeds_cache(
+    module: Union[torch.nn.Module, List[torch.nn.Module], Any], config: Optional[PromptEmbedsCacheConfig] = None
+) -> PromptEmbedsCache:
+    r"""
+    Apply a least-recently-used cache of the text encoder outputs to a pipeline, so that repeated prompts and negative
+    prompts are not encoded again.
+
+    Args:
+        module (`torch.nn.Module`, `List[torch.nn.Module]` or `DiffusionPipeline`):
+            The text encoders to cache the outputs of. If a pipeline is passed, all its components whose name starts
+            with `text_encoder` are used.
+        config (`PromptEmbedsCacheConfig`, *optional*):
+            The configuration to use for the cache.
+
+    Returns:
+        [`~hooks.prompt_embeds_cache.PromptEmbedsCache`]: The object holding the cached outputs and the hit and miss
+        counters. Call its `remove` method to remove the cache from the text encoders.
+
+    Example:
+
+    ```python
+    >>> import torch
+    >>> from diffusers import FluxPipeline, PromptEmbedsCacheConfig, apply_prompt_embeds_cache
+
+    >>> pipe = FluxPipeline.from_pretrained("black-forest-labs/FLUX.1-dev", torch_dtype=torch.bfloat16)
+    >>> pipe.to("cuda")
+
+    >>> cache = apply_prompt_embeds_cache(pipe, PromptEmbedsCacheConfig(max_memory=2 * 1024**3))
+
+    >>> for seed in range(4):
+    ...     image = pipe("A cat holding a sign that says hello world", generator=torch.manual_seed(seed)).images[0]
+    >>> cache.stats["hits"]
+    6
+    ```
+    """
+    if config is None:
+        config = PromptEmbedsCacheConfig()
+
+    if isinstance(module, torch.nn.Module):
+        modules = [module]
+    elif isinstance(module, (list, tuple)):
+        modules = list(module)
+    else:
+        modules = [
+            component
+            for name, component in module.components.items()
+            if name.startswith("text_encoder") and isinstance(component, torch.nn.Module)
+        ]
+        if len(modules) == 0:
+            raise ValueError(f"`{module.__class__.__name__}` has no text encoder to cache the outputs of.")
+
+    return PromptEmbedsCache(modules, config)
+
+
+class _Unhashable(Exception):
+    pass
+
+
+def _to_cache_key(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_to_cache_key(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _to_cache_key(v)) for k, v in value.items()))
+    if isinstance(value, torch.Tensor):
+        data = value.detach().to("cpu").contiguous().flatten().view(torch.uint8)
+        return (str(value.dtype), tuple(value.shape), hashlib.sha256(data.numpy().tobytes()).hexdigest())
+    raise _Unhashable
+
+
+def _get_encoder_fingerprint(module: torch.nn.Module) -> str:
+    # Identifies the text encoder across processes: its class and config, the name, shape and dtype of every parameter,
+    # and a strided sample of the values of every parameter, which tells apart fine-tuned checkpoints sharing the same
+    # config even when only some layers were fine-tuned.
+    fingerprint = hashlib.sha256()
+    fingerprint.update(f"{module.__class__.__module__}.{module.__class__.__qualname__}".encode())
+    config = getattr(module, "config", None)
+    if config is not None:
+        config_string = config.to_json_string() if hasattr(config, "to_json_string") else repr(dict(config))
+        fingerprint.update(config_string.encode())
+
+    for name, parameter in module.named_parameters():
+        fingerprint.update(f"{name}:{tuple(parameter.shape)}:{parameter.dtype}".encode())
+        if parameter.device.type != "meta" and parameter.numel() > 0:
+            values = parameter.detach().flatten()
+            sample = values[:: max(1, values.numel() // _FINGERPRINT_SAMPLES_PER_PARAMETER)]
+            fingerprint.update(sample.to("cpu", torch.float32).numpy().tobytes())
+    return fingerprint.hexdigest()
+
+
+def _get_parameters_state(module: torch.nn.Module) -> Tuple:
+    # `_version` is bumped by in-place modifications like `load_state_dict` or an optimizer step, but not when the
+    # parameters are moved or cast with `to`, so the dtype is part of the state too.
+    return tuple((id(parameter), parameter._version, parameter.dtype) for parameter in module.parameters())
+
+
+def _get_dtype(module: torch.nn.Module) -> Optional[torch.dtype]:
+    return next((parameter.dtype for parameter in module.parameters() if parameter.is_floating_point()), None)
+
+
+def _get_lora_state(module: torch.nn.Module) -> Optional[str]:
+    # The active adapters, their scales (which include the `lora_scale` of the pipeline) and whether they are fused.
+    if not is_peft_available():
+        return None
+
+    from peft.tuners.tuners_utils import BaseTunerLayer
+
+    state = []
+    for name, submodule in module.named_modules():
+        if isinstance(submodule, BaseTunerLayer):
+            state.append(
+                (
+                    name,
+                    tuple(submodule.active_adapters),
+                    submodule.disable_adapters,
+                    tuple(submodule.merged_adapters),
+                    tuple(sorted(getattr(submodule, "scaling", {}).items())),
+                )
+            )
+    if len(state) == 0:
+        return None
+    return hashlib.sha256(repr(state).encode()).hexdigest()
+
+
+def _get_output_fields(output: Any) -> Dict[str, Any]:
+    # Maps the fields of an output to `None`, to a tensor or to the number of tensors of a tuple of tensors. Outputs
+    # that are tuples are saved with their indices as field names.
+    if isinstance(output, torch.Tensor):
+        return {"": "tensor"}
+    items = output.items() if isinstance(output, OrderedDict) else enumerate(output)
+    fields = {}
+    for name, value in items:
+        if value is None or isinstance(value, torch.Tensor):
+            fields[str(name)] = None if value is None else "tensor"
+        else:
+            fields[str(name)] = len(value)
+    return fields
+
+
+def _get_output_tensors(output: Any) -> Dict[str, torch.Tensor]:
+    # An empty dict for outputs that are not made of tensors, which are not cached.
+    if isinstance(output, torch.Tensor):
+        return {"": output}
+    if not isinstance(output, (OrderedDict, tuple)):
+        return {}
+
+    tensors = {}
+    items = output.items() if isinstance(output, OrderedDict) else enumerate(output)
+    for name, value in items:
+        if isinstance(value, torch.Tensor):
+            tensors[str(name)] = value
+        elif isinstance(value, (tuple, list)) and all(isinstance(v, torch.Tensor) for v in value):
+            for i, v in enumerate(value):
+                tensors[f"{name}.{i}"] = v
+        elif value is not None:
+            return {}
+    return tensors
+
+
+def _copy_output(output: Any) -> Any:
+    tensors = {name: tensor.clone() for name, tensor in _get_output_tensors(output).items()}
+    return _build_output(type(output), _get_output_fields(output), tensors)
+
+
+def _build_output(output_class: type, fields: Dict[str, Any], tensors: Dict[str, torch.Tensor]) -> Any:
+    if fields == {"": "tensor"}:
+        return tensors[""]
+
+    values = {}
+    for name, field in fields.items():
+        if field is None:
+            values[name] = None
+        elif field == "tensor":
+            values[name] = tensors[name]
+        else:
+            values[name] = tuple(tensors[f"{name}.{i}"] for i in range(field))
+
+    if issubclass(output_class, OrderedDict):
+        return output_class(**values)
+    return output_class(values[str(i)] for i in range(len(values)))
@@ -0,0 +1,267 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import dataclasses
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+import torch
+
+from ..models.attention_processor import Attention, MochiAttention
+from ..utils import logging
+from .hooks import HookRegistry, ModelHook
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+_PYRAMID_ATTENTION_BROADCAST_HOOK = "pyramid_attention_broadcast"
+_ATTENTION_CLASSES = (Attention, MochiAttention)
+
+_SPATIAL_ATTENTION_BLOCK_IDENTIFIERS = ("blocks", "transformer_blocks", "single_transformer_blocks")
+_TEMPORAL_ATTENTION_BLOCK_IDENTIFIERS = ("temporal_transformer_blocks",)
+_CROSS_ATTENTION_BLOCK_IDENTIFIERS = ("blocks", "transformer_blocks")
+
+
+@dataclass
+class PyramidAttentionBroadcastConfig:
+    r"""
+    Configuration for [Pyramid Attention Broadcast](https://huggingface.co/papers/2408.12588).
+
+    The output of an attention layer is computed once every `*_block_skip_range` calls and broadcast (reused) in
+    between, as long as the current timestep lies within the corresponding `*_timestep_skip_range`. Spatial, temporal
+    and cross attention are configured separately, since their outputs change at different rates across the denoising
+    schedule.
+
+    Args:
+        spatial_attention_block_skip_range (`int`, *optional*, defaults to `None`):
+            The number of calls between two computations of the spatial attention. For example, `2` computes the
+            attention every other step and reuses the output in between. `None` disables the broadcast for spatial
+            attention.
+        temporal_attention_block_skip_range (`int`, *optional*, defaults to `None`):
+            The number of calls between two computations of the temporal attention. `None` disables the broadcast
+            for temporal attention.
+        cross_attention_block_skip_range (`int`, *optional*, defaults to `None`):
+            The number of calls between two computations of the cross attention. `None` disables the broadcast for
+            cross attention.
+        spatial_attention_timestep_skip_range (`Tuple[int, int]`, defaults to `(100, 800)`):
+            The range of timesteps, exclusive on both ends, within which the spatial attention output may be reused.
+        temporal_attention_timestep_skip_range (`Tuple[int, int]`, defaults to `(100, 800)`):
+            The range of timesteps, exclusive on both ends, within which the temporal attention output may be reused.
+        cross_attention_timestep_skip_range (`Tuple[int, int]`, defaults to `(100, 800)`):
+            The range of timesteps, exclusive on both ends, within which the cross attention output may be reused.
+        spatial_attention_block_identifiers (`Tuple[str, ...]`):
+            Regular expressions matched against the start of the attention layer names to identify spatial attention
+            layers.
+        temporal_attention_block_identifiers (`Tuple[str, ...]`):
+            Regular expressions matched against the start of the attention layer names to identify temporal attention
+            layers.
+        cross_attention_block_identifiers (`Tuple[str, ...]`):
+            Regular expressions matched against the start of the attention layer names to identify cross attention
+            layers.
+        current_timestep_callback (`Callable[[], int]`, *optional*, defaults to `None`):
+            A callback returning the timestep of the current denoising step, for example `lambda:
+            pipe.current_timestep`. Required to decide whether the current step lies within the timestep skip ranges.
+    """
+
+    spatial_attention_block_skip_range: Optional[int] = None
+    temporal_attention_block_skip_range: Optional[int] = None
+    cross_attention_block_skip_range: Optional[int] = None
+
+    spatial_attention_timestep_skip_range: Tuple[int, int] = (100, 800)
+    temporal_attention_timestep_skip_range: Tuple[int, int] = (100, 800)
+    cross_attention_timestep_skip_range: Tuple[int, int] = (100, 800)
+
+    spatial_attention_block_identifiers: Tuple[str, ...] = _SPATIAL_ATTENTION_BLOCK_IDENTIFIERS
+    temporal_attention_block_identifiers: Tuple[str, ...] = _TEMPORAL_ATTENTION_BLOCK_IDENTIFIERS
+    cross_attention_block_identifiers: Tuple[str, ...] = _CROSS_ATTENTION_BLOCK_IDENTIFIERS
+
+    current_timestep_callback: Optional[Callable[[], int]] = None
+
+
+class PyramidAttentionBroadcastState:
+    r"""
+    State for Pyramid Attention Broadcast.
+
+    Attributes:
+        iteration (`int`):
+            The number of times the attention layer was called since the state was last reset.
+        cache (`Any`, *optional*):
+            The last computed output of the attention layer.
+    """
+
+    def __init__(self) -> None:
+        self.iteration = 0
+        self.cache = None
+
+    def reset(self) -> None:
+        self.iteration = 0
+        self.cache = None
+
+
+class PyramidAttentionBroadcast:
+    r"""
+    Registers the Pyramid Attention Broadcast hooks on the attention layers of a model. Use
+    [`~hooks.apply_pyramid_attention_broadcast`] instead of instantiating this class directly.
+    """
+
+    def __init__(self, module: torch.nn.Module, config: PyramidAttentionBroadcastConfig) -> None:
+        if config.current_timestep_callback is None:
+            raise ValueError(
+                "The `current_timestep_callback` function must be provided in the configuration to apply Pyramid Attention Broadcast."
+            )
+
+        if (
+            config.spatial_attention_block_skip_range is None
+            and config.temporal_attention_block_skip_range is None
+            and config.cross_attention_block_skip_range is None
+        ):
+            logger.warning(
+                "Pyramid Attention Broadcast requires one or more of `spatial_attention_block_skip_range`, "
+                "`temporal_attention_block_skip_range` or `cross_attention_block_skip_range` to be set to an integer, "
+                "not `None`. Defaulting to using `spatial_attention_block_skip_range=2`. To avoid this warning, please "
+                "set one of the above parameters."
+            )
+            # the configuration of the caller is left unchanged
+            config = dataclasses.replace(config, spatial_attention_block_skip_range=2)
+
+        self.current_timestep_callback = config.current_timestep_callback
+        self._hooks: List[Tuple[torch.nn.Module, PyramidAttentionBroadcastHook]] = []
+
+        for name, submodule in module.named_modules():
+            if not isinstance(submodule, _ATTENTION_CLASSES):
+                continue
+
+            is_cross_attention = getattr(submodule, "is_cross_attention", False)
+            if is_cross_attention:
+                attention_type = "cross"
+                block_skip_range = config.cross_attention_block_skip_range
+                timestep_skip_range = config.cross_attention_timestep_skip_range
+                identifiers = config.cross_attention_block_identifiers
+            elif _matches_any(name, config.temporal_attention_block_identifiers):
+                attention_type = "temporal"
+                block_skip_range = config.temporal_attention_block_skip_range
+                timestep_skip_range = config.temporal_attention_timestep_skip_range
+                identifiers = config.temporal_attention_block_identifiers
+            else:
+                attention_type = "spatial"
+                block_skip_range = config.spatial_attention_block_skip_range
+                timestep_skip_range = config.spatial_attention_timestep_skip_range
+                identifiers = config.spatial_attention_block_identifiers
+
+            if block_skip_range is None or not _matches_any(name, identifiers):
+                continue
+
+            logger.debug(f"Applying Pyramid Attention Broadcast to {attention_type} attention layer `{name}`.")
+            hook = PyramidAttentionBroadcastHook(self.current_timestep_callback, block_skip_range, timestep_skip_range)
+            HookRegistry.check_if_exists_or_initialize(submodule).register_hook(
+                hook, _PYRAMID_ATTENTION_BROADCAST_HOOK
+            )
+            self._hooks.append((submodule, hook))
+
+    def reset_state(self) -> None:
+        for submodule, hook in self._hooks:
+            hook.reset_state(submodule)
+
+    def remove(self) -> None:
+        for submodule, _ in self._hooks:
+            HookRegistry.check_if_exists_or_initialize(submodule).remove_hook(
+                _PYRAMID_ATTENTION_BROADCAST_HOOK, recurse=False
+            )
+        self._hooks = []
+
+
+class PyramidAttentionBroadcastHook(ModelHook):
+    r"""Computes the output of an attention layer or broadcasts its last computed output."""
+
+    _is_stateful = True
+
+    def __init__(
+        self, current_timestep_callback: Callable[[], int], block_skip_range: int, timestep_skip_range: Tuple[int, int]
+    ) -> None:
+        super().__init__()
+        self.current_timestep_callback = current_timestep_callback
+        self.block_skip_range = block_skip_range
+        self.timestep_skip_range = timestep_skip_range
+        self.state = PyramidAttentionBroadcastState()
+
+    def new_forward(self, module: torch.nn.Module, *args, **kwargs) -> Any:
+        state = self.state
+        current_timestep = self.current_timestep_callback()
+        is_within_timestep_range = (
+            current_timestep is not None
+            and self.timestep_skip_range[0] < current_timestep < self.timestep_skip_range[1]
+        )
+        should_compute_attention = (
+            state.cache is None or not is_within_timestep_range or state.iteration % self.block_skip_range == 0
+        )
+
+        if should_compute_attention:
+            output = self.fn_ref.original_forward(*args, **kwargs)
+            state.cache = output
+        else:
+            output = state.cache
+
+        state.iteration += 1
+        return output
+
+    def reset_state(self, module: torch.nn.Module) -> torch.nn.Module:
+        self.state.reset()
+        return module
+
+
+def apply_pyramid_attention_broadcast(
+    module: torch.nn.Module, config: PyramidAttentionBroadcastConfig
+) -> PyramidAttentionBroadcast:
+    r"""
+    Apply [Pyramid Attention Broadcast](https://huggingface.co/papers/2408.12588) to the attention layers of a given
+    model.
+
+    Args:
+        module (`torch.nn.Module`):
+            The model to apply Pyramid Attention Broadcast to.
+        config (`PyramidAttentionBroadcastConfig`):
+            The configuration to use for Pyramid Attention Broadcast.
+
+    Returns:
+        [`~hooks.pyramid_attention_broadcast.PyramidAttentionBroadcast`]: The object holding the broadcast state.
+        Call its `remove` method to restore the original attention layers.
+
+    Example:
+
+    ```python
+    >>> import torch
+    >>> from diffusers import CogVideoXPipeline, PyramidAttentionBroadcastConfig, apply_pyramid_attention_broadcast
+    >>> from diffusers.utils import export_to_video
+
+    >>> pipe = CogVideoXPipeline.from_pretrained("THUDM/CogVideoX-5b", torch_dtype=torch.bfloat16)
+    >>> pipe.to("cuda")
+
+    >>> config = PyramidAttentionBroadcastConfig(
+    ...     spatial_attention_block_skip_range=2,
+    ...     spatial_attention_timestep_skip_range=(100, 800),
+    ...     current_timestep_callback=lambda: pipe.current_timestep,
+    ... )
+    >>> apply_pyramid_attention_broadcast(pipe.transformer, config)
+
+    >>> video = pipe("A panda playing a guitar in a bamboo forest").frames[0]
+    >>> export_to_video(video, "output.mp4", fps=8)
+    ```
+    """
+    return PyramidAttentionBroadcast(module, config)
+
+
+def _matches_any(name: str, identifiers: Tuple[str, ...]) -> bool:
+    return any(re.match(identifier, name) is not None for identifier in identifiers)
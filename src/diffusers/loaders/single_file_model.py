@@ -13,6 +13,7 @@
 # limitations under the License.
 import importlib
 import inspect
+import os
 import re
 from contextlib import nullcontext
 from typing import Optional
@@ -21,7 +22,7 @@ import torch
 from huggingface_hub.utils import validate_hf_hub_args
 
 from ..quantizers import DiffusersAutoQuantizer
-from ..utils import deprecate, is_accelerate_available, logging
+from ..utils import CONFIG_NAME, DIFFUSERS_SINGLE_FILE_CACHE, deprecate, is_accelerate_available, logging
 from .single_file_utils import (
     SingleFileComponentError,
     convert_animatediff_checkpoint_to_diffusers,
@@ -41,7 +42,10 @@ from .single_file_utils import (
     create_vae_diffusers_config_from_ldm,
     fetch_diffusers_config,
     fetch_original_config,
+    fetch_single_file_checkpoint_path,
+    get_conversion_cache_path,
     load_single_file_checkpoint,
+    save_converted_checkpoint_to_cache,
 )
 
 
@@ -182,6 +186,12 @@ class FromOriginalModelMixin:
             revision (`str`, *optional*, defaults to `"main"`):
                 The specific model version to use. It can be a branch name, a tag name, a commit id, or any identifier
                 allowed by Git.
+            conversion_cache_dir (`str` or `os.PathLike`, *optional*):
+                Path to a directory in which the checkpoint is cached after it is converted to the Diffusers format.
+                Later calls with the same checkpoint file and arguments skip the conversion and load the cached model
+                with [`~ModelMixin.from_pretrained`] instead. The cache is keyed by the content hash of the checkpoint.
+                Defaults to the `DIFFUSERS_SINGLE_FILE_CACHE` environment variable, and caching is disabled if neither
+                is set. Quantized models and checkpoints passed as a state dict are not cached.
             kwargs (remaining dictionary of keyword arguments, *optional*):
                 Can be used to overwrite load and saveable variables (for example the pipeline components of the
                 specific pipeline class). The overwritten components are directly passed to the pipelines `__init__`
@@ -229,11 +239,13 @@ class FromOriginalModelMixin:
         torch_dtype = kwargs.pop("torch_dtype", None)
         quantization_config = kwargs.pop("quantization_config", None)
         device = kwargs.pop("device", None)
+        conversion_cache_dir = kwargs.pop("conversion_cache_dir", DIFFUSERS_SINGLE_FILE_CACHE)
 
+        conversion_cache_path = None
         if isinstance(pretrained_model_link_or_path_or_dict, dict):
             checkpoint = pretrained_model_link_or_path_or_dict
         else:
-            checkpoint = load_single_file_checkpoint(
+            checkpoint_file = fetch_single_file_checkpoint_path(
                 pretrained_model_link_or_path_or_dict,
                 force_download=force_download,
                 proxies=proxies,
@@ -242,6 +254,27 @@ class FromOriginalModelMixin:
                 local_files_only=local_files_only,
                 revision=revision,
             )
+
+            # Quantized models are not cached as the cache holds the weights before quantization.
+            if conversion_cache_dir is not None and quantization_config is None:
+                conversion_cache_path = get_conversion_cache_path(
+                    checkpoint_file,
+                    conversion_cache_dir,
+                    model_class=cls.__name__,
+                    config=config,
+                    original_config=original_config,
+                    subfolder=subfolder,
+                    config_revision=config_revision,
+                    **kwargs,
+                )
+                if os.path.isfile(os.path.join(conversion_cache_path, CONFIG_NAME)):
+                    logger.info(f"Loading the converted checkpoint from {conversion_cache_path}.")
+                    model = cls.from_pretrained(conversion_cache_path, torch_dtype=torch_dtype, local_files_only=True)
+                    if device is not None:
+                        model.to(device)
+                    return model
+
+            checkpoint = load_single_file_checkpoint(checkpoint_file)
         if quantization_config is not None:
             hf_quantizer = DiffusersAutoQuantizer.from_config(quantization_config)
             hf_quantizer.validate_environment()
@@ -382,4 +415,7 @@ class FromOriginalModelMixin:
 
         model.eval()
 
+        if conversion_cache_path is not None:
+            save_converted_checkpoint_to_cache(model, diffusers_format_checkpoint, conversion_cache_path)
+
         return model
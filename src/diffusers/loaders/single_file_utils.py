@@ -15,16 +15,22 @@
 """Conversion script for the Stable Diffusion checkpoints."""
 
 import copy
+import hashlib
+import json
 import os
 import re
+import shutil
+import tempfile
 from contextlib import nullcontext
 from io import BytesIO
 from urllib.parse import urlparse
 
 import requests
+import safetensors
 import torch
 import yaml
 
+from .. import __version__
 from ..models.modeling_utils import load_state_dict
 from ..schedulers import (
     DDIMScheduler,
@@ -370,7 +376,7 @@ def _is_legacy_scheduler_kwargs(kwargs):
     return any(k in SCHEDULER_LEGACY_KWARGS for k in kwargs.keys())
 
 
-def load_single_file_checkpoint(
+def fetch_single_file_checkpoint_path(
     pretrained_model_link_or_path,
     force_download=False,
     proxies=None,
@@ -380,20 +386,39 @@ def load_single_file_checkpoint(
     revision=None,
 ):
     if os.path.isfile(pretrained_model_link_or_path):
-        pretrained_model_link_or_path = pretrained_model_link_or_path
+        return pretrained_model_link_or_path
+
+    repo_id, weights_name = _extract_repo_id_and_weights_name(pretrained_model_link_or_path)
+    return _get_model_file(
+        repo_id,
+        weights_name=weights_name,
+        force_download=force_download,
+        cache_dir=cache_dir,
+        proxies=proxies,
+        local_files_only=local_files_only,
+        token=token,
+        revision=revision,
+    )
 
-    else:
-        repo_id, weights_name = _extract_repo_id_and_weights_name(pretrained_model_link_or_path)
-        pretrained_model_link_or_path = _get_model_file(
-            repo_id,
-            weights_name=weights_name,
-            force_download=force_download,
-            cache_dir=cache_dir,
-            proxies=proxies,
-            local_files_only=local_files_only,
-            token=token,
-            revision=revision,
-        )
+
+def load_single_file_checkpoint(
+    pretrained_model_link_or_path,
+    force_download=False,
+    proxies=None,
+    token=None,
+    cache_dir=None,
+    local_files_only=None,
+    revision=None,
+):
+    pretrained_model_link_or_path = fetch_single_file_checkpoint_path(
+        pretrained_model_link_or_path,
+        force_download=force_download,
+        proxies=proxies,
+        token=token,
+        cache_dir=cache_dir,
+        local_files_only=local_files_only,
+        revision=revision,
+    )
 
     checkpoint = load_state_dict(pretrained_model_link_or_path)
 
@@ -404,6 +429,91 @@ def load_single_file_checkpoint(
     return checkpoint
 
 
+def _hash_checkpoint_file(checkpoint_file, conversion_cache_dir):
+    # Hashing a large checkpoint takes a while, so the hash is stored in the cache under a key derived from the path,
+    # size and modification time of the file, and only recomputed when one of them changes.
+    stat = os.stat(checkpoint_file)
+    file_key = f"{os.path.realpath(checkpoint_file)}:{stat.st_size}:{stat.st_mtime_ns}"
+    hash_file = os.path.join(conversion_cache_dir, "hashes", hashlib.sha256(file_key.encode()).hexdigest())
+    if os.path.isfile(hash_file):
+        with open(hash_file, "r") as fp:
+            return fp.read().strip()
+
+    sha256 = hashlib.sha256()
+    with open(checkpoint_file, "rb") as fp:
+        for chunk in iter(lambda: fp.read(16 * 1024 * 1024), b""):
+            sha256.update(chunk)
+    file_hash = sha256.hexdigest()
+
+    os.makedirs(os.path.dirname(hash_file), exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(hash_file), delete=False) as fp:
+        fp.write(file_hash)
+    os.replace(fp.name, hash_file)
+    return file_hash
+
+
+def get_conversion_cache_path(checkpoint_file, conversion_cache_dir, **conversion_kwargs):
+    """
+    Returns the directory of `conversion_cache_dir` in which the Diffusers format conversion of `checkpoint_file` is
+    cached. The directory is keyed by the content hash of the checkpoint, the 🧨 Diffusers version and the arguments
+    that affect the conversion, such as the model class and its config.
+    """
+    original_config = conversion_kwargs.get("original_config")
+    if isinstance(original_config, str) and os.path.isfile(original_config):
+        with open(original_config, "r") as fp:
+            conversion_kwargs["original_config"] = fp.read()
+
+    cache_key = {
+        "checkpoint": _hash_checkpoint_file(checkpoint_file, conversion_cache_dir),
+        "diffusers_version": __version__,
+        **conversion_kwargs,
+    }
+    cache_key = json.dumps(cache_key, sort_keys=True, default=str)
+    return os.path.join(conversion_cache_dir, "models", hashlib.sha256(cache_key.encode()).hexdigest())
+
+
+def save_converted_checkpoint_to_cache(model, diffusers_format_checkpoint, cache_path):
+    """
+    Saves the config of `model` and the converted checkpoint it was loaded from to `cache_path`, so that the model can
+    later be loaded with `from_pretrained`. The checkpoint is saved in its original dtype.
+    """
+    model_keys = set(model.state_dict().keys())
+    state_dict = {}
+    storage_ptrs = set()
+    for key, value in diffusers_format_checkpoint.items():
+        if key not in model_keys:
+            continue
+        value = value.detach().to("cpu").contiguous()
+        # safetensors cannot save tensors that share memory, e.g. the chunks of a fused projection
+        if value.untyped_storage().data_ptr() in storage_ptrs:
+            value = value.clone()
+        storage_ptrs.add(value.untyped_storage().data_ptr())
+        state_dict[key] = value
+
+    missing_keys = model_keys - set(state_dict.keys())
+    if len(missing_keys) > 0:
+        logger.info(f"Not caching the converted checkpoint because the following keys are missing: {missing_keys}")
+        return
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=os.path.dirname(cache_path))
+    try:
+        model.save_config(tmp_path)
+        safetensors.torch.save_file(
+            state_dict, os.path.join(tmp_path, SAFETENSORS_WEIGHTS_NAME), metadata={"format": "pt"}
+        )
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # another process cached the same checkpoint in the meantime
+        if not os.path.isdir(cache_path):
+            raise
+    finally:
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path)
+
+    logger.info(f"Cached the converted checkpoint in {cache_path}.")
+
+
 def fetch_original_config(original_config_file, local_files_only=False):
     if os.path.isfile(original_config_file):
         with open(original_config_file, "r") as fp:
@@ -0,0 +1,187 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import weakref
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Tuple
+
+import torch
+
+from ..utils.logging import get_logger
+
+
+logger = get_logger(__name__)  # pylint: disable=invalid-name
+
+
+class StaticInputCache:
+    r"""
+    Caches the results of computations that only depend on inputs which stay the same across the denoising steps of a
+    generation, such as the projection of the prompt embeddings. Pipelines pass the same tensors at every step, so
+    entries are keyed on the identity of the input tensors and their in-place version counter. Every computation keeps
+    up to `max_entries_per_name` entries, so that the conditional and unconditional inputs of classifier-free guidance,
+    which are passed in turn at every step, each keep their own entry. Nothing is cached while gradients are enabled.
+    """
+
+    def __init__(self, max_entries_per_name: int = 4) -> None:
+        self.max_entries_per_name = max_entries_per_name
+        self._entries: Dict[str, List[Tuple[Tuple[weakref.ref, ...], Tuple[int, ...], Any]]] = {}
+
+    def get_or_compute(self, name: str, inputs: Tuple[torch.Tensor, ...], compute_fn: Callable[[], Any]) -> Any:
+        if torch.is_grad_enabled():
+            return compute_fn()
+
+        versions = tuple(tensor._version for tensor in inputs)
+        entries = self._entries.setdefault(name, [])
+        for refs, cached_versions, output in entries:
+            if versions == cached_versions and all(ref() is tensor for ref, tensor in zip(refs, inputs)):
+                return output
+
+        # the entries of the same tensors before an in-place update, and of tensors that were freed, can't be hit
+        entries[:] = [
+            entry
+            for entry in entries
+            if not (
+                any(ref() is None for ref in entry[0]) or all(ref() is tensor for ref, tensor in zip(entry[0], inputs))
+            )
+        ]
+        output = compute_fn()
+        entries.append((tuple(weakref.ref(tensor) for tensor in inputs), versions, output))
+        del entries[: -self.max_entries_per_name]
+        return output
+
+    def reset(self) -> None:
+        self._entries = {}
+
+
+class CacheMixin:
+    r"""
+    A class for enabling/disabling caching techniques on diffusion models.
+
+    Supported caching techniques:
+        - [First Block Cache](https://github.com/chengzeyi/ParaAttention/blob/main/doc/fastest_flux.md)
+        - [DeepCache](https://huggingface.co/papers/2312.00858)
+        - [Pyramid Attention Broadcast](https://huggingface.co/papers/2408.12588)
+    """
+
+    _cache_config = None
+    _cache = None
+    _static_input_cache = None
+
+    @property
+    def is_cache_enabled(self) -> bool:
+        return self._cache_config is not None
+
+    def enable_cache(self, config) -> None:
+        r"""
+        Enable caching techniques on the model.
+
+        Args:
+            config (`Union[FirstBlockCacheConfig, DeepCacheConfig, PyramidAttentionBroadcastConfig]`):
+                The configuration for applying the caching technique. Currently supported caching techniques are:
+                    - [`~hooks.FirstBlockCacheConfig`]
+                    - [`~hooks.DeepCacheConfig`]
+                    - [`~hooks.PyramidAttentionBroadcastConfig`]
+
+        Example:
+
+        ```python
+        >>> import torch
+        >>> from diffusers import FluxPipeline, FirstBlockCacheConfig
+
+        >>> pipe = FluxPipeline.from_pretrained("black-forest-labs/FLUX.1-dev", torch_dtype=torch.bfloat16)
+        >>> pipe.to("cuda")
+
+        >>> pipe.transformer.enable_cache(FirstBlockCacheConfig(threshold=0.08))
+
+        >>> image = pipe("A cat holding a sign that says hello world", num_inference_steps=28).images[0]
+        ```
+        """
+
+        from ..hooks import (
+            DeepCacheConfig,
+            FirstBlockCacheConfig,
+            PyramidAttentionBroadcastConfig,
+            apply_first_block_cache,
+            apply_pyramid_attention_broadcast,
+        )
+        from ..hooks.deep_cache import DeepCache
+
+        if self.is_cache_enabled:
+            raise ValueError(
+                f"Caching has already been enabled with {type(self._cache_config)}. To apply a new caching technique, please disable the existing one first."
+            )
+
+        if isinstance(config, FirstBlockCacheConfig):
+            self._cache = apply_first_block_cache(self, config)
+        elif isinstance(config, DeepCacheConfig):
+            self._cache = DeepCache(self, config)
+        elif isinstance(config, PyramidAttentionBroadcastConfig):
+            self._cache = apply_pyramid_attention_broadcast(self, config)
+        else:
+            raise ValueError(f"Cache config {type(config)} is not supported.")
+
+        self._cache_config = config
+
+    def disable_cache(self) -> None:
+        r"""Disable the caching technique that was enabled with [`~CacheMixin.enable_cache`]."""
+        if self._cache_config is None:
+            logger.warning("Caching techniques have not been enabled, so there's nothing to disable.")
+            return
+
+        self._cache.remove()
+        self._cache = None
+        self._cache_config = None
+
+    def enable_static_text_cache(self) -> None:
+        r"""
+        Enable caching of the step-invariant computations on the text inputs of the model, such as the projection of
+        the prompt embeddings by the `context_embedder`. They are computed once per generation instead of once per
+        denoising step, as long as the pipeline passes the same prompt embedding tensors at every step. The cache is
+        cleared at the end of every pipeline call. This can be combined with the caching techniques of
+        [`~CacheMixin.enable_cache`].
+        """
+        self._static_input_cache = StaticInputCache()
+
+    def disable_static_text_cache(self) -> None:
+        r"""Disable the cache enabled with [`~CacheMixin.enable_static_text_cache`]."""
+        self._static_input_cache = None
+
+    def _get_static_input(self, name: str, inputs: Tuple[torch.Tensor, ...], compute_fn: Callable[[], Any]) -> Any:
+        if self._static_input_cache is None:
+            return compute_fn()
+        return self._static_input_cache.get_or_compute(name, inputs, compute_fn)
+
+    def _reset_stateful_cache(self) -> None:
+        if self._cache is not None:
+            self._cache.reset_state()
+        if self._static_input_cache is not None:
+            self._static_input_cache.reset()
+
+    @contextmanager
+    def cache_context(self, name: str):
+        r"""
+        Context manager that keeps the cache state of all model calls made within it separate from the calls made
+        under a different `name`. Pipelines that run the model more than once per denoising step, for example for the
+        conditional and unconditional branches of classifier-free guidance, should wrap each call in its own context.
+        """
+        if getattr(self._cache, "current_context", None) is None:
+            yield
+            return
+
+        previous_context = self._cache.current_context
+        self._cache.current_context = name
+        try:
+            yield
+        finally:
+            self._cache.current_context = previous_context
@@ -16,17 +16,23 @@
 
 import importlib
 import inspect
+import json
 import os
+import struct
+import sys
+import threading
 from array import array
 from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 import safetensors
 import torch
 from huggingface_hub.utils import EntryNotFoundError
 
 from ..utils import (
+    DIFFUSERS_MAX_LOADING_WORKERS,
     GGUF_FILE_EXTENSION,
     SAFE_WEIGHTS_INDEX_NAME,
     SAFETENSORS_FILE_EXTENSION,
@@ -52,6 +58,27 @@ _CLASS_REMAPPING_DICT = {
 }
 
 
+_SAFETENSORS_DTYPES = {
+    "BOOL": torch.bool,
+    "U8": torch.uint8,
+    "I8": torch.int8,
+    "I16": torch.int16,
+    "I32": torch.int32,
+    "I64": torch.int64,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "F32": torch.float32,
+    "F64": torch.float64,
+}
+if hasattr(torch, "float8_e4m3fn"):
+    _SAFETENSORS_DTYPES["F8_E4M3"] = torch.float8_e4m3fn
+    _SAFETENSORS_DTYPES["F8_E5M2"] = torch.float8_e5m2
+
+# Instantiating a model temporarily patches process-wide state, e.g. `torch.nn.Module.register_parameter` in
+# `accelerate.init_empty_weights` or the default dtype in `transformers`. When the components of a pipeline are loaded
+# concurrently, these sections are serialized with this lock while the weights are still read in parallel.
+_MODEL_INIT_LOCK = threading.RLock()
+
 if is_accelerate_available():
     from accelerate import infer_auto_device_map
     from accelerate.utils import get_balanced_memory, get_max_memory, set_module_tensor_to_device
@@ -131,9 +158,13 @@ def _fetch_remapped_cls_from_config(config, old_class):
         return old_class
 
 
-def load_state_dict(checkpoint_file: Union[str, os.PathLike], variant: Optional[str] = None):
+def load_state_dict(checkpoint_file: Union[str, os.PathLike], variant: Optional[str] = None, use_mmap: bool = False):
     """
     Reads a checkpoint file, returning properly formatted errors if they arise.
+
+    If `use_mmap` is `True`, the returned tensors are backed by a memory map of the checkpoint file instead of being
+    read into memory. Their data is only paged in when it is accessed, and can be evicted again by the operating system
+    under memory pressure.
     """
     # TODO: We merge the sharded checkpoints in case we're doing quantization. We can revisit this change
     # when refactoring the _merge_sharded_checkpoints() method later.
@@ -142,15 +173,19 @@ def load_state_dict(checkpoint_file: Union[str, os.PathLike], variant: Optional[
     try:
         file_extension = os.path.basename(checkpoint_file).split(".")[-1]
         if file_extension == SAFETENSORS_FILE_EXTENSION:
+            if use_mmap:
+                return _load_safetensors_mmap(checkpoint_file)
             return safetensors.torch.load_file(checkpoint_file, device="cpu")
         elif file_extension == GGUF_FILE_EXTENSION:
             return load_gguf_checkpoint(checkpoint_file)
         else:
             weights_only_kwarg = {"weights_only": True} if is_torch_version(">=", "1.13") else {}
+            mmap_kwarg = {"mmap": True} if use_mmap and is_torch_version(">=", "2.1") else {}
             return torch.load(
                 checkpoint_file,
                 map_location="cpu",
                 **weights_only_kwarg,
+                **mmap_kwarg,
             )
     except Exception as e:
         try:
@@ -172,6 +207,40 @@ def load_state_dict(checkpoint_file: Union[str, os.PathLike], variant: Optional[
             )
 
 
+def _load_safetensors_mmap(checkpoint_file: Union[str, os.PathLike]) -> Dict[str, torch.Tensor]:
+    # The safetensors format is an 8-byte little-endian header length, a JSON header describing the dtype, shape and
+    # byte offsets of every tensor within the data section, and the data section itself.
+    with open(checkpoint_file, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    header.pop("__metadata__", None)
+
+    if sys.byteorder != "little" or len(header) == 0:
+        return safetensors.torch.load_file(checkpoint_file, device="cpu")
+
+    file_size = os.path.getsize(checkpoint_file)
+    # With `shared=False`, the file is mapped privately: pages are read lazily and in-place writes to the tensors are
+    # copy-on-write and never reach the file.
+    storage = torch.UntypedStorage.from_file(os.fspath(checkpoint_file), shared=False, nbytes=file_size)
+    data_start = 8 + header_size
+
+    state_dict = {}
+    with safetensors.safe_open(checkpoint_file, framework="pt", device="cpu") as f:
+        for name, info in header.items():
+            dtype = _SAFETENSORS_DTYPES.get(info["dtype"])
+            begin, end = info["data_offsets"]
+            if dtype is None or (data_start + begin) % dtype.itemsize != 0:
+                # Tensors that cannot be viewed in place are read into memory instead.
+                state_dict[name] = f.get_tensor(name)
+                continue
+
+            tensor = torch.empty(0, dtype=dtype)
+            tensor.set_(storage, (data_start + begin) // dtype.itemsize, info["shape"])
+            state_dict[name] = tensor
+
+    return state_dict
+
+
 def load_model_dict_into_meta(
     model,
     state_dict: OrderedDict,
@@ -201,20 +270,10 @@ def load_model_dict_into_meta(
         # in int/uint/bool and not cast them.
         # TODO: revisit cases when param.dtype == torch.float8_e4m3fn
         if torch.is_floating_point(param):
-            if (
-                keep_in_fp32_modules is not None
-                and any(
-                    module_to_keep_in_fp32 in param_name.split(".") for module_to_keep_in_fp32 in keep_in_fp32_modules
-                )
-                and dtype == torch.float16
-            ):
-                param = param.to(torch.float32)
-                if accepts_dtype:
-                    set_module_kwargs["dtype"] = torch.float32
-            else:
-                param = param.to(dtype)
-                if accepts_dtype:
-                    set_module_kwargs["dtype"] = dtype
+            param_dtype = _get_param_dtype(param_name, dtype, keep_in_fp32_modules)
+            param = param.to(param_dtype)
+            if accepts_dtype:
+                set_module_kwargs["dtype"] = param_dtype
 
         # bnb params are flattened.
         # gguf quants have a different shape based on the type of quantization applied
@@ -244,6 +303,114 @@ def load_model_dict_into_meta(
     return unexpected_keys
 
 
+def _get_param_dtype(
+    param_name: str, dtype: torch.dtype, keep_in_fp32_modules: Optional[List[str]] = None
+) -> torch.dtype:
+    if (
+        keep_in_fp32_modules is not None
+        and any(module_to_keep_in_fp32 in param_name.split(".") for module_to_keep_in_fp32 in keep_in_fp32_modules)
+        and dtype == torch.float16
+    ):
+        return torch.float32
+    return dtype
+
+
+def _load_shard_file(
+    shard_file: Union[str, os.PathLike],
+    dtype: Optional[torch.dtype] = None,
+    keep_in_fp32_modules: Optional[List[str]] = None,
+    use_mmap: bool = False,
+) -> Dict[str, torch.Tensor]:
+    state_dict = load_state_dict(shard_file, use_mmap=use_mmap)
+    if dtype is not None:
+        # Casting here lets the conversion of a shard overlap with the reading of the others.
+        for param_name, param in state_dict.items():
+            if torch.is_floating_point(param):
+                state_dict[param_name] = param.to(_get_param_dtype(param_name, dtype, keep_in_fp32_modules))
+    return state_dict
+
+
+def _iter_shard_state_dicts(
+    shard_files: List[Union[str, os.PathLike]],
+    dtype: Optional[torch.dtype] = None,
+    keep_in_fp32_modules: Optional[List[str]] = None,
+    use_mmap: bool = False,
+) -> Iterator[Dict[str, torch.Tensor]]:
+    # Yields the state dicts of the shards as soon as they are read, in no particular order. At most `max_workers`
+    # shards are read ahead of the caller, which bounds the memory held by shards that were not consumed yet.
+    max_workers = max(1, min(len(shard_files), DIFFUSERS_MAX_LOADING_WORKERS))
+    if max_workers == 1:
+        for shard_file in shard_files:
+            yield _load_shard_file(shard_file, dtype, keep_in_fp32_modules, use_mmap)
+        return
+
+    shard_files = iter(shard_files)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="diffusers_shard_loading") as executor:
+
+        def submit_next() -> Optional[Future]:
+            shard_file = next(shard_files, None)
+            if shard_file is None:
+                return None
+            return executor.submit(_load_shard_file, shard_file, dtype, keep_in_fp32_modules, use_mmap)
+
+        pending = {future for future in (submit_next() for _ in range(max_workers)) if future is not None}
+        try:
+            while len(pending) > 0:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    next_future = submit_next()
+                    if next_future is not None:
+                        pending.add(next_future)
+                    yield future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def load_sharded_model_dict_into_meta(
+    model,
+    shard_files: List[Union[str, os.PathLike]],
+    device: Optional[Union[str, torch.device]] = None,
+    dtype: Optional[Union[str, torch.dtype]] = None,
+    model_name_or_path: Optional[str] = None,
+    hf_quantizer=None,
+    keep_in_fp32_modules=None,
+    use_mmap: bool = False,
+) -> Tuple[List[str], List[str]]:
+    """
+    Loads the shards of a checkpoint into a model initialized on the meta device. The shards are read and converted
+    to `dtype` concurrently in a thread pool, and each shard is loaded into the model as soon as it is available, so
+    that the full state dict is never held in memory at once.
+
+    Returns:
+        `Tuple[List[str], List[str]]`: The keys of the model that were missing from the checkpoint and the keys of the
+        checkpoint that were not used by the model.
+    """
+    expected_keys = set(model.state_dict().keys())
+    loaded_keys = set()
+    unexpected_keys = []
+
+    # Quantizers may handle the dtype of the parameters themselves.
+    cast_dtype = (dtype or torch.float32) if hf_quantizer is None else None
+    for state_dict in _iter_shard_state_dicts(shard_files, cast_dtype, keep_in_fp32_modules, use_mmap):
+        if hasattr(model, "_convert_deprecated_attention_blocks"):
+            model._convert_deprecated_attention_blocks(state_dict)
+        loaded_keys.update(state_dict.keys())
+        unexpected_keys += load_model_dict_into_meta(
+            model,
+            state_dict,
+            device=device,
+            dtype=dtype,
+            model_name_or_path=model_name_or_path,
+            hf_quantizer=hf_quantizer,
+            keep_in_fp32_modules=keep_in_fp32_modules,
+        )
+        del state_dict
+
+    missing_keys = sorted(expected_keys - loaded_keys)
+    return missing_keys, unexpected_keys
+
+
 def _load_state_dict_into_model(model_to_load, state_dict: OrderedDict) -> List[str]:
     # Convert old format to new format if needed from a PyTorch state_dict
     # copy state_dict so _load_from_state_dict can modify it
@@ -320,23 +487,17 @@ def _merge_sharded_checkpoints(sharded_ckpt_cached_folder, sharded_metadata):
         raise KeyError("'weight_map' key not found in the shard index file.")
 
     # Collect all unique safetensors files from weight_map
-    files_to_load = set(weight_map.values())
-    is_safetensors = all(f.endswith(".safetensors") for f in files_to_load)
-    merged_state_dict = {}
-
-    # Load tensors from each unique file
-    for file_name in files_to_load:
+    part_file_paths = []
+    for file_name in sorted(set(weight_map.values())):
         part_file_path = os.path.join(sharded_ckpt_cached_folder, file_name)
         if not os.path.exists(part_file_path):
             raise FileNotFoundError(f"Part file {file_name} not found.")
+        part_file_paths.append(part_file_path)
 
-        if is_safetensors:
-            with safetensors.safe_open(part_file_path, framework="pt", device="cpu") as f:
-                for tensor_key in f.keys():
-                    if tensor_key in weight_map:
-                        merged_state_dict[tensor_key] = f.get_tensor(tensor_key)
-        else:
-            merged_state_dict.update(torch.load(part_file_path, weights_only=True, map_location="cpu"))
+    # Load tensors from each unique file
+    merged_state_dict = {}
+    for state_dict in _iter_shard_state_dicts(part_file_paths):
+        merged_state_dict.update({key: value for key, value in state_dict.items() if key in weight_map})
 
     return merged_state_dict
 
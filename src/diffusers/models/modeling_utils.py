@@ -57,12 +57,14 @@ from ..utils.hub_utils import (
     populate_model_card,
 )
 from .model_loading_utils import (
+    _MODEL_INIT_LOCK,
     _determine_device_map,
     _fetch_index_file,
     _fetch_index_file_legacy,
     _load_state_dict_into_model,
     _merge_sharded_checkpoints,
     load_model_dict_into_meta,
+    load_sharded_model_dict_into_meta,
     load_state_dict,
 )
 
@@ -196,6 +198,59 @@ class ModelMixin(torch.nn.Module, PushToHubMixin):
         if self._supports_gradient_checkpointing:
             self.apply(partial(self._set_gradient_checkpointing, value=False))
 
+    def enable_group_offload(
+        self,
+        onload_device: Union[str, torch.device],
+        offload_device: Union[str, torch.device] = torch.device("cpu"),
+        num_blocks_per_group: int = 1,
+        non_blocking: bool = False,
+        use_stream: bool = False,
+    ) -> None:
+        r"""
+        Offloads the weights of the model in groups of consecutive blocks, and only moves a group to `onload_device`
+        while it runs. See [`~hooks.group_offloading.apply_group_offloading`] for more details.
+
+        Args:
+            onload_device (`torch.device` or `str`):
+                The device that the model runs on.
+            offload_device (`torch.device` or `str`, defaults to `"cpu"`):
+                The device that the weights are stored on while they are not in use.
+            num_blocks_per_group (`int`, defaults to `1`):
+                The number of consecutive blocks that are moved together.
+            non_blocking (`bool`, defaults to `False`):
+                Whether the transfers to the onload device are non-blocking.
+            use_stream (`bool`, defaults to `False`):
+                Whether to prefetch the next group while the current one runs, on a separate CUDA stream or, if the
+                onload device is not a CUDA device, on a background thread.
+
+        Example:
+
+        ```python
+        >>> import torch
+        >>> from diffusers import FluxPipeline
+
+        >>> pipe = FluxPipeline.from_pretrained("black-forest-labs/FLUX.1-dev", torch_dtype=torch.bfloat16)
+        >>> pipe.transformer.enable_group_offload(onload_device="cuda", num_blocks_per_group=2, use_stream=True)
+        >>> for name in ["text_encoder", "text_encoder_2", "vae"]:
+        ...     getattr(pipe, name).to("cuda")
+
+        >>> image = pipe("A cat holding a sign that says hello world").images[0]
+        ```
+        """
+        from ..hooks.group_offloading import apply_group_offloading
+
+        if getattr(self, "is_loaded_in_8bit", False) or getattr(self, "is_loaded_in_4bit", False):
+            raise ValueError("Group offloading is not supported for models quantized with bitsandbytes.")
+
+        apply_group_offloading(
+            self,
+            onload_device=onload_device,
+            offload_device=offload_device,
+            num_blocks_per_group=num_blocks_per_group,
+            non_blocking=non_blocking,
+            use_stream=use_stream,
+        )
+
     def set_use_npu_flash_attention(self, valid: bool) -> None:
         r"""
         Set the switch for the npu flash attention.
@@ -559,6 +614,11 @@ class ModelMixin(torch.nn.Module, PushToHubMixin):
                 If set to `None`, the `safetensors` weights are downloaded if they're available **and** if the
                 `safetensors` library is installed. If set to `True`, the model is forcibly loaded from `safetensors`
                 weights. If set to `False`, `safetensors` weights are not loaded.
+            use_mmap (`bool`, *optional*, defaults to `False`):
+                Whether to keep the weights of a model loaded on the CPU backed by a memory map of the checkpoint file
+                instead of reading them into memory. The weights are then only paged in when they are used, and can be
+                evicted again by the operating system under memory pressure. The weights are copied if `torch_dtype`
+                differs from the dtype of the checkpoint. Requires `low_cpu_mem_usage=True` and `device_map=None`.
 
         <Tip>
 
@@ -604,6 +664,7 @@ class ModelMixin(torch.nn.Module, PushToHubMixin):
         variant = kwargs.pop("variant", None)
         use_safetensors = kwargs.pop("use_safetensors", None)
         quantization_config = kwargs.pop("quantization_config", None)
+        use_mmap = kwargs.pop("use_mmap", False)
 
         allow_pickle = False
         if use_safetensors is None:
@@ -644,6 +705,9 @@ class ModelMixin(torch.nn.Module, PushToHubMixin):
                 " dispatching. Please make sure to set `low_cpu_mem_usage=True`."
             )
 
+        if use_mmap and not low_cpu_mem_usage:
+            raise ValueError("`use_mmap=True` requires `low_cpu_mem_usage=True`.")
+
         # change device_map into a map if we passed an int, a str or a torch.device
         if isinstance(device_map, torch.device):
             device_map = {"": device_map}
@@ -866,16 +930,17 @@ class ModelMixin(torch.nn.Module, PushToHubMixin):
 
             if low_cpu_mem_usage:
                 # Instantiate model with empty weights
-                with accelerate.init_empty_weights():
-                    model = cls.from_config(config, **unused_kwargs)
+                with _MODEL_INIT_LOCK:
+                    with accelerate.init_empty_weights():
+                        model = cls.from_config(config, **unused_kwargs)
 
-                if hf_quantizer is not None:
-                    hf_quantizer.preprocess_model(
-                        model=model, device_map=device_map, keep_in_fp32_modules=keep_in_fp32_modules
-                    )
+                    if hf_quantizer is not None:
+                        hf_quantizer.preprocess_model(
+                            model=model, device_map=device_map, keep_in_fp32_modules=keep_in_fp32_modules
+                        )
 
                 # if device_map is None, load the state dict and move the params from meta device to the cpu
-                if device_map is None and not is_sharded:
+                if device_map is None:
                     # `torch.cuda.current_device()` is fine here when `hf_quantizer` is not None.
                     # It would error out during the `validate_environment()` call above in the absence of cuda.
                     if hf_quantizer is None:
@@ -883,30 +948,55 @@ class ModelMixin(torch.nn.Module, PushToHubMixin):
                     # TODO (sayakpaul,  SunMarc): remove this after model loading refactor
                     else:
                         param_device = torch.device(torch.cuda.current_device())
-                    state_dict = load_state_dict(model_file, variant=variant)
-                    model._convert_deprecated_attention_blocks(state_dict)
 
-                    # move the params from meta device to cpu
-                    missing_keys = set(model.state_dict().keys()) - set(state_dict.keys())
-                    if hf_quantizer is not None:
-                        missing_keys = hf_quantizer.update_missing_keys(model, missing_keys, prefix="")
-                    if len(missing_keys) > 0:
-                        raise ValueError(
-                            f"Cannot load {cls} from {pretrained_model_name_or_path} because the following keys are"
-                            f" missing: \n {', '.join(missing_keys)}. \n Please make sure to pass"
-                            " `low_cpu_mem_usage=False` and `device_map=None` if you want to randomly initialize"
-                            " those weights or else make sure your checkpoint file is correct."
+                    if is_sharded:
+                        # The shards are read concurrently and streamed into the model one at a time.
+                        shard_files = [
+                            os.path.join(sharded_ckpt_cached_folder, shard_file)
+                            for shard_file in sorted(set(sharded_metadata["weight_map"].values()))
+                        ]
+                        missing_keys, unexpected_keys = load_sharded_model_dict_into_meta(
+                            model,
+                            shard_files,
+                            device=param_device,
+                            dtype=torch_dtype,
+                            model_name_or_path=pretrained_model_name_or_path,
+                            hf_quantizer=hf_quantizer,
+                            keep_in_fp32_modules=keep_in_fp32_modules,
+                            use_mmap=use_mmap,
                         )
+                        if len(missing_keys) > 0:
+                            raise ValueError(
+                                f"Cannot load {cls} from {pretrained_model_name_or_path} because the following keys are"
+                                f" missing: \n {', '.join(missing_keys)}. \n Please make sure to pass"
+                                " `low_cpu_mem_usage=False` and `device_map=None` if you want to randomly initialize"
+                                " those weights or else make sure your checkpoint file is correct."
+                            )
+                    else:
+                        state_dict = load_state_dict(model_file, variant=variant, use_mmap=use_mmap)
+                        model._convert_deprecated_attention_blocks(state_dict)
+
+                        # move the params from meta device to cpu
+                        missing_keys = set(model.state_dict().keys()) - set(state_dict.keys())
+                        if hf_quantizer is not None:
+                            missing_keys = hf_quantizer.update_missing_keys(model, missing_keys, prefix="")
+                        if len(missing_keys) > 0:
+                            raise ValueError(
+                                f"Cannot load {cls} from {pretrained_model_name_or_path} because the following keys are"
+                                f" missing: \n {', '.join(missing_keys)}. \n Please make sure to pass"
+                                " `low_cpu_mem_usage=False` and `device_map=None` if you want to randomly initialize"
+                                " those weights or else make sure your checkpoint file is correct."
+                            )
 
-                    unexpected_keys = load_model_dict_into_meta(
-                        model,
-                        state_dict,
-                        device=param_device,
-                        dtype=torch_dtype,
-                        model_name_or_path=pretrained_model_name_or_path,
-                        hf_quantizer=hf_quantizer,
-                        keep_in_fp32_modules=keep_in_fp32_modules,
-                    )
+                        unexpected_keys = load_model_dict_into_meta(
+                            model,
+                            state_dict,
+                            device=param_device,
+                            dtype=torch_dtype,
+                            model_name_or_path=pretrained_model_name_or_path,
+                            hf_quantizer=hf_quantizer,
+                            keep_in_fp32_modules=keep_in_fp32_modules,
+                        )
 
                     if cls._keys_to_ignore_on_load_unexpected is not None:
                         for pat in cls._keys_to_ignore_on_load_unexpected:
@@ -918,16 +1008,13 @@ class ModelMixin(torch.nn.Module, PushToHubMixin):
                         )
 
                 else:  # else let accelerate handle loading and dispatching.
+                    if use_mmap:
+                        logger.warning("`use_mmap=True` is ignored when loading with a `device_map`.")
                     # Load weights and dispatch according to the device_map
-                    # by default the device_map is None and the weights are loaded on the CPU
                     force_hook = True
                     device_map = _determine_device_map(
                         model, device_map, max_memory, torch_dtype, keep_in_fp32_modules, hf_quantizer
                     )
-                    if device_map is None and is_sharded:
-                        # we load the parameters on the cpu
-                        device_map = {"": "cpu"}
-                        force_hook = False
                     try:
                         accelerate.load_checkpoint_and_dispatch(
                             model,
@@ -981,7 +1068,8 @@ class ModelMixin(torch.nn.Module, PushToHubMixin):
                     "error_msgs": [],
                 }
             else:
-                model = cls.from_config(config, **unused_kwargs)
+                with _MODEL_INIT_LOCK:
+                    model = cls.from_config(config, **unused_kwargs)
 
                 state_dict = load_state_dict(model_file, variant=variant)
                 model._convert_deprecated_attention_blocks(state_dict)
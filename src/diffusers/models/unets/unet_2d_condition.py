@@ -19,6 +19,7 @@ import torch.nn as nn
 import torch.utils.checkpoint
 
 from ...configuration_utils import ConfigMixin, register_to_config
+from ...hooks.deep_cache import DeepCache
 from ...loaders import PeftAdapterMixin, UNet2DConditionLoadersMixin
 from ...loaders.single_file_model import FromOriginalModelMixin
 from ...utils import USE_PEFT_BACKEND, BaseOutput, deprecate, logging, scale_lora_layers, unscale_lora_layers
@@ -32,6 +33,7 @@ from ..attention_processor import (
     AttnProcessor,
     FusedAttnProcessor2_0,
 )
+from ..cache_utils import CacheMixin
 from ..embeddings import (
     GaussianFourierProjection,
     GLIGENTextBoundingboxProjection,
@@ -69,7 +71,7 @@ class UNet2DConditionOutput(BaseOutput):
 
 
 class UNet2DConditionModel(
-    ModelMixin, ConfigMixin, FromOriginalModelMixin, UNet2DConditionLoadersMixin, PeftAdapterMixin
+    ModelMixin, ConfigMixin, FromOriginalModelMixin, UNet2DConditionLoadersMixin, PeftAdapterMixin, CacheMixin
 ):
     r"""
     A conditional 2D UNet model that takes a noisy sample, conditional state, and a timestep and returns a sample
@@ -1205,8 +1207,14 @@ class UNet2DConditionModel(
             down_intrablock_additional_residuals = down_block_additional_residuals
             is_adapter = True
 
+        # With DeepCache, the features of the deep blocks are reused from the last fully computed step and only the
+        # shallow down and up blocks up to the cache branch are run
+        deep_cache = self._cache if isinstance(self._cache, DeepCache) else None
+        use_deep_cache = deep_cache is not None and deep_cache.step()
+        down_blocks = self.down_blocks[: deep_cache.cache_branch_id + 1] if use_deep_cache else self.down_blocks
+
         down_block_res_samples = (sample,)
-        for downsample_block in self.down_blocks:
+        for downsample_block in down_blocks:
             if hasattr(downsample_block, "has_cross_attention") and downsample_block.has_cross_attention:
                 # For t2i-adapter CrossAttnDownBlock2D
                 additional_residuals = {}
@@ -1229,6 +1237,11 @@ class UNet2DConditionModel(
 
             down_block_res_samples += res_samples
 
+        if use_deep_cache:
+            # drop the outputs of the last shallow down block that are only consumed by the skipped up blocks
+            num_res_samples = sum(len(block.resnets) for block in self.up_blocks[deep_cache.cache_up_block_index :])
+            down_block_res_samples = down_block_res_samples[:num_res_samples]
+
         if is_controlnet:
             new_down_block_res_samples = ()
 
@@ -1241,7 +1254,7 @@ class UNet2DConditionModel(
             down_block_res_samples = new_down_block_res_samples
 
         # 4. mid
-        if self.mid_block is not None:
+        if self.mid_block is not None and not use_deep_cache:
             if hasattr(self.mid_block, "has_cross_attention") and self.mid_block.has_cross_attention:
                 sample = self.mid_block(
                     sample,
@@ -1262,13 +1275,22 @@ class UNet2DConditionModel(
             ):
                 sample += down_intrablock_additional_residuals.pop(0)
 
-        if is_controlnet:
+        if is_controlnet and not use_deep_cache:
             sample = sample + mid_block_additional_residual
 
         # 5. up
         for i, upsample_block in enumerate(self.up_blocks):
             is_final_block = i == len(self.up_blocks) - 1
 
+            if deep_cache is not None:
+                if use_deep_cache and i < deep_cache.cache_up_block_index:
+                    continue
+                if i == deep_cache.cache_up_block_index:
+                    if use_deep_cache:
+                        sample = deep_cache.state.cached_hidden_states
+                    else:
+                        deep_cache.state.cached_hidden_states = sample
+
             res_samples = down_block_res_samples[-len(upsample_block.resnets) :]
             down_block_res_samples = down_block_res_samples[: -len(upsample_block.resnets)]
 
@@ -674,6 +674,10 @@ class AllegroPipeline(DiffusionPipeline):
     def num_timesteps(self):
         return self._num_timesteps
 
+    @property
+    def current_timestep(self):
+        return self._current_timestep
+
     @property
     def interrupt(self):
         return self._interrupt
@@ -807,6 +811,7 @@ class AllegroPipeline(DiffusionPipeline):
         )
         self._guidance_scale = guidance_scale
         self._interrupt = False
+        self._current_timestep = None
 
         # 2. Default height and width to transformer
         if prompt is not None and isinstance(prompt, str):
@@ -883,6 +888,8 @@ class AllegroPipeline(DiffusionPipeline):
                 if self.interrupt:
                     continue
 
+                self._current_timestep = t
+
                 latent_model_input = torch.cat([latents] * 2) if do_classifier_free_guidance else latents
                 latent_model_input = self.scheduler.scale_model_input(latent_model_input, t)
 
@@ -929,6 +936,8 @@ class AllegroPipeline(DiffusionPipeline):
         else:
             video = latents
 
+        self._current_timestep = None
+
         # Offload all models
         self.maybe_free_model_hooks()
 
@@ -477,6 +477,21 @@ class LTXPipeline(DiffusionPipeline, FromSingleFileMixin, LTXVideoLoraLoaderMixi
         )
         return latents
 
+    def _get_preview_latents(self, latents, vae, height, width, num_frames, **kwargs):
+        r"""Unpacks and denormalizes the latents of a step for the previews of [`~DiffusionPipeline.stream`]."""
+        latent_num_frames = (num_frames - 1) // self.vae_temporal_compression_ratio + 1
+        latent_height = height // self.vae_spatial_compression_ratio
+        latent_width = width // self.vae_spatial_compression_ratio
+        latents = self._unpack_latents(
+            latents,
+            latent_num_frames,
+            latent_height,
+            latent_width,
+            self.transformer_spatial_patch_size,
+            self.transformer_temporal_patch_size,
+        )
+        return self._denormalize_latents(latents, vae.latents_mean, vae.latents_std, vae.config.scaling_factor)
+
     @property
     def guidance_scale(self):
         return self._guidance_scale
@@ -17,9 +17,11 @@
 import importlib
 import os
 import re
+import time
 import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import torch
 from huggingface_hub import ModelCard, model_info
@@ -27,6 +29,7 @@ from huggingface_hub.utils import validate_hf_hub_args
 from packaging import version
 
 from .. import __version__
+from ..models.model_loading_utils import _MODEL_INIT_LOCK
 from ..utils import (
     FLAX_WEIGHTS_NAME,
     ONNX_EXTERNAL_WEIGHTS_NAME,
@@ -627,6 +630,7 @@ def load_sub_model(
     low_cpu_mem_usage: bool,
     cached_folder: Union[str, os.PathLike],
     use_safetensors: bool,
+    use_mmap: bool = False,
 ):
     """Helper method to load the module `name` from `library_name` and `class_name`"""
 
@@ -701,6 +705,9 @@ def load_sub_model(
         if from_flax:
             loading_kwargs["from_flax"] = True
 
+        if is_diffusers_model and use_mmap:
+            loading_kwargs["use_mmap"] = True
+
         # the following can be deleted once the minimum required `transformers` version
         # is higher than 4.27
         if (
@@ -722,10 +729,17 @@ def load_sub_model(
 
     # check if the module is in a subdirectory
     if os.path.isdir(os.path.join(cached_folder, name)):
-        loaded_sub_model = load_method(os.path.join(cached_folder, name), **loading_kwargs)
+        load_path = os.path.join(cached_folder, name)
     else:
         # else load from the root directory
-        loaded_sub_model = load_method(cached_folder, **loading_kwargs)
+        load_path = cached_folder
+
+    if is_diffusers_model:
+        # 🧨 Diffusers models only hold the lock while they are instantiated, not while their weights are read.
+        loaded_sub_model = load_method(load_path, **loading_kwargs)
+    else:
+        with _MODEL_INIT_LOCK:
+            loaded_sub_model = load_method(load_path, **loading_kwargs)
 
     if isinstance(loaded_sub_model, torch.nn.Module) and isinstance(device_map, dict):
         # remove hooks
@@ -746,6 +760,48 @@ def load_sub_model(
     return loaded_sub_model
 
 
+def _load_sub_models(
+    sub_model_kwargs: Dict[str, Dict[str, Any]], max_workers: int = 1
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Loads the modules of a pipeline with `load_sub_model`, using up to `max_workers` threads. Returns the loaded
+    modules and the time it took to load each of them, in seconds.
+    """
+
+    def load(name):
+        start_time = time.perf_counter()
+        loaded_sub_model = load_sub_model(**sub_model_kwargs[name])
+        return loaded_sub_model, time.perf_counter() - start_time
+
+    loaded_sub_models = {}
+    load_times = {}
+    with logging.tqdm(total=len(sub_model_kwargs), desc="Loading pipeline components...") as progress_bar:
+        if max_workers <= 1 or len(sub_model_kwargs) <= 1:
+            for name in sub_model_kwargs:
+                loaded_sub_models[name], load_times[name] = load(name)
+                progress_bar.update(1)
+            return loaded_sub_models, load_times
+
+        # 🧨 Diffusers models are submitted first so that they are instantiated before the other modules take the
+        # instantiation lock, and their weights are read while the other modules are loaded.
+        names = sorted(sub_model_kwargs, key=lambda name: sub_model_kwargs[name]["library_name"] != "diffusers")
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(names)), thread_name_prefix="diffusers_pipeline_loading"
+        ) as executor:
+            futures = {executor.submit(load, name): name for name in names}
+            try:
+                for future in as_completed(futures):
+                    name = futures[future]
+                    loaded_sub_models[name], load_times[name] = future.result()
+                    progress_bar.update(1)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    return loaded_sub_models, {name: load_times[name] for name in sub_model_kwargs}
+
+
 def _fetch_class_library_tuple(module):
     # import it here to avoid circular import
     diffusers_module = importlib.import_module(__name__.split(".")[0])
@@ -0,0 +1,478 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import inspect
+import queue
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import PIL.Image
+import torch
+import torch.nn.functional as F
+
+from ..callbacks import MultiPipelineCallbacks, PipelineCallback
+from ..image_processor import VaeImageProcessor
+from ..utils import BaseOutput, logging
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+_DONE = object()
+
+# creates the per-pipeline call locks
+_CALL_LOCK_GUARD = threading.Lock()
+
+# the latent to RGB factors fitted for each VAE
+_LATENT_RGB_FACTORS = weakref.WeakKeyDictionary()
+
+# the attributes of the pipelines whose VAE compresses the frames of videos
+_TEMPORAL_COMPRESSION_ATTRIBUTES = ("vae_scale_factor_temporal", "vae_temporal_compression_ratio")
+
+
+@dataclass
+class PipelineStepOutput(BaseOutput):
+    """
+    Output of a denoising step of a streamed pipeline call.
+
+    Args:
+        step (`int`):
+            The index of the denoising step that just finished.
+        num_inference_steps (`int`, *optional*):
+            The number of denoising steps of the call, if the pipeline records it.
+        timestep (`torch.Tensor`):
+            The timestep of the denoising step.
+        latents (`torch.Tensor`, *optional*):
+            The latents after the denoising step, if the pipeline passes them to its callbacks.
+        preview (`torch.Tensor`, `np.ndarray` or `List[PIL.Image.Image]`, *optional*):
+            A cheap preview of the images or videos decoded from `latents`, if previews were requested.
+    """
+
+    step: int
+    num_inference_steps: Optional[int]
+    timestep: torch.Tensor
+    latents: Optional[torch.Tensor]
+    preview: Optional[Union[torch.Tensor, np.ndarray, List[PIL.Image.Image]]] = None
+
+
+def _get_call_lock(pipeline) -> threading.Lock:
+    # a pipeline keeps the state of its current call on itself, so its streamed calls run one at a time
+    with _CALL_LOCK_GUARD:
+        lock = getattr(pipeline, "_call_lock", None)
+        if lock is None:
+            lock = pipeline._call_lock = threading.Lock()
+    return lock
+
+
+@torch.no_grad()
+def fit_latent_rgb_factors(vae, video: bool = False, num_images: int = 16, size: int = 256) -> torch.Tensor:
+    r"""
+    Fits a linear map from the latents of a VAE to the average RGB color of the pixels they encode, to preview latents
+    without running the decoder. The map is fitted with least squares on random smooth color images encoded by the
+    VAE.
+
+    Args:
+        vae (`ModelMixin`):
+            The VAE to fit the map of. It must have an `encode` method.
+        video (`bool`, defaults to `False`):
+            Whether the VAE encodes videos, in which case the images are encoded as single-frame videos.
+        num_images (`int`, defaults to 16):
+            The number of random images to encode.
+        size (`int`, defaults to 256):
+            The height and width of the random images.
+
+    Returns:
+        `torch.Tensor`: The factors of shape `(num_channels + 1, 3)`, with the bias in the last row.
+    """
+    generator = torch.Generator().manual_seed(0)
+    colors = torch.rand(num_images, 3, 4, 4, generator=generator) * 2 - 1
+    images = F.interpolate(colors, size=(size, size), mode="bicubic", align_corners=False).clamp(-1, 1)
+
+    inputs, targets = [], []
+    for batch in images.split(4):
+        sample = batch[:, :, None] if video else batch
+        output = vae.encode(sample.to(device=vae.device, dtype=vae.dtype))
+        latents = output.latent_dist.mean if hasattr(output, "latent_dist") else output.latents
+        latents = latents[:, :, 0] if video else latents
+        latents = latents.float().cpu()
+
+        inputs.append(latents.permute(0, 2, 3, 1).flatten(0, 2))
+        targets.append(F.adaptive_avg_pool2d(batch, latents.shape[-2:]).permute(0, 2, 3, 1).flatten(0, 2))
+
+    inputs = torch.cat(inputs)
+    inputs = torch.cat([inputs, torch.ones_like(inputs[:, :1])], dim=1)
+    return torch.linalg.lstsq(inputs, torch.cat(targets), driver="gelsd").solution
+
+
+def latents_to_rgb(latents: torch.Tensor, factors: torch.Tensor) -> torch.Tensor:
+    r"""
+    Maps VAE latents of shape `(batch_size, num_channels, height, width)` or `(batch_size, num_channels, num_frames,
+    height, width)` to RGB values in `[0, 1]` at the latent resolution, with factors from
+    [`~pipelines.pipeline_streaming.fit_latent_rgb_factors`].
+    """
+    factors = factors.to(device=latents.device, dtype=torch.float32)
+    rgb = torch.einsum("bc...,cr->br...", latents.float(), factors[:-1])
+    rgb = rgb + factors[-1].view(1, 3, *([1] * (latents.ndim - 2)))
+    return ((rgb + 1) / 2).clamp(0, 1)
+
+
+def _get_latent_rgb_factors(pipeline) -> torch.Tensor:
+    factors = _LATENT_RGB_FACTORS.get(pipeline.vae)
+    if factors is None:
+        # the random images are encoded to latents of at most 32x32
+        names = ("vae_scale_factor", "vae_scale_factor_spatial", "vae_spatial_compression_ratio")
+        scale_factor = next((getattr(pipeline, name) for name in names if hasattr(pipeline, name)), 8)
+        video = any(hasattr(pipeline, name) for name in _TEMPORAL_COMPRESSION_ATTRIBUTES)
+        factors = fit_latent_rgb_factors(pipeline.vae, video=video, size=min(256, 32 * scale_factor))
+        _LATENT_RGB_FACTORS[pipeline.vae] = factors
+    return factors
+
+
+class _PipelineStream(ABC):
+    r"""
+    Runs a pipeline call and hands its denoising steps to a consumer through `callback_on_step_end`, at most
+    `max_pending_steps` steps ahead of the consumer.
+    """
+
+    def __init__(
+        self,
+        pipeline,
+        kwargs: Dict[str, Any],
+        max_pending_steps: int = 1,
+        preview_type: Optional[str] = None,
+        preview_vae=None,
+        consumer_timeout: Optional[float] = None,
+    ) -> None:
+        signature = inspect.signature(pipeline.__call__)
+        if "callback_on_step_end" not in signature.parameters:
+            raise ValueError(
+                f"{pipeline.__class__.__name__} can't be streamed, as its `__call__` doesn't accept"
+                " `callback_on_step_end`."
+            )
+        if max_pending_steps < 1:
+            raise ValueError(f"`max_pending_steps` must be at least 1, but is {max_pending_steps}.")
+        if preview_type is not None:
+            if preview_type not in ("pt", "np", "pil"):
+                raise ValueError(f"`preview_type` must be one of 'pt', 'np' or 'pil', but is {preview_type}.")
+            if not hasattr(pipeline, "_get_preview_latents"):
+                raise ValueError(
+                    f"{pipeline.__class__.__name__} doesn't support previews, pass `preview_type=None` to stream it"
+                    " without previews."
+                )
+            if preview_vae is not None and any(hasattr(pipeline, name) for name in _TEMPORAL_COMPRESSION_ATTRIBUTES):
+                raise ValueError(
+                    "`preview_vae` only supports image pipelines, use the default linear previews instead."
+                )
+
+        kwargs = dict(kwargs)
+        self._callback = kwargs.pop("callback_on_step_end", None)
+        tensor_inputs = kwargs.pop("callback_on_step_end_tensor_inputs", None)
+        if isinstance(self._callback, (PipelineCallback, MultiPipelineCallbacks)):
+            tensor_inputs = self._callback.tensor_inputs
+        self._tensor_inputs: List[str] = list(tensor_inputs or [])
+        if "latents" not in self._tensor_inputs and "latents" in getattr(pipeline, "_callback_tensor_inputs", []):
+            self._tensor_inputs.append("latents")
+
+        # the previews need the arguments of the call, including the default resolution
+        arguments = signature.bind(**kwargs)
+        arguments.apply_defaults()
+
+        self.pipeline = pipeline
+        self.output = None
+        self._kwargs = kwargs
+        self._call_kwargs = dict(arguments.arguments)
+        self._call_kwargs.update(self._call_kwargs.pop("kwargs", {}))
+        self._call_kwargs.pop("latents", None)
+        self._preview_type = preview_type
+        self._preview_vae = preview_vae
+        self._latent_rgb_factors = None
+        self._slots = threading.Semaphore(max_pending_steps)
+        self._consumer_timeout = consumer_timeout
+        self._cancelled = threading.Event()
+        self._finished = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        r"""Interrupts the pipeline call, which skips its remaining denoising steps, and ends the iteration."""
+        if not self._cancelled.is_set():
+            self._cancelled.set()
+            # wakes the pipeline up if it waits for the consumer
+            self._slots.release()
+
+    def _run(self):
+        with _get_call_lock(self.pipeline):
+            if self.cancelled:
+                return None
+            if self._preview_type is not None and self._preview_vae is None:
+                # fitted before the call, as fitting in a step would pause the call and move the VAE while offloaded
+                self._latent_rgb_factors = _get_latent_rgb_factors(self.pipeline)
+            return self.pipeline(
+                **self._kwargs,
+                callback_on_step_end=self._on_step_end,
+                callback_on_step_end_tensor_inputs=self._tensor_inputs,
+            )
+
+    @abstractmethod
+    def _put(self, step: PipelineStepOutput) -> None:
+        r"""Hands a denoising step to the consumer, from the thread running the pipeline."""
+
+    def _on_step_end(self, pipeline, step_index: int, timestep, callback_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        if self._callback is not None:
+            callback_kwargs = self._callback(pipeline, step_index, timestep, callback_kwargs)
+
+        # waits until the consumer is at most `max_pending_steps` steps behind, a consumer that doesn't take the next
+        # step in time is given up on, as the pipeline can't run other calls until this one returns
+        if not self.cancelled and not self._slots.acquire(timeout=self._consumer_timeout):
+            logger.warning(
+                f"The consumer of the stream didn't take a step for {self._consumer_timeout} seconds, interrupting the"
+                " pipeline call."
+            )
+            self._cancelled.set()
+        if self.cancelled:
+            pipeline._interrupt = True
+        else:
+            latents = callback_kwargs.get("latents")
+            preview = None
+            if self._preview_type is not None and latents is not None:
+                preview = self._get_preview(latents)
+            step = PipelineStepOutput(
+                step=step_index,
+                num_inference_steps=getattr(pipeline, "_num_timesteps", None),
+                timestep=timestep,
+                latents=latents,
+                preview=preview,
+            )
+            self._put(step)
+        return callback_kwargs
+
+    @torch.no_grad()
+    def _get_preview(self, latents: torch.Tensor):
+        vae = self._preview_vae if self._preview_vae is not None else self.pipeline.vae
+        latents = self.pipeline._get_preview_latents(latents, vae, **self._call_kwargs)
+        if self._preview_vae is not None:
+            preview = vae.decode(latents.to(vae.dtype), return_dict=False)[0]
+            preview = ((preview.float() + 1) / 2).clamp(0, 1)
+        else:
+            preview = latents_to_rgb(latents, self._latent_rgb_factors)
+
+        if self._preview_type == "pt":
+            return preview
+
+        if preview.ndim == 5:
+            # videos are returned frame by frame, like the outputs of the video pipelines
+            frames = [VaeImageProcessor.pt_to_numpy(video.transpose(0, 1)) for video in preview]
+            if self._preview_type == "np":
+                return np.stack(frames)
+            return [VaeImageProcessor.numpy_to_pil(video) for video in frames]
+
+        preview = VaeImageProcessor.pt_to_numpy(preview)
+        if self._preview_type == "np":
+            return preview
+        return VaeImageProcessor.numpy_to_pil(preview)
+
+
+class PipelineStream(_PipelineStream):
+    r"""
+    An iterator over the denoising steps of a pipeline call, created by [`~DiffusionPipeline.stream`].
+
+    The pipeline runs in a background thread, and hands a `(step, latents, preview)` tuple to the iterator at the end
+    of every denoising step through `callback_on_step_end`. The latents are the ones of the denoiser, which can be
+    packed, and the preview is decoded from them by a tiny autoencoder or by a linear map from the latents to RGB
+    colors rather than by the VAE of the pipeline. The pipeline runs at most `max_pending_steps` steps ahead of the
+    iteration. Cancelling the stream or leaving its iteration early sets the `interrupt` property of the pipeline, so
+    that the remaining denoising steps are skipped, and leaving the iteration waits for the pipeline call to return.
+    As the other calls of the pipeline wait for the streamed call to return, the stream is also cancelled when the
+    iteration stops taking steps for `consumer_timeout` seconds, for example when it is abandoned without being closed.
+
+    After the iteration, the output of the pipeline call is available in `output`.
+
+    Args:
+        pipeline (`DiffusionPipeline`):
+            The pipeline to call. Its `__call__` must accept `callback_on_step_end`.
+        kwargs (`Dict[str, Any]`):
+            The arguments of the pipeline call. A `callback_on_step_end` is still called at every step.
+        max_pending_steps (`int`, defaults to 1):
+            The number of steps the pipeline can run ahead of the iteration.
+        preview_type (`str`, *optional*):
+            The type of the previews, `"pil"`, `"np"` or `"pt"`, or `None` to not compute previews.
+        preview_vae (`AutoencoderTiny`, *optional*):
+            A tiny autoencoder to decode the previews of image pipelines with. The previews are computed with a linear
+            map from the latents to RGB colors by default.
+        consumer_timeout (`float`, *optional*):
+            The number of seconds the pipeline waits for the iteration to take a step before cancelling the stream, or
+            `None` to wait indefinitely.
+    """
+
+    def __init__(self, pipeline, kwargs: Dict[str, Any], **stream_kwargs) -> None:
+        super().__init__(pipeline, kwargs, **stream_kwargs)
+        self._queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def _put(self, step: PipelineStepOutput) -> None:
+        self._queue.put(step)
+
+    def _start(self) -> None:
+        self._thread = threading.Thread(target=self._run_thread, name="PipelineStream", daemon=True)
+        self._thread.start()
+
+    def _run_thread(self) -> None:
+        try:
+            self.output = self._run()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._queue.put(_DONE)
+
+    def __iter__(self) -> Iterator[Tuple[int, Optional[torch.Tensor], Any]]:
+        if self._finished:
+            return
+        if self._thread is None:
+            self._start()
+
+        try:
+            while not self.cancelled:
+                item = self._queue.get()
+                if item is _DONE:
+                    self._finished = True
+                    self._thread.join()
+                    if self._error is not None:
+                        raise self._error
+                    return
+                self._slots.release()
+                yield item.step, item.latents, item.preview
+        finally:
+            # an iteration that is left early interrupts the pipeline, and waits for it to be free again
+            if not self._finished:
+                self.cancel()
+                self._finished = True
+                self._thread.join()
+
+    def result(self):
+        r"""
+        Runs the remaining denoising steps and returns the output of the pipeline call. The output of a cancelled call
+        is computed from the latents of its last denoising step, or is `None` if the call didn't start.
+        """
+        for _ in self:
+            pass
+        if self._error is not None:
+            raise self._error
+        return self.output
+
+    def __enter__(self) -> "PipelineStream":
+        return self
+
+    def __exit__(self, *args) -> None:
+        if not self._finished:
+            self.cancel()
+            if self._thread is not None:
+                self._finished = True
+                self._thread.join()
+
+
+class AsyncPipelineStream(_PipelineStream):
+    r"""
+    An asynchronous iterator over the denoising steps of a pipeline call, created by
+    [`~DiffusionPipeline.astream`].
+
+    The pipeline runs in the default executor of the event loop, and hands a [`PipelineStepOutput`] to the iterator at
+    the end of every denoising step through `callback_on_step_end`. It runs at most `max_pending_steps` steps ahead of
+    the consumer of the iterator, so a slow consumer pauses the pipeline instead of piling up latents. Cancelling the
+    stream, leaving its iteration early or cancelling the task iterating over it sets the `interrupt` property of the
+    pipeline, so that the remaining denoising steps are skipped. Pipelines without an `interrupt` property run their
+    remaining steps without pausing. As the other calls of the pipeline wait for the streamed call to return, the
+    stream is also cancelled when its consumer stops taking steps for `consumer_timeout` seconds.
+
+    After the iteration, the output of the pipeline call is available in `output`.
+
+    Args:
+        pipeline (`DiffusionPipeline`):
+            The pipeline to call. Its `__call__` must accept `callback_on_step_end`.
+        kwargs (`Dict[str, Any]`):
+            The arguments of the pipeline call. A `callback_on_step_end` is still called at every step.
+        max_pending_steps (`int`, defaults to 1):
+            The number of steps the pipeline can run ahead of the consumer of the iterator.
+        preview_type (`str`, *optional*):
+            The type of the previews, `"pil"`, `"np"` or `"pt"`, or `None` to not compute previews.
+        preview_vae (`AutoencoderTiny`, *optional*):
+            A tiny autoencoder to decode the previews of image pipelines with. The previews are computed with a linear
+            map from the latents to RGB colors by default.
+        consumer_timeout (`float`, *optional*):
+            The number of seconds the pipeline waits for the consumer to take a step before cancelling the stream, or
+            `None` to wait indefinitely.
+    """
+
+    def __init__(self, pipeline, kwargs: Dict[str, Any], **stream_kwargs) -> None:
+        super().__init__(pipeline, kwargs, **stream_kwargs)
+        self._future: Optional[asyncio.Future] = None
+
+    def _start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._future = loop.run_in_executor(None, self._run)
+        self._future.add_done_callback(lambda _: self._queue.put_nowait(_DONE))
+
+    def _put(self, step: PipelineStepOutput) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, step)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        if self._finished:
+            return
+        if self._future is None:
+            self._start()
+
+        try:
+            while not self.cancelled:
+                item = await self._queue.get()
+                if item is _DONE:
+                    self._finished = True
+                    self.output = self._future.result()
+                    return
+                self._slots.release()
+                yield item
+        finally:
+            # an iteration that is left early, or whose task is cancelled, doesn't keep the pipeline busy
+            if not self._finished:
+                self.cancel()
+
+    async def result(self):
+        r"""
+        Runs the remaining denoising steps and returns the output of the pipeline call. The output of a cancelled call
+        is computed from the latents of its last denoising step, or is `None` if the call didn't start.
+        """
+        async for _ in self:
+            pass
+        if not self._finished and self._future is not None:
+            self._finished = True
+            self.output = await self._future
+        return self.output
+
+    async def __aenter__(self) -> "AsyncPipelineStream":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        if not self._finished:
+            self.cancel()
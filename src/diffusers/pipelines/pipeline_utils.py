@@ -79,15 +79,16 @@ from .pipeline_loading_utils import (
     _get_ignore_patterns,
     _get_pipeline_class,
     _identify_model_variants,
+    _load_sub_models,
     _maybe_raise_warning_for_inpainting,
     _resolve_custom_pipeline_and_cls,
     _unwrap_model,
     _update_init_kwargs_with_connected_pipeline,
-    load_sub_model,
     maybe_raise_or_warn,
     variant_compatible_siblings,
     warn_deprecated_model_variant,
 )
+from .pipeline_streaming import AsyncPipelineStream, PipelineStream
 
 
 if is_accelerate_available():
@@ -612,6 +613,14 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
                 If set to `None`, the safetensors weights are downloaded if they're available **and** if the
                 safetensors library is installed. If set to `True`, the model is forcibly loaded from safetensors
                 weights. If set to `False`, safetensors weights are not loaded.
+            use_mmap (`bool`, *optional*, defaults to `False`):
+                Whether to keep the weights of the 🧨 Diffusers models of the pipeline backed by a memory map of their
+                checkpoint files instead of reading them into memory. See [`~ModelMixin.from_pretrained`] for more
+                details.
+            max_loading_workers (`int`, *optional*, defaults to `1`):
+                The maximum number of pipeline components that are loaded concurrently. With the default value, the
+                components are loaded one after the other. The time it took to load each component is stored in the
+                `component_load_times` attribute of the pipeline and is logged at the info level.
             use_onnx (`bool`, *optional*, defaults to `None`):
                 If set to `True`, ONNX weights will always be downloaded if present. If set to `False`, ONNX weights
                 will never be downloaded. By default `use_onnx` defaults to the `_is_onnx` class attribute which is
@@ -674,6 +683,8 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
         low_cpu_mem_usage = kwargs.pop("low_cpu_mem_usage", _LOW_CPU_MEM_USAGE_DEFAULT)
         variant = kwargs.pop("variant", None)
         use_safetensors = kwargs.pop("use_safetensors", None)
+        use_mmap = kwargs.pop("use_mmap", False)
+        max_loading_workers = kwargs.pop("max_loading_workers", 1)
         use_onnx = kwargs.pop("use_onnx", None)
         load_connected_pipeline = kwargs.pop("load_connected_pipeline", False)
 
@@ -893,7 +904,8 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
 
         # 7. Load each module in the pipeline
         current_device_map = None
-        for name, (library_name, class_name) in logging.tqdm(init_dict.items(), desc="Loading pipeline components..."):
+        sub_model_kwargs = {}
+        for name, (library_name, class_name) in init_dict.items():
             # 7.1 device_map shenanigans
             if final_device_map is not None and len(final_device_map) > 0:
                 component_device = final_device_map.get(name, None)
@@ -908,7 +920,6 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
             # 7.3 Define all importable classes
             is_pipeline_module = hasattr(pipelines, library_name)
             importable_classes = ALL_IMPORTABLE_CLASSES
-            loaded_sub_model = None
 
             # 7.4 Use passed sub model or load class_name from library_name
             if name in passed_class_obj:
@@ -918,35 +929,41 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
                     library_name, library, class_name, importable_classes, passed_class_obj, name, is_pipeline_module
                 )
 
-                loaded_sub_model = passed_class_obj[name]
+                init_kwargs[name] = passed_class_obj[name]
             else:
-                # load sub model
-                loaded_sub_model = load_sub_model(
-                    library_name=library_name,
-                    class_name=class_name,
-                    importable_classes=importable_classes,
-                    pipelines=pipelines,
-                    is_pipeline_module=is_pipeline_module,
-                    pipeline_class=pipeline_class,
-                    torch_dtype=torch_dtype,
-                    provider=provider,
-                    sess_options=sess_options,
-                    device_map=current_device_map,
-                    max_memory=max_memory,
-                    offload_folder=offload_folder,
-                    offload_state_dict=offload_state_dict,
-                    model_variants=model_variants,
-                    name=name,
-                    from_flax=from_flax,
-                    variant=variant,
-                    low_cpu_mem_usage=low_cpu_mem_usage,
-                    cached_folder=cached_folder,
-                    use_safetensors=use_safetensors,
-                )
-                logger.info(
-                    f"Loaded {name} as {class_name} from `{name}` subfolder of {pretrained_model_name_or_path}."
-                )
-
+                # the sub model is loaded below
+                init_kwargs[name] = None
+                sub_model_kwargs[name] = {
+                    "library_name": library_name,
+                    "class_name": class_name,
+                    "importable_classes": importable_classes,
+                    "pipelines": pipelines,
+                    "is_pipeline_module": is_pipeline_module,
+                    "pipeline_class": pipeline_class,
+                    "torch_dtype": torch_dtype,
+                    "provider": provider,
+                    "sess_options": sess_options,
+                    "device_map": current_device_map,
+                    "max_memory": max_memory,
+                    "offload_folder": offload_folder,
+                    "offload_state_dict": offload_state_dict,
+                    "model_variants": model_variants,
+                    "name": name,
+                    "from_flax": from_flax,
+                    "variant": variant,
+                    "low_cpu_mem_usage": low_cpu_mem_usage,
+                    "cached_folder": cached_folder,
+                    "use_safetensors": use_safetensors,
+                    "use_mmap": use_mmap,
+                }
+
+        # 7.5 Load the sub models, concurrently if `max_loading_workers > 1`
+        loaded_sub_models, component_load_times = _load_sub_models(sub_model_kwargs, max_workers=max_loading_workers)
+        for name, loaded_sub_model in loaded_sub_models.items():
+            logger.info(
+                f"Loaded {name} as {sub_model_kwargs[name]['class_name']} from `{name}` subfolder of"
+                f" {pretrained_model_name_or_path} in {component_load_times[name]:.2f}s."
+            )
             init_kwargs[name] = loaded_sub_model  # UNet(...), # DiffusionSchedule(...)
 
         # 8. Handle connected pipelines.
@@ -979,6 +996,7 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
         model.register_to_config(_name_or_path=pretrained_model_name_or_path)
         if device_map is not None:
             setattr(model, "hf_device_map", final_device_map)
+        setattr(model, "component_load_times", component_load_times)
         return model
 
     @property
@@ -990,12 +1008,19 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
         r"""
         Returns the device on which the pipeline's models will be executed. After calling
         [`~DiffusionPipeline.enable_sequential_cpu_offload`] the execution device can only be inferred from
-        Accelerate's module hooks.
+        Accelerate's module hooks. Similarly, it is inferred from the onload device of components with group
+        offloading enabled.
         """
+        from ..hooks.group_offloading import _get_group_onload_device
+
         for name, model in self.components.items():
             if not isinstance(model, torch.nn.Module) or name in self._exclude_from_cpu_offload:
                 continue
 
+            onload_device = _get_group_onload_device(model)
+            if onload_device is not None:
+                return onload_device
+
             if not hasattr(model, "_hf_hook"):
                 return self.device
             for module in model.modules():
@@ -1108,8 +1133,13 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
         Function that offloads all components, removes all model hooks that were added when using
         `enable_model_cpu_offload` and then applies them again. In case the model has not been offloaded this function
         is a no-op. Make sure to add this function to the end of the `__call__` function of your pipeline so that it
-        functions correctly when applying enable_model_cpu_offload.
+        functions correctly when applying enable_model_cpu_offload. It also resets the state of any caching technique
+        enabled on the components with `enable_cache`.
         """
+        for component in self.components.values():
+            if hasattr(component, "_reset_stateful_cache"):
+                component._reset_stateful_cache()
+
         if not hasattr(self, "_all_hooks") or len(self._all_hooks) == 0:
             # `enable_model_cpu_offload` has not be called, so silently do nothing
             return
@@ -1716,6 +1746,159 @@ class DiffusionPipeline(ConfigMixin, PushToHubMixin):
         for module in modules:
             module.set_attention_slice(slice_size)
 
+    def enable_prompt_embeds_cache(self, max_memory: int = 1024**3, cache_dir: Optional[str] = None):
+        r"""
+        Enables a least-recently-used cache of the text encoder outputs, so that repeated prompts and negative prompts
+        are not encoded again by `encode_prompt`. The outputs are keyed on the token ids, the text encoder and its LoRA
+        state, so the cache stays valid across `clip_skip`, `max_sequence_length` or LoRA changes. The hit and miss
+        counters are available in `pipeline.prompt_embeds_cache.stats`.
+
+        Args:
+            max_memory (`int`, defaults to `1073741824`):
+                The maximum size in bytes of the text encoder outputs kept in memory.
+            cache_dir (`str`, *optional*):
+                A directory where the text encoder outputs are also saved, to reuse them across processes.
+        """
+        from ..hooks import PromptEmbedsCacheConfig, apply_prompt_embeds_cache
+
+        self.disable_prompt_embeds_cache()
+        config = PromptEmbedsCacheConfig(max_memory=max_memory, cache_dir=cache_dir)
+        self._prompt_embeds_cache = apply_prompt_embeds_cache(self, config)
+
+    def disable_prompt_embeds_cache(self):
+        r"""Disables the prompt embeddings cache if enabled and frees the cached text encoder outputs."""
+        if self.prompt_embeds_cache is not None:
+            self.prompt_embeds_cache.remove()
+            self._prompt_embeds_cache = None
+
+    @property
+    def prompt_embeds_cache(self):
+        r"""The [`~hooks.prompt_embeds_cache.PromptEmbedsCache`] enabled with `enable_prompt_embeds_cache`, if any."""
+        return getattr(self, "_prompt_embeds_cache", None)
+
+    def stream(
+        self,
+        preview_type: Optional[str] = None,
+        preview_vae: Optional[ModelMixin] = None,
+        max_pending_steps: int = 1,
+        consumer_timeout: Optional[float] = 60.0,
+        **kwargs,
+    ) -> PipelineStream:
+        r"""
+        Calls the pipeline in a background thread, and returns an iterator of `(step, latents, preview)` tuples, one
+        per denoising step. The latents are the ones of the denoiser, and the preview is a cheap decoding of them,
+        with a tiny autoencoder like `AutoencoderTiny` or, by default, with a linear map from the latents to RGB colors
+        at the latent resolution. The linear map is fitted once per VAE from a few images encoded by the VAE of the
+        pipeline. The pipeline pauses when it is `max_pending_steps` steps ahead of the iteration, and leaving the
+        iteration early interrupts it through its `interrupt` property. An iteration that stops taking steps for
+        `consumer_timeout` seconds without being closed interrupts the pipeline too, so that it doesn't keep the other
+        calls of the pipeline waiting.
+
+        Previews are supported by the main text-to-image and text-to-video pipelines, and all the pipelines whose
+        `__call__` accepts `callback_on_step_end` can be streamed without previews.
+
+        Args:
+            preview_type (`str`, *optional*):
+                The type of the previews, `"pil"`, `"np"` or `"pt"`. No previews are computed by default.
+            preview_vae (`AutoencoderTiny`, *optional*):
+                A tiny autoencoder to decode the previews of image pipelines with.
+            max_pending_steps (`int`, defaults to 1):
+                The number of steps the pipeline can run ahead of the iteration.
+            consumer_timeout (`float`, *optional*, defaults to 60.0):
+                The number of seconds the pipeline waits for the iteration to take a step before cancelling the
+                stream, or `None` to wait indefinitely.
+            kwargs:
+                The arguments of the pipeline call.
+
+        Returns:
+            [`~pipelines.pipeline_streaming.PipelineStream`]: An iterator of `(step, latents, preview)` tuples. The
+            output of the call is in its `output` attribute after the iteration, or is returned by `stream.result()`.
+
+        Examples:
+
+        ```py
+        >>> import torch
+        >>> from diffusers import AutoencoderTiny, FluxPipeline
+
+        >>> pipe = FluxPipeline.from_pretrained("black-forest-labs/FLUX.1-dev", torch_dtype=torch.bfloat16).to("cuda")
+        >>> taef1 = AutoencoderTiny.from_pretrained("madebyollin/taef1", torch_dtype=torch.bfloat16).to("cuda")
+
+        >>> stream = pipe.stream(prompt="a photo of a cat", preview_type="pil", preview_vae=taef1)
+        >>> for step, latents, preview in stream:
+        ...     preview[0].save(f"step_{step}.png")
+        >>> image = stream.output.images[0]
+        ```
+        """
+        return PipelineStream(
+            self,
+            kwargs,
+            max_pending_steps=max_pending_steps,
+            preview_type=preview_type,
+            preview_vae=preview_vae,
+            consumer_timeout=consumer_timeout,
+        )
+
+    def astream(
+        self,
+        max_pending_steps: int = 1,
+        preview_type: Optional[str] = None,
+        preview_vae: Optional[ModelMixin] = None,
+        consumer_timeout: Optional[float] = 60.0,
+        **kwargs,
+    ) -> AsyncPipelineStream:
+        r"""
+        Calls the pipeline without blocking the event loop, and returns an asynchronous iterator over its denoising
+        steps. The pipeline runs in the default executor of the event loop and pauses when it is `max_pending_steps`
+        steps ahead of the iteration. Cancelling the stream, or the task iterating over it, interrupts the pipeline
+        through its `interrupt` property. A consumer that stops iterating for `consumer_timeout` seconds cancels the
+        stream too, so that it doesn't keep the other calls of the pipeline waiting. Only the pipelines whose
+        `__call__` accepts `callback_on_step_end` can be streamed.
+
+        Args:
+            max_pending_steps (`int`, defaults to 1):
+                The number of steps the pipeline can run ahead of the iteration.
+            preview_type (`str`, *optional*):
+                The type of the previews of the steps, `"pil"`, `"np"` or `"pt"`. No previews are computed by default.
+                See [`~DiffusionPipeline.stream`].
+            preview_vae (`AutoencoderTiny`, *optional*):
+                A tiny autoencoder to decode the previews of image pipelines with.
+            consumer_timeout (`float`, *optional*, defaults to 60.0):
+                The number of seconds the pipeline waits for the iteration to take a step before cancelling the
+                stream, or `None` to wait indefinitely.
+            kwargs:
+                The arguments of the pipeline call.
+
+        Returns:
+            [`~pipelines.pipeline_streaming.AsyncPipelineStream`]: An asynchronous iterator of
+            [`~pipelines.pipeline_streaming.PipelineStepOutput`]. The output of the call is in its `output` attribute
+            after the iteration, or is returned by `await stream.result()`.
+
+        Examples:
+
+        ```py
+        >>> async def generate(pipe, prompt):
+        ...     async with pipe.astream(prompt=prompt, num_inference_steps=30) as stream:
+        ...         async for step in stream:
+        ...             print(f"step {step.step + 1}/{step.num_inference_steps}")
+        ...     return stream.output.images[0]
+        ```
+        """
+        return AsyncPipelineStream(
+            self,
+            kwargs,
+            max_pending_steps=max_pending_steps,
+            preview_type=preview_type,
+            preview_vae=preview_vae,
+            consumer_timeout=consumer_timeout,
+        )
+
+    async def agenerate(self, **kwargs):
+        r"""
+        Calls the pipeline without blocking the event loop and returns its output. See
+        [`~DiffusionPipeline.astream`].
+        """
+        return await self.astream(**kwargs).result()
+
     @classmethod
     def from_pipe(cls, pipeline, **kwargs):
         r"""
@@ -1900,6 +2083,30 @@ class StableDiffusionMixin:
         """Disables the FreeU mechanism if enabled."""
         self.unet.disable_freeu()
 
+    def enable_deepcache(self, cache_interval: int = 3, cache_branch_id: int = 0):
+        r"""Enables [DeepCache](https://huggingface.co/papers/2312.00858) on the UNet.
+
+        The high-level features of the deep UNet blocks are computed once every `cache_interval` steps and reused in
+        between, where only the shallow blocks up to the skip branch `cache_branch_id` are run.
+
+        Args:
+            cache_interval (`int`, defaults to `3`):
+                The number of denoising steps between two full computations of the UNet.
+            cache_branch_id (`int`, defaults to `0`):
+                The index of the skip branch, ordered from the shallowest to the deepest down/up block pair, through
+                which the shallow blocks are connected to the cached features. Lower values are faster at the cost of
+                quality.
+        """
+        from ..hooks import DeepCacheConfig
+
+        if not hasattr(self, "unet"):
+            raise ValueError("The pipeline must have `unet` for using DeepCache.")
+        self.unet.enable_cache(DeepCacheConfig(cache_interval=cache_interval, cache_branch_id=cache_branch_id))
+
+    def disable_deepcache(self):
+        """Disables DeepCache if enabled."""
+        self.unet.disable_cache()
+
     def fuse_qkv_projections(self, unet: bool = True, vae: bool = True):
         """
         Enables fused QKV projections. For self-attention modules, all projection matrices (i.e., query, key, value)
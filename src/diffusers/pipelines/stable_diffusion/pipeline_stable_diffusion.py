@@ -739,6 +739,10 @@ class StableDiffusionPipeline(
         assert emb.shape == (w.shape[0], embedding_dim)
         return emb
 
+    def _get_preview_latents(self, latents, vae, **kwargs):
+        r"""Unscales the latents of a step for the previews of [`~DiffusionPipeline.stream`]."""
+        return latents / vae.config.scaling_factor
+
     @property
     def guidance_scale(self):
         return self._guidance_scale
@@ -662,6 +662,10 @@ class StableDiffusion3Pipeline(DiffusionPipeline, SD3LoraLoaderMixin, FromSingle
 
         return latents
 
+    def _get_preview_latents(self, latents, vae, **kwargs):
+        r"""Undoes the scaling and shift of the latents of a step for the previews."""
+        return latents / vae.config.scaling_factor + vae.config.shift_factor
+
     @property
     def guidance_scale(self):
         return self._guidance_scale
@@ -790,6 +790,16 @@ class StableDiffusionXLPipeline(
         assert emb.shape == (w.shape[0], embedding_dim)
         return emb
 
+    def _get_preview_latents(self, latents, vae, **kwargs):
+        r"""Undoes the normalization or scaling of the latents of a step for the previews."""
+        has_latents_mean = getattr(vae.config, "latents_mean", None) is not None
+        has_latents_std = getattr(vae.config, "latents_std", None) is not None
+        if has_latents_mean and has_latents_std:
+            latents_mean = torch.tensor(vae.config.latents_mean).view(1, 4, 1, 1).to(latents.device, latents.dtype)
+            latents_std = torch.tensor(vae.config.latents_std).view(1, 4, 1, 1).to(latents.device, latents.dtype)
+            return latents * latents_std / vae.config.scaling_factor + latents_mean
+        return latents / vae.config.scaling_factor
+
     @property
     def guidance_scale(self):
         return self._guidance_scale
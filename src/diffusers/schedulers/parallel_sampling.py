@@ -0,0 +1,184 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import inspect
+from dataclasses import dataclass
+from typing import Callable
+
+import torch
+
+from ..utils import BaseOutput
+from .scheduling_utils import SchedulerMixin
+
+
+@dataclass
+class PicardSamplingOutput(BaseOutput):
+    """
+    Output class for [`picard_sample`].
+
+    Args:
+        sample (`torch.Tensor`):
+            The denoised sample, after the last timestep of the scheduler.
+        num_iterations (`int`):
+            The number of Picard iterations, which is the number of sequential (batched) model calls.
+        num_model_evaluations (`int`):
+            The total number of model evaluations over all the batched model calls.
+    """
+
+    sample: torch.Tensor
+    num_iterations: int
+    num_model_evaluations: int
+
+
+def _scale_model_inputs(scheduler, samples, timesteps, begin_index):
+    if not hasattr(scheduler, "scale_model_input"):
+        return samples
+
+    # `scale_model_input` reads the noise level of the current step, so it's moved to every step of the window
+    step_index = scheduler.__dict__.get("_step_index")
+    model_inputs = []
+    for i, (sample, timestep) in enumerate(zip(samples, timesteps)):
+        if "_step_index" in scheduler.__dict__:
+            scheduler._step_index = begin_index + i
+        model_inputs.append(scheduler.scale_model_input(sample, timestep))
+    if "_step_index" in scheduler.__dict__:
+        scheduler._step_index = step_index
+    return torch.stack(model_inputs)
+
+
+def _is_deterministic(scheduler, sample):
+    # a stochastic step draws new noise at every call, so two steps from the same state with different seeds differ
+    timestep = scheduler.timesteps[0]
+    accepts_generator = "generator" in inspect.signature(scheduler.step).parameters
+    prev_samples = []
+    for seed in (0, 1):
+        step_scheduler = copy.deepcopy(scheduler)
+        kwargs = {"generator": torch.Generator(sample.device).manual_seed(seed)} if accepts_generator else {}
+        model_input = _scale_model_inputs(step_scheduler, sample[None], timestep[None], 0)[0]
+        prev_samples.append(step_scheduler.step(model_input, timestep, sample, **kwargs).prev_sample)
+    return torch.equal(*prev_samples)
+
+
+@torch.no_grad()
+def picard_sample(
+    scheduler: SchedulerMixin,
+    model_fn: Callable[[torch.Tensor, torch.Tensor], torch.Tensor],
+    sample: torch.Tensor,
+    parallel: int = 8,
+    tolerance: float = 1e-3,
+) -> PicardSamplingOutput:
+    r"""
+    Samples with the denoising loop of a deterministic scheduler, parallelized over timesteps with Picard iterations
+    as in [Parallel Sampling of Diffusion Models](https://huggingface.co/papers/2305.16317).
+
+    Instead of evaluating the model on one timestep at a time, a sliding window of `parallel` timesteps is evaluated in
+    a single batched model call. Every iteration steps all the samples of the window with the scheduler and updates
+    them from the cumulative updates of the previous timesteps. The window slides past the timesteps whose sample
+    changed by less than `tolerance` since the previous iteration. This takes more model evaluations than sequential
+    sampling, but fewer sequential model calls, which lowers the latency when the hardware is not saturated by a single
+    model call.
+
+    Any scheduler with a deterministic `step`, like [`EulerDiscreteScheduler`], [`DPMSolverMultistepScheduler`] with
+    `algorithm_type="dpmsolver++"` or [`FlowMatchEulerDiscreteScheduler`], can be used. Stochastic schedulers, like
+    [`EulerAncestralDiscreteScheduler`] or the SDE variants of DPMSolver, raise an error, as the noise they draw at
+    every iteration would make the iterations converge to a wrong sample. The scheduler state at the
+    start of every window, like the model output history of multistep schedulers, is obtained by replaying the steps
+    of the converged timesteps on a copy of the scheduler, so `scheduler` itself is left unchanged.
+
+    Args:
+        scheduler (`SchedulerMixin`):
+            The scheduler, with its timesteps already set with `set_timesteps`.
+        model_fn (`Callable[[torch.Tensor, torch.Tensor], torch.Tensor]`):
+            A function that returns the model output for a batch of model inputs of shape
+            `(parallel * batch_size, ...)` and the timesteps of shape `(parallel * batch_size,)` they are evaluated
+            at. Classifier-free guidance can be applied inside this function.
+        sample (`torch.Tensor`):
+            The initial noisy sample of shape `(batch_size, ...)`, already scaled by the `init_noise_sigma` of the
+            scheduler if it has one.
+        parallel (`int`, defaults to 8):
+            The number of timesteps evaluated in every batched model call.
+        tolerance (`float`, defaults to 1e-3):
+            The convergence tolerance of the samples of the window, relative to their root mean square. Lower values
+            are closer to sequential sampling, higher values need fewer iterations.
+
+    Returns:
+        [`~schedulers.parallel_sampling.PicardSamplingOutput`]:
+            The denoised sample and the number of iterations and model evaluations that were needed.
+    """
+    timesteps = scheduler.timesteps
+    num_steps = len(timesteps)
+    parallel = min(parallel, num_steps)
+    batch_size = sample.shape[0]
+
+    # the sample before every timestep, followed by the final sample
+    samples = torch.stack([sample] * (num_steps + 1))
+
+    # the scheduler state at the beginning of the window
+    scheduler = copy.deepcopy(scheduler)
+    if hasattr(scheduler, "set_begin_index"):
+        scheduler.set_begin_index(0)
+    if not _is_deterministic(scheduler, sample):
+        raise ValueError(
+            f"Picard iterations need a deterministic scheduler, but the steps of {scheduler.__class__.__name__} with"
+            " this configuration add random noise."
+        )
+
+    begin_index, end_index = 0, parallel
+    num_iterations, num_model_evaluations = 0, 0
+    while begin_index < num_steps:
+        window_size = end_index - begin_index
+        window_samples = samples[begin_index:end_index].clone()
+        window_timesteps = timesteps[begin_index:end_index]
+
+        model_inputs = _scale_model_inputs(scheduler, window_samples, window_timesteps, begin_index)
+        model_timesteps = window_timesteps.repeat_interleave(batch_size)
+        model_output = model_fn(model_inputs.flatten(0, 1), model_timesteps)
+        model_output = model_output.reshape(window_size, batch_size, *model_output.shape[1:])
+        num_iterations += 1
+        num_model_evaluations += window_size
+
+        # the steps are sequential, as multistep schedulers need the model outputs of the previous timesteps
+        window_scheduler = copy.deepcopy(scheduler)
+        window_steps = torch.stack(
+            [
+                window_scheduler.step(model_output[i], window_timesteps[i], window_samples[i]).prev_sample
+                - window_samples[i]
+                for i in range(window_size)
+            ]
+        )
+        new_samples = samples[begin_index] + torch.cumsum(window_steps, dim=0).to(samples.dtype)
+
+        # relative change of every sample since the previous iteration, the largest one over the batch
+        error = (new_samples - samples[begin_index + 1 : end_index + 1]).flatten(2).float().square().mean(-1).sqrt()
+        scale = new_samples.flatten(2).float().square().mean(-1).sqrt().clamp(min=1e-6)
+        error = (error / scale).amax(dim=1)
+
+        # slide the window past the converged timesteps, at least past the first one whose sample is now exact
+        not_converged = (error > tolerance).tolist()
+        num_converged = not_converged.index(True) + 1 if True in not_converged else window_size
+
+        for i in range(num_converged):
+            scheduler.step(model_output[i], window_timesteps[i], window_samples[i])
+
+        samples[begin_index + 1 : end_index + 1] = new_samples
+        new_begin_index = begin_index + num_converged
+        new_end_index = min(new_begin_index + parallel, num_steps)
+        # the samples of the timesteps entering the window start from the last sample of the current window
+        samples[end_index + 1 : new_end_index + 1] = samples[end_index]
+        begin_index, end_index = new_begin_index, new_end_index
+
+    return PicardSamplingOutput(
+        sample=samples[-1], num_iterations=num_iterations, num_model_evaluations=num_model_evaluations
+    )
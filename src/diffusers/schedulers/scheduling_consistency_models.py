@@ -306,6 +306,41 @@ class CMStochasticIterativeScheduler(SchedulerMixin, ConfigMixin):
 
         return indices[pos].item()
 
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.indices_for_timesteps
+    def indices_for_timesteps(self, timesteps, schedule_timesteps=None):
+        """
+        Batched version of `index_for_timestep`, which looks up the indices of all the `timesteps` at once without
+        synchronizing with the device for every timestep.
+
+        Args:
+            timesteps (`torch.Tensor`):
+                A 1D tensor of timesteps from `schedule_timesteps`, in any order and possibly repeated.
+            schedule_timesteps (`torch.Tensor`, *optional*):
+                The timesteps of the schedule. Defaults to `self.timesteps`.
+
+        Returns:
+            `torch.LongTensor`:
+                The index of every timestep in `schedule_timesteps`.
+        """
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        # a stable sort keeps the repeated timesteps of the schedule in their order
+        # compared in the promoted dtype like `index_for_timestep`, so that float timesteps are not truncated to match
+        # an integer schedule
+        dtype = torch.promote_types(schedule_timesteps.dtype, timesteps.dtype)
+        sorted_timesteps, sorted_indices = torch.sort(schedule_timesteps.to(dtype), stable=True)
+        timesteps = timesteps.reshape(-1).to(dtype)
+        first = torch.searchsorted(sorted_timesteps, timesteps)
+        num_matches = torch.searchsorted(sorted_timesteps, timesteps, right=True) - first
+        if not num_matches.all():
+            raise ValueError(
+                f"`timesteps` {timesteps[num_matches == 0].tolist()} are not in the timesteps of the scheduler."
+            )
+
+        # Like `index_for_timestep`, take the second match of a timestep that is repeated in the schedule
+        return sorted_indices[first + (num_matches > 1).long()]
+
     # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._init_step_index
     def _init_step_index(self, timestep):
         if self.begin_index is None:
@@ -427,7 +462,7 @@ class CMStochasticIterativeScheduler(SchedulerMixin, ConfigMixin):
 
         # self.begin_index is None when scheduler is used for training, or pipeline does not implement set_begin_index
         if self.begin_index is None:
-            step_indices = [self.index_for_timestep(t, schedule_timesteps) for t in timesteps]
+            step_indices = self.indices_for_timesteps(timesteps, schedule_timesteps)
         elif self.step_index is not None:
             # add_noise is called after first denoising step (for inpainting)
             step_indices = [self.step_index] * timesteps.shape[0]
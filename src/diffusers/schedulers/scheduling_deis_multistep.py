@@ -23,7 +23,7 @@ import torch
 
 from ..configuration_utils import ConfigMixin, register_to_config
 from ..utils import deprecate, is_scipy_available
-from .scheduling_utils import KarrasDiffusionSchedulers, SchedulerMixin, SchedulerOutput
+from .scheduling_utils import KarrasDiffusionSchedulers, ModelOutputHistory, SchedulerMixin, SchedulerOutput
 
 
 if is_scipy_available():
@@ -201,11 +201,25 @@ class DEISMultistepScheduler(SchedulerMixin, ConfigMixin):
         self.num_inference_steps = None
         timesteps = np.linspace(0, num_train_timesteps - 1, num_train_timesteps, dtype=np.float32)[::-1].copy()
         self.timesteps = torch.from_numpy(timesteps)
-        self.model_outputs = [None] * solver_order
+        self._model_outputs = ModelOutputHistory(solver_order)
         self.lower_order_nums = 0
         self._step_index = None
         self._begin_index = None
         self.sigmas = self.sigmas.to("cpu")  # to avoid too much CPU/GPU communication
+        self.solver_coefficients = None
+
+    @property
+    def model_outputs(self):
+        """
+        The converted model outputs of the last `solver_order` steps, from the oldest to the most recent one. They are
+        stored in a preallocated [`~schedulers.scheduling_utils.ModelOutputHistory`] ring buffer, which returns copies
+        of its entries, and can be set from a list in which missing model outputs are `None`.
+        """
+        return self._model_outputs
+
+    @model_outputs.setter
+    def model_outputs(self, model_outputs):
+        self._model_outputs.set_entries(model_outputs)
 
     @property
     def step_index(self):
@@ -300,9 +314,7 @@ class DEISMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         self.num_inference_steps = len(timesteps)
 
-        self.model_outputs = [
-            None,
-        ] * self.config.solver_order
+        self.model_outputs.clear()
         self.lower_order_nums = 0
 
         # add an index counter for schedulers that allow duplicated timesteps
@@ -310,6 +322,56 @@ class DEISMultistepScheduler(SchedulerMixin, ConfigMixin):
         self._begin_index = None
         self.sigmas = self.sigmas.to("cpu")  # to avoid too much CPU/GPU communication
 
+        self.solver_coefficients = self._get_solver_coefficients()
+
+    def _get_solver_coefficients(self) -> torch.Tensor:
+        """
+        Precomputes the weights of the multistep updates for every step of the schedule.
+
+        Every update is a linear combination of the sample and the converted model outputs in `self.model_outputs`,
+        whose weights only depend on the sigmas. The update methods are evaluated once for all the steps, with the step
+        index set to all the step indices and each term set to a different basis vector, which yields the weights of
+        every term at every step.
+
+        Returns:
+            `torch.Tensor`:
+                The weights of shape `(solver_order, num_inference_steps, solver_order + 1)`, where `[order - 1, i]`
+                holds the weights of the sample and of the model outputs from the most recent one backwards for an
+                update of order `order` at step `i`.
+        """
+        num_terms = self.config.solver_order + 1
+        basis = torch.eye(num_terms, dtype=torch.float32)[:, :, None]
+        sample = basis[0]
+        # `model_output_list[-1]` is the most recent model output
+        model_output_list = [basis[i] for i in range(self.config.solver_order, 0, -1)]
+
+        # The update methods index `self.sigmas` with the step index, which gathers the sigmas of all the steps at once
+        self._step_index = torch.arange(len(self.timesteps))
+        coefficients = [self.deis_first_order_update(model_output_list[-1], sample=sample)]
+        if self.config.solver_order > 1:
+            coefficients.append(self.multistep_deis_second_order_update(model_output_list, sample=sample))
+        if self.config.solver_order > 2:
+            coefficients.append(self.multistep_deis_third_order_update(model_output_list, sample=sample))
+        self._step_index = None
+
+        return torch.stack(coefficients).to(torch.float32).transpose(1, 2)
+
+    # Copied from diffusers.schedulers.scheduling_dpmsolver_multistep.DPMSolverMultistepScheduler._solver_update
+    def _solver_update(self, order: int, sample: torch.Tensor, noise: Optional[torch.Tensor]) -> torch.Tensor:
+        if order > len(self.solver_coefficients):
+            raise NotImplementedError(
+                f"Solver order {order} is not implemented for `algorithm_type` {self.config.algorithm_type}."
+            )
+
+        # A single weighted sum of the sample, the model outputs and the noise with the precomputed weights
+        coefficients = self.solver_coefficients[order - 1, self.step_index]
+        prev_sample = coefficients[0] * sample
+        for coefficient, model_output in zip(coefficients[1 : order + 1], reversed(self._model_outputs.views())):
+            prev_sample = prev_sample + coefficient * model_output
+        if noise is not None:
+            prev_sample = prev_sample + coefficients[-1] * noise
+        return prev_sample
+
     # Copied from diffusers.schedulers.scheduling_ddpm.DDPMScheduler._threshold_sample
     def _threshold_sample(self, sample: torch.Tensor) -> torch.Tensor:
         """
@@ -754,6 +816,39 @@ class DEISMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         return step_index
 
+    # Copied from diffusers.schedulers.scheduling_dpmsolver_multistep.DPMSolverMultistepScheduler.indices_for_timesteps
+    def indices_for_timesteps(self, timesteps, schedule_timesteps=None):
+        """
+        Batched version of `index_for_timestep`, which looks up the indices of all the `timesteps` at once without
+        synchronizing with the device for every timestep.
+
+        Args:
+            timesteps (`torch.Tensor`):
+                A 1D tensor of timesteps, in any order and possibly repeated.
+            schedule_timesteps (`torch.Tensor`, *optional*):
+                The timesteps of the schedule. Defaults to `self.timesteps`.
+
+        Returns:
+            `torch.LongTensor`:
+                The index of every timestep in `schedule_timesteps`, or the last index for timesteps that are not in
+                the schedule.
+        """
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        # a stable sort keeps the repeated timesteps of the schedule in their order
+        # compared in the promoted dtype like `index_for_timestep`, so that float timesteps are not truncated to match
+        # an integer schedule
+        dtype = torch.promote_types(schedule_timesteps.dtype, timesteps.dtype)
+        sorted_timesteps, sorted_indices = torch.sort(schedule_timesteps.to(dtype), stable=True)
+        timesteps = timesteps.reshape(-1).to(dtype)
+        first = torch.searchsorted(sorted_timesteps, timesteps)
+        num_matches = torch.searchsorted(sorted_timesteps, timesteps, right=True) - first
+
+        # Like `index_for_timestep`, take the second match of a timestep that is repeated in the schedule
+        pos = (first + (num_matches > 1).long()).clamp(max=len(schedule_timesteps) - 1)
+        return torch.where(num_matches == 0, len(self.timesteps) - 1, sorted_indices[pos])
+
     # Copied from diffusers.schedulers.scheduling_dpmsolver_multistep.DPMSolverMultistepScheduler._init_step_index
     def _init_step_index(self, timestep):
         """
@@ -810,16 +905,15 @@ class DEISMultistepScheduler(SchedulerMixin, ConfigMixin):
         )
 
         model_output = self.convert_model_output(model_output, sample=sample)
-        for i in range(self.config.solver_order - 1):
-            self.model_outputs[i] = self.model_outputs[i + 1]
-        self.model_outputs[-1] = model_output
+        self.model_outputs.append(model_output)
 
         if self.config.solver_order == 1 or self.lower_order_nums < 1 or lower_order_final:
-            prev_sample = self.deis_first_order_update(model_output, sample=sample)
+            order = 1
         elif self.config.solver_order == 2 or self.lower_order_nums < 2 or lower_order_second:
-            prev_sample = self.multistep_deis_second_order_update(self.model_outputs, sample=sample)
+            order = 2
         else:
-            prev_sample = self.multistep_deis_third_order_update(self.model_outputs, sample=sample)
+            order = 3
+        prev_sample = self._solver_update(order, sample, noise=None)
 
         if self.lower_order_nums < self.config.solver_order:
             self.lower_order_nums += 1
@@ -866,7 +960,7 @@ class DEISMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         # begin_index is None when the scheduler is used for training or pipeline does not implement set_begin_index
         if self.begin_index is None:
-            step_indices = [self.index_for_timestep(t, schedule_timesteps) for t in timesteps]
+            step_indices = self.indices_for_timesteps(timesteps, schedule_timesteps)
         elif self.step_index is not None:
             # add_noise is called after first denoising step (for inpainting)
             step_indices = [self.step_index] * timesteps.shape[0]
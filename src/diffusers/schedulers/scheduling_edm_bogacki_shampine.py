@@ -0,0 +1,360 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple, Union
+
+import torch
+
+from ..configuration_utils import ConfigMixin, register_to_config
+from ..utils import BaseOutput, logging
+from .scheduling_utils import SchedulerMixin
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+# Bounds and safety factor of the step size update after every step, as commonly used for embedded Runge-Kutta pairs.
+MIN_STEP_SIZE_FACTOR = 0.2
+MAX_STEP_SIZE_FACTOR = 5.0
+STEP_SIZE_SAFETY_FACTOR = 0.9
+
+
+@dataclass
+# Copied from diffusers.schedulers.scheduling_ddpm.DDPMSchedulerOutput with DDPM->EDMBogackiShampine
+class EDMBogackiShampineSchedulerOutput(BaseOutput):
+    """
+    Output class for the scheduler's `step` function output.
+
+    Args:
+        prev_sample (`torch.Tensor` of shape `(batch_size, num_channels, height, width)` for images):
+            Computed sample `(x_{t-1})` of previous timestep. `prev_sample` should be used as next model input in the
+            denoising loop.
+        pred_original_sample (`torch.Tensor` of shape `(batch_size, num_channels, height, width)` for images):
+            The predicted denoised sample `(x_{0})` based on the model output from the current timestep.
+            `pred_original_sample` can be used to preview progress or for guidance.
+    """
+
+    prev_sample: torch.Tensor
+    pred_original_sample: Optional[torch.Tensor] = None
+
+
+class EDMBogackiShampineScheduler(SchedulerMixin, ConfigMixin):
+    """
+    Implements an adaptive step size solver of the probability flow ODE in the EDM formulation of Karras et al. 2022
+    [1], using the embedded Runge-Kutta pair of Bogacki and Shampine [2].
+
+    Instead of a fixed number of inference steps, every step solves the ODE in sigma with a third order method
+    and estimates its error with the embedded second order method. Steps whose error is above the tolerance given by
+    `rtol` and `atol` are retried with a smaller step size, and the size of the next step is adapted to the error of
+    the current one, so that model evaluations are spent where the trajectory is curved. An accepted step takes 3
+    model evaluations, as the last evaluation of a step is the first one of the next step.
+
+    The number of model evaluations is only known once the ODE is solved, so the scheduler is used with a loop that
+    runs until [`~EDMBogackiShampineScheduler.is_finished`] instead of a loop over `timesteps`:
+
+    ```py
+    scheduler.set_timesteps(device=device)
+    sample = noise * scheduler.init_noise_sigma
+    while not scheduler.is_finished:
+        model_input = scheduler.scale_model_input(sample, scheduler.timestep)
+        model_output = model(model_input, scheduler.timestep)
+        sample = scheduler.step(model_output, scheduler.timestep, sample).prev_sample
+    print(f"Used {scheduler.nfe} model evaluations.")
+    ```
+
+    [1] Karras, Tero, et al. "Elucidating the Design Space of Diffusion-Based Generative Models."
+    https://arxiv.org/abs/2206.00364
+
+    [2] Bogacki, Przemyslaw, and Lawrence F. Shampine. "A 3(2) pair of Runge-Kutta formulas." Applied Mathematics
+    Letters 2.4 (1989): 321-325.
+
+    This model inherits from [`SchedulerMixin`] and [`ConfigMixin`]. Check the superclass documentation for the generic
+    methods the library implements for all schedulers such as loading and saving.
+
+    Args:
+        sigma_min (`float`, *optional*, defaults to 0.002):
+            Minimum noise magnitude, where the ODE is solved to. This was set to 0.002 in the EDM paper [1]; a
+            reasonable range is [0, 10].
+        sigma_max (`float`, *optional*, defaults to 80.0):
+            Maximum noise magnitude, where the ODE is solved from. This was set to 80.0 in the EDM paper [1]; a
+            reasonable range is [0.2, 80.0].
+        sigma_data (`float`, *optional*, defaults to 0.5):
+            The standard deviation of the data distribution. This is set to 0.5 in the EDM paper [1].
+        num_train_timesteps (`int`, defaults to 1000):
+            The number of diffusion steps to train the model.
+        prediction_type (`str`, defaults to `epsilon`, *optional*):
+            Prediction type of the scheduler function; can be `epsilon` (predicts the noise of the diffusion process)
+            or `v_prediction` (see section 2.4 of [Imagen Video](https://imagen.research.google/video/paper.pdf)
+            paper).
+        rtol (`float`, defaults to 0.05):
+            The relative tolerance of the error of a step.
+        atol (`float`, defaults to 0.0078):
+            The absolute tolerance of the error of a step.
+        initial_step_size (`float`, defaults to 10.0):
+            The size of the first step, as a decrease of sigma.
+        final_sigmas_type (`str`, defaults to `"zero"`):
+            The final sample. If `"zero"`, the sample is denoised with the last model evaluation at `sigma_min`. If
+            `"sigma_min"`, the sample at `sigma_min` is returned.
+    """
+
+    _compatibles = []
+    order = 1
+
+    @register_to_config
+    def __init__(
+        self,
+        sigma_min: float = 0.002,
+        sigma_max: float = 80.0,
+        sigma_data: float = 0.5,
+        num_train_timesteps: int = 1000,
+        prediction_type: str = "epsilon",
+        rtol: float = 0.05,
+        atol: float = 0.0078,
+        initial_step_size: float = 10.0,
+        final_sigmas_type: str = "zero",
+    ):
+        if final_sigmas_type not in ["zero", "sigma_min"]:
+            raise ValueError(f"`final_sigmas_type` must be one of 'zero', or 'sigma_min', but got {final_sigmas_type}")
+
+        self.num_inference_steps = None
+        self.device = None
+        self._reset()
+
+    def _reset(self):
+        self.nfe = 0
+        self.num_accepted_steps = 0
+        self.num_rejected_steps = 0
+        self.is_finished = False
+
+        # the accepted sample, sigma and derivatives of the current step
+        self._sample = None
+        self._sigma = self.config.sigma_max
+        self._derivatives = []
+        self._step_size = -self.config.initial_step_size
+        self._is_last_step = False
+        # stage of the current step at which the model is evaluated next, 0 being the very first evaluation
+        self._stage = 0
+        self._stage_sigma = self._sigma
+
+    @property
+    def init_noise_sigma(self):
+        # standard deviation of the initial noise distribution
+        return (self.config.sigma_max**2 + 1) ** 0.5
+
+    @property
+    def sigma(self) -> float:
+        """
+        The noise level at which the model is evaluated next.
+        """
+        return self._stage_sigma
+
+    @property
+    def timestep(self) -> torch.Tensor:
+        """
+        The timestep at which the model is evaluated next.
+        """
+        return self.precondition_noise(self.sigma).to(self.device)
+
+    # Copied from diffusers.schedulers.scheduling_edm_euler.EDMEulerScheduler.precondition_inputs
+    def precondition_inputs(self, sample, sigma):
+        c_in = 1 / ((sigma**2 + self.config.sigma_data**2) ** 0.5)
+        scaled_sample = sample * c_in
+        return scaled_sample
+
+    # Copied from diffusers.schedulers.scheduling_edm_euler.EDMEulerScheduler.precondition_noise
+    def precondition_noise(self, sigma):
+        if not isinstance(sigma, torch.Tensor):
+            sigma = torch.tensor([sigma])
+
+        c_noise = 0.25 * torch.log(sigma)
+
+        return c_noise
+
+    # Copied from diffusers.schedulers.scheduling_edm_euler.EDMEulerScheduler.precondition_outputs
+    def precondition_outputs(self, sample, model_output, sigma):
+        sigma_data = self.config.sigma_data
+        c_skip = sigma_data**2 / (sigma**2 + sigma_data**2)
+
+        if self.config.prediction_type == "epsilon":
+            c_out = sigma * sigma_data / (sigma**2 + sigma_data**2) ** 0.5
+        elif self.config.prediction_type == "v_prediction":
+            c_out = -sigma * sigma_data / (sigma**2 + sigma_data**2) ** 0.5
+        else:
+            raise ValueError(f"Prediction type {self.config.prediction_type} is not supported.")
+
+        denoised = c_skip * sample + c_out * model_output
+
+        return denoised
+
+    def scale_model_input(
+        self, sample: torch.Tensor, timestep: Optional[Union[float, torch.Tensor]] = None
+    ) -> torch.Tensor:
+        """
+        Ensures interchangeability with schedulers that need to scale the denoising model input depending on the
+        current timestep. Scales the denoising model input by `(sigma**2 + sigma_data**2) ** 0.5`.
+
+        Args:
+            sample (`torch.Tensor`):
+                The input sample.
+            timestep (`float` or `torch.Tensor`, *optional*):
+                The current timestep in the diffusion chain. Unused, the sample is scaled with
+                [`~EDMBogackiShampineScheduler.sigma`].
+
+        Returns:
+            `torch.Tensor`:
+                A scaled input sample.
+        """
+        return self.precondition_inputs(sample, self.sigma)
+
+    def set_timesteps(self, num_inference_steps: Optional[int] = None, device: Union[str, torch.device] = None):
+        """
+        Resets the solver to the start of the ODE (to be run before inference).
+
+        Args:
+            num_inference_steps (`int`, *optional*):
+                An estimate of the number of steps, used to set the size of the first step instead of
+                `initial_step_size`. The actual number of steps is chosen by the solver.
+            device (`str` or `torch.device`, *optional*):
+                The device to which [`~EDMBogackiShampineScheduler.timestep`] is moved. If `None`, it is not moved.
+        """
+        self.num_inference_steps = num_inference_steps
+        self.device = device
+        self._reset()
+        if num_inference_steps is not None:
+            self._step_size = (self.config.sigma_min - self._sigma) / num_inference_steps
+
+    def _set_stage(self, stage: int):
+        sigma_end = self.config.sigma_min
+        if stage == 1:
+            # don't step past `sigma_min`, both the step size and the remaining decrease are negative
+            self._step_size = max(self._step_size, sigma_end - self._sigma)
+            self._is_last_step = self._step_size == sigma_end - self._sigma
+
+        offsets = {1: 1 / 2, 2: 3 / 4, 3: 1}
+        self._stage = stage
+        self._stage_sigma = self._sigma + offsets[stage] * self._step_size
+        if stage == 3 and self._is_last_step:
+            self._stage_sigma = sigma_end
+
+    def step(
+        self,
+        model_output: torch.Tensor,
+        timestep: Optional[Union[float, torch.Tensor]],
+        sample: torch.Tensor,
+        return_dict: bool = True,
+    ) -> Union[EDMBogackiShampineSchedulerOutput, Tuple]:
+        """
+        Propagates the sample with the Bogacki-Shampine method, given the model output at
+        [`~EDMBogackiShampineScheduler.sigma`]. The returned sample is the one the model has to be evaluated on next,
+        which is either a stage of the current step, the first stage of the next step or, once
+        [`~EDMBogackiShampineScheduler.is_finished`] is `True`, the final sample.
+
+        Args:
+            model_output (`torch.Tensor`):
+                The direct output from learned diffusion model.
+            timestep (`float` or `torch.Tensor`, *optional*):
+                The current timestep in the diffusion chain. Unused, the model output is expected at
+                [`~EDMBogackiShampineScheduler.sigma`].
+            sample (`torch.Tensor`):
+                A current instance of a sample created by the diffusion process.
+            return_dict (`bool`):
+                Whether or not to return a
+                [`~schedulers.scheduling_edm_bogacki_shampine.EDMBogackiShampineSchedulerOutput`] or tuple.
+
+        Returns:
+            [`~schedulers.scheduling_edm_bogacki_shampine.EDMBogackiShampineSchedulerOutput`] or `tuple`:
+                If return_dict is `True`,
+                [`~schedulers.scheduling_edm_bogacki_shampine.EDMBogackiShampineSchedulerOutput`] is returned,
+                otherwise a tuple is returned where the first element is the sample tensor.
+        """
+        if self.is_finished:
+            raise ValueError(
+                "The ODE has already been solved, you need to run 'set_timesteps' before solving it again."
+            )
+
+        # Upcast to avoid precision issues when computing prev_sample
+        sample = sample.to(torch.float32)
+
+        self.nfe += 1
+        # 1. compute predicted original sample (x_0) from sigma-scaled predicted noise
+        pred_original_sample = self.precondition_outputs(sample, model_output, self.sigma)
+        # 2. Convert to an ODE derivative
+        derivative = (sample - pred_original_sample) / self.sigma
+
+        if self._stage == 0:
+            self._sample = sample
+            self._derivatives = [derivative]
+            self._set_stage(1)
+        elif self._stage < 3:
+            self._derivatives.append(derivative)
+            self._set_stage(self._stage + 1)
+        else:
+            h = self._step_size
+            d1, d2, d3 = self._derivatives
+            # difference between the third order solution and the embedded second order solution
+            error = h * (-5 / 72 * d1 + 1 / 12 * d2 + 1 / 9 * d3 - 1 / 8 * derivative)
+            tolerance = self.config.atol + self.config.rtol * torch.maximum(self._sample.abs(), sample.abs())
+            error_norm = (error / tolerance).square().mean().sqrt().item()
+            if math.isnan(error_norm):
+                error_norm = math.inf
+
+            accepted = error_norm <= 1
+            if accepted:
+                self.num_accepted_steps += 1
+                self._sample = sample
+                self._sigma = self._stage_sigma
+                # the last evaluation of a step is the first one of the next step
+                self._derivatives = [derivative]
+                self.is_finished = self._is_last_step
+            else:
+                self.num_rejected_steps += 1
+                self._derivatives = [d1]
+
+            factor = STEP_SIZE_SAFETY_FACTOR * error_norm ** (-1 / 3) if error_norm > 0 else MAX_STEP_SIZE_FACTOR
+            factor = min(max(factor, MIN_STEP_SIZE_FACTOR), MAX_STEP_SIZE_FACTOR if accepted else 1.0)
+            self._step_size = h * factor
+
+            if self.is_finished:
+                prev_sample = pred_original_sample if self.config.final_sigmas_type == "zero" else sample
+                prev_sample = prev_sample.to(model_output.dtype)
+                if not return_dict:
+                    return (prev_sample, pred_original_sample)
+                return EDMBogackiShampineSchedulerOutput(
+                    prev_sample=prev_sample, pred_original_sample=pred_original_sample
+                )
+
+            self._set_stage(1)
+
+        # the sample of the stage the model is evaluated on next
+        h = self._step_size
+        d = self._derivatives
+        if self._stage == 1:
+            prev_sample = self._sample + h / 2 * d[0]
+        elif self._stage == 2:
+            prev_sample = self._sample + 3 * h / 4 * d[1]
+        else:
+            prev_sample = self._sample + h * (2 / 9 * d[0] + 1 / 3 * d[1] + 4 / 9 * d[2])
+
+        # Cast sample back to model compatible dtype
+        prev_sample = prev_sample.to(model_output.dtype)
+
+        if not return_dict:
+            return (prev_sample, pred_original_sample)
+
+        return EDMBogackiShampineSchedulerOutput(prev_sample=prev_sample, pred_original_sample=pred_original_sample)
+
+    def __len__(self):
+        return self.config.num_train_timesteps
@@ -22,7 +22,13 @@ import torch
 from ..configuration_utils import ConfigMixin, register_to_config
 from ..utils import BaseOutput, logging
 from ..utils.torch_utils import randn_tensor
-from .scheduling_utils import KarrasDiffusionSchedulers, SchedulerMixin
+from .scheduling_utils import (
+    KarrasDiffusionSchedulers,
+    SchedulerMixin,
+    StepOutputBuffers,
+    cache_schedule,
+    linear_combination_into,
+)
 
 
 logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
@@ -165,6 +171,7 @@ class EulerAncestralDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
     _compatibles = [e.name for e in KarrasDiffusionSchedulers]
     order = 1
+    _schedule_cache_attributes = ["timesteps", "sigmas", "num_inference_steps", "_step_index", "_begin_index"]
 
     @register_to_config
     def __init__(
@@ -217,6 +224,9 @@ class EulerAncestralDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self._begin_index = None
         self.sigmas = self.sigmas.to("cpu")  # to avoid too much CPU/GPU communication
 
+        self._fused = False
+        self._fused_step_buffers = StepOutputBuffers()
+
     @property
     def init_noise_sigma(self):
         # standard deviation of the initial noise distribution
@@ -250,6 +260,42 @@ class EulerAncestralDiscreteScheduler(SchedulerMixin, ConfigMixin):
         """
         self._begin_index = begin_index
 
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.enable_fused_step with EulerDiscrete->EulerAncestralDiscrete
+    def enable_fused_step(self):
+        """
+        Enables the fused step path, which lowers the memory traffic of [`~EulerAncestralDiscreteScheduler.step`] for
+        large latents, like the ones of video models. The step is computed as one linear combination of `sample` and
+        `model_output`, written into a preallocated buffer with one elementwise pass per term, instead of going
+        through a full-size intermediate tensor for every operation. `pred_original_sample` isn't computed and is
+        returned as `None`.
+
+        The buffer is reused by the next `step` call, which computes the step in place when it is passed the returned
+        `prev_sample`. Clone `prev_sample` to keep it across steps.
+        """
+        self._fused = True
+
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.disable_fused_step with EulerDiscrete->EulerAncestralDiscrete
+    def disable_fused_step(self):
+        """
+        Disables the fused step path enabled with [`~EulerAncestralDiscreteScheduler.enable_fused_step`].
+        """
+        self._fused = False
+        self._fused_step_buffers.clear()
+
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._get_derivative_coefficients
+    def _get_derivative_coefficients(self, sigma: float) -> Tuple[float, float]:
+        # The ODE derivative `(sample - pred_original_sample) / sigma` is `a * sample + b * model_output`
+        if self.config.prediction_type == "original_sample" or self.config.prediction_type == "sample":
+            return 1 / sigma, -1 / sigma
+        elif self.config.prediction_type == "epsilon":
+            return 0.0, 1.0
+        elif self.config.prediction_type == "v_prediction":
+            return sigma / (sigma**2 + 1), 1 / (sigma**2 + 1) ** 0.5
+        else:
+            raise ValueError(
+                f"prediction_type given as {self.config.prediction_type} must be one of `epsilon`, or `v_prediction`"
+            )
+
     def scale_model_input(self, sample: torch.Tensor, timestep: Union[float, torch.Tensor]) -> torch.Tensor:
         """
         Ensures interchangeability with schedulers that need to scale the denoising model input depending on the
@@ -274,6 +320,7 @@ class EulerAncestralDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self.is_scale_input_called = True
         return sample
 
+    @cache_schedule
     def set_timesteps(self, num_inference_steps: int, device: Union[str, torch.device] = None):
         """
         Sets the discrete timesteps used for the diffusion chain (to be run before inference).
@@ -333,6 +380,41 @@ class EulerAncestralDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         return indices[pos].item()
 
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.indices_for_timesteps
+    def indices_for_timesteps(self, timesteps, schedule_timesteps=None):
+        """
+        Batched version of `index_for_timestep`, which looks up the indices of all the `timesteps` at once without
+        synchronizing with the device for every timestep.
+
+        Args:
+            timesteps (`torch.Tensor`):
+                A 1D tensor of timesteps from `schedule_timesteps`, in any order and possibly repeated.
+            schedule_timesteps (`torch.Tensor`, *optional*):
+                The timesteps of the schedule. Defaults to `self.timesteps`.
+
+        Returns:
+            `torch.LongTensor`:
+                The index of every timestep in `schedule_timesteps`.
+        """
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        # a stable sort keeps the repeated timesteps of the schedule in their order
+        # compared in the promoted dtype like `index_for_timestep`, so that float timesteps are not truncated to match
+        # an integer schedule
+        dtype = torch.promote_types(schedule_timesteps.dtype, timesteps.dtype)
+        sorted_timesteps, sorted_indices = torch.sort(schedule_timesteps.to(dtype), stable=True)
+        timesteps = timesteps.reshape(-1).to(dtype)
+        first = torch.searchsorted(sorted_timesteps, timesteps)
+        num_matches = torch.searchsorted(sorted_timesteps, timesteps, right=True) - first
+        if not num_matches.all():
+            raise ValueError(
+                f"`timesteps` {timesteps[num_matches == 0].tolist()} are not in the timesteps of the scheduler."
+            )
+
+        # Like `index_for_timestep`, take the second match of a timestep that is repeated in the schedule
+        return sorted_indices[first + (num_matches > 1).long()]
+
     # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._init_step_index
     def _init_step_index(self, timestep):
         if self.begin_index is None:
@@ -393,6 +475,12 @@ class EulerAncestralDiscreteScheduler(SchedulerMixin, ConfigMixin):
         if self.step_index is None:
             self._init_step_index(timestep)
 
+        if self._fused:
+            prev_sample = self._fused_step(model_output, sample, generator)
+            if not return_dict:
+                return (prev_sample, None)
+            return EulerAncestralDiscreteSchedulerOutput(prev_sample=prev_sample, pred_original_sample=None)
+
         sigma = self.sigmas[self.step_index]
 
         # Upcast to avoid precision issues when computing prev_sample
@@ -444,6 +532,29 @@ class EulerAncestralDiscreteScheduler(SchedulerMixin, ConfigMixin):
             prev_sample=prev_sample, pred_original_sample=pred_original_sample
         )
 
+    def _fused_step(
+        self, model_output: torch.Tensor, sample: torch.Tensor, generator: Optional[torch.Generator]
+    ) -> torch.Tensor:
+        sigma_from = self.sigmas[self.step_index].item()
+        sigma_to = self.sigmas[self.step_index + 1].item()
+        sigma_up = (sigma_to**2 * (sigma_from**2 - sigma_to**2) / sigma_from**2) ** 0.5
+        sigma_down = (sigma_to**2 - sigma_up**2) ** 0.5
+        a, b = self._get_derivative_coefficients(sigma_from)
+        dt = sigma_down - sigma_from
+
+        noise = randn_tensor(
+            model_output.shape, dtype=model_output.dtype, device=model_output.device, generator=generator
+        )
+
+        # `prev_sample = sample + derivative * dt + noise * sigma_up`, expanded in the two terms of the derivative
+        prev_sample = self._fused_step_buffers.get(sample, model_output.dtype)
+        linear_combination_into(prev_sample, [(sample, 1 + a * dt), (model_output, b * dt), (noise, sigma_up)])
+
+        # upon completion increase step index by one
+        self._step_index += 1
+
+        return prev_sample
+
     # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.add_noise
     def add_noise(
         self,
@@ -463,7 +574,7 @@ class EulerAncestralDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         # self.begin_index is None when scheduler is used for training, or pipeline does not implement set_begin_index
         if self.begin_index is None:
-            step_indices = [self.index_for_timestep(t, schedule_timesteps) for t in timesteps]
+            step_indices = self.indices_for_timesteps(timesteps, schedule_timesteps)
         elif self.step_index is not None:
             # add_noise is called after first denoising step (for inpainting)
             step_indices = [self.step_index] * timesteps.shape[0]
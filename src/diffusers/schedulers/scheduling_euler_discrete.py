@@ -22,7 +22,13 @@ import torch
 from ..configuration_utils import ConfigMixin, register_to_config
 from ..utils import BaseOutput, is_scipy_available, logging
 from ..utils.torch_utils import randn_tensor
-from .scheduling_utils import KarrasDiffusionSchedulers, SchedulerMixin
+from .scheduling_utils import (
+    KarrasDiffusionSchedulers,
+    SchedulerMixin,
+    StepOutputBuffers,
+    cache_schedule,
+    linear_combination_into,
+)
 
 
 if is_scipy_available():
@@ -182,6 +188,16 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
     _compatibles = [e.name for e in KarrasDiffusionSchedulers]
     order = 1
+    _schedule_cache_attributes = [
+        "timesteps",
+        "sigmas",
+        "num_inference_steps",
+        "_step_index",
+        "_begin_index",
+        "_sync_free_input_scales",
+        "_sync_free_coefficients",
+    ]
+    _schedule_state_attributes = ["_sync_free"]
 
     @register_to_config
     def __init__(
@@ -258,6 +274,12 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self._begin_index = None
         self.sigmas = self.sigmas.to("cpu")  # to avoid too much CPU/GPU communication
 
+        self._sync_free = False
+        self._sync_free_input_scales = None
+        self._sync_free_coefficients = None
+        self._fused = False
+        self._fused_step_buffers = StepOutputBuffers()
+
     @property
     def init_noise_sigma(self):
         # standard deviation of the initial noise distribution
@@ -270,7 +292,8 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
     @property
     def step_index(self):
         """
-        The index counter for current timestep. It will increase 1 after each scheduler step.
+        The index counter for current timestep. It will increase 1 after each scheduler step. With the sync-free step
+        path enabled, it is a tensor of shape `(1,)` on the device of the timesteps.
         """
         return self._step_index
 
@@ -292,6 +315,90 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         """
         self._begin_index = begin_index
 
+    def enable_sync_free_step(self):
+        """
+        Enables the sync-free step path. The per-step coefficients of [`~EulerDiscreteScheduler.scale_model_input`]
+        and [`~EulerDiscreteScheduler.step`] are precomputed by `set_timesteps` on the device of the timesteps, and
+        the step index is kept as a tensor on that device. Neither method then reads a tensor value on the host, so
+        the denoising loop can be captured in a CUDA graph or compiled with `torch.compile` without graph breaks.
+
+        With the sync-free step path enabled, the denoising loop starts at `begin_index` (or at the first timestep if
+        it is not set) instead of at the timestep passed to the first `step` call, and `s_churn` is not supported.
+        """
+        self._sync_free = True
+        self._step_index = None
+        self._set_sync_free_tables()
+
+    def disable_sync_free_step(self):
+        """
+        Disables the sync-free step path enabled with [`~EulerDiscreteScheduler.enable_sync_free_step`].
+        """
+        self._sync_free = False
+        self._step_index = None
+        self._sync_free_input_scales = None
+        self._sync_free_coefficients = None
+
+    def _init_sync_free_step_index(self):
+        # The step index lives on the device so that it can be advanced without a host round trip
+        begin_index = self.begin_index if self.begin_index is not None else 0
+        self._step_index = torch.full((1,), begin_index, dtype=torch.long, device=self._sync_free_coefficients.device)
+
+    def _set_sync_free_tables(self):
+        sigmas = self.sigmas.to(device=self.timesteps.device, dtype=torch.float32)
+        sigma, sigma_next = sigmas[:-1], sigmas[1:]
+
+        # The predicted original sample is `c_skip * sample + c_out * model_output`
+        if self.config.prediction_type == "original_sample" or self.config.prediction_type == "sample":
+            c_skip, c_out = torch.zeros_like(sigma), torch.ones_like(sigma)
+        elif self.config.prediction_type == "epsilon":
+            c_skip, c_out = torch.ones_like(sigma), -sigma
+        elif self.config.prediction_type == "v_prediction":
+            c_skip, c_out = 1 / (sigma**2 + 1), -sigma / (sigma**2 + 1) ** 0.5
+        else:
+            raise ValueError(
+                f"prediction_type given as {self.config.prediction_type} must be one of `epsilon`, or `v_prediction`"
+            )
+
+        # `prev_sample = sample + (sample - pred_original_sample) / sigma * dt`, expanded in the same two terms
+        dt = sigma_next - sigma
+        self._sync_free_input_scales = (sigma**2 + 1) ** 0.5
+        self._sync_free_coefficients = torch.stack(
+            [c_skip, c_out, 1 + (1 - c_skip) * dt / sigma, -c_out * dt / sigma], dim=1
+        )
+
+    def enable_fused_step(self):
+        """
+        Enables the fused step path, which lowers the memory traffic of [`~EulerDiscreteScheduler.step`] for
+        large latents, like the ones of video models. The step is computed as one linear combination of `sample` and
+        `model_output`, written into a preallocated buffer with one elementwise pass per term, instead of going
+        through a full-size intermediate tensor for every operation. `pred_original_sample` isn't computed and is
+        returned as `None`.
+
+        The buffer is reused by the next `step` call, which computes the step in place when it is passed the returned
+        `prev_sample`. Clone `prev_sample` to keep it across steps.
+        """
+        self._fused = True
+
+    def disable_fused_step(self):
+        """
+        Disables the fused step path enabled with [`~EulerDiscreteScheduler.enable_fused_step`].
+        """
+        self._fused = False
+        self._fused_step_buffers.clear()
+
+    def _get_derivative_coefficients(self, sigma: float) -> Tuple[float, float]:
+        # The ODE derivative `(sample - pred_original_sample) / sigma` is `a * sample + b * model_output`
+        if self.config.prediction_type == "original_sample" or self.config.prediction_type == "sample":
+            return 1 / sigma, -1 / sigma
+        elif self.config.prediction_type == "epsilon":
+            return 0.0, 1.0
+        elif self.config.prediction_type == "v_prediction":
+            return sigma / (sigma**2 + 1), 1 / (sigma**2 + 1) ** 0.5
+        else:
+            raise ValueError(
+                f"prediction_type given as {self.config.prediction_type} must be one of `epsilon`, or `v_prediction`"
+            )
+
     def scale_model_input(self, sample: torch.Tensor, timestep: Union[float, torch.Tensor]) -> torch.Tensor:
         """
         Ensures interchangeability with schedulers that need to scale the denoising model input depending on the
@@ -308,7 +415,15 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
                 A scaled input sample.
         """
         if self.step_index is None:
-            self._init_step_index(timestep)
+            if self._sync_free:
+                self._init_sync_free_step_index()
+            else:
+                self._init_step_index(timestep)
+
+        if self._sync_free:
+            sample = sample / self._sync_free_input_scales.index_select(0, self._step_index)[0]
+            self.is_scale_input_called = True
+            return sample
 
         sigma = self.sigmas[self.step_index]
         sample = sample / ((sigma**2 + 1) ** 0.5)
@@ -316,6 +431,7 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self.is_scale_input_called = True
         return sample
 
+    @cache_schedule
     def set_timesteps(
         self,
         num_inference_steps: int = None,
@@ -449,6 +565,9 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self._begin_index = None
         self.sigmas = sigmas.to("cpu")  # to avoid too much CPU/GPU communication
 
+        if self._sync_free:
+            self._set_sync_free_tables()
+
     def _sigma_to_t(self, sigma, log_sigmas):
         # get log sigma
         log_sigma = np.log(np.maximum(sigma, 1e-10))
@@ -565,6 +684,40 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         return indices[pos].item()
 
+    def indices_for_timesteps(self, timesteps, schedule_timesteps=None):
+        """
+        Batched version of `index_for_timestep`, which looks up the indices of all the `timesteps` at once without
+        synchronizing with the device for every timestep.
+
+        Args:
+            timesteps (`torch.Tensor`):
+                A 1D tensor of timesteps from `schedule_timesteps`, in any order and possibly repeated.
+            schedule_timesteps (`torch.Tensor`, *optional*):
+                The timesteps of the schedule. Defaults to `self.timesteps`.
+
+        Returns:
+            `torch.LongTensor`:
+                The index of every timestep in `schedule_timesteps`.
+        """
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        # a stable sort keeps the repeated timesteps of the schedule in their order
+        # compared in the promoted dtype like `index_for_timestep`, so that float timesteps are not truncated to match
+        # an integer schedule
+        dtype = torch.promote_types(schedule_timesteps.dtype, timesteps.dtype)
+        sorted_timesteps, sorted_indices = torch.sort(schedule_timesteps.to(dtype), stable=True)
+        timesteps = timesteps.reshape(-1).to(dtype)
+        first = torch.searchsorted(sorted_timesteps, timesteps)
+        num_matches = torch.searchsorted(sorted_timesteps, timesteps, right=True) - first
+        if not num_matches.all():
+            raise ValueError(
+                f"`timesteps` {timesteps[num_matches == 0].tolist()} are not in the timesteps of the scheduler."
+            )
+
+        # Like `index_for_timestep`, take the second match of a timestep that is repeated in the schedule
+        return sorted_indices[first + (num_matches > 1).long()]
+
     def _init_step_index(self, timestep):
         if self.begin_index is None:
             if isinstance(timestep, torch.Tensor):
@@ -629,7 +782,24 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
             )
 
         if self.step_index is None:
-            self._init_step_index(timestep)
+            if self._sync_free:
+                self._init_sync_free_step_index()
+            else:
+                self._init_step_index(timestep)
+
+        if self._sync_free:
+            if s_churn > 0:
+                raise ValueError("`s_churn` is not supported when the sync-free step path is enabled.")
+            prev_sample, pred_original_sample = self._sync_free_step(model_output, sample)
+            if not return_dict:
+                return (prev_sample, pred_original_sample)
+            return EulerDiscreteSchedulerOutput(prev_sample=prev_sample, pred_original_sample=pred_original_sample)
+
+        if self._fused and s_churn == 0:
+            prev_sample = self._fused_step(model_output, sample)
+            if not return_dict:
+                return (prev_sample, None)
+            return EulerDiscreteSchedulerOutput(prev_sample=prev_sample, pred_original_sample=None)
 
         # Upcast to avoid precision issues when computing prev_sample
         sample = sample.to(torch.float32)
@@ -683,6 +853,153 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         return EulerDiscreteSchedulerOutput(prev_sample=prev_sample, pred_original_sample=pred_original_sample)
 
+    def _sync_free_step(self, model_output: torch.Tensor, sample: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        c_skip, c_out, c_sample, c_model_output = self._sync_free_coefficients.index_select(0, self._step_index)[0]
+
+        # Upcast to avoid precision issues when computing prev_sample
+        sample = sample.to(torch.float32)
+        pred_original_sample = c_skip * sample + c_out * model_output
+        prev_sample = c_sample * sample + c_model_output * model_output
+
+        # Cast sample back to model compatible dtype
+        prev_sample = prev_sample.to(model_output.dtype)
+
+        # upon completion increase step index by one, in place so that the same tensor can be captured
+        self._step_index.add_(1)
+
+        return prev_sample, pred_original_sample
+
+    def _fused_step(self, model_output: torch.Tensor, sample: torch.Tensor) -> torch.Tensor:
+        sigma = self.sigmas[self.step_index].item()
+        sigma_next = self.sigmas[self.step_index + 1].item()
+        a, b = self._get_derivative_coefficients(sigma)
+        dt = sigma_next - sigma
+
+        # `prev_sample = sample + derivative * dt`, expanded in the two terms of the derivative
+        prev_sample = self._fused_step_buffers.get(sample, model_output.dtype)
+        linear_combination_into(prev_sample, [(sample, 1 + a * dt), (model_output, b * dt)])
+
+        # upon completion increase step index by one
+        self._step_index += 1
+
+        return prev_sample
+
+    def _get_batch_sigmas(
+        self, step_indices: torch.Tensor, sigmas: Optional[torch.Tensor], sample: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Gathers the current and next sigma of every sample in a batch, shaped to broadcast against `sample`.
+        """
+        if step_indices.ndim != 1 or step_indices.shape[0] != sample.shape[0]:
+            raise ValueError(
+                f"`step_indices` must have shape ({sample.shape[0]},) to match the batch size of `sample`, but got"
+                f" {tuple(step_indices.shape)}."
+            )
+
+        sigmas = self.sigmas if sigmas is None else sigmas
+        sigmas = sigmas.to(device=sample.device, dtype=torch.float32)
+        step_indices = step_indices.to(device=sample.device, dtype=torch.long)[:, None]
+        if sigmas.ndim == 1:
+            sigmas = sigmas.expand(sample.shape[0], -1)
+
+        shape = (sample.shape[0],) + (1,) * (sample.ndim - 1)
+        sigma = sigmas.gather(1, step_indices).view(shape)
+        sigma_next = sigmas.gather(1, step_indices + 1).view(shape)
+        return sigma, sigma_next
+
+    def batch_scale_model_input(
+        self, sample: torch.Tensor, step_indices: torch.Tensor, sigmas: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        """
+        Batched version of [`~EulerDiscreteScheduler.scale_model_input`] where every sample of the batch can be at a
+        different step of its own noise schedule.
+
+        Args:
+            sample (`torch.Tensor`):
+                The input sample.
+            step_indices (`torch.Tensor`):
+                The index of the current step of every sample in the batch, of shape `(batch_size,)`.
+            sigmas (`torch.Tensor`, *optional*):
+                The noise schedule of every sample in the batch, of shape `(batch_size, num_sigmas)`, or a single
+                schedule of shape `(num_sigmas,)` shared by all samples. Schedules of different lengths can be padded
+                at the end, as only the sigmas up to `step_indices + 1` are read. Defaults to `self.sigmas`.
+
+        Returns:
+            `torch.Tensor`:
+                A scaled input sample.
+        """
+        sigma, _ = self._get_batch_sigmas(step_indices, sigmas, sample)
+        sample = sample / ((sigma**2 + 1) ** 0.5).to(sample.dtype)
+
+        self.is_scale_input_called = True
+        return sample
+
+    def batch_step(
+        self,
+        model_output: torch.Tensor,
+        sample: torch.Tensor,
+        step_indices: torch.Tensor,
+        sigmas: Optional[torch.Tensor] = None,
+        return_dict: bool = True,
+    ) -> Union[EulerDiscreteSchedulerOutput, Tuple]:
+        """
+        Batched version of [`~EulerDiscreteScheduler.step`] where every sample of the batch can be at a different step
+        of its own noise schedule, for example to denoise requests with different numbers of inference steps or
+        image-to-image strengths together. Unlike `step`, this does not read or advance the `step_index` of the
+        scheduler and does not support `s_churn`.
+
+        Args:
+            model_output (`torch.Tensor`):
+                The direct output from learned diffusion model.
+            sample (`torch.Tensor`):
+                A current instance of a sample created by the diffusion process.
+            step_indices (`torch.Tensor`):
+                The index of the current step of every sample in the batch, of shape `(batch_size,)`.
+            sigmas (`torch.Tensor`, *optional*):
+                The noise schedule of every sample in the batch, of shape `(batch_size, num_sigmas)`, or a single
+                schedule of shape `(num_sigmas,)` shared by all samples. Schedules of different lengths can be padded
+                at the end, as only the sigmas up to `step_indices + 1` are read. Defaults to `self.sigmas`.
+            return_dict (`bool`):
+                Whether or not to return a [`~schedulers.scheduling_euler_discrete.EulerDiscreteSchedulerOutput`] or
+                tuple.
+
+        Returns:
+            [`~schedulers.scheduling_euler_discrete.EulerDiscreteSchedulerOutput`] or `tuple`:
+                If return_dict is `True`, [`~schedulers.scheduling_euler_discrete.EulerDiscreteSchedulerOutput`] is
+                returned, otherwise a tuple is returned where the first element is the sample tensor.
+        """
+        sigma, sigma_next = self._get_batch_sigmas(step_indices, sigmas, sample)
+
+        # Upcast to avoid precision issues when computing prev_sample
+        sample = sample.to(torch.float32)
+
+        # 1. compute predicted original sample (x_0) from sigma-scaled predicted noise
+        if self.config.prediction_type == "original_sample" or self.config.prediction_type == "sample":
+            pred_original_sample = model_output
+        elif self.config.prediction_type == "epsilon":
+            pred_original_sample = sample - sigma * model_output
+        elif self.config.prediction_type == "v_prediction":
+            pred_original_sample = model_output * (-sigma / (sigma**2 + 1) ** 0.5) + (sample / (sigma**2 + 1))
+        else:
+            raise ValueError(
+                f"prediction_type given as {self.config.prediction_type} must be one of `epsilon`, or `v_prediction`"
+            )
+
+        # 2. Convert to an ODE derivative
+        derivative = (sample - pred_original_sample) / sigma
+        prev_sample = sample + derivative * (sigma_next - sigma)
+
+        # Cast sample back to model compatible dtype
+        prev_sample = prev_sample.to(model_output.dtype)
+
+        if not return_dict:
+            return (
+                prev_sample,
+                pred_original_sample,
+            )
+
+        return EulerDiscreteSchedulerOutput(prev_sample=prev_sample, pred_original_sample=pred_original_sample)
+
     def add_noise(
         self,
         original_samples: torch.Tensor,
@@ -701,7 +1018,7 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         # self.begin_index is None when scheduler is used for training, or pipeline does not implement set_begin_index
         if self.begin_index is None:
-            step_indices = [self.index_for_timestep(t, schedule_timesteps) for t in timesteps]
+            step_indices = self.indices_for_timesteps(timesteps, schedule_timesteps)
         elif self.step_index is not None:
             # add_noise is called after first denoising step (for inpainting)
             step_indices = [self.step_index] * timesteps.shape[0]
@@ -738,7 +1055,7 @@ class EulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
             schedule_timesteps = self.timesteps.to(sample.device)
             timesteps = timesteps.to(sample.device)
 
-        step_indices = [self.index_for_timestep(t, schedule_timesteps) for t in timesteps]
+        step_indices = self.indices_for_timesteps(timesteps, schedule_timesteps)
         alphas_cumprod = self.alphas_cumprod.to(sample)
         sqrt_alpha_prod = alphas_cumprod[step_indices] ** 0.5
         sqrt_alpha_prod = sqrt_alpha_prod.flatten()
@@ -21,7 +21,7 @@ import torch
 
 from ..configuration_utils import ConfigMixin, register_to_config
 from ..utils import BaseOutput, is_scipy_available, logging
-from .scheduling_utils import SchedulerMixin
+from .scheduling_utils import SchedulerMixin, cache_schedule
 
 
 if is_scipy_available():
@@ -63,6 +63,15 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
     _compatibles = []
     order = 1
+    _schedule_cache_attributes = [
+        "timesteps",
+        "sigmas",
+        "num_inference_steps",
+        "_step_index",
+        "_begin_index",
+        "_sync_free_coefficients",
+    ]
+    _schedule_state_attributes = ["_sync_free", "_shift"]
 
     @register_to_config
     def __init__(
@@ -105,6 +114,9 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self.sigma_min = self.sigmas[-1].item()
         self.sigma_max = self.sigmas[0].item()
 
+        self._sync_free = False
+        self._sync_free_coefficients = None
+
     @property
     def shift(self):
         """
@@ -115,7 +127,8 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
     @property
     def step_index(self):
         """
-        The index counter for current timestep. It will increase 1 after each scheduler step.
+        The index counter for current timestep. It will increase 1 after each scheduler step. With the sync-free step
+        path enabled, it is a tensor of shape `(1,)` on the device of the timesteps.
         """
         return self._step_index
 
@@ -140,6 +153,38 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
     def set_shift(self, shift: float):
         self._shift = shift
 
+    def enable_sync_free_step(self):
+        """
+        Enables the sync-free step path. The step sizes of [`~FlowMatchEulerDiscreteScheduler.step`] are precomputed
+        by `set_timesteps` on the device of the timesteps, and the step index is kept as a tensor on that device. The
+        step then never reads a tensor value on the host, so the denoising loop can be captured in a CUDA graph or
+        compiled with `torch.compile` without graph breaks.
+
+        With the sync-free step path enabled, the denoising loop starts at `begin_index` (or at the first timestep if
+        it is not set) instead of at the timestep passed to the first `step` call.
+        """
+        self._sync_free = True
+        self._step_index = None
+        self._set_sync_free_tables()
+
+    def disable_sync_free_step(self):
+        """
+        Disables the sync-free step path enabled with [`~FlowMatchEulerDiscreteScheduler.enable_sync_free_step`].
+        """
+        self._sync_free = False
+        self._step_index = None
+        self._sync_free_coefficients = None
+
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._init_sync_free_step_index
+    def _init_sync_free_step_index(self):
+        # The step index lives on the device so that it can be advanced without a host round trip
+        begin_index = self.begin_index if self.begin_index is not None else 0
+        self._step_index = torch.full((1,), begin_index, dtype=torch.long, device=self._sync_free_coefficients.device)
+
+    def _set_sync_free_tables(self):
+        sigmas = self.sigmas.to(device=self.timesteps.device, dtype=torch.float32)
+        self._sync_free_coefficients = sigmas[1:] - sigmas[:-1]
+
     def scale_noise(
         self,
         sample: torch.FloatTensor,
@@ -172,7 +217,7 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         # self.begin_index is None when scheduler is used for training, or pipeline does not implement set_begin_index
         if self.begin_index is None:
-            step_indices = [self.index_for_timestep(t, schedule_timesteps) for t in timestep]
+            step_indices = self.indices_for_timesteps(timestep, schedule_timesteps)
         elif self.step_index is not None:
             # add_noise is called after first denoising step (for inpainting)
             step_indices = [self.step_index] * timestep.shape[0]
@@ -215,6 +260,7 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         stretched_t = 1 - (one_minus_z / scale_factor)
         return stretched_t
 
+    @cache_schedule
     def set_timesteps(
         self,
         num_inference_steps: int = None,
@@ -277,6 +323,9 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self._step_index = None
         self._begin_index = None
 
+        if self._sync_free:
+            self._set_sync_free_tables()
+
     def index_for_timestep(self, timestep, schedule_timesteps=None):
         if schedule_timesteps is None:
             schedule_timesteps = self.timesteps
@@ -291,6 +340,41 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         return indices[pos].item()
 
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.indices_for_timesteps
+    def indices_for_timesteps(self, timesteps, schedule_timesteps=None):
+        """
+        Batched version of `index_for_timestep`, which looks up the indices of all the `timesteps` at once without
+        synchronizing with the device for every timestep.
+
+        Args:
+            timesteps (`torch.Tensor`):
+                A 1D tensor of timesteps from `schedule_timesteps`, in any order and possibly repeated.
+            schedule_timesteps (`torch.Tensor`, *optional*):
+                The timesteps of the schedule. Defaults to `self.timesteps`.
+
+        Returns:
+            `torch.LongTensor`:
+                The index of every timestep in `schedule_timesteps`.
+        """
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        # a stable sort keeps the repeated timesteps of the schedule in their order
+        # compared in the promoted dtype like `index_for_timestep`, so that float timesteps are not truncated to match
+        # an integer schedule
+        dtype = torch.promote_types(schedule_timesteps.dtype, timesteps.dtype)
+        sorted_timesteps, sorted_indices = torch.sort(schedule_timesteps.to(dtype), stable=True)
+        timesteps = timesteps.reshape(-1).to(dtype)
+        first = torch.searchsorted(sorted_timesteps, timesteps)
+        num_matches = torch.searchsorted(sorted_timesteps, timesteps, right=True) - first
+        if not num_matches.all():
+            raise ValueError(
+                f"`timesteps` {timesteps[num_matches == 0].tolist()} are not in the timesteps of the scheduler."
+            )
+
+        # Like `index_for_timestep`, take the second match of a timestep that is repeated in the schedule
+        return sorted_indices[first + (num_matches > 1).long()]
+
     def _init_step_index(self, timestep):
         if self.begin_index is None:
             if isinstance(timestep, torch.Tensor):
@@ -353,15 +437,22 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
             )
 
         if self.step_index is None:
-            self._init_step_index(timestep)
+            if self._sync_free:
+                self._init_sync_free_step_index()
+            else:
+                self._init_step_index(timestep)
 
         # Upcast to avoid precision issues when computing prev_sample
         sample = sample.to(torch.float32)
 
-        sigma = self.sigmas[self.step_index]
-        sigma_next = self.sigmas[self.step_index + 1]
+        if self._sync_free:
+            dt = self._sync_free_coefficients.index_select(0, self._step_index)[0]
+            prev_sample = sample + dt * model_output
+        else:
+            sigma = self.sigmas[self.step_index]
+            sigma_next = self.sigmas[self.step_index + 1]
 
-        prev_sample = sample + (sigma_next - sigma) * model_output
+            prev_sample = sample + (sigma_next - sigma) * model_output
 
         # Cast sample back to model compatible dtype
         prev_sample = prev_sample.to(model_output.dtype)
@@ -374,6 +465,80 @@ class FlowMatchEulerDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         return FlowMatchEulerDiscreteSchedulerOutput(prev_sample=prev_sample)
 
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._get_batch_sigmas
+    def _get_batch_sigmas(
+        self, step_indices: torch.Tensor, sigmas: Optional[torch.Tensor], sample: torch.Tensor
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Gathers the current and next sigma of every sample in a batch, shaped to broadcast against `sample`.
+        """
+        if step_indices.ndim != 1 or step_indices.shape[0] != sample.shape[0]:
+            raise ValueError(
+                f"`step_indices` must have shape ({sample.shape[0]},) to match the batch size of `sample`, but got"
+                f" {tuple(step_indices.shape)}."
+            )
+
+        sigmas = self.sigmas if sigmas is None else sigmas
+        sigmas = sigmas.to(device=sample.device, dtype=torch.float32)
+        step_indices = step_indices.to(device=sample.device, dtype=torch.long)[:, None]
+        if sigmas.ndim == 1:
+            sigmas = sigmas.expand(sample.shape[0], -1)
+
+        shape = (sample.shape[0],) + (1,) * (sample.ndim - 1)
+        sigma = sigmas.gather(1, step_indices).view(shape)
+        sigma_next = sigmas.gather(1, step_indices + 1).view(shape)
+        return sigma, sigma_next
+
+    def batch_step(
+        self,
+        model_output: torch.FloatTensor,
+        sample: torch.FloatTensor,
+        step_indices: torch.Tensor,
+        sigmas: Optional[torch.Tensor] = None,
+        return_dict: bool = True,
+    ) -> Union[FlowMatchEulerDiscreteSchedulerOutput, Tuple]:
+        """
+        Batched version of [`~FlowMatchEulerDiscreteScheduler.step`] where every sample of the batch can be at a
+        different step of its own noise schedule, for example to denoise requests with different numbers of inference
+        steps or image-to-image strengths together. Unlike `step`, this does not read or advance the `step_index` of
+        the scheduler.
+
+        Args:
+            model_output (`torch.FloatTensor`):
+                The direct output from learned diffusion model.
+            sample (`torch.FloatTensor`):
+                A current instance of a sample created by the diffusion process.
+            step_indices (`torch.Tensor`):
+                The index of the current step of every sample in the batch, of shape `(batch_size,)`.
+            sigmas (`torch.Tensor`, *optional*):
+                The noise schedule of every sample in the batch, of shape `(batch_size, num_sigmas)`, or a single
+                schedule of shape `(num_sigmas,)` shared by all samples. Schedules of different lengths can be padded
+                at the end, as only the sigmas up to `step_indices + 1` are read. Defaults to `self.sigmas`.
+            return_dict (`bool`):
+                Whether or not to return a
+                [`~schedulers.scheduling_flow_match_euler_discrete.FlowMatchEulerDiscreteSchedulerOutput`] or tuple.
+
+        Returns:
+            [`~schedulers.scheduling_flow_match_euler_discrete.FlowMatchEulerDiscreteSchedulerOutput`] or `tuple`:
+                If return_dict is `True`,
+                [`~schedulers.scheduling_flow_match_euler_discrete.FlowMatchEulerDiscreteSchedulerOutput`] is returned,
+                otherwise a tuple is returned where the first element is the sample tensor.
+        """
+        sigma, sigma_next = self._get_batch_sigmas(step_indices, sigmas, sample)
+
+        # Upcast to avoid precision issues when computing prev_sample
+        sample = sample.to(torch.float32)
+
+        prev_sample = sample + (sigma_next - sigma) * model_output
+
+        # Cast sample back to model compatible dtype
+        prev_sample = prev_sample.to(model_output.dtype)
+
+        if not return_dict:
+            return (prev_sample,)
+
+        return FlowMatchEulerDiscreteSchedulerOutput(prev_sample=prev_sample)
+
     # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._convert_to_karras
     def _convert_to_karras(self, in_sigmas: torch.Tensor, num_inference_steps) -> torch.Tensor:
         """Constructs the noise schedule of Karras et al. (2022)."""
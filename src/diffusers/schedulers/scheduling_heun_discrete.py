@@ -21,7 +21,12 @@ import torch
 
 from ..configuration_utils import ConfigMixin, register_to_config
 from ..utils import BaseOutput, is_scipy_available
-from .scheduling_utils import KarrasDiffusionSchedulers, SchedulerMixin
+from .scheduling_utils import (
+    KarrasDiffusionSchedulers,
+    SchedulerMixin,
+    StepOutputBuffers,
+    linear_combination_into,
+)
 
 
 if is_scipy_available():
@@ -186,6 +191,9 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
         self._begin_index = None
         self.sigmas = self.sigmas.to("cpu")  # to avoid too much CPU/GPU communication
 
+        self._fused = False
+        self._fused_step_buffers = StepOutputBuffers(num_buffers=2)
+
     # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.index_for_timestep
     def index_for_timestep(self, timestep, schedule_timesteps=None):
         if schedule_timesteps is None:
@@ -201,6 +209,41 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         return indices[pos].item()
 
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.indices_for_timesteps
+    def indices_for_timesteps(self, timesteps, schedule_timesteps=None):
+        """
+        Batched version of `index_for_timestep`, which looks up the indices of all the `timesteps` at once without
+        synchronizing with the device for every timestep.
+
+        Args:
+            timesteps (`torch.Tensor`):
+                A 1D tensor of timesteps from `schedule_timesteps`, in any order and possibly repeated.
+            schedule_timesteps (`torch.Tensor`, *optional*):
+                The timesteps of the schedule. Defaults to `self.timesteps`.
+
+        Returns:
+            `torch.LongTensor`:
+                The index of every timestep in `schedule_timesteps`.
+        """
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        # a stable sort keeps the repeated timesteps of the schedule in their order
+        # compared in the promoted dtype like `index_for_timestep`, so that float timesteps are not truncated to match
+        # an integer schedule
+        dtype = torch.promote_types(schedule_timesteps.dtype, timesteps.dtype)
+        sorted_timesteps, sorted_indices = torch.sort(schedule_timesteps.to(dtype), stable=True)
+        timesteps = timesteps.reshape(-1).to(dtype)
+        first = torch.searchsorted(sorted_timesteps, timesteps)
+        num_matches = torch.searchsorted(sorted_timesteps, timesteps, right=True) - first
+        if not num_matches.all():
+            raise ValueError(
+                f"`timesteps` {timesteps[num_matches == 0].tolist()} are not in the timesteps of the scheduler."
+            )
+
+        # Like `index_for_timestep`, take the second match of a timestep that is repeated in the schedule
+        return sorted_indices[first + (num_matches > 1).long()]
+
     @property
     def init_noise_sigma(self):
         # standard deviation of the initial noise distribution
@@ -234,6 +277,42 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
         """
         self._begin_index = begin_index
 
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.enable_fused_step with EulerDiscrete->HeunDiscrete
+    def enable_fused_step(self):
+        """
+        Enables the fused step path, which lowers the memory traffic of [`~HeunDiscreteScheduler.step`] for
+        large latents, like the ones of video models. The step is computed as one linear combination of `sample` and
+        `model_output`, written into a preallocated buffer with one elementwise pass per term, instead of going
+        through a full-size intermediate tensor for every operation. `pred_original_sample` isn't computed and is
+        returned as `None`.
+
+        The buffer is reused by the next `step` call, which computes the step in place when it is passed the returned
+        `prev_sample`. Clone `prev_sample` to keep it across steps.
+        """
+        self._fused = True
+
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.disable_fused_step with EulerDiscrete->HeunDiscrete
+    def disable_fused_step(self):
+        """
+        Disables the fused step path enabled with [`~HeunDiscreteScheduler.enable_fused_step`].
+        """
+        self._fused = False
+        self._fused_step_buffers.clear()
+
+    # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._get_derivative_coefficients
+    def _get_derivative_coefficients(self, sigma: float) -> Tuple[float, float]:
+        # The ODE derivative `(sample - pred_original_sample) / sigma` is `a * sample + b * model_output`
+        if self.config.prediction_type == "original_sample" or self.config.prediction_type == "sample":
+            return 1 / sigma, -1 / sigma
+        elif self.config.prediction_type == "epsilon":
+            return 0.0, 1.0
+        elif self.config.prediction_type == "v_prediction":
+            return sigma / (sigma**2 + 1), 1 / (sigma**2 + 1) ** 0.5
+        else:
+            raise ValueError(
+                f"prediction_type given as {self.config.prediction_type} must be one of `epsilon`, or `v_prediction`"
+            )
+
     def scale_model_input(
         self,
         sample: torch.Tensor,
@@ -499,6 +578,12 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
         if self.step_index is None:
             self._init_step_index(timestep)
 
+        if self._fused and not self.config.clip_sample:
+            prev_sample = self._fused_step(model_output, sample)
+            if not return_dict:
+                return (prev_sample, None)
+            return HeunDiscreteSchedulerOutput(prev_sample=prev_sample, pred_original_sample=None)
+
         if self.state_in_first_order:
             sigma = self.sigmas[self.step_index]
             sigma_next = self.sigmas[self.step_index + 1]
@@ -572,6 +657,53 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         return HeunDiscreteSchedulerOutput(prev_sample=prev_sample, pred_original_sample=pred_original_sample)
 
+    def _fused_step(self, model_output: torch.Tensor, sample: torch.Tensor) -> torch.Tensor:
+        dtype = torch.promote_types(sample.dtype, model_output.dtype)
+
+        if self.state_in_first_order:
+            sigma = self.sigmas[self.step_index].item()
+            sigma_next = self.sigmas[self.step_index + 1].item()
+            a, b = self._get_derivative_coefficients(sigma)
+
+            # store for 2nd order step
+            self.prev_derivative = linear_combination_into(
+                torch.empty(sample.shape, dtype=dtype, device=sample.device), [(sample, a), (model_output, b)]
+            )
+            self.dt = sigma_next - sigma
+            self.sample = sample
+
+            # `sample` is read again by the 2nd order step, so it can't be overwritten
+            prev_sample = self._fused_step_buffers.get(sample, dtype, exclude=sample)
+            linear_combination_into(prev_sample, [(sample, 1), (self.prev_derivative, self.dt)])
+        else:
+            sigma_next = self.sigmas[self.step_index].item()
+            a, b = self._get_derivative_coefficients(sigma_next)
+
+            # `prev_sample = self.sample + (self.prev_derivative + derivative) / 2 * dt`, expanded in the two terms of
+            # the derivative
+            half_dt = self.dt / 2
+            prev_sample = self._fused_step_buffers.get(sample, dtype)
+            linear_combination_into(
+                prev_sample,
+                [
+                    (self.sample, 1),
+                    (self.prev_derivative, half_dt),
+                    (sample, a * half_dt),
+                    (model_output, b * half_dt),
+                ],
+            )
+
+            # free dt and derivative
+            # Note, this puts the scheduler in "first order mode"
+            self.prev_derivative = None
+            self.dt = None
+            self.sample = None
+
+        # upon completion increase step index by one
+        self._step_index += 1
+
+        return prev_sample
+
     # Copied from diffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler.add_noise
     def add_noise(
         self,
@@ -591,7 +723,7 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         # self.begin_index is None when scheduler is used for training, or pipeline does not implement set_begin_index
         if self.begin_index is None:
-            step_indices = [self.index_for_timestep(t, schedule_timesteps) for t in timesteps]
+            step_indices = self.indices_for_timesteps(timesteps, schedule_timesteps)
         elif self.step_index is not None:
             # add_noise is called after first denoising step (for inpainting)
             step_indices = [self.step_index] * timesteps.shape[0]
@@ -21,7 +21,7 @@ import numpy as np
 import torch
 
 from ..configuration_utils import ConfigMixin, register_to_config
-from .scheduling_utils import KarrasDiffusionSchedulers, SchedulerMixin, SchedulerOutput
+from .scheduling_utils import KarrasDiffusionSchedulers, ModelOutputHistory, SchedulerMixin, SchedulerOutput
 
 
 # Copied from diffusers.schedulers.scheduling_ddpm.betas_for_alpha_bar
@@ -154,7 +154,7 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
         self.cur_model_output = 0
         self.counter = 0
         self.cur_sample = None
-        self.ets = []
+        self._ets = ModelOutputHistory(4)
 
         # setable values
         self.num_inference_steps = None
@@ -163,6 +163,18 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
         self.plms_timesteps = None
         self.timesteps = None
 
+    @property
+    def ets(self):
+        """
+        The model outputs of the last 4 multistep updates, from the oldest to the most recent one. They are stored in a
+        preallocated [`~schedulers.scheduling_utils.ModelOutputHistory`] ring buffer, and can be set from a list.
+        """
+        return self._ets
+
+    @ets.setter
+    def ets(self, ets):
+        self._ets.set_entries(ets)
+
     def set_timesteps(self, num_inference_steps: int, device: Union[str, torch.device] = None):
         """
         Sets the discrete timesteps used for the diffusion chain (to be run before inference).
@@ -219,7 +231,7 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
         timesteps = np.concatenate([self.prk_timesteps, self.plms_timesteps]).astype(np.int64)
         self.timesteps = torch.from_numpy(timesteps).to(device)
 
-        self.ets = []
+        self.ets.clear()
         self.counter = 0
         self.cur_model_output = 0
 
@@ -348,7 +360,7 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
                 "Number of inference steps is 'None', you need to run 'set_timesteps' after creating the scheduler"
             )
 
-        if not self.config.skip_prk_steps and len(self.ets) < 3:
+        if not self.config.skip_prk_steps and self.ets.num_entries < 3:
             raise ValueError(
                 f"{self.__class__} can only be run AFTER scheduler has been run "
                 "in 'prk' mode for at least 12 iterations "
@@ -359,25 +371,25 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
         prev_timestep = timestep - self.config.num_train_timesteps // self.num_inference_steps
 
         if self.counter != 1:
-            self.ets = self.ets[-3:]
             self.ets.append(model_output)
         else:
             prev_timestep = timestep
             timestep = timestep + self.config.num_train_timesteps // self.num_inference_steps
 
-        if len(self.ets) == 1 and self.counter == 0:
+        ets = self._ets.views()
+        if self.ets.num_entries == 1 and self.counter == 0:
             model_output = model_output
             self.cur_sample = sample
-        elif len(self.ets) == 1 and self.counter == 1:
-            model_output = (model_output + self.ets[-1]) / 2
+        elif self.ets.num_entries == 1 and self.counter == 1:
+            model_output = (model_output + ets[-1]) / 2
             sample = self.cur_sample
             self.cur_sample = None
-        elif len(self.ets) == 2:
-            model_output = (3 * self.ets[-1] - self.ets[-2]) / 2
-        elif len(self.ets) == 3:
-            model_output = (23 * self.ets[-1] - 16 * self.ets[-2] + 5 * self.ets[-3]) / 12
+        elif self.ets.num_entries == 2:
+            model_output = (3 * ets[-1] - ets[-2]) / 2
+        elif self.ets.num_entries == 3:
+            model_output = (23 * ets[-1] - 16 * ets[-2] + 5 * ets[-3]) / 12
         else:
-            model_output = (1 / 24) * (55 * self.ets[-1] - 59 * self.ets[-2] + 37 * self.ets[-3] - 9 * self.ets[-4])
+            model_output = (1 / 24) * (55 * ets[-1] - 59 * ets[-2] + 37 * ets[-3] - 9 * ets[-4])
 
         prev_sample = self._get_prev_sample(sample, timestep, prev_timestep, model_output)
         self.counter += 1
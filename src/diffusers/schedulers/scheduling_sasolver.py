@@ -24,7 +24,7 @@ import torch
 from ..configuration_utils import ConfigMixin, register_to_config
 from ..utils import deprecate, is_scipy_available
 from ..utils.torch_utils import randn_tensor
-from .scheduling_utils import KarrasDiffusionSchedulers, SchedulerMixin, SchedulerOutput
+from .scheduling_utils import KarrasDiffusionSchedulers, ModelOutputHistory, SchedulerMixin, SchedulerOutput
 
 
 if is_scipy_available():
@@ -220,7 +220,7 @@ class SASolverScheduler(SchedulerMixin, ConfigMixin):
         timesteps = np.linspace(0, num_train_timesteps - 1, num_train_timesteps, dtype=np.float32)[::-1].copy()
         self.timesteps = torch.from_numpy(timesteps)
         self.timestep_list = [None] * max(predictor_order, corrector_order - 1)
-        self.model_outputs = [None] * max(predictor_order, corrector_order - 1)
+        self._model_outputs = ModelOutputHistory(max(predictor_order, corrector_order - 1))
 
         if tau_func is None:
             self.tau_func = lambda t: 1 if t >= 200 and t <= 800 else 0
@@ -233,6 +233,20 @@ class SASolverScheduler(SchedulerMixin, ConfigMixin):
         self._begin_index = None
         self.sigmas = self.sigmas.to("cpu")  # to avoid too much CPU/GPU communication
 
+    @property
+    def model_outputs(self):
+        """
+        The converted model outputs of the last `max(predictor_order, corrector_order - 1)` steps, from the oldest to
+        the most recent one. They are stored in a preallocated [`~schedulers.scheduling_utils.ModelOutputHistory`] ring
+        buffer, which returns copies of its entries, and can be set from a list in which missing model outputs are
+        `None`.
+        """
+        return self._model_outputs
+
+    @model_outputs.setter
+    def model_outputs(self, model_outputs):
+        self._model_outputs.set_entries(model_outputs)
+
     @property
     def step_index(self):
         """
@@ -328,9 +342,7 @@ class SASolverScheduler(SchedulerMixin, ConfigMixin):
         self.timesteps = torch.from_numpy(timesteps).to(device=device, dtype=torch.int64)
 
         self.num_inference_steps = len(timesteps)
-        self.model_outputs = [
-            None,
-        ] * max(self.config.predictor_order, self.config.corrector_order - 1)
+        self.model_outputs.clear()
         self.lower_order_nums = 0
         self.last_sample = None
 
@@ -834,7 +846,7 @@ class SASolverScheduler(SchedulerMixin, ConfigMixin):
                 "1.0.0",
                 "Passing `prev_timestep` is deprecated and has no effect as model output conversion is now handled via an internal counter `self.step_index`",
             )
-        model_output_list = self.model_outputs
+        model_output_list = self._model_outputs.views()
         sigma_t, sigma_s0 = (
             self.sigmas[self.step_index + 1],
             self.sigmas[self.step_index],
@@ -971,7 +983,7 @@ class SASolverScheduler(SchedulerMixin, ConfigMixin):
                 "Passing `this_timestep` is deprecated and has no effect as model output conversion is now handled via an internal counter `self.step_index`",
             )
 
-        model_output_list = self.model_outputs
+        model_output_list = self._model_outputs.views()
         sigma_t, sigma_s0 = (
             self.sigmas[self.step_index],
             self.sigmas[self.step_index - 1],
@@ -990,7 +1002,7 @@ class SASolverScheduler(SchedulerMixin, ConfigMixin):
             lambda_si = torch.log(alpha_si) - torch.log(sigma_si)
             lambda_list.append(lambda_si)
 
-        model_prev_list = model_output_list + [this_model_output]
+        model_prev_list = list(model_output_list) + [this_model_output]
 
         gradient_coefficients = self.get_coefficients_fn(order, lambda_s0, lambda_t, lambda_list, tau)
 
@@ -1127,10 +1139,9 @@ class SASolverScheduler(SchedulerMixin, ConfigMixin):
             )
 
         for i in range(max(self.config.predictor_order, self.config.corrector_order - 1) - 1):
-            self.model_outputs[i] = self.model_outputs[i + 1]
             self.timestep_list[i] = self.timestep_list[i + 1]
 
-        self.model_outputs[-1] = model_output_convert
+        self.model_outputs.append(model_output_convert)
         self.timestep_list[-1] = timestep
 
         noise = randn_tensor(
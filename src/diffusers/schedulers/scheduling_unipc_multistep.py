@@ -23,7 +23,7 @@ import torch
 
 from ..configuration_utils import ConfigMixin, register_to_config
 from ..utils import deprecate, is_scipy_available
-from .scheduling_utils import KarrasDiffusionSchedulers, SchedulerMixin, SchedulerOutput
+from .scheduling_utils import KarrasDiffusionSchedulers, ModelOutputHistory, SchedulerMixin, SchedulerOutput
 
 
 if is_scipy_available():
@@ -263,7 +263,7 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
         self.num_inference_steps = None
         timesteps = np.linspace(0, num_train_timesteps - 1, num_train_timesteps, dtype=np.float32)[::-1].copy()
         self.timesteps = torch.from_numpy(timesteps)
-        self.model_outputs = [None] * solver_order
+        self._model_outputs = ModelOutputHistory(solver_order)
         self.timestep_list = [None] * solver_order
         self.lower_order_nums = 0
         self.disable_corrector = disable_corrector
@@ -272,6 +272,21 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
         self._step_index = None
         self._begin_index = None
         self.sigmas = self.sigmas.to("cpu")  # to avoid too much CPU/GPU communication
+        self.predictor_coefficients = None
+        self.corrector_coefficients = None
+
+    @property
+    def model_outputs(self):
+        """
+        The converted model outputs of the last `solver_order` steps, from the oldest to the most recent one. They are
+        stored in a preallocated [`~schedulers.scheduling_utils.ModelOutputHistory`] ring buffer, which returns copies
+        of its entries, and can be set from a list in which missing model outputs are `None`.
+        """
+        return self._model_outputs
+
+    @model_outputs.setter
+    def model_outputs(self, model_outputs):
+        self._model_outputs.set_entries(model_outputs)
 
     @property
     def step_index(self):
@@ -407,9 +422,7 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         self.num_inference_steps = len(timesteps)
 
-        self.model_outputs = [
-            None,
-        ] * self.config.solver_order
+        self.model_outputs.clear()
         self.lower_order_nums = 0
         self.last_sample = None
         if self.solver_p:
@@ -420,6 +433,132 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
         self._begin_index = None
         self.sigmas = self.sigmas.to("cpu")  # to avoid too much CPU/GPU communication
 
+        self.predictor_coefficients, self.corrector_coefficients = self._get_solver_coefficients()
+
+    def _get_solver_coefficients(self) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Precomputes the weights of the UniP predictor and the UniC corrector for every step of the schedule, following
+        [`~UniPCMultistepScheduler.multistep_uni_p_bh_update`] and
+        [`~UniPCMultistepScheduler.multistep_uni_c_bh_update`] for all the steps at once.
+
+        Returns:
+            `tuple`:
+                The predictor weights of shape `(solver_order, num_inference_steps, solver_order + 1)`, where `[order -
+                1, i]` holds the weights of the sample and of the model outputs from the most recent one backwards for
+                a predictor of order `order` at step `i`. The corrector weights of shape `(solver_order,
+                num_inference_steps, solver_order + 2)`, where `[order - 1, i]` holds the weights of the last sample,
+                of the model output at step `i` and of the model outputs from step `i - 1` backwards for a corrector of
+                order `order` at step `i`.
+        """
+        alpha, sigma = self._sigma_to_alpha_sigma_t(self.sigmas)
+        lambdas = torch.log(alpha) - torch.log(sigma)
+        step_indices = torch.arange(len(self.timesteps))
+
+        predictor_coefficients, corrector_coefficients = [], []
+        for order in range(1, self.config.solver_order + 1):
+            predictor_coefficients.append(
+                self._get_uni_bh_coefficients(alpha, sigma, lambdas, step_indices + 1, step_indices, order, False)
+            )
+            corrector_coefficients.append(
+                self._get_uni_bh_coefficients(alpha, sigma, lambdas, step_indices, step_indices - 1, order, True)
+            )
+        return torch.stack(predictor_coefficients), torch.stack(corrector_coefficients)
+
+    def _get_uni_bh_coefficients(
+        self,
+        alpha: torch.Tensor,
+        sigma: torch.Tensor,
+        lambdas: torch.Tensor,
+        t: torch.Tensor,
+        s0: torch.Tensor,
+        order: int,
+        corrector: bool,
+    ) -> torch.Tensor:
+        h = lambdas[t] - lambdas[s0]
+        rks = [(lambdas[s0 - i] - lambdas[s0]) / h for i in range(1, order)]
+        rks = torch.stack(rks + [torch.ones_like(h)], dim=-1)
+
+        hh = -h if self.predict_x0 else h
+        h_phi_1 = torch.expm1(hh)  # h\phi_1(h) = e^h - 1
+        h_phi_k = h_phi_1 / hh - 1
+
+        factorial_i = 1
+
+        if self.config.solver_type == "bh1":
+            B_h = hh
+        elif self.config.solver_type == "bh2":
+            B_h = torch.expm1(hh)
+        else:
+            raise NotImplementedError()
+
+        R = []
+        b = []
+        for i in range(1, order + 1):
+            R.append(torch.pow(rks, i - 1))
+            b.append(h_phi_k * factorial_i / B_h)
+            factorial_i *= i + 1
+            h_phi_k = h_phi_k / hh - 1 / factorial_i
+
+        R = torch.stack(R, dim=1)
+        b = torch.stack(b, dim=-1)
+
+        # The rows of the steps that cannot use this order are never read, so their solves are not checked
+        if corrector and order == 1:
+            rhos = torch.full_like(b, 0.5)
+        elif corrector:
+            rhos = torch.linalg.solve_ex(R, b)[0]
+        elif order == 1:
+            rhos = b[:, :0]
+        elif order == 2:
+            rhos = torch.full_like(b[:, :1], 0.5)
+        else:
+            rhos = torch.linalg.solve_ex(R[:, :-1, :-1], b[:, :-1])[0]
+
+        if self.predict_x0:
+            sample_coefficient, m0_coefficient, res_coefficient = (
+                sigma[t] / sigma[s0],
+                alpha[t] * h_phi_1,
+                alpha[t] * B_h,
+            )
+        else:
+            sample_coefficient, m0_coefficient, res_coefficient = (
+                alpha[t] / alpha[s0],
+                sigma[t] * h_phi_1,
+                sigma[t] * B_h,
+            )
+
+        # `D1s` holds `(m_i - m0) / r_i`, weighted by `rhos` in the residual that is subtracted from `x_t_`
+        history_coefficients = -res_coefficient[:, None] * rhos[:, : order - 1] / rks[:, : order - 1]
+        m0_coefficient = -m0_coefficient - history_coefficients.sum(dim=-1)
+        coefficients = [sample_coefficient]
+        if corrector:
+            # The residual also includes `rhos_c[-1] * (model_t - m0)`
+            coefficients.append(-res_coefficient * rhos[:, -1])
+            m0_coefficient = m0_coefficient + res_coefficient * rhos[:, -1]
+        coefficients = torch.stack(coefficients + [m0_coefficient], dim=-1)
+        coefficients = torch.cat([coefficients, history_coefficients], dim=-1)
+
+        num_terms = self.config.solver_order + (2 if corrector else 1)
+        return torch.nn.functional.pad(coefficients, (0, num_terms - coefficients.shape[-1]))
+
+    def _predictor_update(self, order: int, sample: torch.Tensor) -> torch.Tensor:
+        # `multistep_uni_p_bh_update` as a single weighted sum with the weights precomputed in `set_timesteps`
+        coefficients = self.predictor_coefficients[order - 1, self.step_index]
+        prev_sample = coefficients[0] * sample
+        for coefficient, model_output in zip(coefficients[1 : order + 1], reversed(self._model_outputs.views())):
+            prev_sample = prev_sample + coefficient * model_output
+        return prev_sample.to(sample.dtype)
+
+    def _corrector_update(
+        self, order: int, this_model_output: torch.Tensor, last_sample: torch.Tensor
+    ) -> torch.Tensor:
+        # `multistep_uni_c_bh_update` as a single weighted sum with the weights precomputed in `set_timesteps`
+        coefficients = self.corrector_coefficients[order - 1, self.step_index]
+        sample = coefficients[0] * last_sample + coefficients[1] * this_model_output
+        for coefficient, model_output in zip(coefficients[2 : order + 2], reversed(self._model_outputs.views())):
+            sample = sample + coefficient * model_output
+        return sample.to(last_sample.dtype)
+
     # Copied from diffusers.schedulers.scheduling_ddpm.DDPMScheduler._threshold_sample
     def _threshold_sample(self, sample: torch.Tensor) -> torch.Tensor:
         """
@@ -684,7 +823,7 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
                 "1.0.0",
                 "Passing `prev_timestep` is deprecated and has no effect as model output conversion is now handled via an internal counter `self.step_index`",
             )
-        model_output_list = self.model_outputs
+        model_output_list = self._model_outputs.views()
 
         s0 = self.timestep_list[-1]
         m0 = model_output_list[-1]
@@ -822,7 +961,7 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
                 "Passing `this_timestep` is deprecated and has no effect as model output conversion is now handled via an internal counter `self.step_index`",
             )
 
-        model_output_list = self.model_outputs
+        model_output_list = self._model_outputs.views()
 
         m0 = model_output_list[-1]
         x = last_sample
@@ -928,6 +1067,39 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         return step_index
 
+    # Copied from diffusers.schedulers.scheduling_dpmsolver_multistep.DPMSolverMultistepScheduler.indices_for_timesteps
+    def indices_for_timesteps(self, timesteps, schedule_timesteps=None):
+        """
+        Batched version of `index_for_timestep`, which looks up the indices of all the `timesteps` at once without
+        synchronizing with the device for every timestep.
+
+        Args:
+            timesteps (`torch.Tensor`):
+                A 1D tensor of timesteps, in any order and possibly repeated.
+            schedule_timesteps (`torch.Tensor`, *optional*):
+                The timesteps of the schedule. Defaults to `self.timesteps`.
+
+        Returns:
+            `torch.LongTensor`:
+                The index of every timestep in `schedule_timesteps`, or the last index for timesteps that are not in
+                the schedule.
+        """
+        if schedule_timesteps is None:
+            schedule_timesteps = self.timesteps
+
+        # a stable sort keeps the repeated timesteps of the schedule in their order
+        # compared in the promoted dtype like `index_for_timestep`, so that float timesteps are not truncated to match
+        # an integer schedule
+        dtype = torch.promote_types(schedule_timesteps.dtype, timesteps.dtype)
+        sorted_timesteps, sorted_indices = torch.sort(schedule_timesteps.to(dtype), stable=True)
+        timesteps = timesteps.reshape(-1).to(dtype)
+        first = torch.searchsorted(sorted_timesteps, timesteps)
+        num_matches = torch.searchsorted(sorted_timesteps, timesteps, right=True) - first
+
+        # Like `index_for_timestep`, take the second match of a timestep that is repeated in the schedule
+        pos = (first + (num_matches > 1).long()).clamp(max=len(schedule_timesteps) - 1)
+        return torch.where(num_matches == 0, len(self.timesteps) - 1, sorted_indices[pos])
+
     # Copied from diffusers.schedulers.scheduling_dpmsolver_multistep.DPMSolverMultistepScheduler._init_step_index
     def _init_step_index(self, timestep):
         """
@@ -982,18 +1154,12 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         model_output_convert = self.convert_model_output(model_output, sample=sample)
         if use_corrector:
-            sample = self.multistep_uni_c_bh_update(
-                this_model_output=model_output_convert,
-                last_sample=self.last_sample,
-                this_sample=sample,
-                order=self.this_order,
-            )
+            sample = self._corrector_update(self.this_order, model_output_convert, self.last_sample)
 
         for i in range(self.config.solver_order - 1):
-            self.model_outputs[i] = self.model_outputs[i + 1]
             self.timestep_list[i] = self.timestep_list[i + 1]
 
-        self.model_outputs[-1] = model_output_convert
+        self.model_outputs.append(model_output_convert)
         self.timestep_list[-1] = timestep
 
         if self.config.lower_order_final:
@@ -1005,11 +1171,14 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
         assert self.this_order > 0
 
         self.last_sample = sample
-        prev_sample = self.multistep_uni_p_bh_update(
-            model_output=model_output,  # pass the original non-converted model output, in case solver-p is used
-            sample=sample,
-            order=self.this_order,
-        )
+        if self.solver_p:
+            prev_sample = self.multistep_uni_p_bh_update(
+                model_output=model_output,  # pass the original non-converted model output, in case solver-p is used
+                sample=sample,
+                order=self.this_order,
+            )
+        else:
+            prev_sample = self._predictor_update(self.this_order, sample)
 
         if self.lower_order_nums < self.config.solver_order:
             self.lower_order_nums += 1
@@ -1056,7 +1225,7 @@ class UniPCMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         # begin_index is None when the scheduler is used for training or pipeline does not implement set_begin_index
         if self.begin_index is None:
-            step_indices = [self.index_for_timestep(t, schedule_timesteps) for t in timesteps]
+            step_indices = self.indices_for_timesteps(timesteps, schedule_timesteps)
         elif self.step_index is not None:
             # add_noise is called after first denoising step (for inpainting)
             step_indices = [self.step_index] * timesteps.shape[0]
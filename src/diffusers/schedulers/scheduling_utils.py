@@ -11,12 +11,16 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import copy
+import functools
 import importlib
 import os
+from collections import OrderedDict
 from dataclasses import dataclass
 from enum import Enum
-from typing import Optional, Union
+from typing import List, Optional, Union
 
+import numpy as np
 import torch
 from huggingface_hub.utils import validate_hf_hub_args
 
@@ -71,6 +75,295 @@ class SchedulerOutput(BaseOutput):
     prev_sample: torch.Tensor
 
 
+class ModelOutputHistory:
+    """
+    The model outputs of the last `size` steps of a multistep scheduler, stored in one preallocated ring buffer of
+    shape `(size, *model_output.shape)`.
+
+    The history is indexed like a list of length `size` ordered from the oldest to the most recent model output, where
+    entries that have not been written yet are `None`. Appending a model output copies it over the oldest entry
+    instead of shifting the others, so the buffer is only allocated on the first write (and again if the shape, dtype
+    or device of the model outputs changes) and every entry keeps a fixed address, including across
+    [`~ModelOutputHistory.clear`] calls.
+
+    Indexing and iterating return copies of the entries, which stay valid after later appends. The schedulers read
+    the entries without copying them with [`~ModelOutputHistory.views`].
+
+    Args:
+        size (`int`):
+            The number of model outputs to keep.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.buffer: Optional[torch.Tensor] = None
+        self._filled = [False] * size
+        # physical slot the next model output is written to, which also holds the oldest one
+        self._head = 0
+
+    @property
+    def num_entries(self) -> int:
+        """
+        The number of entries that have been written.
+        """
+        return sum(self._filled)
+
+    def _get_slot(self, index: int) -> int:
+        if not -self.size <= index < self.size:
+            raise IndexError(f"History index {index} is out of range for a history of size {self.size}.")
+        return (self._head + index) % self.size
+
+    def _maybe_allocate(self, model_output: torch.Tensor):
+        shape = (self.size, *model_output.shape)
+        if self.buffer is not None and (
+            self.buffer.shape == shape
+            and self.buffer.dtype == model_output.dtype
+            and self.buffer.device == model_output.device
+        ):
+            return
+
+        buffer = torch.empty(shape, dtype=model_output.dtype, device=model_output.device)
+        if self.buffer is not None and self.buffer.shape == shape:
+            buffer.copy_(self.buffer)
+        else:
+            self._filled = [False] * self.size
+        self.buffer = buffer
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.size))]
+        slot = self._get_slot(index)
+        return self.buffer[slot].clone() if self._filled[slot] else None
+
+    def __setitem__(self, index: int, model_output: Optional[torch.Tensor]):
+        slot = self._get_slot(index)
+        if model_output is None:
+            self._filled[slot] = False
+            return
+        self._maybe_allocate(model_output)
+        if model_output.data_ptr() != self.buffer[slot].data_ptr():
+            self.buffer[slot].copy_(model_output)
+        self._filled[slot] = True
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __reversed__(self):
+        return reversed(self[:])
+
+    def views(self) -> List[Optional[torch.Tensor]]:
+        """
+        Returns the entries ordered from the oldest to the most recent one as views of the buffer, without copying
+        them. A view is overwritten by the append that makes its entry the oldest one, so the views must not be kept
+        across steps.
+        """
+        slots = [(self._head + i) % self.size for i in range(self.size)]
+        return [self.buffer[slot] if self._filled[slot] else None for slot in slots]
+
+    def append(self, model_output: torch.Tensor):
+        """
+        Overwrites the oldest entry with `model_output`, which becomes the most recent entry.
+        """
+        self._maybe_allocate(model_output)
+        self.buffer[self._head].copy_(model_output)
+        self._filled[self._head] = True
+        self._head = (self._head + 1) % self.size
+
+    def clear(self):
+        """
+        Marks all entries as unwritten while keeping the buffer allocated.
+        """
+        self._filled = [False] * self.size
+        self._head = 0
+
+    def set_entries(self, model_outputs):
+        """
+        Replaces the history with a list of model outputs ordered from the oldest to the most recent one, in which
+        unwritten entries are `None`. Only the last `size` model outputs are kept.
+        """
+        model_outputs = list(model_outputs)[-self.size :]
+        if self.buffer is not None:
+            # entries that are views of the buffer could be overwritten before they are copied
+            model_outputs = [
+                m.clone()
+                if m is not None and m.untyped_storage().data_ptr() == self.buffer.untyped_storage().data_ptr()
+                else m
+                for m in model_outputs
+            ]
+        self.clear()
+        offset = self.size - len(model_outputs)
+        for i, model_output in enumerate(model_outputs):
+            self[offset + i] = model_output
+
+
+class StepOutputBuffers:
+    """
+    Preallocated output tensors of the fused step path of the Euler schedulers, into which `prev_sample` is written
+    instead of allocating a new tensor at every step. Once the denoising loop passes the returned `prev_sample` back
+    as the next `sample`, the step is computed in place.
+
+    Args:
+        num_buffers (`int`, defaults to 1):
+            The number of buffers to keep, which is 2 for schedulers that still read the `sample` of a step after
+            returning its `prev_sample`.
+    """
+
+    def __init__(self, num_buffers: int = 1):
+        self.num_buffers = num_buffers
+        self.buffers = []
+
+    def get(self, like: torch.Tensor, dtype: torch.dtype, exclude: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """
+        Returns a buffer with the shape and device of `like` and the given `dtype`, other than `exclude`.
+        """
+        for buffer in self.buffers:
+            if (
+                buffer.shape == like.shape
+                and buffer.dtype == dtype
+                and buffer.device == like.device
+                and (exclude is None or buffer.data_ptr() != exclude.data_ptr())
+            ):
+                return buffer
+
+        buffer = torch.empty(like.shape, dtype=dtype, device=like.device)
+        self.buffers = (self.buffers + [buffer])[-self.num_buffers :]
+        return buffer
+
+    def clear(self):
+        self.buffers = []
+
+
+def linear_combination_into(out: torch.Tensor, terms) -> torch.Tensor:
+    """
+    Writes the sum of `coefficient * tensor` over the `(tensor, coefficient)` pairs of `terms` into `out`, with one
+    elementwise pass per term. `out` can be one of the tensors of `terms`. Sums that take more than one rounding in a
+    half precision `out` are accumulated in float32, like the upcast of the regular step.
+    """
+    terms = [term for term in terms if term[1] != 0] or terms[:1]
+    single_op = len(terms) == 1 or (len(terms) == 2 and 1 in (terms[0][1], terms[1][1]))
+    if out.dtype in (torch.float16, torch.bfloat16) and not single_op:
+        accumulator = torch.empty(out.shape, dtype=torch.float32, device=out.device)
+        return out.copy_(linear_combination_into(accumulator, terms))
+
+    # a tensor that is overwritten by the output has to be read first, and a unit coefficient saves a multiplication
+    terms = sorted(terms, key=lambda term: (term[0].data_ptr() != out.data_ptr(), term[1] != 1))
+    (first, first_coefficient), *terms = terms
+    if first_coefficient != 1:
+        torch.mul(first, first_coefficient, out=out)
+    elif terms:
+        (second, second_coefficient), *terms = terms
+        torch.add(first, second, alpha=second_coefficient, out=out)
+    elif first.data_ptr() != out.data_ptr():
+        out.copy_(first)
+
+    for tensor, coefficient in terms:
+        out.add_(tensor, alpha=coefficient)
+    return out
+
+
+class ScheduleCache:
+    """
+    A least-recently-used cache of the schedules computed by `set_timesteps`. Every entry holds the attributes that a
+    `set_timesteps` call assigned, including the timesteps and sigmas already on their target device.
+
+    Args:
+        max_size (`int`):
+            The maximum number of schedules to keep.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# shared by all schedulers so that schedulers created per request reuse the schedules of the previous ones
+_SCHEDULE_CACHE = ScheduleCache(max_size=64)
+
+
+class _Unhashable(Exception):
+    pass
+
+
+def _to_cache_key(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_to_cache_key(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _to_cache_key(v)) for k, v in value.items()))
+    if isinstance(value, torch.device):
+        return str(value)
+    if isinstance(value, np.ndarray):
+        return (value.dtype.str, value.shape, value.tobytes())
+    if isinstance(value, torch.Tensor):
+        return (str(value.dtype), tuple(value.shape), tuple(value.flatten().tolist()))
+    if isinstance(value, np.generic):
+        return value.item()
+    raise _Unhashable
+
+
+def _copy_schedule_value(value):
+    # the cached values are copied both ways, so that a scheduler modifying its own values in place can't change the
+    # values of the cache or of the other schedulers restored from it
+    if isinstance(value, torch.Tensor):
+        return value.clone()
+    if isinstance(value, ModelOutputHistory):
+        return list(value)
+    if isinstance(value, (list, dict)):
+        return copy.copy(value)
+    return value
+
+
+def cache_schedule(set_timesteps):
+    """
+    Decorates the `set_timesteps` method of a scheduler to support [`~SchedulerMixin.enable_schedule_cache`]. The
+    scheduler class lists the attributes assigned by `set_timesteps` in `_schedule_cache_attributes`, which are stored
+    in the cache and restored from it, and the instance attributes the schedule depends on, other than its
+    configuration and the arguments of `set_timesteps`, in `_schedule_state_attributes`.
+    """
+
+    @functools.wraps(set_timesteps)
+    def wrapper(self, *args, **kwargs):
+        if not self._schedule_cache_enabled:
+            return set_timesteps(self, *args, **kwargs)
+
+        key = self._get_schedule_cache_key(args, kwargs)
+        if key is None:
+            return set_timesteps(self, *args, **kwargs)
+
+        entry = _SCHEDULE_CACHE.get(key)
+        if entry is None:
+            output = set_timesteps(self, *args, **kwargs)
+            values = {name: _copy_schedule_value(getattr(self, name)) for name in self._schedule_cache_attributes}
+            _SCHEDULE_CACHE.put(key, (values, output))
+            return output
+
+        values, output = entry
+        for name, value in values.items():
+            setattr(self, name, _copy_schedule_value(value))
+        return output
+
+    return wrapper
+
+
 class SchedulerMixin(PushToHubMixin):
     """
     Base class for all schedulers.
@@ -85,10 +378,18 @@ class SchedulerMixin(PushToHubMixin):
         - **_compatibles** (`List[str]`) -- A list of scheduler classes that are compatible with the parent scheduler
           class. Use [`~ConfigMixin.from_config`] to load a different compatible scheduler class (should be overridden
           by parent class).
+        - **_schedule_cache_attributes** (`List[str]`) -- The attributes assigned by `set_timesteps` in the
+          schedulers that support [`~SchedulerMixin.enable_schedule_cache`], which are restored from the cache.
+        - **_schedule_state_attributes** (`List[str]`) -- Instance attributes, other than the configuration, that
+          change the schedule computed by `set_timesteps`. They are part of the key of
+          [`~SchedulerMixin.enable_schedule_cache`].
     """
 
     config_name = SCHEDULER_CONFIG_NAME
     _compatibles = []
+    _schedule_cache_attributes = []
+    _schedule_state_attributes = []
+    _schedule_cache_enabled = False
     has_compatibles = True
 
     @classmethod
@@ -173,6 +474,52 @@ class SchedulerMixin(PushToHubMixin):
         """
         self.save_config(save_directory=save_directory, push_to_hub=push_to_hub, **kwargs)
 
+    def enable_schedule_cache(self, max_size: Optional[int] = None):
+        r"""
+        Memoizes `set_timesteps` in a least-recently-used cache that is shared by all schedulers. Calling
+        `set_timesteps` again with the same arguments on a scheduler of the same class and configuration restores the
+        previously computed timesteps and sigmas, already on the requested device, instead of recomputing them. This is
+        useful when serving few-step models, where computing the schedule is a visible share of the latency.
+
+        The cache is supported by [`EulerDiscreteScheduler`], [`EulerAncestralDiscreteScheduler`],
+        [`FlowMatchEulerDiscreteScheduler`] and [`DPMSolverMultistepScheduler`].
+
+        Args:
+            max_size (`int`, *optional*):
+                The maximum number of schedules kept in the shared cache. Defaults to the current size (64 initially).
+        """
+        if not self._schedule_cache_attributes:
+            raise ValueError(f"{self.__class__.__name__} doesn't support the schedule cache.")
+        if max_size is not None:
+            _SCHEDULE_CACHE.max_size = max_size
+        self._schedule_cache_enabled = True
+
+    def disable_schedule_cache(self):
+        r"""
+        Disables the schedule cache enabled with [`~SchedulerMixin.enable_schedule_cache`].
+        """
+        self._schedule_cache_enabled = False
+
+    @staticmethod
+    def clear_schedule_cache():
+        r"""
+        Removes all the schedules from the shared cache of [`~SchedulerMixin.enable_schedule_cache`].
+        """
+        _SCHEDULE_CACHE.clear()
+
+    def _get_schedule_cache_key(self, args, kwargs):
+        # the configuration is frozen, so its key only needs to be recomputed when it is replaced
+        config_key = self.__dict__.get("_schedule_config_key")
+        if config_key is None or config_key[0] is not self._internal_dict:
+            config_key = (self._internal_dict, self.to_json_string())
+            self._schedule_config_key = config_key
+
+        state = [getattr(self, name) for name in self._schedule_state_attributes]
+        try:
+            return (self.__class__, config_key[1], _to_cache_key(state), _to_cache_key(args), _to_cache_key(kwargs))
+        except _Unhashable:
+            return None
+
     @property
     def compatibles(self):
         """
@@ -0,0 +1,6 @@
+from ..utils import is_torch_available
+
+
+if is_torch_available():
+    from .continuous_batching import ContinuousBatchingEngine
+    from .request_batching import RequestBatchingEngine
@@ -0,0 +1,829 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import inspect
+import queue
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from ..pipelines.pipeline_streaming import _get_call_lock
+from ..utils import logging
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+_STOP = object()
+
+
+class DenoisingState:
+    r"""
+    The denoising state of a request in a [`ContinuousBatchingEngine`], with its own latents and noise schedule.
+
+    Attributes:
+        latents (`torch.Tensor`):
+            The current latents of the images of the request.
+        timesteps (`torch.Tensor`):
+            The timesteps of the request, one per inference step.
+        sigmas (`torch.Tensor`):
+            The noise schedule of the request, with one more sigma than timesteps.
+        step_index (`int`):
+            The index of the next denoising step of the request.
+        conditions (`Dict[str, torch.Tensor]`):
+            The conditions of the denoiser that are batched over the images, like the prompt embeddings. They are
+            concatenated with the conditions of the other requests of a batched step.
+        shared_conditions (`Dict[str, torch.Tensor]`):
+            The conditions of the denoiser that are the same for all the images of a batched step, like the positional
+            ids of Flux.
+        key (`Any`):
+            The batching key of the request. Only the requests with the same key are denoised in the same call of the
+            denoiser.
+        decode_kwargs (`Dict[str, Any]`):
+            The arguments used to decode the final latents, like the `output_type`.
+    """
+
+    def __init__(
+        self,
+        latents: torch.Tensor,
+        timesteps: torch.Tensor,
+        sigmas: torch.Tensor,
+        conditions: Dict[str, torch.Tensor],
+        shared_conditions: Optional[Dict[str, torch.Tensor]] = None,
+        key: Any = None,
+        **decode_kwargs,
+    ) -> None:
+        self.latents = latents
+        self.timesteps = timesteps.to(latents.device)
+        self.sigmas = sigmas.to(device=latents.device, dtype=torch.float32)
+        self.step_index = 0
+        self.conditions = conditions
+        self.shared_conditions = shared_conditions or {}
+        self.decode_kwargs = decode_kwargs
+
+        # the shapes of the batched inputs have to match to be concatenated, and the shared ones to be equal
+        shapes = tuple((name, tuple(value.shape[1:]), value.dtype) for name, value in sorted(conditions.items()))
+        self.key = (key, tuple(latents.shape[1:]), latents.dtype, shapes, tuple(sorted(self.shared_conditions)))
+
+    @property
+    def num_images(self) -> int:
+        return self.latents.shape[0]
+
+    @property
+    def num_inference_steps(self) -> int:
+        return len(self.timesteps)
+
+    @property
+    def is_finished(self) -> bool:
+        return self.step_index >= self.num_inference_steps
+
+
+class _DenoisingLoop(ABC):
+    r"""
+    The denoising loop of a pipeline, split into the preparation of a request, a denoising step of a batch of requests
+    that are at different steps, and the decoding of a finished request.
+    """
+
+    def __init__(self, pipeline) -> None:
+        self.pipeline = pipeline
+        self.scheduler = pipeline.scheduler
+        if not hasattr(self.scheduler, "batch_step"):
+            raise ValueError(
+                "Continuous batching needs a scheduler with a `batch_step` method, but"
+                f" {self.scheduler.__class__.__name__} doesn't have one. Use `EulerDiscreteScheduler` or"
+                " `FlowMatchEulerDiscreteScheduler` instead."
+            )
+
+    @abstractmethod
+    def prepare(self, **kwargs) -> DenoisingState:
+        r"""Encodes the prompts of a request and prepares its latents, noise schedule and conditions."""
+
+    @abstractmethod
+    def predict_noise(
+        self,
+        latents: torch.Tensor,
+        timesteps: torch.Tensor,
+        step_indices: torch.Tensor,
+        sigmas: torch.Tensor,
+        conditions: Dict[str, torch.Tensor],
+    ) -> torch.Tensor:
+        r"""Runs the denoiser on the concatenated latents and conditions of requests with the same key."""
+
+    @abstractmethod
+    def decode(self, state: DenoisingState):
+        r"""Decodes the latents of a finished request into the output of the pipeline."""
+
+    @torch.no_grad()
+    def step(self, states: List[DenoisingState]) -> None:
+        r"""Runs the next denoising step of requests with the same key, in a single call of the denoiser."""
+        num_images = [state.num_images for state in states]
+        latents = torch.cat([state.latents for state in states])
+        device = latents.device
+
+        step_indices = torch.tensor(
+            [state.step_index for state in states for _ in range(state.num_images)], device=device
+        )
+        timesteps = torch.cat([state.timesteps[state.step_index].expand(state.num_images) for state in states])
+        num_sigmas = max(len(state.sigmas) for state in states)
+        sigmas = torch.cat(
+            [
+                F.pad(state.sigmas, (0, num_sigmas - len(state.sigmas)))[None].expand(state.num_images, -1)
+                for state in states
+            ]
+        )
+        conditions = {name: torch.cat([state.conditions[name] for state in states]) for name in states[0].conditions}
+        conditions.update(states[0].shared_conditions)
+
+        noise_pred = self.predict_noise(latents, timesteps, step_indices, sigmas, conditions)
+        latents_dtype = latents.dtype
+        latents = self.scheduler.batch_step(noise_pred, latents, step_indices, sigmas=sigmas, return_dict=False)[0]
+        if latents.dtype != latents_dtype:
+            if torch.backends.mps.is_available():
+                # some platforms (eg. apple mps) misbehave due to a pytorch bug:
+                # https://github.com/pytorch/pytorch/pull/99272
+                latents = latents.to(latents_dtype)
+
+        for state, state_latents in zip(states, latents.split(num_images)):
+            state.latents = state_latents
+            state.step_index += 1
+
+
+class _FluxDenoisingLoop(_DenoisingLoop):
+    @torch.no_grad()
+    def prepare(
+        self,
+        prompt: Union[str, List[str]] = None,
+        prompt_2: Optional[Union[str, List[str]]] = None,
+        height: Optional[int] = None,
+        width: Optional[int] = None,
+        num_inference_steps: int = 28,
+        sigmas: Optional[List[float]] = None,
+        guidance_scale: float = 3.5,
+        num_images_per_prompt: Optional[int] = 1,
+        generator: Optional[Union[torch.Generator, List[torch.Generator]]] = None,
+        latents: Optional[torch.FloatTensor] = None,
+        prompt_embeds: Optional[torch.FloatTensor] = None,
+        pooled_prompt_embeds: Optional[torch.FloatTensor] = None,
+        output_type: Optional[str] = "pil",
+        max_sequence_length: int = 512,
+    ) -> DenoisingState:
+        from ..pipelines.flux.pipeline_flux import calculate_shift, retrieve_timesteps
+
+        pipe = self.pipeline
+        height = height or pipe.default_sample_size * pipe.vae_scale_factor
+        width = width or pipe.default_sample_size * pipe.vae_scale_factor
+
+        pipe.check_inputs(
+            prompt,
+            prompt_2,
+            height,
+            width,
+            prompt_embeds=prompt_embeds,
+            pooled_prompt_embeds=pooled_prompt_embeds,
+            max_sequence_length=max_sequence_length,
+        )
+
+        if prompt is not None and isinstance(prompt, str):
+            batch_size = 1
+        elif prompt is not None and isinstance(prompt, list):
+            batch_size = len(prompt)
+        else:
+            batch_size = prompt_embeds.shape[0]
+
+        device = pipe._execution_device
+
+        prompt_embeds, pooled_prompt_embeds, text_ids = pipe.encode_prompt(
+            prompt=prompt,
+            prompt_2=prompt_2,
+            prompt_embeds=prompt_embeds,
+            pooled_prompt_embeds=pooled_prompt_embeds,
+            device=device,
+            num_images_per_prompt=num_images_per_prompt,
+            max_sequence_length=max_sequence_length,
+        )
+
+        num_channels_latents = pipe.transformer.config.in_channels // 4
+        latents, latent_image_ids = pipe.prepare_latents(
+            batch_size * num_images_per_prompt,
+            num_channels_latents,
+            height,
+            width,
+            prompt_embeds.dtype,
+            device,
+            generator,
+            latents,
+        )
+
+        # every request has its own schedule, the sigmas are read back from the scheduler right after being set
+        sigmas = np.linspace(1.0, 1 / num_inference_steps, num_inference_steps) if sigmas is None else sigmas
+        image_seq_len = latents.shape[1]
+        mu = calculate_shift(
+            image_seq_len,
+            self.scheduler.config.base_image_seq_len,
+            self.scheduler.config.max_image_seq_len,
+            self.scheduler.config.base_shift,
+            self.scheduler.config.max_shift,
+        )
+        timesteps, num_inference_steps = retrieve_timesteps(
+            self.scheduler,
+            num_inference_steps,
+            device,
+            sigmas=sigmas,
+            mu=mu,
+        )
+
+        conditions = {"prompt_embeds": prompt_embeds, "pooled_prompt_embeds": pooled_prompt_embeds}
+        if pipe.transformer.config.guidance_embeds:
+            conditions["guidance"] = torch.full([latents.shape[0]], guidance_scale, device=device, dtype=torch.float32)
+
+        return DenoisingState(
+            latents,
+            timesteps,
+            self.scheduler.sigmas,
+            conditions,
+            shared_conditions={"text_ids": text_ids, "latent_image_ids": latent_image_ids},
+            key=(height, width),
+            height=height,
+            width=width,
+            output_type=output_type,
+        )
+
+    def predict_noise(self, latents, timesteps, step_indices, sigmas, conditions):
+        timestep = timesteps.to(latents.dtype)
+        return self.pipeline.transformer(
+            hidden_states=latents,
+            timestep=timestep / 1000,
+            guidance=conditions.get("guidance"),
+            pooled_projections=conditions["pooled_prompt_embeds"],
+            encoder_hidden_states=conditions["prompt_embeds"],
+            txt_ids=conditions["text_ids"],
+            img_ids=conditions["latent_image_ids"],
+            return_dict=False,
+        )[0]
+
+    @torch.no_grad()
+    def decode(self, state: DenoisingState):
+        from ..pipelines.flux.pipeline_output import FluxPipelineOutput
+
+        pipe = self.pipeline
+        latents = state.latents
+        output_type = state.decode_kwargs["output_type"]
+        if output_type == "latent":
+            image = latents
+
+        else:
+            latents = pipe._unpack_latents(
+                latents, state.decode_kwargs["height"], state.decode_kwargs["width"], pipe.vae_scale_factor
+            )
+            latents = (latents / pipe.vae.config.scaling_factor) + pipe.vae.config.shift_factor
+            image = pipe.vae.decode(latents, return_dict=False)[0]
+            image = pipe.image_processor.postprocess(image, output_type=output_type)
+
+        return FluxPipelineOutput(images=image)
+
+
+class _StableDiffusionXLDenoisingLoop(_DenoisingLoop):
+    def __init__(self, pipeline) -> None:
+        super().__init__(pipeline)
+        if not hasattr(self.scheduler, "batch_scale_model_input"):
+            raise ValueError(
+                f"Continuous batching needs a scheduler with a `batch_scale_model_input` method, but"
+                f" {self.scheduler.__class__.__name__} doesn't have one. Use `EulerDiscreteScheduler` instead."
+            )
+
+    @torch.no_grad()
+    def prepare(
+        self,
+        prompt: Union[str, List[str]] = None,
+        prompt_2: Optional[Union[str, List[str]]] = None,
+        height: Optional[int] = None,
+        width: Optional[int] = None,
+        num_inference_steps: int = 50,
+        timesteps: List[int] = None,
+        sigmas: List[float] = None,
+        guidance_scale: float = 5.0,
+        negative_prompt: Optional[Union[str, List[str]]] = None,
+        negative_prompt_2: Optional[Union[str, List[str]]] = None,
+        num_images_per_prompt: Optional[int] = 1,
+        generator: Optional[Union[torch.Generator, List[torch.Generator]]] = None,
+        latents: Optional[torch.Tensor] = None,
+        prompt_embeds: Optional[torch.Tensor] = None,
+        negative_prompt_embeds: Optional[torch.Tensor] = None,
+        pooled_prompt_embeds: Optional[torch.Tensor] = None,
+        negative_pooled_prompt_embeds: Optional[torch.Tensor] = None,
+        output_type: Optional[str] = "pil",
+        guidance_rescale: float = 0.0,
+        original_size: Optional[Tuple[int, int]] = None,
+        crops_coords_top_left: Tuple[int, int] = (0, 0),
+        target_size: Optional[Tuple[int, int]] = None,
+        negative_original_size: Optional[Tuple[int, int]] = None,
+        negative_crops_coords_top_left: Tuple[int, int] = (0, 0),
+        negative_target_size: Optional[Tuple[int, int]] = None,
+        clip_skip: Optional[int] = None,
+    ) -> DenoisingState:
+        from ..pipelines.stable_diffusion_xl.pipeline_stable_diffusion_xl import retrieve_timesteps
+
+        pipe = self.pipeline
+        height = height or pipe.default_sample_size * pipe.vae_scale_factor
+        width = width or pipe.default_sample_size * pipe.vae_scale_factor
+
+        original_size = original_size or (height, width)
+        target_size = target_size or (height, width)
+
+        pipe.check_inputs(
+            prompt,
+            prompt_2,
+            height,
+            width,
+            None,
+            negative_prompt,
+            negative_prompt_2,
+            prompt_embeds,
+            negative_prompt_embeds,
+            pooled_prompt_embeds,
+            negative_pooled_prompt_embeds,
+        )
+        do_classifier_free_guidance = guidance_scale > 1 and pipe.unet.config.time_cond_proj_dim is None
+
+        if prompt is not None and isinstance(prompt, str):
+            batch_size = 1
+        elif prompt is not None and isinstance(prompt, list):
+            batch_size = len(prompt)
+        else:
+            batch_size = prompt_embeds.shape[0]
+
+        device = pipe._execution_device
+
+        (
+            prompt_embeds,
+            negative_prompt_embeds,
+            pooled_prompt_embeds,
+            negative_pooled_prompt_embeds,
+        ) = pipe.encode_prompt(
+            prompt=prompt,
+            prompt_2=prompt_2,
+            device=device,
+            num_images_per_prompt=num_images_per_prompt,
+            do_classifier_free_guidance=do_classifier_free_guidance,
+            negative_prompt=negative_prompt,
+            negative_prompt_2=negative_prompt_2,
+            prompt_embeds=prompt_embeds,
+            negative_prompt_embeds=negative_prompt_embeds,
+            pooled_prompt_embeds=pooled_prompt_embeds,
+            negative_pooled_prompt_embeds=negative_pooled_prompt_embeds,
+            clip_skip=clip_skip,
+        )
+
+        timesteps, num_inference_steps = retrieve_timesteps(
+            self.scheduler, num_inference_steps, device, timesteps, sigmas
+        )
+
+        num_channels_latents = pipe.unet.config.in_channels
+        latents = pipe.prepare_latents(
+            batch_size * num_images_per_prompt,
+            num_channels_latents,
+            height,
+            width,
+            prompt_embeds.dtype,
+            device,
+            generator,
+            latents,
+        )
+
+        if pipe.text_encoder_2 is None:
+            text_encoder_projection_dim = int(pooled_prompt_embeds.shape[-1])
+        else:
+            text_encoder_projection_dim = pipe.text_encoder_2.config.projection_dim
+
+        add_time_ids = pipe._get_add_time_ids(
+            original_size,
+            crops_coords_top_left,
+            target_size,
+            dtype=prompt_embeds.dtype,
+            text_encoder_projection_dim=text_encoder_projection_dim,
+        )
+        if negative_original_size is not None and negative_target_size is not None:
+            negative_add_time_ids = pipe._get_add_time_ids(
+                negative_original_size,
+                negative_crops_coords_top_left,
+                negative_target_size,
+                dtype=prompt_embeds.dtype,
+                text_encoder_projection_dim=text_encoder_projection_dim,
+            )
+        else:
+            negative_add_time_ids = add_time_ids
+
+        num_images = latents.shape[0]
+        conditions = {
+            "prompt_embeds": prompt_embeds.to(device),
+            "add_text_embeds": pooled_prompt_embeds.to(device),
+            "add_time_ids": add_time_ids.to(device).repeat(num_images, 1),
+        }
+        if do_classifier_free_guidance:
+            conditions["negative_prompt_embeds"] = negative_prompt_embeds.to(device)
+            conditions["negative_add_text_embeds"] = negative_pooled_prompt_embeds.to(device)
+            conditions["negative_add_time_ids"] = negative_add_time_ids.to(device).repeat(num_images, 1)
+            conditions["guidance_scale"] = torch.full([num_images], guidance_scale, device=device)
+            conditions["guidance_rescale"] = torch.full([num_images], guidance_rescale, device=device)
+
+        if pipe.unet.config.time_cond_proj_dim is not None:
+            guidance_scale_tensor = torch.tensor(guidance_scale - 1).repeat(num_images)
+            conditions["timestep_cond"] = pipe.get_guidance_scale_embedding(
+                guidance_scale_tensor, embedding_dim=pipe.unet.config.time_cond_proj_dim
+            ).to(device=device, dtype=latents.dtype)
+
+        return DenoisingState(
+            latents,
+            timesteps,
+            self.scheduler.sigmas,
+            conditions,
+            key=do_classifier_free_guidance,
+            output_type=output_type,
+        )
+
+    def predict_noise(self, latents, timesteps, step_indices, sigmas, conditions):
+        from ..pipelines.stable_diffusion_xl.pipeline_stable_diffusion_xl import rescale_noise_cfg
+
+        do_classifier_free_guidance = "negative_prompt_embeds" in conditions
+
+        latent_model_input = self.scheduler.batch_scale_model_input(latents, step_indices, sigmas)
+        prompt_embeds = conditions["prompt_embeds"]
+        add_text_embeds = conditions["add_text_embeds"]
+        add_time_ids = conditions["add_time_ids"]
+        if do_classifier_free_guidance:
+            # the unconditional inputs of all the requests come first, like in the pipeline
+            latent_model_input = torch.cat([latent_model_input] * 2)
+            timesteps = torch.cat([timesteps] * 2)
+            prompt_embeds = torch.cat([conditions["negative_prompt_embeds"], prompt_embeds])
+            add_text_embeds = torch.cat([conditions["negative_add_text_embeds"], add_text_embeds])
+            add_time_ids = torch.cat([conditions["negative_add_time_ids"], add_time_ids])
+
+        noise_pred = self.pipeline.unet(
+            latent_model_input,
+            timesteps,
+            encoder_hidden_states=prompt_embeds,
+            timestep_cond=conditions.get("timestep_cond"),
+            added_cond_kwargs={"text_embeds": add_text_embeds, "time_ids": add_time_ids},
+            return_dict=False,
+        )[0]
+
+        if do_classifier_free_guidance:
+            shape = (-1,) + (1,) * (noise_pred.ndim - 1)
+            guidance_scale = conditions["guidance_scale"].to(noise_pred.dtype).view(shape)
+            noise_pred_uncond, noise_pred_text = noise_pred.chunk(2)
+            noise_pred = noise_pred_uncond + guidance_scale * (noise_pred_text - noise_pred_uncond)
+
+            guidance_rescale = conditions["guidance_rescale"]
+            if (guidance_rescale > 0.0).any():
+                # Based on 3.4. in https://arxiv.org/pdf/2305.08891.pdf
+                guidance_rescale = guidance_rescale.to(noise_pred.dtype).view(shape)
+                noise_pred = rescale_noise_cfg(noise_pred, noise_pred_text, guidance_rescale=guidance_rescale)
+
+        return noise_pred
+
+    @torch.no_grad()
+    def decode(self, state: DenoisingState):
+        from ..pipelines.stable_diffusion_xl.pipeline_output import StableDiffusionXLPipelineOutput
+
+        pipe = self.pipeline
+        latents = state.latents
+        output_type = state.decode_kwargs["output_type"]
+        if not output_type == "latent":
+            # make sure the VAE is in float32 mode, as it overflows in float16
+            needs_upcasting = pipe.vae.dtype == torch.float16 and pipe.vae.config.force_upcast
+
+            if needs_upcasting:
+                pipe.upcast_vae()
+                latents = latents.to(next(iter(pipe.vae.post_quant_conv.parameters())).dtype)
+            elif latents.dtype != pipe.vae.dtype:
+                if torch.backends.mps.is_available():
+                    # some platforms (eg. apple mps) misbehave due to a pytorch bug:
+                    # https://github.com/pytorch/pytorch/pull/99272
+                    pipe.vae = pipe.vae.to(latents.dtype)
+
+            # unscale/denormalize the latents
+            # denormalize with the mean and std if available and not None
+            has_latents_mean = hasattr(pipe.vae.config, "latents_mean") and pipe.vae.config.latents_mean is not None
+            has_latents_std = hasattr(pipe.vae.config, "latents_std") and pipe.vae.config.latents_std is not None
+            if has_latents_mean and has_latents_std:
+                latents_mean = (
+                    torch.tensor(pipe.vae.config.latents_mean).view(1, 4, 1, 1).to(latents.device, latents.dtype)
+                )
+                latents_std = (
+                    torch.tensor(pipe.vae.config.latents_std).view(1, 4, 1, 1).to(latents.device, latents.dtype)
+                )
+                latents = latents * latents_std / pipe.vae.config.scaling_factor + latents_mean
+            else:
+                latents = latents / pipe.vae.config.scaling_factor
+
+            image = pipe.vae.decode(latents, return_dict=False)[0]
+
+            # cast back to fp16 if needed
+            if needs_upcasting:
+                pipe.vae.to(dtype=torch.float16)
+        else:
+            image = latents
+
+        if not output_type == "latent":
+            # apply watermark if available
+            if pipe.watermark is not None:
+                image = pipe.watermark.apply_watermark(image)
+
+            image = pipe.image_processor.postprocess(image, output_type=output_type)
+
+        return StableDiffusionXLPipelineOutput(images=image)
+
+
+# The denoising loops of the pipelines that support continuous batching, by class name so that subclasses of these
+# pipelines are supported as well.
+_DENOISING_LOOPS = {
+    "FluxPipeline": _FluxDenoisingLoop,
+    "StableDiffusionXLPipeline": _StableDiffusionXLDenoisingLoop,
+}
+
+
+def _get_denoising_loop(pipeline) -> _DenoisingLoop:
+    for cls in type(pipeline).__mro__:
+        if cls.__name__ in _DENOISING_LOOPS:
+            return _DENOISING_LOOPS[cls.__name__](pipeline)
+    raise ValueError(
+        f"Continuous batching is not supported for {pipeline.__class__.__name__}, the supported pipelines are"
+        f" {', '.join(_DENOISING_LOOPS)}."
+    )
+
+
+class ContinuousBatchRequest:
+    r"""
+    A request queued in a [`ContinuousBatchingEngine`].
+
+    Attributes:
+        kwargs (`Dict[str, Any]`):
+            The arguments of the request.
+        num_images (`int`):
+            The number of images generated by the request.
+        state ([`~serving.continuous_batching.DenoisingState`], *optional*):
+            The denoising state of the request, once it joined the running batch.
+        future (`concurrent.futures.Future`):
+            The future that is resolved with the output of the request.
+    """
+
+    def __init__(self, kwargs: Dict[str, Any]) -> None:
+        prompt = kwargs.get("prompt")
+        if prompt is not None:
+            num_prompts = 1 if isinstance(prompt, str) else len(prompt)
+        elif kwargs.get("prompt_embeds") is not None:
+            num_prompts = kwargs["prompt_embeds"].shape[0]
+        else:
+            raise ValueError("Provide either `prompt` or `prompt_embeds`.")
+
+        self.kwargs = kwargs
+        self.num_images = num_prompts * (kwargs.get("num_images_per_prompt") or 1)
+        self.state: Optional[DenoisingState] = None
+        self.future = Future()
+
+
+class ContinuousBatchingEngine:
+    r"""
+    A serving engine that batches the requests to a pipeline at the level of the denoising steps, so that requests can
+    join and leave the running batch at any step instead of waiting for a whole batch to finish.
+
+    Every request keeps its own latents, step index and noise schedule, so requests with different numbers of inference
+    steps, resolutions or guidance scales are denoised together. At each iteration, the queued requests join the
+    running batch as long as it has fewer than `max_batch_size` images, and all the requests of the batch run one
+    denoising step with the batched `batch_step` of the scheduler. Requests whose inputs can't be concatenated, like
+    different resolutions, run in separate calls of the denoiser within the same iteration. Finished requests leave
+    the batch and are decoded by the VAE in a separate thread while the others keep denoising.
+
+    The preparation of a request, every batched denoising step and every decoding run one at a time with the streamed
+    calls of the pipeline, see [`~DiffusionPipeline.astream`], and the batches of a [`RequestBatchingEngine`], so
+    that they can share the pipeline.
+
+    The `FluxPipeline` and `StableDiffusionXLPipeline` pipelines and their subclasses are supported, with a scheduler
+    that has a `batch_step` method like `FlowMatchEulerDiscreteScheduler` or `EulerDiscreteScheduler`. The requests
+    accept the arguments of the pipeline call, except for the callbacks, IP-Adapter images, `denoising_end` and the
+    true classifier-free guidance of Flux.
+
+    Args:
+        pipeline (`DiffusionPipeline`):
+            The pipeline to batch the denoising steps of.
+        max_batch_size (`int`, defaults to 8):
+            The maximum number of images in the running batch. A single request that asks for more images runs alone.
+
+    Example:
+
+    ```python
+    >>> import torch
+    >>> from diffusers import ContinuousBatchingEngine, FluxPipeline
+
+    >>> pipe = FluxPipeline.from_pretrained("black-forest-labs/FLUX.1-dev", torch_dtype=torch.bfloat16).to("cuda")
+    >>> engine = ContinuousBatchingEngine(pipe, max_batch_size=8)
+
+    >>> # a 4-step request doesn't wait for a 28-step request submitted before it
+    >>> slow = engine.submit(prompt="a photo of a cat", num_inference_steps=28)
+    >>> fast = engine.submit(prompt="a photo of a dog", num_inference_steps=4)
+    >>> image = fast.result().images[0]
+    >>> engine.stop()
+    ```
+    """
+
+    def __init__(self, pipeline, max_batch_size: int = 8) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"`max_batch_size` must be at least 1, but is {max_batch_size}.")
+
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.num_steps = 0
+        self.num_requests = 0
+
+        self._loop = _get_denoising_loop(pipeline)
+        # the worker threads started by every `start` have their own queues, so that workers started right after
+        # `stop` never receive the stop signal or the requests of the previous ones
+        self._queue: Optional[queue.Queue] = None
+        self._threads: Optional[List[threading.Thread]] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        r"""Starts the worker threads of the engine. They are started automatically by the first request."""
+        with self._lock:
+            self._start()
+
+    def _start(self) -> None:
+        if self._threads is None:
+            self._queue = queue.Queue()
+            decode_queue = queue.Queue()
+            self._threads = [
+                threading.Thread(
+                    target=self._run, args=(self._queue, decode_queue), name="ContinuousBatchingEngine", daemon=True
+                ),
+                threading.Thread(
+                    target=self._run_decode, args=(decode_queue,), name="ContinuousBatchingEngineDecode", daemon=True
+                ),
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self) -> None:
+        r"""Finishes the requests that are already queued and stops the worker threads."""
+        with self._lock:
+            threads, self._threads = self._threads, None
+            if threads is not None:
+                self._queue.put(_STOP)
+                self._queue = None
+        if threads is not None:
+            for thread in threads:
+                thread.join()
+
+    def __enter__(self) -> "ContinuousBatchingEngine":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def submit(self, **kwargs) -> Future:
+        r"""
+        Queues a request and returns a future that is resolved with its output.
+
+        Args:
+            kwargs:
+                The arguments of the pipeline call.
+
+        Returns:
+            `concurrent.futures.Future`: The future of the pipeline output of the request. Cancelling the future before
+            the request joins the running batch removes it from the queue.
+        """
+        # unsupported arguments are reported right away rather than through the future
+        inspect.signature(self._loop.prepare).bind(**kwargs)
+        request = ContinuousBatchRequest(kwargs)
+        with self._lock:
+            self._start()
+            self._queue.put(request)
+        return request.future
+
+    def __call__(self, **kwargs):
+        r"""Queues a request and waits for its output. See [`~ContinuousBatchingEngine.submit`]."""
+        return self.submit(**kwargs).result()
+
+    async def generate(self, **kwargs):
+        r"""
+        Queues a request and awaits its output without blocking the event loop. See
+        [`~ContinuousBatchingEngine.submit`].
+        """
+        return await asyncio.wrap_future(self.submit(**kwargs))
+
+    def _run(self, requests: queue.Queue, decode_queue: queue.Queue) -> None:
+        pending = collections.deque()
+        active: List[ContinuousBatchRequest] = []
+        stopping = False
+        while True:
+            # take the new requests, and only wait for one when there is nothing to denoise
+            while True:
+                wait = not stopping and len(active) == 0 and len(pending) == 0
+                try:
+                    item = requests.get() if wait else requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    pending.append(item)
+
+            if stopping and len(active) == 0 and len(pending) == 0:
+                break
+
+            self._admit(pending, active, decode_queue)
+            if len(active) > 0:
+                active = self._step(active, decode_queue)
+
+        decode_queue.put(_STOP)
+
+    def _admit(
+        self, pending: collections.deque, active: List[ContinuousBatchRequest], decode_queue: queue.Queue
+    ) -> None:
+        num_images = sum(request.num_images for request in active)
+        while len(pending) > 0:
+            request = pending[0]
+            # requests join in order, the first one always fits in an empty batch
+            if len(active) > 0 and num_images + request.num_images > self.max_batch_size:
+                break
+            pending.popleft()
+
+            # requests cancelled while queued are dropped
+            if not request.future.set_running_or_notify_cancel():
+                continue
+            try:
+                # the scheduler and the models are shared with the other calls of the pipeline, see
+                # `DiffusionPipeline.astream` and `RequestBatchingEngine`
+                with _get_call_lock(self.pipeline):
+                    request.state = self._loop.prepare(**request.kwargs)
+            except Exception as e:
+                request.future.set_exception(e)
+                continue
+
+            if request.state.is_finished:
+                decode_queue.put(request)
+            else:
+                active.append(request)
+                num_images += request.num_images
+
+    def _step(self, active: List[ContinuousBatchRequest], decode_queue: queue.Queue) -> List[ContinuousBatchRequest]:
+        groups = collections.defaultdict(list)
+        for request in active:
+            groups[request.state.key].append(request)
+
+        for requests in groups.values():
+            try:
+                with _get_call_lock(self.pipeline):
+                    self._loop.step([request.state for request in requests])
+            except Exception as e:
+                for request in requests:
+                    request.future.set_exception(e)
+                    request.state = None
+            self.num_steps += 1
+
+        logger.debug(f"Ran a denoising step of {len(active)} requests in {len(groups)} batches.")
+
+        remaining = []
+        for request in active:
+            if request.state is None:
+                continue
+            if request.state.is_finished:
+                decode_queue.put(request)
+            else:
+                remaining.append(request)
+        return remaining
+
+    def _run_decode(self, decode_queue: queue.Queue) -> None:
+        while True:
+            request = decode_queue.get()
+            if request is _STOP:
+                break
+
+            try:
+                with _get_call_lock(self.pipeline):
+                    output = self._loop.decode(request.state)
+            except Exception as e:
+                request.future.set_exception(e)
+            else:
+                request.future.set_result(output)
+            finally:
+                request.state = None
+                self.num_requests += 1
@@ -0,0 +1,350 @@
+# Copyright 2024 The HuggingFace Team. All rights reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import dataclasses
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from ..pipelines.pipeline_streaming import _get_call_lock
+from ..utils import logging
+
+
+logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
+
+
+# The arguments that are given per prompt, and are concatenated over the requests of a batch. All the other arguments
+# must be equal for requests to be batched together.
+PER_PROMPT_ARGUMENTS = (
+    "prompt",
+    "prompt_2",
+    "prompt_3",
+    "negative_prompt",
+    "negative_prompt_2",
+    "negative_prompt_3",
+)
+
+_STOP = object()
+
+
+class _Unbatchable(Exception):
+    pass
+
+
+def _to_batch_key(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_to_batch_key(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _to_batch_key(v)) for k, v in value.items()))
+    raise _Unbatchable
+
+
+class BatchRequest:
+    r"""
+    A request queued in a [`RequestBatchingEngine`], with the prompts and generators of each of its images.
+
+    Attributes:
+        prompts (`Dict[str, List[str]]`):
+            The per-prompt arguments of the request, repeated `num_images_per_prompt` times, so that there is one entry
+            per image.
+        generators (`List[torch.Generator]`, *optional*):
+            One generator per image, or `None` if the request didn't pass a generator.
+        kwargs (`Dict[str, Any]`):
+            The other arguments of the request, which are passed to the pipeline as is.
+        key (`Any`):
+            The batching key of the request. Requests with the same key are batched together.
+        future (`concurrent.futures.Future`):
+            The future that is resolved with the output of the request.
+    """
+
+    _counter = itertools.count()
+
+    def __init__(self, kwargs: Dict[str, Any]) -> None:
+        kwargs = dict(kwargs)
+        num_images_per_prompt = kwargs.pop("num_images_per_prompt", None) or 1
+        generator = kwargs.pop("generator", None)
+
+        prompt = kwargs.pop("prompt", None)
+        if prompt is None:
+            raise ValueError(
+                "Batched requests need a `prompt`, pass `prompt_embeds` to the pipeline directly instead."
+            )
+        num_prompts = 1 if isinstance(prompt, str) else len(prompt)
+
+        self.prompts = {}
+        for name in PER_PROMPT_ARGUMENTS:
+            value = prompt if name == "prompt" else kwargs.pop(name, None)
+            if value is None:
+                continue
+            values = [value] * num_prompts if isinstance(value, str) else list(value)
+            if len(values) != num_prompts:
+                raise ValueError(f"`{name}` has {len(values)} entries but there are {num_prompts} prompts.")
+            self.prompts[name] = [v for v in values for _ in range(num_images_per_prompt)]
+        self.num_images = num_prompts * num_images_per_prompt
+
+        # one generator per image, a single generator is shared by all the images like in an unbatched call
+        if generator is None or isinstance(generator, list):
+            self.generators = generator
+        else:
+            self.generators = [generator] * self.num_images
+        if self.generators is not None and len(self.generators) != self.num_images:
+            raise ValueError(f"Got {len(self.generators)} generators for {self.num_images} images.")
+
+        self.kwargs = kwargs
+        try:
+            self.key = (tuple(sorted(self.prompts)), _to_batch_key(kwargs))
+        except _Unbatchable:
+            # arguments like images or embeddings can't be compared, so the request runs alone
+            self.key = ("unbatchable", next(self._counter))
+
+        self.arrival_time = time.monotonic()
+        self.future = Future()
+
+
+class RequestBatchingEngine:
+    r"""
+    A serving engine that queues the calls to a pipeline and runs compatible ones as a single batched call, to keep
+    the accelerator busy when a server receives many concurrent requests.
+
+    Requests are compatible when all their arguments other than the prompts, negative prompts and generators are
+    equal, for example the same resolution, number of inference steps and guidance scale. A batch is started as soon as
+    `max_batch_size` images of compatible requests are queued, or `max_wait_time` seconds after its first request
+    arrived. The output of the batched call is then split back into one output per request. Requests with arguments
+    that can't be compared, like input images or precomputed embeddings, run in a batch of their own.
+
+    The pipeline is only called from the worker thread of the engine, so a single pipeline can serve all requests.
+
+    Args:
+        pipeline (`DiffusionPipeline`):
+            The pipeline to batch the calls of.
+        max_batch_size (`int`, defaults to 8):
+            The maximum number of images generated by a batched call. A single request that asks for more images runs
+            alone.
+        max_wait_time (`float`, defaults to 0.01):
+            The maximum time in seconds that the first request of a batch waits for other requests to join it.
+
+    Example:
+
+    ```python
+    >>> import torch
+    >>> from diffusers import RequestBatchingEngine, StableDiffusion3Pipeline
+
+    >>> pipe = StableDiffusion3Pipeline.from_pretrained(
+    ...     "stabilityai/stable-diffusion-3.5-medium", torch_dtype=torch.bfloat16
+    ... ).to("cuda")
+    >>> engine = RequestBatchingEngine(pipe, max_batch_size=4, max_wait_time=0.05)
+
+    >>> # from any number of threads, or with `await engine.generate(...)` in an event loop
+    >>> image = engine(prompt="a photo of a cat", num_inference_steps=28).images[0]
+    >>> engine.stop()
+    ```
+    """
+
+    def __init__(self, pipeline, max_batch_size: int = 8, max_wait_time: float = 0.01) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"`max_batch_size` must be at least 1, but is {max_batch_size}.")
+
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait_time = max_wait_time
+        self.num_batches = 0
+        self.num_requests = 0
+
+        # every worker thread has its own queue, so that a worker started right after `stop` never receives the stop
+        # signal or the requests of the previous one
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        r"""Starts the worker thread of the engine. It is started automatically by the first request."""
+        with self._lock:
+            self._start()
+
+    def _start(self) -> None:
+        if self._thread is None:
+            self._queue = queue.Queue()
+            self._thread = threading.Thread(
+                target=self._run, args=(self._queue,), name="RequestBatchingEngine", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        r"""Runs the requests that are already queued and stops the worker thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(_STOP)
+                self._queue = None
+        if thread is not None:
+            thread.join()
+
+    def __enter__(self) -> "RequestBatchingEngine":
+        self.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def submit(self, **kwargs) -> Future:
+        r"""
+        Queues a request and returns a future that is resolved with its output.
+
+        Args:
+            kwargs:
+                The arguments of the pipeline call. `prompt` is required, and `generator` can be a single generator
+                or one generator per image.
+
+        Returns:
+            `concurrent.futures.Future`: The future of the pipeline output of the request, with only the images of this
+            request. Cancelling the future before its batch starts removes the request from the queue.
+        """
+        request = BatchRequest(kwargs)
+        with self._lock:
+            self._start()
+            self._queue.put(request)
+        return request.future
+
+    def __call__(self, **kwargs):
+        r"""Queues a request and waits for its output. See [`~RequestBatchingEngine.submit`]."""
+        return self.submit(**kwargs).result()
+
+    async def generate(self, **kwargs):
+        r"""
+        Queues a request and awaits its output without blocking the event loop. See [`~RequestBatchingEngine.submit`].
+        """
+        return await asyncio.wrap_future(self.submit(**kwargs))
+
+    def _run(self, requests: queue.Queue) -> None:
+        pending: List[BatchRequest] = []
+        stopping = False
+        while not (stopping and len(pending) == 0):
+            if len(pending) == 0:
+                item = requests.get()
+                if item is _STOP:
+                    break
+                pending.append(item)
+
+            # wait for more requests to join the batch of the oldest request, until it's full or its time is up
+            first = pending[0]
+            deadline = first.arrival_time + self.max_wait_time
+            while not stopping and self._num_batchable_images(pending, first.key) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    pending.append(item)
+
+            batch, pending = self._take_batch(pending, first.key)
+            if len(batch) > 0:
+                self._run_batch(batch)
+
+    def _num_batchable_images(self, pending: List[BatchRequest], key) -> int:
+        return sum(request.num_images for request in pending if request.key == key)
+
+    def _take_batch(self, pending: List[BatchRequest], key) -> Tuple[List[BatchRequest], List[BatchRequest]]:
+        batch, remaining, num_images = [], [], 0
+        for request in pending:
+            fits = len(batch) == 0 or num_images + request.num_images <= self.max_batch_size
+            if request.key == key and fits:
+                # requests cancelled while queued are dropped
+                if request.future.set_running_or_notify_cancel():
+                    batch.append(request)
+                    num_images += request.num_images
+            else:
+                remaining.append(request)
+        return batch, remaining
+
+    def _run_batch(self, batch: List[BatchRequest]) -> None:
+        kwargs = dict(batch[0].kwargs)
+        for name in batch[0].prompts:
+            kwargs[name] = [prompt for request in batch for prompt in request.prompts[name]]
+        kwargs["generator"] = _get_batch_generators(batch)
+
+        num_images = [request.num_images for request in batch]
+        logger.debug(f"Running a batch of {len(batch)} requests with {sum(num_images)} images.")
+        try:
+            # the streamed calls of the pipeline, see `DiffusionPipeline.astream`, don't run at the same time
+            with _get_call_lock(self.pipeline):
+                output = self.pipeline(**kwargs)
+            outputs = _split_output(output, num_images)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        finally:
+            self.num_batches += 1
+            self.num_requests += len(batch)
+
+        for request, request_output in zip(batch, outputs):
+            request.future.set_result(request_output)
+
+
+def _get_batch_generators(batch: List[BatchRequest]) -> Optional[List[torch.Generator]]:
+    # the images of the requests without a generator get a randomly seeded one, on the device of the other generators
+    given = [generator for request in batch if request.generators is not None for generator in request.generators]
+    if len(given) == 0:
+        return None
+
+    device = given[0].device
+    generators = []
+    for request in batch:
+        if request.generators is not None:
+            generators.extend(request.generators)
+        else:
+            for _ in range(request.num_images):
+                generator = torch.Generator(device=device)
+                generator.seed()
+                generators.append(generator)
+    return generators
+
+
+def _split_value(value: Any, num_images: List[int]) -> Optional[List[Any]]:
+    # `None` if the value isn't batched over the images
+    if isinstance(value, (list, tuple, np.ndarray, torch.Tensor)) and len(value) == sum(num_images):
+        offsets = np.cumsum([0] + num_images)
+        return [value[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    return None
+
+
+def _split_output(output: Any, num_images: List[int]) -> List[Any]:
+    if dataclasses.is_dataclass(output):
+        # the fields that are `None` are not items of the output, but are still required to create it
+        fields = {}
+        for name, value in ((field.name, getattr(output, field.name)) for field in dataclasses.fields(output)):
+            split = _split_value(value, num_images)
+            fields[name] = split if split is not None else [value] * len(num_images)
+        return [type(output)(**{name: values[i] for name, values in fields.items()}) for i in range(len(num_images))]
+
+    if isinstance(output, tuple):
+        values = []
+        for value in output:
+            split = _split_value(value, num_images)
+            values.append(split if split is not None else [value] * len(num_images))
+        return [tuple(value[i] for value in values) for i in range(len(num_images))]
+
+    raise ValueError(f"Can't split an output of type {type(output)} into the outputs of the requests.")
@@ -22,6 +22,8 @@ from .constants import (
     CONFIG_NAME,
     DEPRECATED_REVISION_ARGS,
     DIFFUSERS_DYNAMIC_MODULE_NAME,
+    DIFFUSERS_MAX_LOADING_WORKERS,
+    DIFFUSERS_SINGLE_FILE_CACHE,
     FLAX_WEIGHTS_NAME,
     GGUF_FILE_EXTENSION,
     HF_MODULES_CACHE,
@@ -40,6 +40,10 @@ HUGGINGFACE_CO_RESOLVE_ENDPOINT = os.environ.get("HF_ENDPOINT", "https://hugging
 DIFFUSERS_DYNAMIC_MODULE_NAME = "diffusers_modules"
 HF_MODULES_CACHE = os.getenv("HF_MODULES_CACHE", os.path.join(HF_HOME, "modules"))
 DEPRECATED_REVISION_ARGS = ["fp16", "non-ema"]
+# The maximum number of threads used to read checkpoint shards concurrently.
+DIFFUSERS_MAX_LOADING_WORKERS = int(os.getenv("DIFFUSERS_MAX_LOADING_WORKERS", "8"))
+# The default directory in which `from_single_file` caches converted checkpoints. Caching is disabled when not set.
+DIFFUSERS_SINGLE_FILE_CACHE = os.getenv("DIFFUSERS_SINGLE_FILE_CACHE", None)
 
 # Below should be `True` if the current version of `peft` and `transformers` are compatible with
 # PEFT backend. Will automatically fall back to PEFT backend if the correct versions of the libraries are
@@ -0,0 +1,100 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import torch
+
+from diffusers.hooks import apply_group_offloading
+from diffusers.hooks.group_offloading import _GROUP_OFFLOADING, _get_group_onload_device
+from diffusers.utils.testing_utils import torch_device
+
+from .test_hooks import DummyModel
+
+
+class GroupOffloadingTests(unittest.TestCase):
+    in_features = 4
+    hidden_features = 8
+    out_features = 4
+    num_layers = 4
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = DummyModel(self.in_features, self.hidden_features, self.out_features, self.num_layers)
+        self.model.to(torch_device)
+        self.input = torch.randn(1, self.in_features, generator=torch.Generator().manual_seed(0)).to(torch_device)
+
+    def _record_onloaded_groups(self):
+        # Records, for every block call, which block groups are onloaded while the block runs.
+        groups = [block._diffusers_hook.get_hook(_GROUP_OFFLOADING).group for block in self.model.blocks]
+        records = []
+
+        def record(module, args):
+            records.append([group.is_onloaded for group in groups])
+
+        for block in self.model.blocks:
+            block.proj_in.register_forward_pre_hook(record)
+        return records
+
+    def test_group_offloading_output(self):
+        with torch.no_grad():
+            expected_output = self.model(self.input)
+
+        apply_group_offloading(self.model, onload_device=torch_device, num_blocks_per_group=2)
+        with torch.no_grad():
+            output = self.model(self.input)
+
+        self.assertTrue(torch.allclose(expected_output, output))
+        self.assertEqual(_get_group_onload_device(self.model), torch.device(torch_device))
+        for parameter in self.model.parameters():
+            self.assertEqual(parameter.device.type, "cpu")
+
+    def test_only_current_group_is_onloaded(self):
+        apply_group_offloading(self.model, onload_device=torch_device, num_blocks_per_group=1)
+        records = self._record_onloaded_groups()
+        with torch.no_grad():
+            self.model(self.input)
+
+        # Without prefetching, every group is onloaded right before it runs and offloaded right after.
+        self.assertEqual(len(records), self.num_layers)
+        for i, onloaded in enumerate(records):
+            self.assertEqual(onloaded, [j == i for j in range(self.num_layers)])
+
+    def test_prefetch_next_group(self):
+        with torch.no_grad():
+            expected_output = self.model(self.input)
+
+        apply_group_offloading(self.model, onload_device=torch_device, num_blocks_per_group=1, use_stream=True)
+        records = self._record_onloaded_groups()
+        for _ in range(2):
+            records.clear()
+            with torch.no_grad():
+                output = self.model(self.input)
+            self.assertTrue(torch.allclose(expected_output, output))
+
+            # The next group is prefetched while the current one runs.
+            for i, onloaded in enumerate(records):
+                self.assertEqual(onloaded, [j in (i, i + 1) for j in range(self.num_layers)])
+
+        block_groups = [block._diffusers_hook.get_hook(_GROUP_OFFLOADING).group for block in self.model.blocks]
+        self.assertFalse(any(group.is_onloaded for group in block_groups))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            apply_group_offloading(self.model, onload_device=torch_device, num_blocks_per_group=0)
+
+        apply_group_offloading(self.model, onload_device=torch_device)
+        with self.assertRaises(ValueError):
+            apply_group_offloading(self.model, onload_device=torch_device)
@@ -0,0 +1,258 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import torch
+
+from diffusers.hooks import HookRegistry, ModelHook
+from diffusers.utils.testing_utils import torch_device
+
+
+class DummyBlock(torch.nn.Module):
+    def __init__(self, in_features: int, hidden_features: int, out_features: int) -> None:
+        super().__init__()
+
+        self.proj_in = torch.nn.Linear(in_features, hidden_features)
+        self.activation = torch.nn.ReLU()
+        self.proj_out = torch.nn.Linear(hidden_features, out_features)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        x = self.proj_in(x)
+        x = self.activation(x)
+        x = self.proj_out(x)
+        return x
+
+
+class DummyModel(torch.nn.Module):
+    def __init__(self, in_features: int, hidden_features: int, out_features: int, num_layers: int) -> None:
+        super().__init__()
+
+        self.linear_1 = torch.nn.Linear(in_features, hidden_features)
+        self.activation = torch.nn.ReLU()
+        self.blocks = torch.nn.ModuleList(
+            [DummyBlock(hidden_features, hidden_features, hidden_features) for _ in range(num_layers)]
+        )
+        self.linear_2 = torch.nn.Linear(hidden_features, out_features)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        x = self.linear_1(x)
+        x = self.activation(x)
+        for block in self.blocks:
+            x = block(x)
+        x = self.linear_2(x)
+        return x
+
+
+class AddHook(ModelHook):
+    def __init__(self, value: int, calls: list = None):
+        super().__init__()
+        self.value = value
+        self.calls = calls
+
+    def pre_forward(self, module, *args, **kwargs):
+        if self.calls is not None:
+            self.calls.append(f"{self.__class__.__name__}({self.value}).pre_forward")
+        args = ((x + self.value) if torch.is_tensor(x) else x for x in args)
+        return args, kwargs
+
+    def post_forward(self, module, output):
+        if self.calls is not None:
+            self.calls.append(f"{self.__class__.__name__}({self.value}).post_forward")
+        return output
+
+
+class MultiplyHook(AddHook):
+    def pre_forward(self, module, *args, **kwargs):
+        if self.calls is not None:
+            self.calls.append(f"{self.__class__.__name__}({self.value}).pre_forward")
+        args = ((x * self.value) if torch.is_tensor(x) else x for x in args)
+        return args, kwargs
+
+
+class SkipLayerHook(ModelHook):
+    def __init__(self, skip_layer: bool):
+        super().__init__()
+        self.skip_layer = skip_layer
+
+    def new_forward(self, module, *args, **kwargs):
+        if self.skip_layer:
+            return args[0]
+        return self.fn_ref.original_forward(*args, **kwargs)
+
+
+class StatefulAddHook(ModelHook):
+    _is_stateful = True
+
+    def __init__(self):
+        super().__init__()
+        self.increment = 0
+
+    def pre_forward(self, module, *args, **kwargs):
+        self.increment += 1
+        args = ((x + self.increment) if torch.is_tensor(x) else x for x in args)
+        return args, kwargs
+
+    def reset_state(self, module):
+        self.increment = 0
+        return module
+
+
+class HookTests(unittest.TestCase):
+    in_features = 4
+    hidden_features = 8
+    out_features = 4
+    num_layers = 2
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = DummyModel(self.in_features, self.hidden_features, self.out_features, self.num_layers)
+        self.model.to(torch_device)
+
+    def get_input(self):
+        generator = torch.Generator().manual_seed(0)
+        return torch.randn(1, self.in_features, generator=generator).to(torch_device)
+
+    def test_hook_registry(self):
+        registry = HookRegistry.check_if_exists_or_initialize(self.model)
+        registry.register_hook(AddHook(1), "add_hook")
+        registry.register_hook(MultiplyHook(2), "multiply_hook")
+
+        self.assertIs(HookRegistry.check_if_exists_or_initialize(self.model), registry)
+        self.assertEqual(registry._hook_order, ["add_hook", "multiply_hook"])
+        self.assertIsInstance(registry.get_hook("add_hook"), AddHook)
+        self.assertIsNone(registry.get_hook("missing_hook"))
+
+        with self.assertRaises(ValueError):
+            registry.register_hook(AddHook(1), "add_hook")
+
+    def test_stateless_hook_output(self):
+        input = self.get_input()
+        with torch.no_grad():
+            expected_output = self.model(input + 1)
+
+        registry = HookRegistry.check_if_exists_or_initialize(self.model)
+        registry.register_hook(AddHook(1), "add_hook")
+        with torch.no_grad():
+            output = self.model(input)
+
+        self.assertTrue(torch.allclose(output, expected_output))
+
+    def test_hook_ordering(self):
+        input = self.get_input()
+        calls = []
+
+        registry = HookRegistry.check_if_exists_or_initialize(self.model)
+        registry.register_hook(AddHook(1, calls), "add_hook")
+        registry.register_hook(MultiplyHook(2, calls), "multiply_hook")
+        with torch.no_grad():
+            output = self.model(input)
+            # Hooks registered later wrap the ones registered earlier.
+            expected_output = self.model.__class__.forward(self.model, input * 2 + 1)
+
+        self.assertTrue(torch.allclose(output, expected_output))
+        self.assertEqual(
+            calls,
+            [
+                "MultiplyHook(2).pre_forward",
+                "AddHook(1).pre_forward",
+                "AddHook(1).post_forward",
+                "MultiplyHook(2).post_forward",
+            ],
+        )
+
+    def test_remove_hook_from_middle_of_chain(self):
+        input = self.get_input()
+
+        registry = HookRegistry.check_if_exists_or_initialize(self.model)
+        registry.register_hook(AddHook(1), "add_hook")
+        registry.register_hook(SkipLayerHook(skip_layer=False), "skip_layer_hook")
+        registry.register_hook(MultiplyHook(2), "multiply_hook")
+        registry.remove_hook("skip_layer_hook")
+
+        with torch.no_grad():
+            output = self.model(input)
+            expected_output = self.model.__class__.forward(self.model, input * 2 + 1)
+        self.assertTrue(torch.allclose(output, expected_output))
+        self.assertEqual(registry._hook_order, ["add_hook", "multiply_hook"])
+
+        registry.remove_hook("add_hook")
+        with torch.no_grad():
+            output = self.model(input)
+            expected_output = self.model.__class__.forward(self.model, input * 2)
+        self.assertTrue(torch.allclose(output, expected_output))
+
+        registry.remove_hook("multiply_hook")
+        self.assertNotIn("forward", self.model.__dict__)
+
+    def test_new_forward_hook(self):
+        input = self.get_input()
+        block = self.model.blocks[0]
+        registry = HookRegistry.check_if_exists_or_initialize(block)
+        registry.register_hook(SkipLayerHook(skip_layer=True), "skip_layer_hook")
+
+        hidden_states = torch.randn(1, self.hidden_features, device=torch_device)
+        self.assertIs(block(hidden_states), hidden_states)
+
+        registry.get_hook("skip_layer_hook").skip_layer = False
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(block(hidden_states), block.__class__.forward(block, hidden_states)))
+            output = self.model(input)
+
+        registry.remove_hook("skip_layer_hook")
+        with torch.no_grad():
+            expected_output = self.model(input)
+        self.assertTrue(torch.allclose(output, expected_output))
+
+    def test_stateful_hook_and_recursive_removal(self):
+        input = self.get_input()
+        with torch.no_grad():
+            expected_output = self.model(input)
+
+        for block in self.model.blocks:
+            HookRegistry.check_if_exists_or_initialize(block).register_hook(StatefulAddHook(), "stateful_add_hook")
+        root_registry = HookRegistry.check_if_exists_or_initialize(self.model)
+
+        with torch.no_grad():
+            first_output = self.model(input)
+            second_output = self.model(input)
+        self.assertFalse(torch.allclose(first_output, second_output))
+        self.assertEqual(self.model.blocks[0]._diffusers_hook.get_hook("stateful_add_hook").increment, 2)
+
+        root_registry.reset_stateful_hooks()
+        self.assertEqual(self.model.blocks[0]._diffusers_hook.get_hook("stateful_add_hook").increment, 0)
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(first_output, self.model(input)))
+
+        root_registry.remove_hook("stateful_add_hook")
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(expected_output, self.model(input)))
+        for block in self.model.blocks:
+            self.assertNotIn("forward", block.__dict__)
+
+    def test_restores_existing_instance_forward(self):
+        input = self.get_input()
+
+        def instance_forward(x):
+            return self.model.__class__.forward(self.model, x) * 3
+
+        self.model.forward = instance_forward
+        registry = HookRegistry.check_if_exists_or_initialize(self.model)
+        registry.register_hook(AddHook(1), "add_hook")
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(self.model(input), instance_forward(input + 1)))
+
+        registry.remove_hook("add_hook")
+        self.assertIs(self.model.forward, instance_forward)
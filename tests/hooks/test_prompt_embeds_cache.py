@@ -0,0 +1,219 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import threading
+import unittest
+
+import safetensors
+import safetensors.torch
+import torch
+from transformers import CLIPTextConfig, CLIPTextModel
+
+from diffusers.hooks import PromptEmbedsCacheConfig, apply_prompt_embeds_cache
+
+
+class PromptEmbedsCacheTests(unittest.TestCase):
+    def get_text_encoder(self, seed=0):
+        torch.manual_seed(seed)
+        config = CLIPTextConfig(
+            bos_token_id=0,
+            eos_token_id=2,
+            hidden_size=32,
+            intermediate_size=37,
+            layer_norm_eps=1e-05,
+            num_attention_heads=4,
+            num_hidden_layers=5,
+            pad_token_id=1,
+            vocab_size=1000,
+        )
+        return CLIPTextModel(config).eval()
+
+    def get_input_ids(self, seed):
+        return torch.randint(3, 1000, (1, 77), generator=torch.manual_seed(seed))
+
+    def test_cached_outputs_match(self):
+        text_encoder = self.get_text_encoder()
+        input_ids = self.get_input_ids(0)
+        with torch.no_grad():
+            expected = text_encoder(input_ids, output_hidden_states=True)
+
+        cache = apply_prompt_embeds_cache(text_encoder)
+        with torch.no_grad():
+            first = text_encoder(input_ids, output_hidden_states=True)
+            second = text_encoder(input_ids, output_hidden_states=True)
+            # a different flag is a different entry
+            text_encoder(input_ids, output_hidden_states=False)
+
+        self.assertIsNot(first, second)
+        self.assertTrue(torch.equal(second.last_hidden_state, expected.last_hidden_state))
+        self.assertTrue(torch.equal(second.hidden_states[-2], expected.hidden_states[-2]))
+        self.assertEqual(cache.stats["hits"], 1)
+        self.assertEqual(cache.stats["misses"], 2)
+
+        cache.remove()
+        self.assertNotIn("forward", text_encoder.__dict__)
+
+    def test_outputs_are_copies(self):
+        text_encoder = self.get_text_encoder()
+        input_ids = self.get_input_ids(0)
+        apply_prompt_embeds_cache(text_encoder)
+        with torch.no_grad():
+            expected = text_encoder(input_ids).last_hidden_state.clone()
+            # callers scaling the prompt embeddings in place don't modify the cached output
+            text_encoder(input_ids).last_hidden_state.mul_(2.0)
+            output = text_encoder(input_ids)
+        self.assertTrue(torch.equal(output.last_hidden_state, expected))
+
+    def test_concurrent_calls(self):
+        text_encoder = self.get_text_encoder()
+        input_ids = [self.get_input_ids(seed) for seed in range(4)]
+        with torch.no_grad():
+            expected = [text_encoder(ids).last_hidden_state for ids in input_ids]
+            nbytes = sum(t.numel() * t.element_size() for t in text_encoder(input_ids[0]).values())
+
+        cache = apply_prompt_embeds_cache(text_encoder, PromptEmbedsCacheConfig(max_memory=3 * nbytes))
+        errors = []
+
+        def encode(thread_index):
+            try:
+                with torch.no_grad():
+                    for i in range(20):
+                        index = (thread_index + i) % len(input_ids)
+                        output = text_encoder(input_ids[index]).last_hidden_state
+                        if not torch.equal(output, expected[index]):
+                            errors.append(index)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=encode, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = cache.stats
+        self.assertEqual(errors, [])
+        self.assertEqual(stats["hits"] + stats["misses"], 80)
+        self.assertEqual(stats["memory_usage"], stats["num_entries"] * nbytes)
+        self.assertLessEqual(stats["memory_usage"], 3 * nbytes)
+
+    def test_lru_eviction(self):
+        text_encoder = self.get_text_encoder()
+        with torch.no_grad():
+            nbytes = sum(t.numel() * t.element_size() for t in text_encoder(self.get_input_ids(0)).values())
+
+        cache = apply_prompt_embeds_cache(text_encoder, PromptEmbedsCacheConfig(max_memory=2 * nbytes))
+        with torch.no_grad():
+            for seed in [0, 1, 0, 2, 0, 1]:
+                text_encoder(self.get_input_ids(seed))
+
+        # 1 is evicted by 2, as 0 was used more recently
+        self.assertEqual(cache.stats["hits"], 2)
+        self.assertEqual(cache.stats["misses"], 4)
+        self.assertEqual(cache.stats["evictions"], 2)
+        self.assertEqual(cache.stats["num_entries"], 2)
+        self.assertEqual(cache.memory_usage, 2 * nbytes)
+
+    def test_disk_persistence(self):
+        input_ids = self.get_input_ids(0)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            text_encoder = self.get_text_encoder()
+            cache = apply_prompt_embeds_cache(text_encoder, PromptEmbedsCacheConfig(cache_dir=tmpdir))
+            with torch.no_grad():
+                expected = text_encoder(input_ids, output_hidden_states=True)
+            cache.remove()
+
+            # a new text encoder with the same weights reuses the saved output
+            text_encoder = self.get_text_encoder()
+            cache = apply_prompt_embeds_cache(text_encoder, PromptEmbedsCacheConfig(cache_dir=tmpdir))
+            with torch.no_grad():
+                output = text_encoder(input_ids, output_hidden_states=True)
+            self.assertEqual(cache.stats["disk_hits"], 1)
+            self.assertEqual(type(output), type(expected))
+            self.assertEqual(len(output.hidden_states), len(expected.hidden_states))
+            self.assertTrue(torch.equal(output.pooler_output, expected.pooler_output))
+            cache.remove()
+
+            # a text encoder with other weights doesn't
+            text_encoder = self.get_text_encoder(seed=1)
+            cache = apply_prompt_embeds_cache(text_encoder, PromptEmbedsCacheConfig(cache_dir=tmpdir))
+            with torch.no_grad():
+                output = text_encoder(input_ids, output_hidden_states=True)
+            self.assertEqual(cache.stats["disk_hits"], 0)
+            self.assertFalse(torch.equal(output.pooler_output, expected.pooler_output))
+
+    def test_training_mode_not_cached(self):
+        text_encoder = self.get_text_encoder()
+        cache = apply_prompt_embeds_cache(text_encoder)
+
+        text_encoder.train()
+        text_encoder(self.get_input_ids(0))
+        text_encoder.eval()
+        # outputs that require grad are computed but not cached
+        text_encoder(self.get_input_ids(0))
+        self.assertEqual(cache.stats["num_entries"], 0)
+
+    def test_modified_weights_not_reused(self):
+        text_encoder = self.get_text_encoder()
+        input_ids = self.get_input_ids(0)
+        cache = apply_prompt_embeds_cache(text_encoder)
+        with torch.no_grad():
+            text_encoder(input_ids)
+            # only a layer in the middle of the text encoder is modified after the cache was applied
+            text_encoder.text_model.encoder.layers[2].mlp.fc1.weight.add_(1.0)
+            output = text_encoder(input_ids)
+            text_encoder(input_ids)
+        self.assertEqual(cache.stats["misses"], 2)
+        self.assertEqual(cache.stats["hits"], 1)
+
+        cache.remove()
+        with torch.no_grad():
+            expected = text_encoder(input_ids)
+        self.assertTrue(torch.equal(output.last_hidden_state, expected.last_hidden_state))
+
+    def test_dtype_is_part_of_the_key(self):
+        text_encoder = self.get_text_encoder()
+        input_ids = self.get_input_ids(0)
+        cache = apply_prompt_embeds_cache(text_encoder)
+        with torch.no_grad():
+            text_encoder(input_ids)
+            text_encoder.to(torch.bfloat16)
+            output = text_encoder(input_ids)
+        self.assertEqual(cache.stats["misses"], 2)
+        self.assertEqual(output.last_hidden_state.dtype, torch.bfloat16)
+
+    def test_corrupt_file_is_a_miss(self):
+        input_ids = self.get_input_ids(0)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            text_encoder = self.get_text_encoder()
+            cache = apply_prompt_embeds_cache(text_encoder, PromptEmbedsCacheConfig(cache_dir=tmpdir))
+            with torch.no_grad():
+                expected = text_encoder(input_ids)
+            cache.remove()
+
+            # a file whose metadata doesn't match its tensors
+            (filename,) = os.listdir(tmpdir)
+            path = os.path.join(tmpdir, filename)
+            metadata = safetensors.safe_open(path, framework="pt").metadata()
+            safetensors.torch.save_file({}, path, metadata=metadata)
+
+            cache = apply_prompt_embeds_cache(text_encoder, PromptEmbedsCacheConfig(cache_dir=tmpdir))
+            with torch.no_grad():
+                output = text_encoder(input_ids)
+            self.assertEqual(cache.stats["disk_hits"], 0)
+            self.assertEqual(cache.stats["misses"], 1)
+            self.assertTrue(torch.equal(output.last_hidden_state, expected.last_hidden_state))
@@ -35,6 +35,7 @@ from huggingface_hub.utils import is_jinja_available
 from parameterized import parameterized
 from requests.exceptions import HTTPError
 
+from diffusers import FirstBlockCacheConfig, PyramidAttentionBroadcastConfig
 from diffusers.models import UNet2DConditionModel
 from diffusers.models.attention_processor import (
     AttnProcessor,
@@ -42,6 +43,7 @@ from diffusers.models.attention_processor import (
     AttnProcessorNPU,
     XFormersAttnProcessor,
 )
+from diffusers.models.model_loading_utils import _get_param_dtype
 from diffusers.training_utils import EMAModel
 from diffusers.utils import (
     SAFE_WEIGHTS_INDEX_NAME,
@@ -342,6 +344,219 @@ class UNetTesterMixin:
         self.assertEqual(output.shape, expected_shape, "Input and output shapes do not match")
 
 
+class FirstBlockCacheTesterMixin:
+    def _get_first_block_cache_output(self, model, inputs_dict):
+        with torch.no_grad():
+            output = model(**inputs_dict, return_dict=False)[0]
+        return output
+
+    def test_first_block_cache_reuses_residual(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict).to(torch_device).eval()
+
+        expected_output = self._get_first_block_cache_output(model, inputs_dict)
+
+        model.enable_cache(FirstBlockCacheConfig(threshold=0.5))
+        self.assertTrue(model.is_cache_enabled)
+
+        first_output = self._get_first_block_cache_output(model, inputs_dict)
+        self.assertTrue(model._cache.state.should_compute)
+
+        # The first block sees identical inputs, so the remaining blocks must be skipped and their cached residual
+        # must reproduce the fully computed output.
+        second_output = self._get_first_block_cache_output(model, inputs_dict)
+        self.assertFalse(model._cache.state.should_compute)
+
+        self.assertTrue(torch.allclose(expected_output, first_output, atol=1e-5))
+        self.assertTrue(torch.allclose(expected_output, second_output, atol=1e-4))
+
+        model._reset_stateful_cache()
+        self._get_first_block_cache_output(model, inputs_dict)
+        self.assertTrue(model._cache.state.should_compute)
+
+    def test_first_block_cache_zero_threshold_always_computes(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict).to(torch_device).eval()
+
+        expected_output = self._get_first_block_cache_output(model, inputs_dict)
+
+        model.enable_cache(FirstBlockCacheConfig(threshold=0.0))
+        for _ in range(2):
+            output = self._get_first_block_cache_output(model, inputs_dict)
+            self.assertTrue(model._cache.state.should_compute)
+            self.assertTrue(torch.allclose(expected_output, output, atol=1e-5))
+
+    def test_first_block_cache_enable_disable(self):
+        init_dict, _ = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict)
+
+        model.enable_cache(FirstBlockCacheConfig())
+        with self.assertRaises(ValueError):
+            model.enable_cache(FirstBlockCacheConfig())
+
+        model.disable_cache()
+        self.assertFalse(model.is_cache_enabled)
+        for module in model.modules():
+            self.assertNotIn("forward", module.__dict__)
+
+
+class StaticTextCacheTesterMixin:
+    def test_static_text_cache_reuses_context_embedder(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict).to(torch_device).eval()
+
+        counter = {"calls": 0}
+
+        def count_calls(module, args, output):
+            counter["calls"] += 1
+
+        model.context_embedder.register_forward_hook(count_calls)
+
+        with torch.no_grad():
+            expected_output = model(**inputs_dict, return_dict=False)[0]
+
+        model.enable_static_text_cache()
+        counter["calls"] = 0
+        with torch.no_grad():
+            outputs = [model(**inputs_dict, return_dict=False)[0] for _ in range(3)]
+        self.assertEqual(counter["calls"], 1)
+        for output in outputs:
+            self.assertTrue(torch.allclose(expected_output, output, atol=1e-5))
+
+        # New prompt embeddings, in-place updates and a reset must all invalidate the cache.
+        inputs_dict["encoder_hidden_states"] = inputs_dict["encoder_hidden_states"].clone()
+        with torch.no_grad():
+            model(**inputs_dict, return_dict=False)
+            inputs_dict["encoder_hidden_states"].mul_(2.0)
+            model(**inputs_dict, return_dict=False)
+        self.assertEqual(counter["calls"], 3)
+
+        model._reset_stateful_cache()
+        with torch.no_grad():
+            model(**inputs_dict, return_dict=False)
+        self.assertEqual(counter["calls"], 4)
+
+        model.disable_static_text_cache()
+        with torch.no_grad():
+            model(**inputs_dict, return_dict=False)
+            model(**inputs_dict, return_dict=False)
+        self.assertEqual(counter["calls"], 6)
+
+    def test_static_text_cache_alternating_inputs(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict).to(torch_device).eval()
+
+        counter = {"calls": 0}
+
+        def count_calls(module, args, output):
+            counter["calls"] += 1
+
+        model.context_embedder.register_forward_hook(count_calls)
+        model.enable_static_text_cache()
+
+        # like the positive and negative prompt embeddings of true classifier-free guidance
+        cond_inputs = dict(inputs_dict)
+        uncond_inputs = dict(inputs_dict, encoder_hidden_states=torch.randn_like(inputs_dict["encoder_hidden_states"]))
+        with torch.no_grad():
+            for _ in range(3):
+                cond_output = model(**cond_inputs, return_dict=False)[0]
+                uncond_output = model(**uncond_inputs, return_dict=False)[0]
+        self.assertEqual(counter["calls"], 2)
+
+        model.disable_static_text_cache()
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(cond_output, model(**cond_inputs, return_dict=False)[0], atol=1e-5))
+            self.assertTrue(torch.allclose(uncond_output, model(**uncond_inputs, return_dict=False)[0], atol=1e-5))
+
+    def test_static_text_cache_bypassed_with_grad(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict).to(torch_device)
+        model.enable_static_text_cache()
+
+        output = model(**inputs_dict, return_dict=False)[0]
+        output.float().mean().backward()
+        self.assertIsNotNone(model.context_embedder.weight.grad)
+
+
+class PyramidAttentionBroadcastTesterMixin:
+    def _count_attention_processor_calls(self, model):
+        counter = {"calls": 0}
+
+        class CountingProcessor:
+            def __init__(self, processor):
+                self.processor = processor
+
+            def __call__(self, *args, **kwargs):
+                counter["calls"] += 1
+                return self.processor(*args, **kwargs)
+
+        for module in model.modules():
+            if hasattr(module, "processor") and callable(module.processor):
+                module.processor = CountingProcessor(module.processor)
+        return counter
+
+    def test_pyramid_attention_broadcast_reuses_attention(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict).to(torch_device).eval()
+
+        with torch.no_grad():
+            expected_output = model(**inputs_dict, return_dict=False)[0]
+
+        current_timestep = 500
+        model.enable_cache(
+            PyramidAttentionBroadcastConfig(
+                spatial_attention_block_skip_range=2,
+                temporal_attention_block_skip_range=2,
+                cross_attention_block_skip_range=2,
+                current_timestep_callback=lambda: current_timestep,
+            )
+        )
+        counter = self._count_attention_processor_calls(model)
+
+        with torch.no_grad():
+            first_output = model(**inputs_dict, return_dict=False)[0]
+            num_computed_calls = counter["calls"]
+            self.assertGreater(num_computed_calls, 0)
+
+            # The attention outputs are broadcast from the previous call, so no attention processor runs.
+            second_output = model(**inputs_dict, return_dict=False)[0]
+            self.assertEqual(counter["calls"], num_computed_calls)
+
+            # Outside of the timestep skip range, attention is always computed.
+            current_timestep = 900
+            model(**inputs_dict, return_dict=False)
+            self.assertEqual(counter["calls"], 2 * num_computed_calls)
+
+        self.assertTrue(torch.allclose(expected_output, first_output, atol=1e-5))
+        self.assertTrue(torch.allclose(expected_output, second_output, atol=1e-5))
+
+    def test_pyramid_attention_broadcast_enable_disable(self):
+        init_dict, _ = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict)
+
+        with self.assertRaises(ValueError):
+            model.enable_cache(PyramidAttentionBroadcastConfig(spatial_attention_block_skip_range=2))
+        self.assertFalse(model.is_cache_enabled)
+
+        model.enable_cache(
+            PyramidAttentionBroadcastConfig(
+                spatial_attention_block_skip_range=2, current_timestep_callback=lambda: 500
+            )
+        )
+        self.assertTrue(any("forward" in module.__dict__ for module in model.modules()))
+
+        model.disable_cache()
+        self.assertFalse(model.is_cache_enabled)
+        for module in model.modules():
+            self.assertNotIn("forward", module.__dict__)
+
+        # the default skip range is applied without changing the configuration of the caller
+        config = PyramidAttentionBroadcastConfig(current_timestep_callback=lambda: 500)
+        model.enable_cache(config)
+        self.assertIsNone(config.spatial_attention_block_skip_range)
+        model.disable_cache()
+
+
 class ModelTesterMixin:
     main_input_name = None  # overwrite in model specific tester class
     base_precision = 1e-3
@@ -675,6 +890,26 @@ class ModelTesterMixin:
                 new_model = self.model_class.from_pretrained(tmpdirname, low_cpu_mem_usage=False, torch_dtype=dtype)
                 assert new_model.dtype == dtype
 
+    @parameterized.expand([True, False])
+    def test_from_save_pretrained_mmap(self, safe_serialization):
+        init_dict, _ = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict).eval()
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            model.save_pretrained(tmpdirname, safe_serialization=safe_serialization)
+            new_model = self.model_class.from_pretrained(tmpdirname, use_mmap=True)
+
+            for name, tensor in new_model.state_dict().items():
+                torch.testing.assert_close(tensor, model.state_dict()[name], rtol=0, atol=0, equal_nan=True)
+
+            if safe_serialization:
+                # All tensors are views into the single memory map of the checkpoint file.
+                storages = {tensor.untyped_storage().data_ptr() for tensor in new_model.state_dict().values()}
+                self.assertEqual(len(storages), 1)
+
+            with self.assertRaises(ValueError):
+                self.model_class.from_pretrained(tmpdirname, use_mmap=True, low_cpu_mem_usage=False)
+
     def test_determinism(self, expected_max_diff=1e-5):
         if self.forward_requires_fresh_args:
             model = self.model_class(**self.init_dict)
@@ -1191,6 +1426,30 @@ class ModelTesterMixin:
 
                 self.assertTrue(torch.allclose(base_output[0], new_output[0], atol=1e-5))
 
+    @parameterized.expand([(True, None), (True, torch.float16), (False, None)])
+    def test_sharded_checkpoints_streaming(self, safe_serialization, torch_dtype):
+        config, _ = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**config).eval()
+
+        model_size = compute_module_persistent_sizes(model)[""]
+        max_shard_size = int((model_size * 0.25) / (2**10))  # Convert to KB as these test models are small.
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model.save_pretrained(tmp_dir, max_shard_size=f"{max_shard_size}KB", safe_serialization=safe_serialization)
+            index_file = SAFE_WEIGHTS_INDEX_NAME if safe_serialization else WEIGHTS_INDEX_NAME
+            self.assertGreater(caculate_expected_num_shards(os.path.join(tmp_dir, index_file)), 1)
+
+            new_model = self.model_class.from_pretrained(
+                tmp_dir, torch_dtype=torch_dtype, use_safetensors=safe_serialization
+            )
+
+        expected_state_dict = model.state_dict()
+        for name, tensor in new_model.state_dict().items():
+            expected_tensor = expected_state_dict[name]
+            if torch_dtype is not None and torch.is_floating_point(expected_tensor):
+                self.assertEqual(tensor.dtype, _get_param_dtype(name, torch_dtype, new_model._keep_in_fp32_modules))
+                expected_tensor = expected_tensor.to(tensor.dtype)
+            torch.testing.assert_close(tensor, expected_tensor, rtol=0, atol=0, equal_nan=True)
+
     @require_torch_gpu
     def test_sharded_checkpoints(self):
         torch.manual_seed(0)
@@ -1293,6 +1552,37 @@ class ModelTesterMixin:
             new_output = new_model(**inputs_dict)
             self.assertTrue(torch.allclose(base_output[0], new_output[0], atol=1e-5))
 
+    @parameterized.expand([(1, False), (1, True), (3, True)])
+    def test_group_offloading(self, num_blocks_per_group, use_stream):
+        if self.forward_requires_fresh_args:
+            model = self.model_class(**self.init_dict)
+        else:
+            init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+            model = self.model_class(**init_dict)
+        model.to(torch_device)
+        model.eval()
+
+        def run_forward(model):
+            torch.manual_seed(0)
+            with torch.no_grad():
+                if self.forward_requires_fresh_args:
+                    output = model(**self.inputs_dict(0))
+                else:
+                    output = model(**inputs_dict)
+            if isinstance(output, dict):
+                output = output.to_tuple()[0]
+            return output
+
+        expected_output = run_forward(model)
+        model.enable_group_offload(
+            onload_device=torch_device, num_blocks_per_group=num_blocks_per_group, use_stream=use_stream
+        )
+        output = run_forward(model)
+        self.assertTrue(torch.allclose(expected_output, output, atol=1e-5))
+
+        for tensor in [*model.parameters(), *model.buffers()]:
+            self.assertEqual(tensor.device.type, "cpu")
+
     # This test is okay without a GPU because we're not running any execution. We're just serializing
     # and check if the resultant files are following an expected format.
     def test_variant_sharded_ckpt_right_format(self):
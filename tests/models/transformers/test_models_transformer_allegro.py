@@ -22,13 +22,13 @@ from diffusers.utils.testing_utils import (
     torch_device,
 )
 
-from ..test_modeling_common import ModelTesterMixin
+from ..test_modeling_common import ModelTesterMixin, PyramidAttentionBroadcastTesterMixin
 
 
 enable_full_determinism()
 
 
-class AllegroTransformerTests(ModelTesterMixin, unittest.TestCase):
+class AllegroTransformerTests(ModelTesterMixin, PyramidAttentionBroadcastTesterMixin, unittest.TestCase):
     model_class = AllegroTransformer3DModel
     main_input_name = "hidden_states"
     uses_custom_attn_processor = True
@@ -23,13 +23,19 @@ from diffusers.utils.testing_utils import (
     torch_device,
 )
 
-from ..test_modeling_common import ModelTesterMixin
+from ..test_modeling_common import (
+    FirstBlockCacheTesterMixin,
+    ModelTesterMixin,
+    PyramidAttentionBroadcastTesterMixin,
+)
 
 
 enable_full_determinism()
 
 
-class CogVideoXTransformerTests(ModelTesterMixin, unittest.TestCase):
+class CogVideoXTransformerTests(
+    ModelTesterMixin, FirstBlockCacheTesterMixin, PyramidAttentionBroadcastTesterMixin, unittest.TestCase
+):
     model_class = CogVideoXTransformer3DModel
     main_input_name = "hidden_states"
     uses_custom_attn_processor = True
@@ -88,7 +94,9 @@ class CogVideoXTransformerTests(ModelTesterMixin, unittest.TestCase):
         super().test_gradient_checkpointing_is_applied(expected_set=expected_set)
 
 
-class CogVideoX1_5TransformerTests(ModelTesterMixin, unittest.TestCase):
+class CogVideoX1_5TransformerTests(
+    ModelTesterMixin, FirstBlockCacheTesterMixin, PyramidAttentionBroadcastTesterMixin, unittest.TestCase
+):
     model_class = CogVideoXTransformer3DModel
     main_input_name = "hidden_states"
     uses_custom_attn_processor = True
@@ -23,13 +23,13 @@ from diffusers.utils.testing_utils import (
     torch_device,
 )
 
-from ..test_modeling_common import ModelTesterMixin
+from ..test_modeling_common import ModelTesterMixin, PyramidAttentionBroadcastTesterMixin
 
 
 enable_full_determinism()
 
 
-class LatteTransformerTests(ModelTesterMixin, unittest.TestCase):
+class LatteTransformerTests(ModelTesterMixin, PyramidAttentionBroadcastTesterMixin, unittest.TestCase):
     model_class = LatteTransformer3DModel
     main_input_name = "hidden_states"
 
@@ -20,13 +20,13 @@ import torch
 from diffusers import MochiTransformer3DModel
 from diffusers.utils.testing_utils import enable_full_determinism, torch_device
 
-from ..test_modeling_common import ModelTesterMixin
+from ..test_modeling_common import ModelTesterMixin, PyramidAttentionBroadcastTesterMixin
 
 
 enable_full_determinism()
 
 
-class MochiTransformerTests(ModelTesterMixin, unittest.TestCase):
+class MochiTransformerTests(ModelTesterMixin, PyramidAttentionBroadcastTesterMixin, unittest.TestCase):
     model_class = MochiTransformer3DModel
     main_input_name = "hidden_states"
     uses_custom_attn_processor = True
@@ -24,13 +24,13 @@ from diffusers.utils.testing_utils import (
     torch_device,
 )
 
-from ..test_modeling_common import ModelTesterMixin
+from ..test_modeling_common import FirstBlockCacheTesterMixin, ModelTesterMixin, StaticTextCacheTesterMixin
 
 
 enable_full_determinism()
 
 
-class SD3TransformerTests(ModelTesterMixin, unittest.TestCase):
+class SD3TransformerTests(ModelTesterMixin, FirstBlockCacheTesterMixin, StaticTextCacheTesterMixin, unittest.TestCase):
     model_class = SD3Transformer2DModel
     main_input_name = "hidden_states"
 
@@ -104,7 +104,9 @@ class SD3TransformerTests(ModelTesterMixin, unittest.TestCase):
         super().test_gradient_checkpointing_is_applied(expected_set=expected_set)
 
 
-class SD35TransformerTests(ModelTesterMixin, unittest.TestCase):
+class SD35TransformerTests(
+    ModelTesterMixin, FirstBlockCacheTesterMixin, StaticTextCacheTesterMixin, unittest.TestCase
+):
     model_class = SD3Transformer2DModel
     main_input_name = "hidden_states"
 
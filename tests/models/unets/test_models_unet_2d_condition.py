@@ -25,7 +25,7 @@ from huggingface_hub import snapshot_download
 from parameterized import parameterized
 from pytest import mark
 
-from diffusers import UNet2DConditionModel
+from diffusers import DeepCacheConfig, UNet2DConditionModel
 from diffusers.models.attention_processor import (
     CustomDiffusionAttnProcessor,
     IPAdapterAttnProcessor,
@@ -825,6 +825,42 @@ class UNet2DConditionModelTests(ModelTesterMixin, UNetTesterMixin, unittest.Test
         # Check if input and output shapes are the same
         self.assertEqual(output.shape, expected_shape, "Input and output shapes do not match")
 
+    def test_deepcache(self):
+        init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
+        init_dict["block_out_channels"] = (16, 32)
+        init_dict["attention_head_dim"] = (8, 16)
+
+        model = self.model_class(**init_dict)
+        model.to(torch_device)
+        model.eval()
+
+        with torch.no_grad():
+            expected_sample = model(**inputs_dict).sample
+
+        model.enable_cache(DeepCacheConfig(cache_interval=2, cache_branch_id=0))
+        with torch.no_grad():
+            full_sample = model(**inputs_dict).sample
+            # uses the cached deep features, which match the fully computed ones for identical inputs
+            cached_sample = model(**inputs_dict).sample
+
+        self.assertEqual(model._cache.state.iteration, 2)
+        self.assertIsNotNone(model._cache.state.cached_hidden_states)
+        assert (expected_sample - full_sample).abs().max() < 1e-4
+        assert (expected_sample - cached_sample).abs().max() < 1e-4
+
+        model._reset_stateful_cache()
+        self.assertIsNone(model._cache.state.cached_hidden_states)
+
+        model.disable_cache()
+        self.assertFalse(model.is_cache_enabled)
+
+    def test_deepcache_invalid_branch_raises(self):
+        init_dict, _ = self.prepare_init_args_and_inputs_for_common()
+        model = self.model_class(**init_dict)
+
+        with self.assertRaises(ValueError):
+            model.enable_cache(DeepCacheConfig(cache_branch_id=len(model.down_blocks)))
+
     def test_ip_adapter(self):
         init_dict, inputs_dict = self.prepare_init_args_and_inputs_for_common()
 
@@ -757,6 +757,45 @@ class StableDiffusionPipelineFastTests(
             output[0, -3:, -3:, -1], output_no_freeu[0, -3:, -3:, -1]
         ), "Disabling of FreeU should lead to results similar to the default pipeline results."
 
+    def test_deepcache_enabled(self):
+        components = self.get_dummy_components()
+        sd_pipe = StableDiffusionPipeline(**components)
+        sd_pipe = sd_pipe.to(torch_device)
+        sd_pipe.set_progress_bar_config(disable=None)
+
+        prompt = "hey"
+        output = sd_pipe(prompt, num_inference_steps=3, output_type="np", generator=torch.manual_seed(0)).images
+
+        sd_pipe.enable_deepcache(cache_interval=2, cache_branch_id=0)
+        output_deepcache = sd_pipe(
+            prompt, num_inference_steps=3, output_type="np", generator=torch.manual_seed(0)
+        ).images
+
+        assert not np.allclose(
+            output[0, -3:, -3:, -1], output_deepcache[0, -3:, -3:, -1]
+        ), "Enabling of DeepCache should lead to different results."
+
+    def test_deepcache_disabled(self):
+        components = self.get_dummy_components()
+        sd_pipe = StableDiffusionPipeline(**components)
+        sd_pipe = sd_pipe.to(torch_device)
+        sd_pipe.set_progress_bar_config(disable=None)
+
+        prompt = "hey"
+        output = sd_pipe(prompt, num_inference_steps=3, output_type="np", generator=torch.manual_seed(0)).images
+
+        sd_pipe.enable_deepcache(cache_interval=2, cache_branch_id=0)
+        sd_pipe.disable_deepcache()
+        assert not sd_pipe.unet.is_cache_enabled, "Disabling of DeepCache should remove the cache from the UNet."
+
+        output_no_deepcache = sd_pipe(
+            prompt, num_inference_steps=3, output_type="np", generator=torch.manual_seed(0)
+        ).images
+
+        assert np.allclose(
+            output[0, -3:, -3:, -1], output_no_deepcache[0, -3:, -3:, -1]
+        ), "Disabling of DeepCache should lead to results similar to the default pipeline results."
+
     def test_fused_qkv_projections(self):
         device = "cpu"  # ensure determinism for the device-dependent torch.Generator
         components = self.get_dummy_components()
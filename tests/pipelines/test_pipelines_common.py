@@ -1,3 +1,4 @@
+import asyncio
 import gc
 import inspect
 import json
@@ -1411,6 +1412,138 @@ class PipelineTesterMixin:
         max_diff = np.abs(to_np(output) - to_np(output_loaded)).max()
         self.assertLess(max_diff, expected_max_difference)
 
+    def test_save_load_concurrently(self):
+        components = self.get_dummy_components()
+        pipe = self.pipeline_class(**components)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pipe.save_pretrained(tmpdir)
+            pipe_loaded = self.pipeline_class.from_pretrained(tmpdir)
+            pipe_loaded_concurrently = self.pipeline_class.from_pretrained(tmpdir, max_loading_workers=4)
+
+        self.assertEqual(list(pipe_loaded.components.keys()), list(pipe_loaded_concurrently.components.keys()))
+        loaded_names = [name for name, component in pipe_loaded.components.items() if component is not None]
+        self.assertEqual(sorted(pipe_loaded_concurrently.component_load_times.keys()), sorted(loaded_names))
+
+        for name, component in pipe_loaded.components.items():
+            component_loaded_concurrently = pipe_loaded_concurrently.components[name]
+            self.assertEqual(type(component), type(component_loaded_concurrently))
+            if isinstance(component, torch.nn.Module):
+                torch.testing.assert_close(
+                    component.state_dict(), component_loaded_concurrently.state_dict(), rtol=0, atol=0, equal_nan=True
+                )
+
+    def test_prompt_embeds_cache(self, expected_max_diff=1e-4):
+        components = self.get_dummy_components()
+        pipe = self.pipeline_class(**components)
+        text_encoders = [
+            component
+            for name, component in pipe.components.items()
+            if name.startswith("text_encoder") and isinstance(component, torch.nn.Module)
+        ]
+        if len(text_encoders) == 0:
+            return
+
+        # text encoders in training mode are not cached, and the dummy ones are created in training mode
+        for text_encoder in text_encoders:
+            text_encoder.eval()
+        pipe.to(torch_device)
+        pipe.set_progress_bar_config(disable=None)
+        generator_device = "cpu"
+        output = pipe(**self.get_dummy_inputs(generator_device))[0]
+
+        pipe.enable_prompt_embeds_cache()
+        pipe(**self.get_dummy_inputs(generator_device))
+        stats = pipe.prompt_embeds_cache.stats
+        output_cached = pipe(**self.get_dummy_inputs(generator_device))[0]
+
+        # the second call encodes the same prompts, so all its text encoder calls are hits
+        new_stats = pipe.prompt_embeds_cache.stats
+        self.assertEqual(new_stats["misses"], stats["misses"])
+        self.assertEqual(new_stats["hits"] - stats["hits"], stats["hits"] + stats["misses"])
+        max_diff = np.abs(to_np(output) - to_np(output_cached)).max()
+        self.assertLess(max_diff, expected_max_diff)
+
+        pipe.disable_prompt_embeds_cache()
+        self.assertIsNone(pipe.prompt_embeds_cache)
+
+    def test_astream(self, expected_max_diff=1e-4):
+        if "callback_on_step_end" not in inspect.signature(self.pipeline_class.__call__).parameters:
+            return
+
+        components = self.get_dummy_components()
+        pipe = self.pipeline_class(**components)
+        pipe.to(torch_device)
+        pipe.set_progress_bar_config(disable=None)
+        generator_device = "cpu"
+        output = pipe(**self.get_dummy_inputs(generator_device))[0]
+
+        async def stream():
+            steps = []
+            async with pipe.astream(**self.get_dummy_inputs(generator_device)) as stream:
+                async for step in stream:
+                    steps.append(step.step)
+            return steps, stream.output[0]
+
+        steps, output_streamed = asyncio.run(stream())
+        self.assertGreater(len(steps), 0)
+        self.assertEqual(steps, list(range(len(steps))))
+        max_diff = np.abs(to_np(output) - to_np(output_streamed)).max()
+        self.assertLess(max_diff, expected_max_diff)
+
+        if not hasattr(pipe, "interrupt") or len(steps) < 2:
+            return
+
+        async def cancel():
+            stream = pipe.astream(**self.get_dummy_inputs(generator_device))
+            num_steps = 0
+            async for _ in stream:
+                num_steps += 1
+                stream.cancel()
+            await stream.result()
+            return num_steps
+
+        # the remaining steps are interrupted
+        self.assertEqual(asyncio.run(cancel()), 1)
+        self.assertTrue(pipe.interrupt)
+
+    def test_stream(self, expected_max_diff=1e-4):
+        if "callback_on_step_end" not in inspect.signature(self.pipeline_class.__call__).parameters:
+            return
+
+        components = self.get_dummy_components()
+        pipe = self.pipeline_class(**components)
+        pipe.to(torch_device)
+        pipe.set_progress_bar_config(disable=None)
+        generator_device = "cpu"
+        output = pipe(**self.get_dummy_inputs(generator_device))[0]
+
+        # the pipelines without previews can still be streamed
+        preview_type = "pt" if hasattr(pipe, "_get_preview_latents") else None
+        stream = pipe.stream(preview_type=preview_type, **self.get_dummy_inputs(generator_device))
+        steps, previews = [], []
+        for step, _, preview in stream:
+            steps.append(step)
+            previews.append(preview)
+        self.assertGreater(len(steps), 0)
+        self.assertEqual(steps, list(range(len(steps))))
+        max_diff = np.abs(to_np(output) - to_np(stream.output[0])).max()
+        self.assertLess(max_diff, expected_max_diff)
+
+        if preview_type is None or "latents" not in pipe._callback_tensor_inputs:
+            return
+        for preview in previews:
+            self.assertIn(preview.ndim, (4, 5))
+            self.assertEqual(preview.shape[1], 3)
+            self.assertTrue(0 <= preview.min() and preview.max() <= 1)
+
+        # leaving the iteration early interrupts the pipeline, and no previews are computed by default
+        for _, _, preview in pipe.stream(**self.get_dummy_inputs(generator_device)):
+            self.assertIsNone(preview)
+            break
+        if hasattr(pipe, "interrupt") and len(steps) > 1:
+            self.assertTrue(pipe.interrupt)
+
     @require_accelerator
     def test_to_device(self):
         components = self.get_dummy_components()
@@ -0,0 +1,94 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import torch
+
+from diffusers import (
+    DPMSolverMultistepScheduler,
+    EulerAncestralDiscreteScheduler,
+    EulerDiscreteScheduler,
+    FlowMatchEulerDiscreteScheduler,
+    picard_sample,
+)
+
+
+class PicardSampleTest(unittest.TestCase):
+    num_inference_steps = 25
+
+    def setUp(self):
+        generator = torch.manual_seed(0)
+        self.weight = torch.randn(16, 16, generator=generator) * 0.3
+        self.noise = torch.randn(2, 16, generator=generator)
+
+    def model(self, sample, timestep):
+        return torch.tanh(sample @ self.weight) * (timestep.float()[:, None] / 1000 + 0.5)
+
+    def sequential_loop(self, scheduler, sample):
+        for t in scheduler.timesteps:
+            model_input = scheduler.scale_model_input(sample, t) if hasattr(scheduler, "scale_model_input") else sample
+            model_output = self.model(model_input, t.expand(sample.shape[0]))
+            sample = scheduler.step(model_output, t, sample).prev_sample
+        return sample
+
+    def check_matches_sequential(self, scheduler_class, **config):
+        scheduler = scheduler_class(**config)
+        scheduler.set_timesteps(self.num_inference_steps)
+        sample = self.noise * getattr(scheduler, "init_noise_sigma", 1.0)
+
+        output = picard_sample(scheduler, self.model, sample, parallel=8, tolerance=1e-4)
+        expected = self.sequential_loop(scheduler, sample)
+
+        assert torch.allclose(output.sample, expected, atol=1e-3 * expected.abs().max())
+        assert output.num_iterations < self.num_inference_steps
+        assert output.num_model_evaluations >= self.num_inference_steps
+
+    def test_euler(self):
+        self.check_matches_sequential(EulerDiscreteScheduler)
+
+    def test_dpm_solver_multistep(self):
+        self.check_matches_sequential(DPMSolverMultistepScheduler, algorithm_type="dpmsolver++")
+
+    def test_flow_match_euler(self):
+        self.check_matches_sequential(FlowMatchEulerDiscreteScheduler)
+
+    def test_scheduler_unchanged(self):
+        scheduler = EulerDiscreteScheduler()
+        scheduler.set_timesteps(self.num_inference_steps)
+        picard_sample(scheduler, self.model, self.noise * scheduler.init_noise_sigma)
+
+        assert scheduler.step_index is None
+        assert scheduler.begin_index is None
+
+    def test_parallel_one_is_sequential(self):
+        scheduler = EulerDiscreteScheduler()
+        scheduler.set_timesteps(self.num_inference_steps)
+        sample = self.noise * scheduler.init_noise_sigma
+
+        output = picard_sample(scheduler, self.model, sample, parallel=1)
+        expected = self.sequential_loop(scheduler, sample)
+
+        assert torch.allclose(output.sample, expected, atol=1e-5)
+        assert output.num_iterations == self.num_inference_steps
+
+    def test_stochastic_schedulers(self):
+        for scheduler in [
+            EulerAncestralDiscreteScheduler(),
+            DPMSolverMultistepScheduler(algorithm_type="sde-dpmsolver++"),
+        ]:
+            scheduler.set_timesteps(self.num_inference_steps)
+            with self.assertRaises(ValueError):
+                picard_sample(scheduler, self.model, self.noise * scheduler.init_noise_sigma)
@@ -269,3 +269,23 @@ class DEISMultistepSchedulerTest(SchedulerCommonTest):
 
     def test_exponential_sigmas(self):
         self.check_over_configs(use_exponential_sigmas=True)
+
+    def test_solver_coefficients(self):
+        # The precomputed weights must reproduce the update methods at every step
+        scheduler_class = self.scheduler_classes[0]
+        scheduler = scheduler_class(**self.get_scheduler_config(solver_order=3))
+        scheduler.set_timesteps(10)
+
+        generator = torch.manual_seed(0)
+        sample = torch.randn(2, 4, 8, 8, generator=generator)
+        scheduler.model_outputs = list(torch.randn(3, 2, 4, 8, 8, generator=generator))
+        for step_index in range(2, len(scheduler.timesteps)):
+            scheduler._step_index = step_index
+            expected_samples = [
+                scheduler.deis_first_order_update(scheduler.model_outputs[-1], sample=sample),
+                scheduler.multistep_deis_second_order_update(scheduler.model_outputs, sample=sample),
+                scheduler.multistep_deis_third_order_update(scheduler.model_outputs, sample=sample),
+            ]
+            for order, expected_sample in enumerate(expected_samples, start=1):
+                prev_sample = scheduler._solver_update(order, sample, noise=None)
+                assert torch.allclose(prev_sample, expected_sample, rtol=1e-4, atol=1e-5), (step_index, order)
@@ -364,3 +364,94 @@ class DPMSolverMultistepSchedulerTest(SchedulerCommonTest):
 
     def test_exponential_sigmas(self):
         self.check_over_configs(use_exponential_sigmas=True)
+
+    def test_solver_coefficients(self):
+        # The precomputed weights must reproduce the update methods at every step
+        for algorithm_type in ["dpmsolver", "dpmsolver++", "sde-dpmsolver", "sde-dpmsolver++"]:
+            for solver_type in ["midpoint", "heun"]:
+                solver_order = 2 if algorithm_type == "sde-dpmsolver" else 3
+                scheduler_class = self.scheduler_classes[0]
+                scheduler_config = self.get_scheduler_config(
+                    solver_order=solver_order, algorithm_type=algorithm_type, solver_type=solver_type
+                )
+                scheduler = scheduler_class(**scheduler_config)
+                scheduler.set_timesteps(10)
+
+                generator = torch.manual_seed(0)
+                sample = torch.randn(2, 4, 8, 8, generator=generator)
+                noise = torch.randn(2, 4, 8, 8, generator=generator)
+                scheduler.model_outputs = list(torch.randn(solver_order, 2, 4, 8, 8, generator=generator))
+                for step_index in range(solver_order - 1, len(scheduler.timesteps)):
+                    scheduler._step_index = step_index
+                    expected_samples = [
+                        scheduler.dpm_solver_first_order_update(
+                            scheduler.model_outputs[-1], sample=sample, noise=noise
+                        ),
+                        scheduler.multistep_dpm_solver_second_order_update(
+                            scheduler.model_outputs, sample=sample, noise=noise
+                        ),
+                    ]
+                    if solver_order == 3:
+                        expected_samples.append(
+                            scheduler.multistep_dpm_solver_third_order_update(
+                                scheduler.model_outputs, sample=sample, noise=noise
+                            )
+                        )
+                    for order, expected_sample in enumerate(expected_samples, start=1):
+                        prev_sample = scheduler._solver_update(order, sample, noise)
+                        assert torch.allclose(prev_sample, expected_sample, rtol=1e-4, atol=1e-5), (
+                            algorithm_type,
+                            solver_type,
+                            step_index,
+                            order,
+                        )
+
+    def test_model_outputs_history(self):
+        scheduler_class = self.scheduler_classes[0]
+        scheduler = scheduler_class(**self.get_scheduler_config(solver_order=3))
+        sample = self.dummy_sample_deter
+        model = self.dummy_model()
+
+        scheduler.set_timesteps(10)
+        for t in scheduler.timesteps[:4]:
+            residual = model(sample, t)
+            sample = scheduler.step(residual, t, sample).prev_sample
+            buffer = scheduler.model_outputs.buffer
+
+        # the history keeps the last `solver_order` model outputs without reallocating
+        assert scheduler.model_outputs.buffer.data_ptr() == buffer.data_ptr()
+        assert scheduler.model_outputs.num_entries == 3
+
+        scheduler.set_timesteps(10)
+        assert list(scheduler.model_outputs) == [None, None, None]
+
+        # it can still be set from a list, in which missing model outputs are `None`
+        model_outputs = [None, sample, 0.1 * sample]
+        scheduler.model_outputs = model_outputs
+        assert scheduler.model_outputs[0] is None
+        assert torch.equal(scheduler.model_outputs[1], model_outputs[1])
+        assert torch.equal(scheduler.model_outputs[-1], model_outputs[2])
+        assert scheduler.model_outputs.buffer.data_ptr() == buffer.data_ptr()
+
+        # the entries returned by the history are copies, which later steps don't overwrite
+        kept = list(scheduler.model_outputs)
+        for t in scheduler.timesteps[:3]:
+            sample = scheduler.step(model(sample, t), t, sample).prev_sample
+        assert torch.equal(kept[-1], model_outputs[2])
+
+    def test_indices_for_timesteps(self):
+        scheduler_class = self.scheduler_classes[0]
+        scheduler = scheduler_class(**self.get_scheduler_config())
+        scheduler.set_timesteps(10)
+
+        timesteps = torch.cat([scheduler.timesteps[torch.randint(0, 10, (64,))], torch.tensor([1, 1000])])
+        expected_indices = [scheduler.index_for_timestep(t) for t in timesteps]
+        assert scheduler.indices_for_timesteps(timesteps).tolist() == expected_indices
+        # timesteps that are not in the schedule are mapped to the last step
+        assert expected_indices[-2:] == [9, 9]
+
+        # float timesteps are not truncated to the integer timesteps of the schedule
+        timesteps = torch.tensor([float(scheduler.timesteps[3]) + 0.7, float(scheduler.timesteps[3])])
+        expected_indices = [scheduler.index_for_timestep(t) for t in timesteps]
+        assert expected_indices == [9, 3]
+        assert scheduler.indices_for_timesteps(timesteps).tolist() == expected_indices
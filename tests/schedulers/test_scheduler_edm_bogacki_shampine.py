@@ -0,0 +1,126 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import tempfile
+import unittest
+
+import torch
+
+from diffusers import EDMBogackiShampineScheduler
+
+
+class EDMBogackiShampineSchedulerTest(unittest.TestCase):
+    scheduler_class = EDMBogackiShampineScheduler
+    sigma_data = 0.5
+
+    def get_scheduler_config(self, **kwargs):
+        config = {
+            "sigma_min": 0.002,
+            "sigma_max": 80.0,
+            "sigma_data": self.sigma_data,
+            "prediction_type": "epsilon",
+        }
+
+        config.update(**kwargs)
+        return config
+
+    @property
+    def dummy_noise(self):
+        generator = torch.manual_seed(0)
+        return torch.randn(2, 4, 8, 8, generator=generator)
+
+    def model(self, sample, sigma):
+        # Predicts the noise of the exact denoiser of a Gaussian data distribution with standard deviation
+        # `sigma_data`, for which the ODE solution is known.
+        c_skip = self.sigma_data**2 / (sigma**2 + self.sigma_data**2)
+        c_out = sigma * self.sigma_data / (sigma**2 + self.sigma_data**2) ** 0.5
+        denoised = sample * c_skip
+        return (denoised - c_skip * sample) / c_out
+
+    def full_loop(self, scheduler, sample):
+        while not scheduler.is_finished:
+            model_output = self.model(sample, scheduler.sigma)
+            sample = scheduler.step(model_output, scheduler.timestep, sample).prev_sample
+        return sample
+
+    def exact_solution(self, sample, sigma):
+        return sample * math.sqrt(sigma**2 + self.sigma_data**2) / math.sqrt(80.0**2 + self.sigma_data**2)
+
+    def test_full_loop_accuracy(self):
+        noise = self.dummy_noise * 80.0
+        expected_sample = self.exact_solution(noise, 0.002)
+
+        errors, nfes = [], []
+        for rtol in [0.05, 0.01, 0.001]:
+            scheduler = self.scheduler_class(
+                **self.get_scheduler_config(rtol=rtol, atol=1e-4, final_sigmas_type="sigma_min")
+            )
+            scheduler.set_timesteps()
+            sample = self.full_loop(scheduler, noise)
+
+            errors.append((sample - expected_sample).abs().max().item() / expected_sample.abs().max().item())
+            nfes.append(scheduler.nfe)
+            # the first evaluation is reused by the first step, and the last evaluation of every step by the next one
+            assert scheduler.nfe == 1 + 3 * (scheduler.num_accepted_steps + scheduler.num_rejected_steps)
+
+        # a lower tolerance spends more model evaluations for a more accurate solution
+        assert errors[0] > errors[1] > errors[2]
+        assert nfes[0] < nfes[1] < nfes[2]
+        assert errors[2] < 1e-3
+
+    def test_final_sigmas_type_zero(self):
+        noise = self.dummy_noise * 80.0
+        samples = []
+        for final_sigmas_type in ["sigma_min", "zero"]:
+            scheduler = self.scheduler_class(**self.get_scheduler_config(final_sigmas_type=final_sigmas_type))
+            scheduler.set_timesteps()
+            samples.append(self.full_loop(scheduler, noise))
+
+        # the final sample is denoised with the model output at `sigma_min`
+        c_skip = self.sigma_data**2 / (0.002**2 + self.sigma_data**2)
+        assert torch.allclose(samples[1], c_skip * samples[0])
+
+    def test_set_timesteps(self):
+        scheduler = self.scheduler_class(**self.get_scheduler_config())
+        scheduler.set_timesteps(num_inference_steps=10)
+        assert scheduler.sigma == 80.0
+
+        sample = self.dummy_noise * 80.0
+        scheduler.step(self.model(sample, scheduler.sigma), scheduler.timestep, sample)
+        # the first stage is half of the first step
+        assert math.isclose(scheduler.sigma, 80.0 + (0.002 - 80.0) / 20)
+        assert torch.allclose(scheduler.timestep, scheduler.precondition_noise(scheduler.sigma))
+
+        self.full_loop(scheduler, sample)
+        with self.assertRaises(ValueError):
+            scheduler.step(sample, scheduler.timestep, sample)
+
+        scheduler.set_timesteps()
+        assert scheduler.sigma == 80.0
+        assert scheduler.nfe == 0
+        assert not scheduler.is_finished
+
+    def test_from_save_pretrained(self):
+        scheduler = self.scheduler_class(**self.get_scheduler_config(rtol=0.01, atol=0.001))
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            scheduler.save_config(tmpdirname)
+            new_scheduler = self.scheduler_class.from_pretrained(tmpdirname)
+
+        noise = self.dummy_noise * 80.0
+        scheduler.set_timesteps()
+        new_scheduler.set_timesteps()
+        assert torch.equal(self.full_loop(scheduler, noise), self.full_loop(new_scheduler, noise))
+        assert scheduler.nfe == new_scheduler.nfe
@@ -1,7 +1,7 @@
 import torch
 
 from diffusers import EulerDiscreteScheduler
-from diffusers.utils.testing_utils import torch_device
+from diffusers.utils.testing_utils import require_torch_2, torch_device
 
 from .test_schedulers import SchedulerCommonTest
 
@@ -269,3 +269,167 @@ class EulerDiscreteSchedulerTest(SchedulerCommonTest):
 
     def test_exponential_sigmas(self):
         self.check_over_configs(use_exponential_sigmas=True)
+
+    def test_batch_step(self):
+        # Two samples with different numbers of inference steps, where the second one joins the batch later so that
+        # both finish together.
+        num_inference_steps = [10, 6]
+        start_steps = [0, 4]
+        for prediction_type in ["epsilon", "sample", "v_prediction"]:
+            scheduler_class = self.scheduler_classes[0]
+            scheduler_config = self.get_scheduler_config(prediction_type=prediction_type)
+            model = self.dummy_model()
+
+            expected_samples, init_noise_sigmas, timesteps, sigmas = [], [], [], []
+            for i, steps in enumerate(num_inference_steps):
+                scheduler = scheduler_class(**scheduler_config)
+                scheduler.set_timesteps(steps)
+                init_noise_sigmas.append(scheduler.init_noise_sigma)
+                timesteps.append(scheduler.timesteps)
+                sigmas.append(scheduler.sigmas)
+
+                sample = self.dummy_sample_deter[i : i + 1] * scheduler.init_noise_sigma
+                for t in scheduler.timesteps:
+                    model_output = model(scheduler.scale_model_input(sample, t), t)
+                    sample = scheduler.step(model_output, t, sample).prev_sample
+                expected_samples.append(sample)
+
+            max_len = max(len(s) for s in sigmas)
+            sigmas = torch.stack([torch.nn.functional.pad(s, (0, max_len - len(s))) for s in sigmas])
+            timesteps = torch.stack([torch.nn.functional.pad(t, (0, max_len - len(t))) for t in timesteps])
+
+            scheduler = scheduler_class(**scheduler_config)
+            sample = self.dummy_sample_deter[:2] * torch.tensor(init_noise_sigmas).view(-1, 1, 1, 1)
+            for step in range(max(num_inference_steps)):
+                active = torch.tensor([step >= start for start in start_steps])
+                step_indices = torch.tensor([step - start for start in start_steps])[active]
+                t = timesteps[active].gather(1, step_indices[:, None]).squeeze(1)
+
+                model_input = scheduler.batch_scale_model_input(sample[active], step_indices, sigmas[active])
+                model_output = model(model_input, t)
+                sample[active] = scheduler.batch_step(
+                    model_output, sample[active], step_indices, sigmas[active]
+                ).prev_sample
+
+            for i, expected_sample in enumerate(expected_samples):
+                assert torch.allclose(sample[i : i + 1], expected_sample, atol=1e-5), prediction_type
+
+    def test_sync_free_step(self):
+        scheduler_class = self.scheduler_classes[0]
+        model = self.dummy_model()
+        for prediction_type in ["epsilon", "sample", "v_prediction"]:
+            for begin_index in [None, 3]:
+                samples = []
+                for sync_free in [False, True]:
+                    scheduler = scheduler_class(**self.get_scheduler_config(prediction_type=prediction_type))
+                    if sync_free:
+                        scheduler.enable_sync_free_step()
+                    scheduler.set_timesteps(self.num_inference_steps)
+                    if begin_index is not None:
+                        scheduler.set_begin_index(begin_index)
+
+                    sample = self.dummy_sample_deter * scheduler.init_noise_sigma
+                    for t in scheduler.timesteps[begin_index:]:
+                        model_output = model(scheduler.scale_model_input(sample, t), t)
+                        output = scheduler.step(model_output, t, sample)
+                        sample = output.prev_sample
+                    samples.append((sample, output.pred_original_sample))
+
+                for expected, actual in zip(*samples):
+                    assert torch.allclose(actual, expected, rtol=1e-4, atol=1e-4), (prediction_type, begin_index)
+                assert torch.equal(scheduler.step_index, torch.tensor([self.num_inference_steps]))
+
+    def test_sync_free_step_with_schedule_cache(self):
+        scheduler_class = self.scheduler_classes[0]
+        expected_scheduler = scheduler_class(**self.get_scheduler_config())
+        expected_scheduler.enable_sync_free_step()
+        expected_scheduler.set_timesteps(self.num_inference_steps)
+
+        # the sync-free step tables are computed by `set_timesteps`, so they must not be restored from a schedule
+        # cached before the sync-free step was enabled
+        scheduler = scheduler_class(**self.get_scheduler_config())
+        scheduler.enable_schedule_cache()
+        scheduler.set_timesteps(self.num_inference_steps)
+        scheduler.enable_sync_free_step()
+        scheduler.set_timesteps(self.num_inference_steps)
+        assert torch.equal(scheduler._sync_free_coefficients, expected_scheduler._sync_free_coefficients)
+
+        scheduler.disable_sync_free_step()
+        scheduler.set_timesteps(self.num_inference_steps)
+        assert scheduler._sync_free_coefficients is None
+        scheduler.clear_schedule_cache()
+
+    @require_torch_2
+    def test_sync_free_step_fullgraph(self):
+        scheduler_class = self.scheduler_classes[0]
+        scheduler = scheduler_class(**self.get_scheduler_config())
+        scheduler.enable_sync_free_step()
+        scheduler.set_timesteps(self.num_inference_steps)
+
+        def denoise(sample):
+            for t in scheduler.timesteps:
+                model_input = scheduler.scale_model_input(sample, t)
+                sample = scheduler.step(torch.sin(model_input), t, sample).prev_sample
+            return sample
+
+        # `fullgraph=True` raises on any graph break, such as the ones caused by `.item()` or `.nonzero()`.
+        sample = self.dummy_sample_deter * scheduler.init_noise_sigma
+        torch.compile(denoise, backend="eager", fullgraph=True)(sample)
+
+        scheduler.disable_sync_free_step()
+        scheduler.set_timesteps(self.num_inference_steps)
+        expected_sample = denoise(sample)
+        scheduler.enable_sync_free_step()
+        assert torch.allclose(
+            torch.compile(denoise, backend="eager", fullgraph=True)(sample), expected_sample, atol=1e-4
+        )
+
+    def test_indices_for_timesteps(self):
+        scheduler_class = self.scheduler_classes[0]
+        scheduler = scheduler_class(**self.get_scheduler_config())
+        scheduler.set_timesteps(self.num_inference_steps)
+
+        timesteps = scheduler.timesteps[torch.randint(0, self.num_inference_steps, (64,))]
+        expected_indices = [scheduler.index_for_timestep(t) for t in timesteps]
+        assert scheduler.indices_for_timesteps(timesteps).tolist() == expected_indices
+
+        # a timestep repeated in the schedule is mapped to its second occurrence
+        scheduler.set_timesteps(timesteps=[999, 999, 500, 0])
+        assert scheduler.indices_for_timesteps(torch.tensor([999, 0, 500])).tolist() == [1, 3, 2]
+
+        with self.assertRaises(ValueError):
+            scheduler.indices_for_timesteps(torch.tensor([999, 1]))
+        # float timesteps are not truncated to the integer timesteps of the schedule
+        schedule_timesteps = torch.tensor([999, 999, 500, 0])
+        with self.assertRaises(ValueError):
+            scheduler.indices_for_timesteps(torch.tensor([999.7]), schedule_timesteps)
+        assert scheduler.indices_for_timesteps(torch.tensor([500.0]), schedule_timesteps).tolist() == [2]
+
+    def test_fused_step(self):
+        scheduler_class = self.scheduler_classes[0]
+        model = self.dummy_model()
+        for prediction_type in ["epsilon", "sample", "v_prediction"]:
+            samples = []
+            for fused in [False, True]:
+                scheduler = scheduler_class(**self.get_scheduler_config(prediction_type=prediction_type))
+                if fused:
+                    scheduler.enable_fused_step()
+                scheduler.set_timesteps(self.num_inference_steps)
+
+                sample = self.dummy_sample_deter * scheduler.init_noise_sigma
+                for i, t in enumerate(scheduler.timesteps):
+                    model_output = model(scheduler.scale_model_input(sample, t), t)
+                    output = scheduler.step(model_output, t, sample)
+                    if fused and i > 0:
+                        # the returned sample is updated in place by the next step
+                        assert output.prev_sample.data_ptr() == sample.data_ptr()
+                    sample = output.prev_sample
+                samples.append(sample)
+
+            assert torch.allclose(samples[1], samples[0], rtol=1e-4, atol=1e-4), prediction_type
+            assert output.pred_original_sample is None
+
+        scheduler.disable_fused_step()
+        scheduler.set_timesteps(self.num_inference_steps)
+        t = scheduler.timesteps[0]
+        assert scheduler.step(model(sample, t), t, sample).pred_original_sample is not None
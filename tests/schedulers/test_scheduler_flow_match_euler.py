@@ -0,0 +1,109 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import torch
+
+from diffusers import FlowMatchEulerDiscreteScheduler
+
+
+class FlowMatchEulerDiscreteSchedulerTest(unittest.TestCase):
+    def get_scheduler(self, **kwargs):
+        config = {"num_train_timesteps": 1000, "shift": 3.0}
+        config.update(**kwargs)
+        return FlowMatchEulerDiscreteScheduler(**config)
+
+    def dummy_model(self, sample, t):
+        t = t.reshape(-1, *(1,) * (sample.ndim - 1)) / 1000
+        return sample * t - (1 - t)
+
+    def test_batch_step(self):
+        # Two requests with different numbers of inference steps and image-to-image strengths, denoised together.
+        num_inference_steps = [8, 5]
+        begin_indices = [3, 0]
+        generator = torch.Generator().manual_seed(0)
+        samples = torch.randn(2, 4, 8, 8, generator=generator)
+
+        expected_samples, timesteps, sigmas = [], [], []
+        for i, (steps, begin_index) in enumerate(zip(num_inference_steps, begin_indices)):
+            scheduler = self.get_scheduler()
+            scheduler.set_timesteps(steps)
+            scheduler.set_begin_index(begin_index)
+            timesteps.append(scheduler.timesteps)
+            sigmas.append(scheduler.sigmas)
+
+            sample = samples[i : i + 1]
+            for t in scheduler.timesteps[begin_index:]:
+                sample = scheduler.step(self.dummy_model(sample, t), t, sample).prev_sample
+            expected_samples.append(sample)
+
+        max_len = max(len(s) for s in sigmas)
+        sigmas = torch.stack([torch.nn.functional.pad(s, (0, max_len - len(s))) for s in sigmas])
+        timesteps = torch.stack([torch.nn.functional.pad(t, (0, max_len - len(t))) for t in timesteps])
+
+        scheduler = self.get_scheduler()
+        step_indices = torch.tensor(begin_indices)
+        sample = samples
+        for _ in range(max(steps - begin for steps, begin in zip(num_inference_steps, begin_indices))):
+            t = timesteps.gather(1, step_indices[:, None]).squeeze(1)
+            sample = scheduler.batch_step(self.dummy_model(sample, t), sample, step_indices, sigmas).prev_sample
+            step_indices = step_indices + 1
+
+        for i, expected_sample in enumerate(expected_samples):
+            self.assertTrue(torch.allclose(sample[i : i + 1], expected_sample, atol=1e-6))
+        self.assertIsNone(scheduler.step_index)
+
+    def test_sync_free_step(self):
+        for begin_index in [None, 2]:
+            samples = []
+            for sync_free in [False, True]:
+                scheduler = self.get_scheduler()
+                if sync_free:
+                    scheduler.enable_sync_free_step()
+                scheduler.set_timesteps(6)
+                if begin_index is not None:
+                    scheduler.set_begin_index(begin_index)
+
+                sample = torch.randn(1, 4, 8, 8, generator=torch.Generator().manual_seed(0))
+                for t in scheduler.timesteps[begin_index:]:
+                    sample = scheduler.step(self.dummy_model(sample, t), t, sample).prev_sample
+                samples.append(sample)
+
+            self.assertTrue(torch.allclose(samples[1], samples[0], atol=1e-6))
+            self.assertTrue(torch.equal(scheduler.step_index, torch.tensor([6])))
+
+    def test_batch_step_invalid_step_indices(self):
+        scheduler = self.get_scheduler()
+        scheduler.set_timesteps(4)
+        sample = torch.randn(2, 4, 8, 8)
+        with self.assertRaises(ValueError):
+            scheduler.batch_step(sample, sample, torch.tensor([0]))
+
+    def test_schedule_cache_with_set_shift(self):
+        scheduler = self.get_scheduler()
+        scheduler.enable_schedule_cache()
+        scheduler.set_timesteps(10)
+        sigmas = scheduler.sigmas
+
+        # the shift is not part of the configuration, but still changes the schedule
+        scheduler.set_shift(1.0)
+        scheduler.set_timesteps(10)
+        assert not torch.allclose(scheduler.sigmas, sigmas)
+        expected_scheduler = self.get_scheduler()
+        expected_scheduler.set_shift(1.0)
+        expected_scheduler.set_timesteps(10)
+        assert torch.allclose(scheduler.sigmas, expected_scheduler.sigmas)
+        scheduler.clear_schedule_cache()
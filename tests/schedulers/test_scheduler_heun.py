@@ -225,3 +225,24 @@ class HeunDiscreteSchedulerTest(SchedulerCommonTest):
 
     def test_exponential_sigmas(self):
         self.check_over_configs(use_exponential_sigmas=True)
+
+    def test_fused_step(self):
+        scheduler_class = self.scheduler_classes[0]
+        model = self.dummy_model()
+        for prediction_type in ["epsilon", "v_prediction"]:
+            samples = []
+            for fused in [False, True]:
+                scheduler = scheduler_class(**self.get_scheduler_config(prediction_type=prediction_type))
+                if fused:
+                    scheduler.enable_fused_step()
+                scheduler.set_timesteps(self.num_inference_steps)
+
+                sample = self.dummy_sample_deter * scheduler.init_noise_sigma
+                for t in scheduler.timesteps:
+                    model_output = model(scheduler.scale_model_input(sample, t), t)
+                    output = scheduler.step(model_output, t, sample)
+                    sample = output.prev_sample
+                samples.append(sample)
+
+            assert torch.allclose(samples[1], samples[0], rtol=1e-4, atol=1e-4), prediction_type
+            assert output.pred_original_sample is None
@@ -240,3 +240,26 @@ class PNDMSchedulerTest(SchedulerCommonTest):
 
         assert abs(result_sum.item() - 186.9482) < 1e-2
         assert abs(result_mean.item() - 0.2434) < 1e-3
+
+    def test_ets_history(self):
+        scheduler_class = self.scheduler_classes[0]
+        scheduler = scheduler_class(**self.get_scheduler_config(skip_prk_steps=True))
+        sample = self.dummy_sample_deter
+        model = self.dummy_model()
+
+        scheduler.set_timesteps(10)
+        residuals = []
+        for t in scheduler.plms_timesteps[:6]:
+            residual = model(sample, t)
+            sample = scheduler.step_plms(residual, t, sample).prev_sample
+            residuals.append(residual)
+            buffer = scheduler.ets.buffer
+
+        # only the model outputs of the last 4 multistep updates are kept, in a buffer that is not reallocated
+        assert scheduler.ets.num_entries == 4
+        assert scheduler.ets.buffer.data_ptr() == buffer.data_ptr()
+        for ets, residual in zip(scheduler.ets, residuals[-4:]):
+            assert torch.equal(ets, residual)
+
+        scheduler.set_timesteps(10)
+        assert scheduler.ets.num_entries == 0
@@ -284,6 +284,43 @@ class UniPCMultistepSchedulerTest(SchedulerCommonTest):
         assert abs(result_sum.item() - 315.5757) < 1e-2, f" expected result sum 315.5757, but get {result_sum}"
         assert abs(result_mean.item() - 0.4109) < 1e-3, f" expected result mean 0.4109, but get {result_mean}"
 
+    def test_solver_coefficients(self):
+        # The precomputed weights must reproduce the update methods at every step
+        for solver_type in ["bh1", "bh2"]:
+            for predict_x0 in [True, False]:
+                scheduler_class = self.scheduler_classes[0]
+                scheduler_config = self.get_scheduler_config(
+                    solver_order=3, solver_type=solver_type, predict_x0=predict_x0
+                )
+                scheduler = scheduler_class(**scheduler_config)
+                scheduler.set_timesteps(10)
+
+                generator = torch.manual_seed(0)
+                sample, last_sample, this_model_output = torch.randn(3, 2, 4, 8, 8, generator=generator)
+                scheduler.model_outputs = list(torch.randn(3, 2, 4, 8, 8, generator=generator))
+                for step_index in range(2, len(scheduler.timesteps)):
+                    scheduler._step_index = step_index
+                    for order in range(1, 4):
+                        expected_sample = scheduler.multistep_uni_p_bh_update(
+                            model_output=None, sample=sample, order=order
+                        )
+                        prev_sample = scheduler._predictor_update(order, sample)
+                        assert torch.allclose(prev_sample, expected_sample, rtol=1e-4, atol=1e-5), (step_index, order)
+
+                        if step_index < order:
+                            continue
+                        expected_sample = scheduler.multistep_uni_c_bh_update(
+                            this_model_output=this_model_output,
+                            last_sample=last_sample,
+                            this_sample=sample,
+                            order=order,
+                        )
+                        corrected_sample = scheduler._corrector_update(order, this_model_output, last_sample)
+                        assert torch.allclose(corrected_sample, expected_sample, rtol=1e-4, atol=1e-5), (
+                            step_index,
+                            order,
+                        )
+
 
 class UniPCMultistepScheduler1DTest(UniPCMultistepSchedulerTest):
     @property
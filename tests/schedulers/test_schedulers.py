@@ -727,6 +727,47 @@ class SchedulerCommonTest(unittest.TestCase):
             noised = scheduler.add_noise(scaled_sample, noise, t)
             self.assertEqual(noised.shape, scaled_sample.shape)
 
+    def test_schedule_cache(self):
+        kwargs = dict(self.forward_default_kwargs)
+        num_inference_steps = kwargs.get("num_inference_steps", self.default_num_inference_steps)
+
+        for scheduler_class in self.scheduler_classes:
+            scheduler_config = self.get_scheduler_config()
+            if num_inference_steps is None or not scheduler_class._schedule_cache_attributes:
+                continue
+
+            scheduler = scheduler_class(**scheduler_config)
+            scheduler.set_timesteps(num_inference_steps)
+
+            SchedulerMixin.clear_schedule_cache()
+            cached_scheduler = scheduler_class(**scheduler_config)
+            cached_scheduler.enable_schedule_cache()
+            cached_scheduler.set_timesteps(num_inference_steps)
+            cached_timesteps = cached_scheduler.timesteps
+            cached_scheduler.set_timesteps(num_inference_steps - 1)
+
+            # a second scheduler with the same configuration reuses the schedule computed by the first one
+            new_scheduler = scheduler_class(**scheduler_config)
+            new_scheduler.enable_schedule_cache()
+            new_scheduler.set_timesteps(num_inference_steps)
+            self.assertTrue(torch.equal(new_scheduler.timesteps, cached_timesteps))
+            self.assertTrue(np.array_equal(np.asarray(new_scheduler.timesteps), np.asarray(scheduler.timesteps)))
+            if hasattr(scheduler, "sigmas"):
+                self.assertTrue(np.array_equal(np.asarray(new_scheduler.sigmas), np.asarray(scheduler.sigmas)))
+
+            # the schedulers get copies of the cached schedule, which they can modify in place
+            self.assertNotEqual(new_scheduler.timesteps.data_ptr(), cached_timesteps.data_ptr())
+            new_scheduler.timesteps.zero_()
+            other_scheduler = scheduler_class(**scheduler_config)
+            other_scheduler.enable_schedule_cache()
+            other_scheduler.set_timesteps(num_inference_steps)
+            self.assertTrue(torch.equal(other_scheduler.timesteps, cached_timesteps))
+            SchedulerMixin.clear_schedule_cache()
+
+        # the schedulers that don't list the attributes of their schedule don't support the cache
+        with self.assertRaises(ValueError):
+            DDIMScheduler().enable_schedule_cache()
+
     def test_deprecated_kwargs(self):
         for scheduler_class in self.scheduler_classes:
             has_kwarg_in_model_class = "kwargs" in inspect.signature(scheduler_class.__init__).parameters
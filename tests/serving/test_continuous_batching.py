@@ -0,0 +1,251 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+
+from diffusers import (
+    AutoencoderKL,
+    ContinuousBatchingEngine,
+    DDIMScheduler,
+    EulerDiscreteScheduler,
+    FlowMatchEulerDiscreteScheduler,
+    FluxPipeline,
+    FluxTransformer2DModel,
+    StableDiffusionXLPipeline,
+    UNet2DConditionModel,
+)
+
+
+class ContinuousBatchingEngineTests(unittest.TestCase):
+    # the text encoders are not needed, the requests pass their prompt embeddings
+
+    def get_flux_pipeline(self):
+        torch.manual_seed(0)
+        transformer = FluxTransformer2DModel(
+            patch_size=1,
+            in_channels=4,
+            num_layers=1,
+            num_single_layers=1,
+            attention_head_dim=16,
+            num_attention_heads=2,
+            joint_attention_dim=32,
+            pooled_projection_dim=32,
+            axes_dims_rope=[4, 4, 8],
+        )
+        torch.manual_seed(0)
+        vae = AutoencoderKL(
+            sample_size=32,
+            in_channels=3,
+            out_channels=3,
+            block_out_channels=(4,),
+            layers_per_block=1,
+            latent_channels=1,
+            norm_num_groups=1,
+            use_quant_conv=False,
+            use_post_quant_conv=False,
+            shift_factor=0.0609,
+            scaling_factor=1.5035,
+        )
+        return FluxPipeline(
+            scheduler=FlowMatchEulerDiscreteScheduler(),
+            vae=vae,
+            text_encoder=None,
+            tokenizer=None,
+            text_encoder_2=None,
+            tokenizer_2=None,
+            transformer=transformer,
+        )
+
+    def get_flux_inputs(self, seed, num_inference_steps, height=8, width=8):
+        generator = torch.Generator().manual_seed(seed)
+        return {
+            "prompt_embeds": torch.randn(1, 16, 32, generator=generator),
+            "pooled_prompt_embeds": torch.randn(1, 32, generator=generator),
+            "num_inference_steps": num_inference_steps,
+            "height": height,
+            "width": width,
+            "max_sequence_length": 16,
+            "generator": generator,
+            "output_type": "np",
+        }
+
+    def get_sdxl_pipeline(self, scheduler=None):
+        torch.manual_seed(0)
+        unet = UNet2DConditionModel(
+            block_out_channels=(2, 4),
+            layers_per_block=2,
+            sample_size=32,
+            in_channels=4,
+            out_channels=4,
+            down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+            up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+            attention_head_dim=(2, 4),
+            use_linear_projection=True,
+            addition_embed_type="text_time",
+            addition_time_embed_dim=8,
+            transformer_layers_per_block=(1, 2),
+            projection_class_embeddings_input_dim=80,  # 6 * 8 + 32
+            cross_attention_dim=64,
+            norm_num_groups=1,
+        )
+        scheduler = scheduler or EulerDiscreteScheduler(
+            beta_start=0.00085,
+            beta_end=0.012,
+            steps_offset=1,
+            beta_schedule="scaled_linear",
+            timestep_spacing="leading",
+        )
+        torch.manual_seed(0)
+        vae = AutoencoderKL(
+            block_out_channels=[32, 64],
+            in_channels=3,
+            out_channels=3,
+            down_block_types=["DownEncoderBlock2D", "DownEncoderBlock2D"],
+            up_block_types=["UpDecoderBlock2D", "UpDecoderBlock2D"],
+            latent_channels=4,
+            sample_size=128,
+        )
+        return StableDiffusionXLPipeline(
+            vae=vae,
+            text_encoder=None,
+            text_encoder_2=None,
+            tokenizer=None,
+            tokenizer_2=None,
+            unet=unet,
+            scheduler=scheduler,
+            add_watermarker=False,
+        )
+
+    def get_sdxl_inputs(self, seed, num_inference_steps, guidance_scale=5.0, guidance_rescale=0.0):
+        generator = torch.Generator().manual_seed(seed)
+        return {
+            "prompt_embeds": torch.randn(1, 8, 64, generator=generator),
+            "pooled_prompt_embeds": torch.randn(1, 32, generator=generator),
+            "num_inference_steps": num_inference_steps,
+            "guidance_scale": guidance_scale,
+            "guidance_rescale": guidance_rescale,
+            "generator": generator,
+            "output_type": "np",
+        }
+
+    def check_matches_pipeline(self, pipe, requests, max_batch_size):
+        expected = [pipe(**get_inputs()).images for get_inputs in requests]
+
+        with ContinuousBatchingEngine(pipe, max_batch_size=max_batch_size) as engine:
+            futures = [engine.submit(**get_inputs()) for get_inputs in requests]
+            images = [future.result().images for future in futures]
+
+        self.assertEqual(engine.num_requests, len(requests))
+        for image, expected_image in zip(images, expected):
+            self.assertEqual(image.shape, expected_image.shape)
+            self.assertLess(np.abs(image - expected_image).max(), 1e-4)
+
+    def test_flux_matches_pipeline(self):
+        pipe = self.get_flux_pipeline()
+        # the short requests finish first and let the last one join the running batch
+        requests = [
+            lambda: self.get_flux_inputs(0, num_inference_steps=6),
+            lambda: self.get_flux_inputs(1, num_inference_steps=2),
+            lambda: self.get_flux_inputs(2, num_inference_steps=3),
+            lambda: self.get_flux_inputs(3, num_inference_steps=4, height=16, width=16),
+            lambda: self.get_flux_inputs(4, num_inference_steps=2),
+        ]
+        self.check_matches_pipeline(pipe, requests, max_batch_size=3)
+
+    def test_sdxl_matches_pipeline(self):
+        pipe = self.get_sdxl_pipeline()
+        requests = [
+            lambda: self.get_sdxl_inputs(0, num_inference_steps=5),
+            lambda: self.get_sdxl_inputs(1, num_inference_steps=2, guidance_scale=7.5, guidance_rescale=0.7),
+            lambda: self.get_sdxl_inputs(2, num_inference_steps=3, guidance_scale=1.0),
+            lambda: self.get_sdxl_inputs(3, num_inference_steps=2),
+        ]
+        self.check_matches_pipeline(pipe, requests, max_batch_size=2)
+
+    def test_batches_denoising_steps(self):
+        pipe = self.get_flux_pipeline()
+        # the first request is held in `encode_prompt` until the others are queued
+        queued = threading.Event()
+        encode_prompt = pipe.encode_prompt
+
+        def wait_and_encode_prompt(*args, **kwargs):
+            queued.wait(timeout=30)
+            return encode_prompt(*args, **kwargs)
+
+        with ContinuousBatchingEngine(pipe, max_batch_size=4) as engine:
+            with mock.patch.object(pipe, "encode_prompt", side_effect=wait_and_encode_prompt):
+                futures = [engine.submit(**self.get_flux_inputs(seed, n)) for seed, n in enumerate([4, 2, 3])]
+                queued.set()
+                for future in futures:
+                    self.assertEqual(future.result().images.shape, (1, 8, 8, 3))
+
+        # the other requests join the running batch at its second step, and the longest request ends at its fourth
+        self.assertEqual(engine.num_steps, 4)
+        self.assertEqual(engine.num_requests, 3)
+
+    def test_generate(self):
+        pipe = self.get_flux_pipeline()
+        expected = pipe(**self.get_flux_inputs(0, num_inference_steps=2)).images
+
+        async def generate(engine):
+            return await engine.generate(**self.get_flux_inputs(0, num_inference_steps=2))
+
+        with ContinuousBatchingEngine(pipe) as engine:
+            images = asyncio.run(generate(engine)).images
+        self.assertLess(np.abs(images - expected).max(), 1e-4)
+
+    def test_restart(self):
+        pipe = self.get_flux_pipeline()
+        engine = ContinuousBatchingEngine(pipe)
+        for seed in range(10):
+            future = engine.submit(**self.get_flux_inputs(seed, 1))
+            # the new workers must not receive the stop signal of the previous ones
+            stopping = threading.Thread(target=engine.stop)
+            stopping.start()
+            engine.start()
+            stopping.join(timeout=30)
+            self.assertFalse(stopping.is_alive())
+            self.assertEqual(future.result(timeout=30).images.shape, (1, 8, 8, 3))
+            self.assertEqual(
+                engine.submit(**self.get_flux_inputs(seed, 1)).result(timeout=30).images.shape, (1, 8, 8, 3)
+            )
+
+        engine.stop()
+        workers = [thread for thread in threading.enumerate() if thread.name.startswith("ContinuousBatchingEngine")]
+        self.assertEqual(workers, [])
+        self.assertEqual(engine.num_requests, 20)
+
+    def test_errors(self):
+        pipe = self.get_flux_pipeline()
+        with ContinuousBatchingEngine(pipe) as engine:
+            with self.assertRaises(TypeError):
+                engine.submit(**self.get_flux_inputs(0, 2), callback_on_step_end=lambda *args: {})
+            # errors of a request don't affect the other requests
+            inputs = self.get_flux_inputs(0, 2)
+            inputs["max_sequence_length"] = 1024
+            failing = engine.submit(**inputs)
+            working = engine.submit(**self.get_flux_inputs(1, 2))
+            with self.assertRaises(ValueError):
+                failing.result()
+            self.assertEqual(working.result().images.shape, (1, 8, 8, 3))
+
+        with self.assertRaises(ValueError):
+            ContinuousBatchingEngine(self.get_sdxl_pipeline(scheduler=DDIMScheduler()))
@@ -0,0 +1,259 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import unittest
+
+import numpy as np
+import torch
+from transformers import CLIPTextConfig, CLIPTextModel, CLIPTokenizer
+
+from diffusers import (
+    AutoencoderKL,
+    DDIMScheduler,
+    ImagePipelineOutput,
+    RequestBatchingEngine,
+    StableDiffusionPipeline,
+    UNet2DConditionModel,
+)
+from diffusers.pipelines.pipeline_streaming import AsyncPipelineStream, PipelineStream
+from diffusers.utils.torch_utils import randn_tensor
+
+
+class DummyPromptPipeline:
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, prompt, negative_prompt=None, num_inference_steps=2, generator=None, num_images_per_prompt=1):
+        prompts = [prompt] if isinstance(prompt, str) else prompt
+        prompts = [p for p in prompts for _ in range(num_images_per_prompt)]
+        if num_inference_steps < 1:
+            raise ValueError("`num_inference_steps` must be positive.")
+        self.batch_sizes.append(len(prompts))
+
+        noise = randn_tensor((len(prompts), 4), generator=generator)
+        images = noise + torch.tensor([[float(len(p))] for p in prompts]) * num_inference_steps
+        return ImagePipelineOutput(images=images)
+
+
+class DummyStepPipeline(DummyPromptPipeline):
+    _callback_tensor_inputs = ["latents"]
+
+    def __init__(self):
+        super().__init__()
+        self._interrupt = False
+
+    @property
+    def interrupt(self):
+        return self._interrupt
+
+    def __call__(
+        self,
+        prompt,
+        num_inference_steps=2,
+        generator=None,
+        callback_on_step_end=None,
+        callback_on_step_end_tensor_inputs=None,
+    ):
+        self._interrupt = False
+        for i in range(num_inference_steps):
+            if self.interrupt:
+                continue
+            if callback_on_step_end is not None:
+                callback_on_step_end(self, i, torch.tensor(i), {"latents": torch.zeros(1, 4)})
+        return super().__call__(prompt, num_inference_steps=num_inference_steps, generator=generator)
+
+
+class RequestBatchingEngineTests(unittest.TestCase):
+    def test_batches_compatible_requests(self):
+        pipe = DummyPromptPipeline()
+        requests = [
+            {"prompt": "a cat", "generator": torch.Generator().manual_seed(0)},
+            {"prompt": "a photo of a dog", "generator": torch.Generator().manual_seed(1), "num_images_per_prompt": 2},
+            {"prompt": "a cat", "num_inference_steps": 4, "generator": torch.Generator().manual_seed(2)},
+            {
+                "prompt": ["a bird", "a fish"],
+                "generator": [torch.Generator().manual_seed(3), torch.Generator().manual_seed(4)],
+            },
+        ]
+        expected = []
+        for request in requests:
+            request = dict(request)
+            generator = request["generator"]
+            if isinstance(generator, list):
+                request["generator"] = [torch.Generator().set_state(g.get_state()) for g in generator]
+            else:
+                request["generator"] = torch.Generator().set_state(generator.get_state())
+            expected.append(pipe(**request).images)
+        pipe.batch_sizes = []
+
+        with RequestBatchingEngine(pipe, max_batch_size=5, max_wait_time=0.5) as engine:
+            futures = [engine.submit(**request) for request in requests]
+            outputs = [future.result().images for future in futures]
+
+        # the request with a different number of steps runs in its own batch
+        self.assertEqual(sorted(pipe.batch_sizes), [1, 5])
+        self.assertEqual(engine.num_batches, 2)
+        for output, expected_output in zip(outputs, expected):
+            self.assertTrue(torch.allclose(output, expected_output))
+
+    def test_max_batch_size(self):
+        pipe = DummyPromptPipeline()
+        with RequestBatchingEngine(pipe, max_batch_size=4, max_wait_time=0.5) as engine:
+            futures = [engine.submit(prompt="a cat", num_images_per_prompt=2) for _ in range(5)]
+            futures.append(engine.submit(prompt="a dog", num_images_per_prompt=6))
+            outputs = [future.result().images for future in futures]
+
+        # a request larger than `max_batch_size` runs alone
+        self.assertEqual(sorted(pipe.batch_sizes), [2, 4, 4, 6])
+        self.assertEqual([len(output) for output in outputs], [2, 2, 2, 2, 2, 6])
+
+    def test_exceptions_are_returned_to_the_batch(self):
+        pipe = DummyPromptPipeline()
+        with RequestBatchingEngine(pipe, max_batch_size=2, max_wait_time=0.5) as engine:
+            failing = [engine.submit(prompt="a cat", num_inference_steps=0) for _ in range(2)]
+            succeeding = engine.submit(prompt="a cat")
+
+            for future in failing:
+                with self.assertRaises(ValueError):
+                    future.result()
+            self.assertEqual(len(succeeding.result().images), 1)
+
+    def test_generate(self):
+        pipe = DummyPromptPipeline()
+        engine = RequestBatchingEngine(pipe, max_batch_size=3, max_wait_time=0.5)
+
+        async def generate():
+            return await asyncio.gather(*[engine.generate(prompt=f"prompt {i}") for i in range(3)])
+
+        outputs = asyncio.run(generate())
+        engine.stop()
+        self.assertEqual(pipe.batch_sizes, [3])
+        self.assertEqual([len(output.images) for output in outputs], [1, 1, 1])
+
+    def test_stalled_stream(self):
+        pipe = DummyStepPipeline()
+
+        async def generate():
+            stream = AsyncPipelineStream(pipe, {"prompt": "a cat", "num_inference_steps": 4}, consumer_timeout=0.1)
+            steps = stream.__aiter__()
+            await steps.__anext__()
+            # the consumer stalls while holding the pipeline, which is given up on after `consumer_timeout`
+            with RequestBatchingEngine(pipe) as engine:
+                output = await asyncio.wait_for(engine.generate(prompt="a dog"), timeout=10)
+            await steps.aclose()
+            return stream, output
+
+        stream, output = asyncio.run(generate())
+        self.assertTrue(stream.cancelled)
+        self.assertEqual(len(output.images), 1)
+
+    def test_abandoned_stream(self):
+        pipe = DummyStepPipeline()
+        stream = PipelineStream(pipe, {"prompt": "a cat", "num_inference_steps": 4}, consumer_timeout=0.1)
+        steps = iter(stream)
+        next(steps)
+        # the iterator is abandoned without being closed, while the pipeline waits for it to take the next step
+        with RequestBatchingEngine(pipe) as engine:
+            output = engine.submit(prompt="a dog").result(timeout=10)
+        self.assertTrue(stream.cancelled)
+        self.assertEqual(len(output.images), 1)
+        steps.close()
+
+    def test_restart(self):
+        pipe = DummyPromptPipeline()
+        engine = RequestBatchingEngine(pipe, max_batch_size=2, max_wait_time=0.01)
+        for _ in range(20):
+            future = engine.submit(prompt="a cat")
+            # the new worker must not receive the stop signal of the previous one
+            stopping = threading.Thread(target=engine.stop)
+            stopping.start()
+            engine.start()
+            stopping.join(timeout=5)
+            self.assertFalse(stopping.is_alive())
+            self.assertEqual(len(future.result(timeout=5).images), 1)
+            self.assertEqual(len(engine.submit(prompt="a dog").result(timeout=5).images), 1)
+
+        engine.stop()
+        workers = [thread for thread in threading.enumerate() if thread.name == "RequestBatchingEngine"]
+        self.assertEqual(workers, [])
+        self.assertEqual(engine.num_requests, 40)
+
+    def test_stable_diffusion(self):
+        torch.manual_seed(0)
+        unet = UNet2DConditionModel(
+            block_out_channels=(4, 8),
+            layers_per_block=1,
+            sample_size=32,
+            in_channels=4,
+            out_channels=4,
+            down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+            up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+            cross_attention_dim=8,
+            norm_num_groups=2,
+        )
+        torch.manual_seed(0)
+        vae = AutoencoderKL(
+            block_out_channels=[4, 8],
+            in_channels=3,
+            out_channels=3,
+            down_block_types=["DownEncoderBlock2D", "DownEncoderBlock2D"],
+            up_block_types=["UpDecoderBlock2D", "UpDecoderBlock2D"],
+            latent_channels=4,
+            norm_num_groups=2,
+        )
+        torch.manual_seed(0)
+        text_encoder_config = CLIPTextConfig(
+            bos_token_id=0,
+            eos_token_id=2,
+            hidden_size=8,
+            intermediate_size=16,
+            layer_norm_eps=1e-05,
+            num_attention_heads=2,
+            num_hidden_layers=2,
+            pad_token_id=1,
+            vocab_size=1000,
+        )
+        pipe = StableDiffusionPipeline(
+            unet=unet,
+            scheduler=DDIMScheduler(clip_sample=False, set_alpha_to_one=False),
+            vae=vae,
+            text_encoder=CLIPTextModel(text_encoder_config),
+            tokenizer=CLIPTokenizer.from_pretrained("hf-internal-testing/tiny-random-clip"),
+            safety_checker=None,
+            feature_extractor=None,
+            requires_safety_checker=False,
+        )
+        pipe.set_progress_bar_config(disable=True)
+
+        prompts = ["a cat", "a photo of a dog", "an astronaut riding a horse"]
+        inputs = {"num_inference_steps": 2, "guidance_scale": 6.0, "output_type": "np"}
+        expected = [
+            pipe(prompt, generator=torch.Generator().manual_seed(i), **inputs).images
+            for i, prompt in enumerate(prompts)
+        ]
+
+        with RequestBatchingEngine(pipe, max_batch_size=3, max_wait_time=0.5) as engine:
+            futures = [
+                engine.submit(prompt=prompt, generator=torch.Generator().manual_seed(i), **inputs)
+                for i, prompt in enumerate(prompts)
+            ]
+            outputs = [future.result().images for future in futures]
+
+        self.assertEqual(engine.num_batches, 1)
+        for output, expected_output in zip(outputs, expected):
+            self.assertEqual(output.shape, expected_output.shape)
+            self.assertLess(np.abs(output - expected_output).max(), 1e-3)
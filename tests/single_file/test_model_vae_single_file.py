@@ -14,7 +14,10 @@
 # limitations under the License.
 
 import gc
+import os
+import tempfile
 import unittest
+from unittest import mock
 
 import torch
 
@@ -116,3 +119,28 @@ class AutoencoderKLSingleFileTests(unittest.TestCase):
         assert model.config.scaling_factor == scaling_factor
         assert model.config.sample_size == sample_size
         assert model.dtype == torch_dtype
+
+    def test_single_file_conversion_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model = self.model_class.from_single_file(self.ckpt_path, config=self.repo_id, conversion_cache_dir=tmpdir)
+            self.assertEqual(len(os.listdir(os.path.join(tmpdir, "models"))), 1)
+
+            with mock.patch("diffusers.loaders.single_file_model.load_single_file_checkpoint") as load_checkpoint:
+                model_cached = self.model_class.from_single_file(
+                    self.ckpt_path, config=self.repo_id, conversion_cache_dir=tmpdir
+                )
+            load_checkpoint.assert_not_called()
+
+            # arguments that change the conversion get their own cache entry
+            self.model_class.from_single_file(
+                self.ckpt_path, config=self.repo_id, conversion_cache_dir=tmpdir, scaling_factor=2.0
+            )
+            self.assertEqual(len(os.listdir(os.path.join(tmpdir, "models"))), 2)
+
+        PARAMS_TO_IGNORE = ["_name_or_path", "_use_default_values", "_diffusers_version"]
+        for param_name, param_value in model.config.items():
+            if param_name in PARAMS_TO_IGNORE:
+                continue
+            self.assertEqual(model_cached.config[param_name], param_value, param_name)
+        for key, value in model.state_dict().items():
+            self.assertTrue(torch.equal(value, model_cached.state_dict()[key]), key)
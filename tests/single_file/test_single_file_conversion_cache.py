@@ -0,0 +1,101 @@
+# coding=utf-8
+# Copyright 2024 HuggingFace Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import safetensors.torch
+import torch
+
+from diffusers import LTXVideoTransformer3DModel
+from diffusers.loaders import single_file_model
+
+
+class SingleFileConversionCacheTests(unittest.TestCase):
+    def get_model(self):
+        torch.manual_seed(0)
+        return LTXVideoTransformer3DModel(
+            in_channels=4,
+            out_channels=4,
+            num_attention_heads=2,
+            attention_head_dim=8,
+            cross_attention_dim=16,
+            num_layers=1,
+            caption_channels=16,
+        )
+
+    def save_original_checkpoint(self, model, path):
+        # the inverse of `convert_ltx_transformer_checkpoint_to_diffusers`
+        renames = {"proj_in": "patchify_proj", "time_embed": "adaln_single", "norm_q": "q_norm", "norm_k": "k_norm"}
+        checkpoint = {}
+        for key, value in model.state_dict().items():
+            for diffusers_name, original_name in renames.items():
+                key = key.replace(diffusers_name, original_name)
+            checkpoint[f"model.diffusion_model.{key}"] = value.contiguous()
+        safetensors.torch.save_file(checkpoint, path)
+
+    def num_cache_entries(self, cache_dir):
+        return len(os.listdir(os.path.join(cache_dir, "models")))
+
+    def test_conversion_cache(self):
+        model = self.get_model()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config_dir = os.path.join(tmpdir, "config")
+            model.save_config(config_dir)
+            ckpt_path = os.path.join(tmpdir, "ltx.safetensors")
+            self.save_original_checkpoint(model, ckpt_path)
+            cache_dir = os.path.join(tmpdir, "cache")
+
+            with mock.patch.object(
+                single_file_model,
+                "load_single_file_checkpoint",
+                wraps=single_file_model.load_single_file_checkpoint,
+            ) as load_checkpoint:
+                converted = LTXVideoTransformer3DModel.from_single_file(
+                    ckpt_path, config=config_dir, conversion_cache_dir=cache_dir
+                )
+                self.assertEqual(load_checkpoint.call_count, 1)
+                self.assertEqual(self.num_cache_entries(cache_dir), 1)
+
+                # the second load skips the conversion
+                cached = LTXVideoTransformer3DModel.from_single_file(
+                    ckpt_path, config=config_dir, conversion_cache_dir=cache_dir
+                )
+                self.assertEqual(load_checkpoint.call_count, 1)
+                self.assertEqual(self.num_cache_entries(cache_dir), 1)
+
+                # arguments that change the config of the converted model miss the cache
+                with_kwargs = LTXVideoTransformer3DModel.from_single_file(
+                    ckpt_path, config=config_dir, conversion_cache_dir=cache_dir, norm_eps=1e-5
+                )
+                self.assertEqual(load_checkpoint.call_count, 2)
+                self.assertEqual(self.num_cache_entries(cache_dir), 2)
+                self.assertEqual(with_kwargs.config.norm_eps, 1e-5)
+
+                other_config_dir = os.path.join(tmpdir, "other_config")
+                LTXVideoTransformer3DModel.from_config(model.config, norm_eps=1e-4).save_config(other_config_dir)
+                with_other_config = LTXVideoTransformer3DModel.from_single_file(
+                    ckpt_path, config=other_config_dir, conversion_cache_dir=cache_dir
+                )
+                self.assertEqual(load_checkpoint.call_count, 3)
+                self.assertEqual(self.num_cache_entries(cache_dir), 3)
+                self.assertEqual(with_other_config.config.norm_eps, 1e-4)
+
+        for loaded in (converted, cached):
+            self.assertEqual(loaded.config.norm_eps, model.config.norm_eps)
+            for key, value in model.state_dict().items():
+                self.assertTrue(torch.equal(value, loaded.state_dict()[key]), key)